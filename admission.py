@@ -0,0 +1,245 @@
+"""
+Controle de admissão de /api/generate sob picos de tráfego
+
+Sem controle, cada geração aceita disputa as mesmas vagas de LLM e de
+renderização, e sob pico todas acabam estourando o tempo. A admissão limita
+o trabalho em andamento (em páginas, por processo, como LLM_CONCURRENCY e
+RENDER_CONCURRENCY) para que as gerações aceitas terminem no prazo, e
+recusa o restante logo na entrada, com Retry-After:
+
+    - 429: o tenant já ocupa mais que a sua parcela da capacidade
+    - 503: capacidade do processo esgotada ou fila de renderização longa demais
+
+Os documentos curtos (até ADMISSION_SHORT_PAGES páginas) têm prioridade: os
+longos só ocupam até ADMISSION_LONG_SHARE da capacidade, e o restante fica
+reservado para os curtos.
+
+Acima de ADMISSION_DEGRADE_AT da capacidade, ou com renderizações demais em
+espera, as gerações ainda são aceitas em modo degradado: qualidade 'draft'
+(modelo rápido, PDF simples) e, se houver fila de renderização, apenas
+enfileiradas (resposta 202, sem renderizar no processo da API). Quem envia
+allow_degraded: false recebe 503 em vez do modo degradado.
+
+Configuração (variáveis de ambiente):
+    ADMISSION_CAPACITY_PAGES    Páginas em geração simultânea por processo (padrão 40 × LLM_CONCURRENCY)
+    ADMISSION_SHORT_PAGES       Tamanho máximo de um documento curto (padrão 20)
+    ADMISSION_LONG_SHARE        Parcela da capacidade disponível para documentos longos (padrão 0.7)
+    ADMISSION_TENANT_SHARE      Parcela máxima da capacidade por tenant (padrão 0.5)
+    ADMISSION_DEGRADE_AT        Ocupação a partir da qual as gerações são degradadas (padrão 0.8)
+    ADMISSION_MAX_RENDER_WAIT   Renderizações em espera que ativam o modo degradado (padrão 2 × RENDER_CONCURRENCY)
+    ADMISSION_MAX_QUEUE_DEPTH   Jobs na fila de renderização acima dos quais a API responde 503 (padrão 100)
+    ADMISSION_OVERFLOW_QUEUE    1: no modo inline, o modo degradado enfileira a renderização
+                                (exige render_worker.py consumindo a fila)
+    ADMISSION_SECONDS_PER_PAGE  Duração inicial estimada por página, para o Retry-After (padrão 6)
+"""
+
+import math
+import os
+import random
+import threading
+import time
+from typing import Dict, Any, Callable, Optional
+
+from metrics import metrics
+from tenant_scheduler import QuotaExceeded
+
+ADMISSION_CAPACITY_PAGES = int(os.getenv('ADMISSION_CAPACITY_PAGES', str(40 * int(os.getenv('LLM_CONCURRENCY', '8')))))
+ADMISSION_SHORT_PAGES = int(os.getenv('ADMISSION_SHORT_PAGES', '20'))
+ADMISSION_LONG_SHARE = float(os.getenv('ADMISSION_LONG_SHARE', '0.7'))
+ADMISSION_TENANT_SHARE = float(os.getenv('ADMISSION_TENANT_SHARE', '0.5'))
+ADMISSION_DEGRADE_AT = float(os.getenv('ADMISSION_DEGRADE_AT', '0.8'))
+ADMISSION_MAX_RENDER_WAIT = int(os.getenv('ADMISSION_MAX_RENDER_WAIT', str(2 * int(os.getenv('RENDER_CONCURRENCY', str(os.cpu_count() or 1))))))
+ADMISSION_MAX_QUEUE_DEPTH = int(os.getenv('ADMISSION_MAX_QUEUE_DEPTH', '100'))
+ADMISSION_OVERFLOW_QUEUE = os.getenv('ADMISSION_OVERFLOW_QUEUE', '0') == '1'
+ADMISSION_SECONDS_PER_PAGE = float(os.getenv('ADMISSION_SECONDS_PER_PAGE', '6'))
+
+# Custo mínimo de uma geração em páginas (chamadas, validação e renderização têm custo fixo)
+MIN_COST_PAGES = 5
+
+# Limites do Retry-After em segundos
+MIN_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 120
+
+# Nível de qualidade do modo degradado
+DEGRADED_QUALITY = 'draft'
+
+class Overloaded(QuotaExceeded):
+    """Geração recusada pelo controle de admissão"""
+    
+    def __init__(self, message: str, retry_after: int, status: int = 503, reason: str = 'capacity'):
+        super().__init__(message, retry_after)
+        self.status = status
+        self.reason = reason
+
+class Admission:
+    """Geração admitida: ocupa a capacidade até release()"""
+    
+    def __init__(self, controller: 'AdmissionController', tenant: str, cost: int, quality: str,
+                 queued_only: bool, degraded_reason: Optional[str]):
+        self.controller = controller
+        self.tenant = tenant
+        self.cost = cost
+        self.quality = quality  # Nível efetivo (DEGRADED_QUALITY no modo degradado)
+        self.queued_only = queued_only  # Renderizar apenas pela fila
+        self.degraded_reason = degraded_reason
+        self.started = time.monotonic()
+        self._released = False
+    
+    @property
+    def degraded(self) -> bool:
+        return self.degraded_reason is not None
+    
+    def release(self) -> None:
+        """Libera a capacidade ocupada (chamadas repetidas são ignoradas)"""
+        if not self._released:
+            self._released = True
+            self.controller._release(self)
+
+class AdmissionController:
+    """Admite, degrada ou recusa gerações conforme a ocupação do processo"""
+    
+    def __init__(self, capacity_pages: int = ADMISSION_CAPACITY_PAGES,
+                 render_backlog: Optional[Callable[[], int]] = None,
+                 queue_depth: Optional[Callable[[], int]] = None,
+                 overflow_queue: bool = False):
+        self.capacity_pages = capacity_pages
+        self.render_backlog = render_backlog  # Renderizações à espera de uma vaga no processo
+        self.queue_depth = queue_depth  # Jobs na fila de renderização (None: sem fila)
+        self.overflow_queue = overflow_queue  # Se o modo degradado pode enfileirar a renderização
+        self._lock = threading.Lock()
+        self._pages = 0
+        self._jobs = 0
+        self._tenant_pages: Dict[str, int] = {}
+        self._seconds_per_page = ADMISSION_SECONDS_PER_PAGE
+        self._depth_cache = (0.0, 0)
+    
+    def admit(self, tenant: str, page_count: int, quality: str, allow_degraded: bool = True) -> Admission:
+        """
+        Decide se uma geração é aceita, e em que modo
+        
+        Args:
+            tenant: Identificador do tenant
+            page_count: Número de páginas pedido
+            quality: Nível de qualidade pedido
+            allow_degraded: Se a geração pode ser degradada em vez de recusada
+        
+        Returns:
+            Admission com o nível efetivo e o modo de renderização
+        
+        Raises:
+            Overloaded: Geração recusada (status 429 ou 503, com Retry-After)
+        """
+        cost = max(page_count, MIN_COST_PAGES)
+        short = page_count <= ADMISSION_SHORT_PAGES
+        
+        # Fila de renderização longa: os jobs aceitos agora terminariam tarde de qualquer forma
+        depth = self._queue_depth()
+        if depth >= ADMISSION_MAX_QUEUE_DEPTH:
+            self._reject('queue_depth', f"Fila de renderização cheia ({depth} jobs)", 503,
+                         depth / ADMISSION_MAX_QUEUE_DEPTH * self._seconds_per_page * ADMISSION_SHORT_PAGES)
+        
+        render_backlog = self.render_backlog() if self.render_backlog is not None else 0
+        
+        with self._lock:
+            load = self._pages
+            tenant_load = self._tenant_pages.get(tenant, 0)
+            
+            # A parcela do tenant só é aplicada sob carga: com o processo folgado, um tenant pode usar mais
+            tenant_limit = self.capacity_pages * ADMISSION_TENANT_SHARE
+            if tenant_load + cost > tenant_limit and load + cost > self.capacity_pages * ADMISSION_DEGRADE_AT:
+                self._reject('tenant_share', "Limite de gerações simultâneas do tenant atingido", 429,
+                             self._retry_after(tenant_load + cost - tenant_limit, tenant_load, cost))
+            
+            # Documentos longos não ocupam a reserva dos curtos
+            limit = self.capacity_pages if short else self.capacity_pages * ADMISSION_LONG_SHARE
+            if load + cost > limit:
+                reason = 'capacity' if short else 'long_job'
+                self._reject(reason, "Servidor sobrecarregado, tente novamente", 503,
+                             self._retry_after(load + cost - limit, load, cost))
+            
+            degraded_reason = None
+            if load + cost > self.capacity_pages * ADMISSION_DEGRADE_AT:
+                degraded_reason = 'load'
+            elif render_backlog >= ADMISSION_MAX_RENDER_WAIT:
+                degraded_reason = 'render_backlog'
+            
+            if degraded_reason and not allow_degraded:
+                self._reject(degraded_reason, "Servidor sobrecarregado e modo degradado não permitido", 503,
+                             self._retry_after(load + cost - self.capacity_pages * ADMISSION_DEGRADE_AT, load, cost))
+            
+            self._pages += cost
+            self._jobs += 1
+            self._tenant_pages[tenant] = tenant_load + cost
+        
+        metrics.increment('admission_admitted', short=short)
+        metrics.observe('admission_load', (load + cost) / self.capacity_pages)
+        if degraded_reason:
+            metrics.increment('admission_degraded', reason=degraded_reason)
+            return Admission(self, tenant, cost, DEGRADED_QUALITY, self.overflow_queue, degraded_reason)
+        return Admission(self, tenant, cost, quality, False, None)
+    
+    @property
+    def degraded(self) -> bool:
+        """Indica se novas gerações já seriam degradadas (trabalho opcional deve ser evitado)"""
+        with self._lock:
+            return self._pages > self.capacity_pages * ADMISSION_DEGRADE_AT
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Retorna o estado atual do controle de admissão
+        
+        Returns:
+            Dicionário com a capacidade, a ocupação e a duração estimada por página
+        """
+        with self._lock:
+            return {
+                'capacity_pages': self.capacity_pages,
+                'pages_in_flight': self._pages,
+                'jobs_in_flight': self._jobs,
+                'tenants': dict(self._tenant_pages),
+                'seconds_per_page': round(self._seconds_per_page, 2),
+                'degrade_at': ADMISSION_DEGRADE_AT,
+            }
+    
+    def _release(self, admission: Admission) -> None:
+        """Devolve a capacidade e atualiza a duração estimada por página (média móvel)"""
+        seconds = time.monotonic() - admission.started
+        with self._lock:
+            self._pages -= admission.cost
+            self._jobs -= 1
+            remaining = self._tenant_pages.get(admission.tenant, 0) - admission.cost
+            if remaining > 0:
+                self._tenant_pages[admission.tenant] = remaining
+            else:
+                self._tenant_pages.pop(admission.tenant, None)
+            self._seconds_per_page = 0.8 * self._seconds_per_page + 0.2 * seconds / admission.cost
+    
+    def _queue_depth(self) -> int:
+        """Profundidade da fila de renderização, consultada no máximo uma vez por segundo"""
+        if self.queue_depth is None:
+            return 0
+        checked_at, depth = self._depth_cache
+        if time.monotonic() - checked_at >= 1.0:
+            try:
+                depth = self.queue_depth()
+            except Exception as e:
+                print(f"Erro ao consultar a fila de renderização: {str(e)}")
+            self._depth_cache = (time.monotonic(), depth)
+        return depth
+    
+    def _retry_after(self, excess_pages: float, load: int, cost: int) -> float:
+        """
+        Segundos estimados até liberar as páginas que faltam
+        
+        As gerações em andamento estão, em média, na metade: liberar uma
+        fração da ocupação leva a mesma fração de meia geração.
+        """
+        job_seconds = self._seconds_per_page * max(cost, ADMISSION_SHORT_PAGES)
+        return job_seconds * min(1.0, excess_pages / max(load, 1)) + job_seconds / 2
+    
+    @staticmethod
+    def _reject(reason: str, message: str, status: int, retry_seconds: float) -> None:
+        """Recusa a geração, com um Retry-After espalhado para que os clientes não voltem juntos"""
+        retry_after = min(MAX_RETRY_AFTER, max(MIN_RETRY_AFTER, math.ceil(retry_seconds * random.uniform(1.0, 1.25))))
+        metrics.increment('admission_rejected', reason=reason, status=status)
+        raise Overloaded(message, retry_after, status, reason)
@@ -3,14 +3,66 @@ Interfaces para diferentes APIs de IA
 """
 
 import os
+import re
 import json
-import requests
+import time
+import random
+import hashlib
+import threading
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from prompt_cache import prompt_segments, PROMPT_CACHE_MIN_TOKENS
+
+# Modelo padrão de cada provedor (usado pela fábrica, pelos clientes de lote,
+# pelo planejamento de tokens e pelos níveis de qualidade sem modelo próprio)
+DEFAULT_MODELS = {
+    'openai': 'gpt-3.5-turbo',
+    'anthropic': 'claude-3-5-haiku-20241022',  # A API Messages não aceita mais o claude-2
+    'gemini': 'gemini-pro',
+    'simulated': 'simulated',
+}
+
+# Mensagem de sistema comum a todas as chamadas (primeira parte do prefixo em cache)
+SYSTEM_PROMPT = "Você é um assistente especializado em criar conteúdo de alta qualidade em formato Markdown. Seu trabalho é gerar conteúdo detalhado, bem estruturado e sem erros."
+
+# Pontos de cache explícitos aceitos pela Anthropic em uma requisição
+ANTHROPIC_MAX_CACHE_BREAKPOINTS = 4
+
+# Endereços das APIs (podem apontar para um proxy ou para o servidor local de batch_standin.py)
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1')
+ANTHROPIC_BASE_URL = os.getenv('ANTHROPIC_BASE_URL', 'https://api.anthropic.com/v1')
+
+# Pedidos por submissão em lote (limites dos provedores: 50.000 na OpenAI, 100.000 na Anthropic)
+BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', '10000'))
+
+class Completion:
+    """Resposta de uma chamada ao modelo, com o motivo de parada"""
+    
+    def __init__(self, text: str, finish_reason: Optional[str] = None, truncated: bool = False, usage: Optional[Dict[str, int]] = None):
+        self.text = text
+        self.finish_reason = finish_reason
+        self.truncated = truncated  # True quando a resposta foi cortada pelo limite de tokens
+        self.usage = usage  # {'prompt_tokens', 'output_tokens', 'cached_tokens'} informados pelo provedor, se houver
 
 class AIModelInterface(ABC):
     """Interface base para modelos de IA"""
     
+    @abstractmethod
+    def complete(self, prompt: str, max_tokens: int = 4000, temperature: float = 0.7) -> Completion:
+        """
+        Faz uma chamada ao modelo sem fallback, propagando erros da API
+        
+        Args:
+            prompt: Texto do prompt para a IA
+            max_tokens: Número máximo de tokens na resposta
+            temperature: Temperatura para geração (0.0 a 1.0)
+            
+        Returns:
+            Resposta com o texto gerado e a indicação de truncamento
+        """
+        pass
+    
     @abstractmethod
     def generate_content(self, prompt: str, max_tokens: int = 4000, temperature: float = 0.7) -> str:
         """
@@ -26,6 +78,22 @@ class AIModelInterface(ABC):
         """
         pass
     
+    def stream(self, prompt: str, max_tokens: int = 4000, temperature: float = 0.7) -> Iterator[str]:
+        """
+        Gera conteúdo em fragmentos, à medida que fica disponível
+        
+        A implementação padrão entrega a resposta completa em um único fragmento.
+        
+        Args:
+            prompt: Texto do prompt para a IA
+            max_tokens: Número máximo de tokens na resposta
+            temperature: Temperatura para geração (0.0 a 1.0)
+            
+        Returns:
+            Gerador de fragmentos de texto Markdown
+        """
+        yield self.complete(prompt, max_tokens, temperature).text
+    
     @abstractmethod
     def get_name(self) -> str:
         """
@@ -39,33 +107,62 @@ class AIModelInterface(ABC):
 class OpenAIModel(AIModelInterface):
     """Implementação para OpenAI (GPT-3.5/4)"""
     
-    def __init__(self, api_key: str, model: str = "gpt-3.5-turbo"):
+    def __init__(self, api_key: str, model: str = DEFAULT_MODELS['openai'], base_url: Optional[str] = None):
         self.api_key = api_key
         self.model = model
-        self.api_url = "https://api.openai.com/v1/chat/completions"
+        self.base_url = (base_url or OPENAI_BASE_URL).rstrip('/')
+        self.api_url = f"{self.base_url}/chat/completions"
     
-    def generate_content(self, prompt: str, max_tokens: int = 4000, temperature: float = 0.7) -> str:
-        headers = {
+    def complete(self, prompt: str, max_tokens: int = 4000, temperature: float = 0.7) -> Completion:
+        import requests  # Importação sob demanda
+        
+        response = requests.post(self.api_url, headers=self.headers(), json=self.request_body(prompt, max_tokens, temperature))
+        response.raise_for_status()
+        return OpenAIModel.parse_response(response.json())
+    
+    def headers(self) -> Dict[str, str]:
+        """Cabeçalhos de autenticação da API"""
+        return {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.api_key}"
         }
-        
+    
+    def request_body(self, prompt: str, max_tokens: int, temperature: float) -> Dict[str, Any]:
+        """Corpo de uma chamada a /chat/completions (também usado nos lotes)"""
         data = {
             "model": self.model,
             "messages": [
-                {"role": "system", "content": "Você é um assistente especializado em criar conteúdo de alta qualidade em formato Markdown. Seu trabalho é gerar conteúdo detalhado, bem estruturado e sem erros."},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             "max_tokens": max_tokens,
             "temperature": temperature
         }
         
+        # O cache de prefixo é automático; a chave agrupa no mesmo servidor
+        # as chamadas que compartilham as instruções do tipo de documento
+        segments = prompt_segments(prompt)
+        if len(segments) > 1:
+            data["prompt_cache_key"] = hashlib.sha256(segments[0].encode('utf-8')).hexdigest()[:32]
+        return data
+    
+    @staticmethod
+    def parse_response(result: Dict[str, Any]) -> Completion:
+        """Converte a resposta de /chat/completions em Completion"""
+        choice = result["choices"][0]
+        finish_reason = choice.get("finish_reason")
+        usage = result.get("usage")
+        if usage:
+            usage = {
+                'prompt_tokens': usage.get("prompt_tokens", 0),
+                'output_tokens': usage.get("completion_tokens", 0),
+                'cached_tokens': (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0),
+            }
+        return Completion(choice["message"]["content"], finish_reason, finish_reason == "length", usage)
+    
+    def generate_content(self, prompt: str, max_tokens: int = 4000, temperature: float = 0.7) -> str:
         try:
-            response = requests.post(self.api_url, headers=headers, json=data)
-            response.raise_for_status()
-            
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
+            return self.complete(prompt, max_tokens, temperature).text
         
         except Exception as e:
             print(f"Erro na chamada à API OpenAI: {str(e)}")
@@ -78,30 +175,81 @@ class OpenAIModel(AIModelInterface):
 class AnthropicModel(AIModelInterface):
     """Implementação para Anthropic (Claude)"""
     
-    def __init__(self, api_key: str, model: str = "claude-2"):
+    def __init__(self, api_key: str, model: str = DEFAULT_MODELS['anthropic'], base_url: Optional[str] = None):
         self.api_key = api_key
         self.model = model
-        self.api_url = "https://api.anthropic.com/v1/complete"
+        self.base_url = (base_url or ANTHROPIC_BASE_URL).rstrip('/')
+        self.api_url = f"{self.base_url}/messages"
     
-    def generate_content(self, prompt: str, max_tokens: int = 4000, temperature: float = 0.7) -> str:
-        headers = {
+    def complete(self, prompt: str, max_tokens: int = 4000, temperature: float = 0.7) -> Completion:
+        import requests  # Importação sob demanda
+        
+        response = requests.post(self.api_url, headers=self.headers(), json=self.request_body(prompt, max_tokens, temperature))
+        response.raise_for_status()
+        return AnthropicModel.parse_response(response.json())
+    
+    def headers(self) -> Dict[str, str]:
+        """Cabeçalhos de autenticação e versão da API"""
+        return {
             "Content-Type": "application/json",
-            "X-API-Key": self.api_key
+            "x-api-key": self.api_key,
+            "anthropic-version": "2023-06-01"
         }
-        
-        data = {
+    
+    def request_body(self, prompt: str, max_tokens: int, temperature: float) -> Dict[str, Any]:
+        """Parâmetros de uma chamada a /messages (também usados nos lotes)"""
+        return {
             "model": self.model,
-            "prompt": f"\n\nHuman: {prompt}\n\nAssistant:",
-            "max_tokens_to_sample": max_tokens,
+            "system": [{"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}],
+            "messages": [{"role": "user", "content": AnthropicModel._content_blocks(prompt)}],
+            "max_tokens": max_tokens,
             "temperature": temperature
         }
+    
+    @staticmethod
+    def parse_response(result: Dict[str, Any]) -> Completion:
+        """Converte uma mensagem da API em Completion"""
+        stop_reason = result.get("stop_reason")
+        text = ''.join(block.get("text", "") for block in result.get("content", []) if block.get("type") == "text")
+        
+        usage = result.get("usage")
+        if usage:
+            cached = usage.get("cache_read_input_tokens") or 0
+            usage = {
+                'prompt_tokens': usage.get("input_tokens", 0) + cached + (usage.get("cache_creation_input_tokens") or 0),
+                'output_tokens': usage.get("output_tokens", 0),
+                'cached_tokens': cached,
+            }
+        return Completion(text, stop_reason, stop_reason == "max_tokens", usage)
+    
+    @staticmethod
+    def _content_blocks(prompt: str) -> List[Dict[str, Any]]:
+        """
+        Divide o prompt em blocos, com ponto de cache no fim de cada segmento estável
         
+        Args:
+            prompt: Prompt a enviar (string comum ou CacheablePrompt)
+        
+        Returns:
+            Blocos de conteúdo da mensagem do usuário
+        """
+        segments = prompt_segments(prompt)
+        
+        # Um dos pontos de cache fica na mensagem de sistema; os mais próximos
+        # do fim cobrem o prefixo mais longo, então os primeiros são juntados
+        stable_count = min(len(segments) - 1, ANTHROPIC_MAX_CACHE_BREAKPOINTS - 1)
+        merged = len(segments) - 1 - stable_count
+        if merged > 0:
+            segments = [''.join(segments[:merged + 1])] + segments[merged + 1:]
+        
+        blocks = [{"type": "text", "text": segment} for segment in segments]
+        for block in blocks[:-1]:
+            block["cache_control"] = {"type": "ephemeral"}
+        return blocks
+    
+    def generate_content(self, prompt: str, max_tokens: int = 4000, temperature: float = 0.7) -> str:
         try:
-            response = requests.post(self.api_url, headers=headers, json=data)
-            response.raise_for_status()
-            
-            result = response.json()
-            return result["completion"]
+            return self.complete(prompt, max_tokens, temperature).text
         
         except Exception as e:
             print(f"Erro na chamada à API Anthropic: {str(e)}")
@@ -120,12 +268,14 @@ class AnthropicModel(AIModelInterface):
 class GeminiModel(AIModelInterface):
     """Implementação para Google Gemini"""
     
-    def __init__(self, api_key: str, model: str = "gemini-pro"):
+    def __init__(self, api_key: str, model: str = DEFAULT_MODELS['gemini']):
         self.api_key = api_key
         self.model = model
         self.api_url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
     
-    def generate_content(self, prompt: str, max_tokens: int = 4000, temperature: float = 0.7) -> str:
+    def complete(self, prompt: str, max_tokens: int = 4000, temperature: float = 0.7) -> Completion:
+        import requests  # Importação sob demanda
+        
         headers = {
             "Content-Type": "application/json"
         }
@@ -146,16 +296,32 @@ class GeminiModel(AIModelInterface):
             }
         }
         
+        response = requests.post(
+            f"{self.api_url}?key={self.api_key}", 
+            headers=headers, 
+            json=data
+        )
+        response.raise_for_status()
+        
+        result = response.json()
+        candidate = result["candidates"][0]
+        finish_reason = candidate.get("finishReason")
+        usage = result.get("usageMetadata")
+        if usage:
+            usage = {
+                'prompt_tokens': usage.get("promptTokenCount", 0),
+                'output_tokens': usage.get("candidatesTokenCount", 0),
+                'cached_tokens': usage.get("cachedContentTokenCount", 0),
+            }
+        
+        # A resposta pode vir em várias partes, ou sem conteúdo (ex.: cortada por MAX_TOKENS ou SAFETY)
+        parts = (candidate.get("content") or {}).get("parts") or []
+        text = ''.join(part.get("text", "") for part in parts)
+        return Completion(text, finish_reason, finish_reason == "MAX_TOKENS", usage)
+    
+    def generate_content(self, prompt: str, max_tokens: int = 4000, temperature: float = 0.7) -> str:
         try:
-            response = requests.post(
-                f"{self.api_url}?key={self.api_key}", 
-                headers=headers, 
-                json=data
-            )
-            response.raise_for_status()
-            
-            result = response.json()
-            return result["candidates"][0]["content"]["parts"][0]["text"]
+            return self.complete(prompt, max_tokens, temperature).text
         
         except Exception as e:
             print(f"Erro na chamada à API Gemini: {str(e)}")
@@ -171,6 +337,448 @@ class GeminiModel(AIModelInterface):
     def get_name(self) -> str:
         return f"Google Gemini ({self.model})"
 
+# Vocabulário do texto simulado, por idioma
+SIMULATED_VOCABULARY = {
+    'pt-BR': (
+        "análise aplicação aprendizado base caso conceito contexto critério dado decisão desafio "
+        "desenvolvimento equipe estratégia estrutura etapa exemplo experiência ferramenta fluxo "
+        "gestão impacto indicador informação inovação mercado meta método modelo mudança objetivo "
+        "oportunidade organização padrão planejamento prática prazo processo produto projeto "
+        "qualidade recurso resultado risco solução sistema tecnologia tempo uso valor visão "
+        "permite melhora define orienta mostra reduz aumenta organiza simplifica garante apoia "
+        "claro eficiente prático sólido simples consistente relevante importante completo"
+    ).split(),
+    'en-US': (
+        "analysis application learning basis case concept context criterion data decision challenge "
+        "development team strategy structure step example experience tool flow management impact "
+        "indicator information innovation market goal method model change objective opportunity "
+        "organization pattern planning practice deadline process product project quality resource "
+        "result risk solution system technology time use value vision allows improves defines "
+        "guides shows reduces increases organizes simplifies ensures supports clear efficient "
+        "practical solid simple consistent relevant important complete"
+    ).split(),
+}
+
+# Caracteres por token e por palavra usados pelo modelo simulado para respeitar max_tokens
+SIMULATED_CHARS_PER_TOKEN = 4
+SIMULATED_CHARS_PER_WORD = 10
+
+# Prefixos lembrados pelo cache simulado
+SIMULATED_CACHE_ENTRIES = 10000
+
+class SimulatedModel(AIModelInterface):
+    """
+    Provedor simulado, determinístico e sem rede, para testes de carga
+    
+    Gera Markdown de tamanho realista a partir do prompt (título, idioma,
+    partes pedidas e número de palavras), com tabelas e blocos de código
+    configuráveis. A mesma semente e o mesmo prompt produzem sempre o mesmo
+    texto. A latência é sintética: espera inicial mais tempo proporcional aos
+    tokens gerados.
+    """
+    
+    # Prefixos já vistos, compartilhados no processo como o cache de um provedor
+    _seen_prefixes = {}
+    _seen_lock = threading.Lock()
+    
+    def __init__(self, api_key: str = "", model: str = "simulated", seed: int = 0, pages: Optional[int] = None,
+                 sections: int = 5, tables: int = 1, code_blocks: int = 0,
+                 latency: float = 0.0, tokens_per_second: float = 0.0, chunk_tokens: int = 16):
+        self.api_key = api_key
+        self.model = model
+        self.seed = seed
+        self.pages = pages  # None: usa o número de palavras pedido no prompt
+        self.sections = sections  # Capítulos quando o prompt não lista as partes
+        self.tables = tables  # Tabelas por seção
+        self.code_blocks = code_blocks  # Blocos de código por seção
+        self.latency = latency  # Segundos até o primeiro token
+        self.tokens_per_second = tokens_per_second  # 0 para gerar sem atraso
+        self.chunk_tokens = chunk_tokens  # Tokens por fragmento no modo stream
+    
+    @classmethod
+    def from_env(cls, model: Optional[str] = None) -> 'SimulatedModel':
+        """Cria o modelo simulado com a configuração das variáveis SIMULATED_*"""
+        pages = os.getenv('SIMULATED_PAGES')
+        return cls(
+            model=model or "simulated",
+            seed=int(os.getenv('SIMULATED_SEED', '0')),
+            pages=int(pages) if pages else None,
+            sections=int(os.getenv('SIMULATED_SECTIONS', '5')),
+            tables=int(os.getenv('SIMULATED_TABLES', '1')),
+            code_blocks=int(os.getenv('SIMULATED_CODE_BLOCKS', '0')),
+            latency=float(os.getenv('SIMULATED_LATENCY', '0')),
+            tokens_per_second=float(os.getenv('SIMULATED_TOKENS_PER_SECOND', '0'))
+        )
+    
+    def complete(self, prompt: str, max_tokens: int = 4000, temperature: float = 0.7) -> Completion:
+        text, truncated = self._render(prompt, max_tokens)
+        self._wait(self.latency + self._generation_seconds(text))
+        usage = {
+            'prompt_tokens': len(prompt) // SIMULATED_CHARS_PER_TOKEN,
+            'output_tokens': len(text) // SIMULATED_CHARS_PER_TOKEN,
+            'cached_tokens': SimulatedModel._cached_tokens(prompt),
+        }
+        return Completion(text, "length" if truncated else "stop", truncated, usage)
+    
+    def generate_content(self, prompt: str, max_tokens: int = 4000, temperature: float = 0.7) -> str:
+        return self.complete(prompt, max_tokens, temperature).text
+    
+    def stream(self, prompt: str, max_tokens: int = 4000, temperature: float = 0.7) -> Iterator[str]:
+        text, _ = self._render(prompt, max_tokens)
+        chunk_size = self.chunk_tokens * SIMULATED_CHARS_PER_TOKEN
+        
+        self._wait(self.latency)
+        for start in range(0, len(text), chunk_size):
+            chunk = text[start:start + chunk_size]
+            self._wait(self._generation_seconds(chunk))
+            yield chunk
+    
+    def get_name(self) -> str:
+        return f"Simulado ({self.model})"
+    
+    @staticmethod
+    def _cached_tokens(prompt: str) -> int:
+        """Imita o cache de prefixo dos provedores: tokens do maior prefixo estável já visto"""
+        cached = 0
+        prefix = ''
+        with SimulatedModel._seen_lock:
+            for segment in prompt_segments(prompt)[:-1]:
+                prefix += segment
+                tokens = len(prefix) // SIMULATED_CHARS_PER_TOKEN
+                key = hashlib.sha256(prefix.encode('utf-8')).digest()
+                if key in SimulatedModel._seen_prefixes and tokens >= PROMPT_CACHE_MIN_TOKENS:
+                    cached = tokens
+                SimulatedModel._seen_prefixes[key] = True
+            
+            while len(SimulatedModel._seen_prefixes) > SIMULATED_CACHE_ENTRIES:
+                SimulatedModel._seen_prefixes.pop(next(iter(SimulatedModel._seen_prefixes)))
+        return cached
+    
+    def _wait(self, seconds: float) -> None:
+        """Espera sintética que imita a latência do provedor"""
+        if seconds > 0:
+            time.sleep(seconds)
+    
+    def _generation_seconds(self, text: str) -> float:
+        """Tempo de geração do texto na velocidade configurada"""
+        if self.tokens_per_second <= 0:
+            return 0.0
+        return len(text) / SIMULATED_CHARS_PER_TOKEN / self.tokens_per_second
+    
+    def _render(self, prompt: str, max_tokens: int) -> Tuple[str, bool]:
+        """Gera o texto do prompt, cortado em max_tokens como um provedor real"""
+        rng = random.Random(f"{self.seed}:{prompt}")
+        language = 'pt-BR' if re.search(r'\b(palavras|Crie|documento)\b', prompt) else 'en-US'
+        title_match = re.search(r'(?:[Tt]ítulo|[Tt]itle):? "([^"]+)"', prompt)
+        title = title_match.group(1) if title_match else "Documento"
+        
+        requested = self._parse_list(prompt, ('seguintes partes', 'following parts'))
+        parts = requested or self._default_parts(language)
+        
+        # Continuação: pula as seções já escritas e recomeça pela seção indicada
+        written = set(self._parse_list(prompt, ('NÃO devem ser repetidas', 'must NOT be repeated')))
+        resume_match = re.search(r'(?:começando pela seção|starting with the section) "([^"]+)"', prompt)
+        if resume_match and resume_match.group(1) in parts:
+            parts = parts[parts.index(resume_match.group(1)):]
+        elif written:
+            parts = [part for part in parts if part not in written]
+        
+        if self.pages:
+            words_per_part = self.pages * 500 // (self.sections + 3)
+        else:
+            # Como um modelo real, escreve o que foi pedido dentro do max_tokens da chamada
+            words_per_part = self._requested_words(prompt) // (self.sections + 3)
+            fitting_chars = max_tokens * SIMULATED_CHARS_PER_TOKEN * 0.8 / max(1, len(parts))
+            words_per_part = min(words_per_part, int(fitting_chars / SIMULATED_CHARS_PER_WORD))
+        words_per_part = max(80, words_per_part)
+        
+        blocks = []
+        first_step = not requested or re.search(r'(?:etapa|step) 1 (?:de|of) ', prompt)
+        for index, part in enumerate(parts):
+            if index == 0 and first_step and not written:
+                blocks.append(f"# {title}")
+                blocks.append(self._paragraph(rng, SIMULATED_VOCABULARY[language])[0])
+            blocks.append(self._section(rng, part, words_per_part, language))
+        text = '\n\n'.join(blocks) + '\n'
+        
+        max_chars = max_tokens * SIMULATED_CHARS_PER_TOKEN
+        if len(text) > max_chars:
+            return text[:max_chars], True
+        return text, False
+    
+    def _default_parts(self, language: str) -> List[str]:
+        """Partes do documento quando o prompt não as lista"""
+        if language == 'pt-BR':
+            return (["Introdução"] + [f"Capítulo {i + 1}" for i in range(self.sections)]
+                    + ["Conclusão", "Referências"])
+        return (["Introduction"] + [f"Chapter {i + 1}" for i in range(self.sections)]
+                + ["Conclusion", "References"])
+    
+    @staticmethod
+    def _parse_list(prompt: str, markers: Tuple[str, ...]) -> List[str]:
+        """Lê a lista de itens ('- item') que segue um dos marcadores no prompt"""
+        for marker in markers:
+            position = prompt.find(marker)
+            if position == -1:
+                continue
+            items = []
+            for line in prompt[position:].split('\n')[1:]:
+                if not line.startswith('- '):
+                    break
+                items.append(line[2:].strip())
+            return items
+        return []
+    
+    @staticmethod
+    def _requested_words(prompt: str) -> int:
+        """Número total de palavras pedido no prompt (10000 se não houver)"""
+        match = re.search(r'(\d+) (?:palavras no total|words in total)', prompt)
+        return int(match.group(1)) if match else 10000
+    
+    def _section(self, rng: random.Random, heading: str, words: int, language: str) -> str:
+        """Gera uma seção com subtópicos, parágrafos, tabelas e blocos de código"""
+        vocabulary = SIMULATED_VOCABULARY[language]
+        subtopic = "Subtópico" if language == 'pt-BR' else "Subtopic"
+        blocks = [f"## {heading}"]
+        
+        subtopic_count = max(1, min(4, words // 300))
+        for index in range(subtopic_count):
+            # Todo cabeçalho é seguido de pelo menos um parágrafo
+            if subtopic_count > 1:
+                if index == 0:
+                    blocks.append(self._paragraph(rng, vocabulary)[0])
+                blocks.append(f"### {subtopic} {index + 1}")
+            remaining = words // subtopic_count
+            while remaining > 0:
+                paragraph, used = self._paragraph(rng, vocabulary)
+                blocks.append(paragraph)
+                remaining -= used
+        
+        for index in range(self.tables):
+            blocks.insert(min(len(blocks), 2 + index * 3), self._table(rng, vocabulary))
+        for index in range(self.code_blocks):
+            blocks.insert(min(len(blocks), 3 + index * 3), self._code_block(rng, vocabulary))
+        
+        if heading in ("Referências", "References"):
+            blocks.append('\n'.join(
+                f"{i + 1}. [{rng.choice(vocabulary).capitalize()} {rng.choice(vocabulary)}](https://example.com/ref/{rng.randrange(10000)})"
+                for i in range(5)
+            ))
+        
+        return '\n\n'.join(blocks)
+    
+    @staticmethod
+    def _paragraph(rng: random.Random, vocabulary: List[str]) -> Tuple[str, int]:
+        """Gera um parágrafo e retorna (texto, número de palavras)"""
+        sentences = []
+        word_count = 0
+        for _ in range(rng.randint(3, 6)):
+            words = [rng.choice(vocabulary) for _ in range(rng.randint(8, 18))]
+            if rng.random() < 0.15:
+                position = rng.randrange(1, len(words))
+                words[position] = f"**{words[position]}**"
+            word_count += len(words)
+            sentences.append(' '.join(words).capitalize() + '.')
+        return ' '.join(sentences), word_count
+    
+    @staticmethod
+    def _table(rng: random.Random, vocabulary: List[str]) -> str:
+        """Gera uma tabela Markdown de 3 colunas"""
+        header = [rng.choice(vocabulary).capitalize() for _ in range(3)]
+        rows = [
+            f"| {rng.choice(vocabulary)} | {rng.choice(vocabulary)} | {rng.randint(1, 999)} |"
+            for _ in range(rng.randint(3, 6))
+        ]
+        return '\n'.join([f"| {' | '.join(header)} |", "| --- | --- | --- |"] + rows)
+    
+    @staticmethod
+    def _code_block(rng: random.Random, vocabulary: List[str]) -> str:
+        """Gera um bloco de código Python cercado"""
+        names = [rng.choice(vocabulary) for _ in range(3)]
+        return '\n'.join([
+            "```python",
+            f"def {names[0]}_{names[1]}({names[2]}):",
+            f"    total = sum(item * {rng.randint(2, 9)} for item in {names[2]})",
+            f"    return total / max(1, len({names[2]}))",
+            "```",
+        ])
+
+class BatchRequest:
+    """Pedido de uma submissão em lote"""
+    
+    def __init__(self, custom_id: str, prompt: str, max_tokens: int = 4000, temperature: float = 0.7):
+        self.custom_id = custom_id  # Até 64 caracteres [A-Za-z0-9_-] (exigência da Anthropic)
+        self.prompt = prompt
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+
+class BatchClientInterface(ABC):
+    """
+    Interface para as APIs de lote dos provedores
+    
+    Os pedidos são processados de forma assíncrona (em até 24 horas), com
+    custo menor e sem disputar o limite de requisições das chamadas síncronas.
+    """
+    
+    @abstractmethod
+    def submit(self, requests: List[BatchRequest]) -> str:
+        """
+        Envia um lote de pedidos
+        
+        Args:
+            requests: Pedidos (no máximo BATCH_MAX_REQUESTS)
+        
+        Returns:
+            Identificador do lote no provedor
+        """
+        pass
+    
+    @abstractmethod
+    def poll(self, batch_id: str) -> Optional[Dict[str, Completion]]:
+        """
+        Consulta um lote
+        
+        Args:
+            batch_id: Identificador do lote
+        
+        Returns:
+            None enquanto o lote estiver em processamento; ao terminar, as
+            respostas por custom_id (pedidos com erro ficam de fora)
+        """
+        pass
+    
+    def wait(self, batch_id: str, poll_interval: float = 30.0, timeout: Optional[float] = None) -> Dict[str, Completion]:
+        """
+        Espera um lote terminar
+        
+        Args:
+            batch_id: Identificador do lote
+            poll_interval: Intervalo entre as consultas, em segundos
+            timeout: Espera máxima, em segundos (None para esperar indefinidamente)
+        
+        Returns:
+            Respostas por custom_id
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            results = self.poll(batch_id)
+            if results is not None:
+                return results
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"Lote {batch_id} não terminou em {timeout:.0f} s")
+            time.sleep(poll_interval)
+
+class OpenAIBatchClient(BatchClientInterface):
+    """API Batch da OpenAI: arquivo JSONL enviado a /files e processado por /batches"""
+    
+    # Estados finais com arquivo de saída (lotes expirados ou cancelados têm resultados parciais)
+    FINISHED_STATUSES = ('completed', 'expired', 'cancelled')
+    
+    def __init__(self, api_key: str, model: str = DEFAULT_MODELS['openai'], base_url: Optional[str] = None):
+        self.model = OpenAIModel(api_key, model, base_url)
+    
+    def submit(self, requests: List[BatchRequest]) -> str:
+        import requests as http  # Importação sob demanda
+        
+        lines = [
+            json.dumps({
+                "custom_id": request.custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": self.model.request_body(request.prompt, request.max_tokens, request.temperature)
+            }, ensure_ascii=False)
+            for request in requests
+        ]
+        auth = {"Authorization": f"Bearer {self.model.api_key}"}
+        
+        upload = http.post(
+            f"{self.model.base_url}/files", headers=auth, data={"purpose": "batch"},
+            files={"file": ("batch.jsonl", '\n'.join(lines).encode('utf-8'), "application/jsonl")}
+        )
+        upload.raise_for_status()
+        
+        response = http.post(f"{self.model.base_url}/batches", headers=self.model.headers(), json={
+            "input_file_id": upload.json()["id"],
+            "endpoint": "/v1/chat/completions",
+            "completion_window": "24h"
+        })
+        response.raise_for_status()
+        return response.json()["id"]
+    
+    def poll(self, batch_id: str) -> Optional[Dict[str, Completion]]:
+        import requests as http  # Importação sob demanda
+        
+        response = http.get(f"{self.model.base_url}/batches/{batch_id}", headers=self.model.headers())
+        response.raise_for_status()
+        batch = response.json()
+        
+        if batch["status"] == "failed":
+            raise RuntimeError(f"Lote {batch_id} falhou: {batch.get('errors')}")
+        if batch["status"] not in self.FINISHED_STATUSES:
+            return None
+        
+        results = {}
+        for file_id in (batch.get("output_file_id"), batch.get("error_file_id")):
+            if not file_id:
+                continue
+            content = http.get(f"{self.model.base_url}/files/{file_id}/content", headers=self.model.headers())
+            content.raise_for_status()
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                item_response = item.get("response") or {}
+                if item_response.get("status_code") == 200:
+                    results[item["custom_id"]] = OpenAIModel.parse_response(item_response["body"])
+                else:
+                    print(f"Pedido {item['custom_id']} do lote {batch_id} falhou: {item.get('error') or item_response.get('body')}")
+        return results
+
+class AnthropicBatchClient(BatchClientInterface):
+    """API Message Batches da Anthropic"""
+    
+    def __init__(self, api_key: str, model: str = DEFAULT_MODELS['anthropic'], base_url: Optional[str] = None):
+        self.model = AnthropicModel(api_key, model, base_url)
+    
+    def submit(self, requests: List[BatchRequest]) -> str:
+        import requests as http  # Importação sob demanda
+        
+        response = http.post(f"{self.model.base_url}/messages/batches", headers=self.model.headers(), json={
+            "requests": [
+                {
+                    "custom_id": request.custom_id,
+                    "params": self.model.request_body(request.prompt, request.max_tokens, request.temperature)
+                }
+                for request in requests
+            ]
+        })
+        response.raise_for_status()
+        return response.json()["id"]
+    
+    def poll(self, batch_id: str) -> Optional[Dict[str, Completion]]:
+        import requests as http  # Importação sob demanda
+        
+        response = http.get(f"{self.model.base_url}/messages/batches/{batch_id}", headers=self.model.headers())
+        response.raise_for_status()
+        batch = response.json()
+        if batch["processing_status"] != "ended":
+            return None
+        
+        content = http.get(batch["results_url"], headers=self.model.headers())
+        content.raise_for_status()
+        
+        results = {}
+        for line in content.text.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            result = item.get("result") or {}
+            if result.get("type") == "succeeded":
+                results[item["custom_id"]] = AnthropicModel.parse_response(result["message"])
+            else:
+                print(f"Pedido {item['custom_id']} do lote {batch_id}: {result.get('type')} {result.get('error', '')}")
+        return results
+
 class AIModelFactory:
     """Fábrica para criar instâncias de modelos de IA"""
     
@@ -180,7 +788,7 @@ class AIModelFactory:
         Cria uma instância do modelo de IA baseado no provedor
         
         Args:
-            provider: Nome do provedor ('openai', 'anthropic', 'gemini')
+            provider: Nome do provedor ('openai', 'anthropic', 'gemini', 'simulated')
             api_key: Chave de API para o provedor
             model: Nome do modelo específico (opcional)
             
@@ -188,12 +796,35 @@ class AIModelFactory:
             Instância do modelo de IA
         """
         if provider.lower() == "openai":
-            return OpenAIModel(api_key, model or "gpt-3.5-turbo")
+            return OpenAIModel(api_key, model or DEFAULT_MODELS['openai'])
         elif provider.lower() == "anthropic":
-            return AnthropicModel(api_key, model or "claude-2")
+            return AnthropicModel(api_key, model or DEFAULT_MODELS['anthropic'])
         elif provider.lower() == "gemini":
-            return GeminiModel(api_key, model or "gemini-pro")
+            return GeminiModel(api_key, model or DEFAULT_MODELS['gemini'])
+        elif provider.lower() == "simulated":
+            return SimulatedModel.from_env(model)
         else:
             # Fallback para OpenAI
             print(f"Provedor {provider} não suportado, usando OpenAI como fallback")
-            return OpenAIModel(api_key, "gpt-3.5-turbo")
+            return OpenAIModel(api_key, DEFAULT_MODELS['openai'])
+    
+    @staticmethod
+    def create_batch_client(provider: str, api_key: str, model: Optional[str] = None,
+                            base_url: Optional[str] = None) -> BatchClientInterface:
+        """
+        Cria o cliente da API de lote do provedor
+        
+        Args:
+            provider: Nome do provedor ('openai' ou 'anthropic')
+            api_key: Chave de API para o provedor
+            model: Nome do modelo específico (opcional)
+            base_url: Endereço da API (padrão: OPENAI_BASE_URL ou ANTHROPIC_BASE_URL)
+        
+        Returns:
+            Cliente da API de lote
+        """
+        if provider.lower() == "openai":
+            return OpenAIBatchClient(api_key, model or DEFAULT_MODELS['openai'], base_url)
+        elif provider.lower() == "anthropic":
+            return AnthropicBatchClient(api_key, model or DEFAULT_MODELS['anthropic'], base_url)
+        raise ValueError(f"O provedor {provider} não tem API de lote suportada")
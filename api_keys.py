@@ -0,0 +1,90 @@
+"""
+Chaves de API dos provedores, compartilhadas entre threads e processos
+
+As chaves vêm das variáveis de ambiente e podem ser substituídas por
+/api/settings. As substituições ficam em API_KEYS_PATH (JSON com permissão
+0600), gravado de forma atômica sob uma trava de arquivo. Cada leitura
+confere a data de modificação do arquivo, para que todos os workers do
+gunicorn usem a mesma chave logo depois de uma alteração.
+"""
+
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+from storage import file_lock, temp_path
+
+# Provedores com chave de API configurável
+PROVIDERS = ('openai', 'anthropic', 'gemini')
+
+class ApiKeyStore:
+    """Chaves de API com leitura e atualização seguras entre threads e processos"""
+    
+    def __init__(self, path: str, defaults: Optional[Dict[str, str]] = None):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self._defaults = defaults if defaults is not None else {
+            provider: os.getenv(f"{provider.upper()}_API_KEY", '') for provider in PROVIDERS
+        }
+        self._saved: Dict[str, str] = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    
+    def get(self, provider: str) -> str:
+        """
+        Retorna a chave de API de um provedor
+        
+        Args:
+            provider: Nome do provedor
+        
+        Returns:
+            Chave salva em /api/settings, a da variável de ambiente ou ''
+        """
+        with self._lock:
+            self._reload()
+            return self._saved.get(provider) or self._defaults.get(provider, '')
+    
+    def update(self, **keys: str) -> None:
+        """
+        Salva novas chaves de API (valores vazios são ignorados)
+        
+        Args:
+            keys: Chave de cada provedor (ex.: openai='sk-...')
+        """
+        keys = {provider: key for provider, key in keys.items() if provider in PROVIDERS and key}
+        if not keys:
+            return
+        
+        # Ler, alterar e gravar sob a trava: atualizações simultâneas de provedores diferentes não se perdem
+        with self._lock, file_lock(self.lock_path):
+            self._mtime = None
+            self._reload()
+            saved = dict(self._saved, **keys)
+            
+            tmp_path = temp_path(self.path)
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as keys_file:
+                json.dump(saved, keys_file)
+            os.replace(tmp_path, self.path)
+            
+            self._saved = saved
+            self._mtime = os.stat(self.path).st_mtime_ns
+    
+    def _reload(self) -> None:
+        """Relê o arquivo se ele mudou desde a última leitura (com a trava já obtida)"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            self._saved, self._mtime = {}, None
+            return
+        
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as keys_file:
+                self._saved = json.load(keys_file)
+            self._mtime = mtime
+        except (OSError, ValueError) as e:
+            print(f"Erro ao ler as chaves de API salvas: {str(e)}")
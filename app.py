@@ -1,44 +1,191 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, Response, g, render_template, request, jsonify
 import os
+import hmac
 import json
+import time
 import uuid
 from datetime import datetime
-import markdown
-from weasyprint import HTML, CSS
 
 # Importar módulos personalizados
 from ai_models import AIModelFactory
+from api_keys import ApiKeyStore, PROVIDERS as API_KEY_PROVIDERS
 from document_templates import TemplateFactory
+from token_budget import TokenBudget
+from content_generation import ContentGenerator, CheckpointStore
+from content_repair import ContentRepair
+from speculation import Speculator, SPECULATION_ENABLED
+from quality_tiers import QUALITY_TIERS, get_tier, model_for, record_generation
 from pdf_generator import PdfGenerator
 from content_validator import ContentValidator
-from document_generator import DocumentGenerator
+from document_generator import DocumentGenerator, RENDER_ERROR_PREFIX
+from preview_generator import PreviewGenerator
+from export_engine import ExportEngine, EXPORT_FOLDER, FORMAT_EXTENSIONS
+from file_serving import FileServer, CACHE_IMMUTABLE, CACHE_PRIVATE_IMMUTABLE
+from server_lifecycle import lifecycle
+from lazy_imports import prewarm
+from metrics import metrics, MetricsExporter, collect_snapshots, merge_snapshots
+from profiling import ProfileStore, PROFILE_HEADER, should_profile
+from render_queue import create_render_queue
+from settings import UPLOAD_FOLDER, PDF_FOLDER, RENDER_MODE, CHECKPOINT_FOLDER, DOCUMENT_STORE_PATH, SEARCH_INDEX_PATH, CONTENT_STORE_FOLDER, API_KEYS_PATH, PROFILE_FOLDER
+from storage import FileStorage
+from document_store import DocumentStore
+from search_index import SearchIndex
+from content_store import ContentStore
+from janitor import Janitor
+from tenant_scheduler import resolve_tenant, InvalidApiKey, QuotaExceeded, llm_scheduler, render_scheduler
+from admission import AdmissionController, ADMISSION_OVERFLOW_QUEUE
 
 app = Flask(__name__, 
             static_folder='static',
             template_folder='templates')
 app.config['SECRET_KEY'] = os.urandom(24)
 
-# Configuração de pastas
-UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
-PDF_FOLDER = os.path.join(UPLOAD_FOLDER, 'pdfs')
-os.makedirs(PDF_FOLDER, exist_ok=True)
+# Armazenamento dos PDFs (pastas configuradas em settings.py)
+storage = FileStorage(PDF_FOLDER)
 
-# Armazenamento temporário (em produção seria um banco de dados)
-documents_db = []
+# Entrega dos arquivos (diretamente ou pelo proxy, conforme SENDFILE_MODE)
+pdf_server = FileServer(PDF_FOLDER)
+export_server = FileServer(EXPORT_FOLDER)
+static_server = FileServer(app.static_folder)
 
-# Configuração de chaves de API (em produção, usar variáveis de ambiente)
-API_KEYS = {
-    'openai': os.getenv('OPENAI_API_KEY', ''),
-    'anthropic': os.getenv('ANTHROPIC_API_KEY', ''),
-    'gemini': os.getenv('GEMINI_API_KEY', '')
-}
+# Estáticos com variantes pré-comprimidas e URLs versionadas pelo conteúdo
+app.view_functions['static'] = static_server.send_static
+
+@app.url_defaults
+def add_static_version(endpoint, values):
+    if endpoint == 'static' and 'v' not in values:
+        version = static_server.version(values.get('filename', ''))
+        if version:
+            values['v'] = version
+
+# Progresso das gerações de conteúdo, para retomar após falhas do provedor ou do processo
+checkpoints = CheckpointStore(CHECKPOINT_FOLDER)
+
+# No modo 'queue', a renderização é feita pelos workers de render_worker.py; no modo inline,
+# a fila pode receber as renderizações do modo degradado (ADMISSION_OVERFLOW_QUEUE=1)
+render_queue = create_render_queue() if RENDER_MODE == 'queue' or ADMISSION_OVERFLOW_QUEUE else None
+
+# Controle de admissão: recusa (429/503) ou degrada as gerações acima da capacidade do processo
+admission = AdmissionController(
+    render_backlog=lambda: sum(render_scheduler.snapshot()['waiting'].values()),
+    queue_depth=render_queue.depth if render_queue is not None else None,
+    overflow_queue=render_queue is not None and RENDER_MODE != 'queue'
+)
+
+# Documentos e contadores de uso por tenant, persistidos em SQLite
+document_store = DocumentStore(DOCUMENT_STORE_PATH)
+
+# Pré-gerações especulativas iniciadas pelo formulário (/api/prewarm), adotadas no envio
+speculator = Speculator(checkpoints, record_usage=document_store.record_usage)
+
+# Busca textual no Markdown final dos documentos
+search_index = SearchIndex(SEARCH_INDEX_PATH)
+
+# Markdown final dos documentos, deduplicado e comprimido
+content_store = ContentStore(CONTENT_STORE_FOLDER)
+
+# Chaves de API: variáveis de ambiente, substituídas pelas salvas em /api/settings
+# (compartilhadas entre threads e workers, ver api_keys.py)
+api_keys = ApiKeyStore(API_KEYS_PATH)
+
+# Perfis de desempenho das gerações pedidos por X-Profile ou sorteados (PROFILE_SAMPLE_RATE)
+profiles = ProfileStore(PROFILE_FOLDER)
+
+def start_background_tasks(janitor: bool = True) -> None:
+    """
+    Inicia as threads de segundo plano do processo
+    
+    Nada é iniciado na importação: com preload_app, o módulo é importado no
+    mestre do Gunicorn, e threads vivas no fork podem deixar travas presas nos
+    workers. O Gunicorn chama esta função em post_fork (ver gunicorn.conf.py);
+    o servidor de desenvolvimento, ao iniciar.
+    
+    Args:
+        janitor: Se este processo roda o janitor (apenas um worker é designado)
+    """
+    # Pré-aquecer em segundo plano as dependências pesadas do papel deste processo
+    # (PROCESS_ROLE=api|render|all), sem atrasar a inicialização
+    if os.getenv('PREWARM_IMPORTS', '0') == '1':
+        prewarm(background=True)
+    
+    # Cópia periódica das métricas do processo, somada por /api/metrics nos demais workers
+    MetricsExporter(metrics, 'api').start_background()
+    
+    # Retenção e limpeza de PDFs órfãos em segundo plano (JANITOR_INTERVAL=0 desativa;
+    # em produção, prefira um processo separado: python janitor.py)
+    interval = float(os.getenv('JANITOR_INTERVAL', '0'))
+    if janitor and interval > 0:
+        Janitor(document_store, storage, search_index=search_index, content_store=content_store,
+                checkpoints=checkpoints).start_background(interval)
+
+@app.before_request
+def identify_tenant():
+    # Tenant da chave de API emitida (ou do proxy confiável); chaves desconhecidas são recusadas
+    try:
+        g.tenant = resolve_tenant(request.headers)
+    except InvalidApiKey as e:
+        return jsonify({'error': str(e)}), 401
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+@app.route('/healthz')
+def health_check():
+    # Verificação de vida: o processo está respondendo
+    return jsonify({'status': 'ok'}), 200
+
+@app.route('/readyz')
+def readiness_check():
+    # Verificação de prontidão: o worker aceita novos jobs
+    status = {
+        'draining': lifecycle.draining,
+        'in_flight_jobs': lifecycle.in_flight,
+        'pdf_folder_writable': os.access(PDF_FOLDER, os.W_OK)
+    }
+    
+    if lifecycle.draining or not status['pdf_folder_writable']:
+        return jsonify(dict(status, status='unavailable')), 503
+    
+    return jsonify(dict(status, status='ready')), 200
+
+@app.route('/api/metrics')
+def get_metrics():
+    if not _is_admin():
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    # Este processo (em memória) mais as cópias recentes dos outros workers da API e dos
+    # workers de renderização (ver MetricsExporter); ?scope=process mostra só este processo
+    if request.args.get('scope') == 'process':
+        return jsonify(metrics.snapshot()), 200
+    
+    others = collect_snapshots(exclude_pid=os.getpid())
+    merged = merge_snapshots([metrics.snapshot()] + others)
+    merged['processes'] = [{'role': 'api', 'pid': os.getpid(), 'updated_at': time.time()}] + [
+        {'role': snapshot.get('role'), 'pid': snapshot.get('pid'), 'updated_at': snapshot.get('updated_at')}
+        for snapshot in others
+    ]
+    return jsonify(merged), 200
+
 @app.route('/api/generate', methods=['POST'])
 def generate_document():
+    if lifecycle.draining:
+        return jsonify({'error': 'Servidor em encerramento, tente novamente'}), 503
+    
+    # Perfil da geração: pedido pelo cabeçalho X-Profile (apenas administradores) ou sorteado
+    requested = request.headers.get(PROFILE_HEADER, '').lower() in ('1', 'true', 'yes') and _is_admin()
+    profile_id = profiles.new_id() if should_profile(requested) else None
+    
+    # Jobs em andamento são aguardados no encerramento gracioso do worker
+    with lifecycle.track_job(), profiles.capture(profile_id, 'api'):
+        response, status = _generate_document(profile_id)
+    
+    if profile_id:
+        response.headers['X-Profile-Id'] = profile_id
+    return response, status
+
+def _generate_document(profile_id=None):
+    admitted = None
     try:
         # Obter dados do formulário
         data = request.json
@@ -49,59 +196,66 @@ def generate_document():
         page_count = int(data.get('page_count', 20))
         language = data.get('language', 'pt-BR')
         quality = data.get('quality', 'high')
+        export_formats = [fmt for fmt in data.get('formats', []) if fmt != 'pdf']
         
         # Validar dados
         if not all([title, theme, ai_model_provider, doc_type]):
             return jsonify({'error': 'Dados incompletos'}), 400
         
-        # Obter chave de API
-        api_key = API_KEYS.get(ai_model_provider)
+        if any(fmt not in FORMAT_EXTENSIONS for fmt in export_formats):
+            return jsonify({'error': 'Formato de exportação não suportado'}), 400
         
-        # Para fins de demonstração, se não houver chave, simular geração
-        if not api_key:
-            print(f"Chave de API para {ai_model_provider} não configurada, usando simulação")
-            content = simulate_ai_generation(title, theme, doc_type, page_count, language)
-        else:
-            # Criar instância do modelo de IA
-            ai_model = AIModelFactory.create_model(ai_model_provider, api_key)
-            
-            # Criar instância do template de documento
-            document_template = TemplateFactory.create_template(doc_type, language)
-            
-            # Gerar prompt baseado no template
-            prompt = document_template.get_prompt(title, theme, page_count)
-            
-            # Ajustar parâmetros de qualidade
-            temperature = 0.7  # Padrão
-            if quality == 'high':
-                temperature = 0.5  # Mais determinístico para alta qualidade
-            elif quality == 'premium':
-                temperature = 0.3  # Ainda mais determinístico para qualidade premium
-            
-            # Calcular tokens com base no tamanho do documento
-            max_tokens = 4000 if page_count == 20 else 8000
-            
-            # Gerar conteúdo usando o modelo de IA
-            content = ai_model.generate_content(prompt, max_tokens=max_tokens, temperature=temperature)
+        if quality not in QUALITY_TIERS:
+            return jsonify({'error': 'Nível de qualidade não suportado'}), 400
         
-        # Validar e melhorar o conteúdo
-        content = ContentValidator.enhance_content(content, doc_type, language)
+        # Cotas e escalonamento justo são aplicados por tenant
+        tenant = g.tenant
         
-        # Gerar nome de arquivo único
-        doc_id = str(uuid.uuid4())
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        filename = f"{title.replace(' ', '_')}_{timestamp}.pdf"
-        pdf_path = os.path.join(PDF_FOLDER, filename)
+        # Admissão: acima da capacidade, recusar logo (429/503 com Retry-After) ou degradar
+        # para 'draft' e apenas enfileirar, para que as gerações aceitas terminem no prazo
+        requested_quality = quality
+        admitted = admission.admit(tenant, page_count, quality, bool(data.get('allow_degraded', True)))
+        quality = admitted.quality
         
-        # Gerar PDF
-        success, message, generated_path = DocumentGenerator.generate_document(
-            content, doc_type, language, title, pdf_path
+        generator, budget_plan, job_key, temperature = _prepare_generation(
+            ai_model_provider, doc_type, language, title, theme, page_count, quality, tenant
         )
         
-        if not success:
-            return jsonify({'error': message}), 500
+        # Uma pré-geração com os mesmos parâmetros (ver /api/prewarm) já gravou o início no checkpoint;
+        # até release(), nenhuma especulação descarta o checkpoint desta chave
+        speculator.adopt(job_key, tenant)
+        
+        # Gerar conteúdo usando o modelo de IA, uma chamada por grupo de partes;
+        # respostas truncadas são continuadas e o progresso fica em checkpoint
+        generation_started = time.monotonic()
+        try:
+            content = generator.generate(budget_plan, job_key, temperature)
+            
+            # Premium: refazer as chamadas mais fracas até a pontuação do validador atingir o limite
+            refine = get_tier(quality)['refine']
+            if refine:
+                content = generator.refine(budget_plan, job_key, temperature, content, doc_type, language, **refine)
+            
+            # Seções que faltam ou curtas demais são corrigidas com chamadas pequenas,
+            # em vez de reprovar o documento na renderização
+            repairer = ContentRepair(generator)
+            content = repairer.repair(content, budget_plan, doc_type, language, title, theme, page_count, temperature)
+        finally:
+            # Tokens consumidos contam mesmo se a geração não terminar
+            document_store.record_usage(tenant, **generator.usage)
+            speculator.release(job_key)
+        
+        # Latência e custo medidos, comparados com as metas do nível de qualidade
+        quality_report = record_generation(
+            quality, page_count, time.monotonic() - generation_started,
+            TokenBudget.cost_usd(budget_plan.model, generator.usage['prompt_tokens'], generator.usage['output_tokens'])
+        )
+        quality_report.update(tier=quality, model=budget_plan.model, refinement=generator.refinement)
+        
+        # Gerar chave de armazenamento única
+        doc_id = str(uuid.uuid4())
+        filename = storage.new_key(title, content, doc_type=doc_type, language=language, quality=quality)
         
-        # Salvar no "banco de dados" temporário
         doc_info = {
             'id': doc_id,
             'title': title,
@@ -111,229 +265,409 @@ def generate_document():
             'page_count': page_count,
             'language': language,
             'file_path': filename,
+            'status': 'done',
             'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
-        documents_db.append(doc_info)
+        
+        doc_info['token_estimate'] = budget_plan.to_dict()
+        doc_info['quality'] = quality_report
+        if repairer.report:
+            doc_info['repairs'] = repairer.report
+        if profile_id:
+            doc_info['profile_id'] = profile_id
+        if admitted.degraded:
+            doc_info['degraded'] = {
+                'reason': admitted.degraded_reason,
+                'requested_quality': requested_quality,
+                'quality': quality,
+                'queued_only': admitted.queued_only
+            }
+        
+        # Formatos adicionais (EPUB, HTML, DOCX) emitidos de uma única análise do Markdown, sem paginação
+        if export_formats:
+            enhanced_content = ContentValidator.enhance_content(content, doc_type, language)
+            doc_info['exports'] = ExportEngine.export(enhanced_content, title, language, export_formats)
+        
+        # Modo fila (ou modo degradado com fila): enfileirar a renderização e responder
+        # imediatamente com a chave de armazenamento
+        if render_queue is not None and (RENDER_MODE == 'queue' or admitted.queued_only):
+            doc_info['job_id'] = render_queue.enqueue({
+                'content': content,
+                'doc_type': doc_type,
+                'language': language,
+                'title': title,
+                'storage_key': filename,
+                'quality': quality,
+                'tenant': tenant,
+                'page_count': page_count,
+                'profile_id': profile_id
+            })
+            doc_info['status'] = 'queued'
+            document_store.add_document(doc_info, tenant)
+            document_store.record_usage(tenant, documents=1)
+            
+            # O worker pode ter concluído o job antes do registro do documento
+            job = render_queue.get_job(doc_info['job_id'])
+            if job and job['status'] != doc_info['status']:
+                doc_info = document_store.update_document(doc_id, status=job['status']) or doc_info
+            _store_content(doc_info, tenant, content)
+            checkpoints.delete(job_key)
+            return jsonify(doc_info), 202
+        
+        # Registrar o documento antes de renderizar: a exclusão simultânea de um documento
+        # idêntico (mesmo PDF) vê a referência e não apaga o arquivo em renderização
+        document_store.add_document(dict(doc_info, status='rendering'), tenant)
+        
+        # Melhorar, validar e gerar PDF seção a seção, em uma vaga de renderização do tenant
+        try:
+            with render_scheduler.slot(tenant, cost=page_count):
+                render_started = time.monotonic()
+                success, message, generated_path = DocumentGenerator.generate_document(
+                    content, doc_type, language, title, storage.path_for(filename), quality
+                )
+                render_seconds = time.monotonic() - render_started
+        except Exception:
+            document_store.delete_document(doc_id)
+            raise
+        
+        if not success:
+            document_store.delete_document(doc_id)
+            document_store.record_usage(tenant, render_seconds=render_seconds)
+            
+            # Reprovado na validação: o mesmo conteúdo reprovaria de novo, então uma nova
+            # tentativa gera tudo outra vez; erros do renderizador mantêm o checkpoint
+            if not message.startswith(RENDER_ERROR_PREFIX):
+                checkpoints.delete(job_key)
+            return jsonify({'error': message}), 500
+        
+        # Documento pronto no banco de documentos
+        document_store.update_document(doc_id, status='done')
+        document_store.record_usage(
+            tenant, documents=1, render_seconds=render_seconds, bytes_stored=os.path.getsize(generated_path)
+        )
+        _store_content(doc_info, tenant, content)
+        
+        # O documento está salvo; o checkpoint da geração não é mais necessário
+        checkpoints.delete(job_key)
         
         # Retornar informações do documento gerado
         return jsonify(doc_info), 200
     
+    except QuotaExceeded as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, getattr(e, 'status', 429)
+    
     except Exception as e:
         print(f"Erro na geração: {str(e)}")
         return jsonify({'error': str(e)}), 500
-
-@app.route('/api/documents', methods=['GET'])
-def get_documents():
-    return jsonify(documents_db), 200
-
-@app.route('/api/documents/<doc_id>', methods=['DELETE'])
-def delete_document(doc_id):
-    global documents_db
     
-    # Encontrar o documento
-    doc = next((d for d in documents_db if d['id'] == doc_id), None)
+    finally:
+        if admitted is not None:
+            admitted.release()
+
+def _prepare_generation(ai_model_provider, doc_type, language, title, theme, page_count, quality, tenant):
+    """Cria o gerador, o plano de chamadas, a chave da geração e a temperatura de um documento"""
+    # Obter chave de API
+    api_key = api_keys.get(ai_model_provider)
     
-    if not doc:
-        return jsonify({'error': 'Documento não encontrado'}), 404
+    # Sem chave de API, usar o provedor simulado (também selecionável como 'simulated')
+    generation_provider = ai_model_provider
+    if ai_model_provider != 'simulated' and not api_key:
+        print(f"Chave de API para {ai_model_provider} não configurada, usando simulação")
+        generation_provider = 'simulated'
     
-    # Excluir arquivo PDF
-    pdf_path = os.path.join(PDF_FOLDER, doc['file_path'])
-    if os.path.exists(pdf_path):
-        os.remove(pdf_path)
+    # Criar instância do modelo de IA (o nível de qualidade escolhe o modelo do provedor)
+    model = model_for(quality, generation_provider)
+    ai_model = AIModelFactory.create_model(generation_provider, api_key, model)
     
-    # Remover do "banco de dados"
-    documents_db = [d for d in documents_db if d['id'] != doc_id]
+    # Criar instância do template de documento
+    document_template = TemplateFactory.create_template(doc_type, language)
+    
+    # Planejar prompts e max_tokens a partir da estrutura do template,
+    # dividindo a geração em várias chamadas se não couber no limite do modelo
+    budget_plan = TokenBudget.plan(document_template, title, theme, page_count, generation_provider, model)
+    
+    # Ajustar parâmetros de qualidade
+    temperature = ContentGenerator.temperature_for(quality)
+    
+    # A mesma requisição do mesmo tenant produz a mesma chave e retoma o checkpoint existente;
+    # tenants diferentes nunca compartilham checkpoints nem especulações
+    job_key = ContentGenerator.job_key(
+        provider=generation_provider, doc_type=doc_type, language=language,
+        title=title, theme=theme, page_count=page_count, quality=quality, tenant=tenant
+    )
+    generator = ContentGenerator(ai_model, document_template, checkpoints, scheduler=llm_scheduler, tenant=tenant)
+    return generator, budget_plan, job_key, temperature
+
+@app.route('/api/prewarm', methods=['POST'])
+def prewarm_document():
+    """Inicia a pré-geração especulativa enquanto o usuário termina de preencher o formulário"""
+    # Sob carga, a pré-geração especulativa é o primeiro trabalho a ser dispensado
+    if not SPECULATION_ENABLED or lifecycle.draining or admission.degraded:
+        return jsonify({'status': 'disabled'}), 200
     
-    return jsonify({'message': 'Documento excluído com sucesso'}), 200
-
-@app.route('/download/<filename>')
-def download_file(filename):
-    return send_from_directory(PDF_FOLDER, filename, as_attachment=True)
-
-@app.route('/preview/<filename>')
-def preview_file(filename):
-    return send_from_directory(PDF_FOLDER, filename)
-
-@app.route('/api/settings', methods=['POST'])
-def save_settings():
     try:
-        # Obter dados do formulário
         data = request.json
+        title = data.get('title')
+        theme = data.get('theme')
+        ai_model_provider = data.get('ai_model')
+        doc_type = data.get('doc_type')
         
-        # Atualizar chaves de API
-        if 'openai_api_key' in data and data['openai_api_key']:
-            API_KEYS['openai'] = data['openai_api_key']
+        quality = data.get('quality', 'high')
         
-        if 'anthropic_api_key' in data and data['anthropic_api_key']:
-            API_KEYS['anthropic'] = data['anthropic_api_key']
+        if not all([title, theme, ai_model_provider, doc_type]):
+            return jsonify({'error': 'Dados incompletos'}), 400
         
-        if 'gemini_api_key' in data and data['gemini_api_key']:
-            API_KEYS['gemini'] = data['gemini_api_key']
+        if quality not in QUALITY_TIERS:
+            return jsonify({'error': 'Nível de qualidade não suportado'}), 400
         
-        # Em produção, salvar em variáveis de ambiente ou banco de dados seguro
+        generator, budget_plan, job_key, temperature = _prepare_generation(
+            ai_model_provider, doc_type, data.get('language', 'pt-BR'), title, theme,
+            int(data.get('page_count', 20)), quality, g.tenant
+        )
         
-        return jsonify({'message': 'Configurações salvas com sucesso'}), 200
+        # Sessão do formulário (gerada pela página): só as especulações da mesma sessão se substituem
+        session = str(data.get('session') or '')[:64] or None
+        return jsonify(speculator.start(generator, budget_plan, job_key, temperature, session)), 202
     
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-# Simulação de geração de conteúdo por IA
-def simulate_ai_generation(title, theme, doc_type, page_count, language):
-    # Em um cenário real, aqui seria feita a chamada à API de IA
-    # Por enquanto, vamos usar templates predefinidos
-    
-    template = TemplateFactory.create_template(doc_type, language)
-    prompt = template.get_prompt(title, theme, page_count)
-    
-    # Gerar conteúdo simulado baseado no tipo de documento
-    if doc_type == "ebook":
-        chapter_count = 5 if page_count == 20 else 10
-        words_per_chapter = 600 if page_count == 20 else 1500
-        
-        if language == "pt-BR":
-            content = f"""# {title}
-
-## Sumário
-
-1. Introdução
-{', '.join([f'{i+2}. Capítulo {i+1}' for i in range(chapter_count)])}
-{chapter_count+2}. Conclusão
-{chapter_count+3}. Referências
-{chapter_count+4}. Sobre o Autor
-
-## Introdução
-
-Este é um eBook sobre {theme}. O conteúdo foi gerado automaticamente como demonstração.
-
-{chr(10).join([f'''
-## Capítulo {i+1}
-
-Conteúdo do capítulo {i+1} sobre {theme}.
-
-### Subtópico 1
-
-Desenvolvimento do primeiro subtópico.
-
-### Subtópico 2
+        return jsonify({'error': str(e)}), 400
 
-Desenvolvimento do segundo subtópico.
-
-### Subtópico 3
-
-Desenvolvimento do terceiro subtópico com exemplos práticos.
-''' for i in range(chapter_count)])}
-
-## Conclusão
-
-Resumo dos pontos principais e reflexões finais sobre {theme}.
-
-## Referências
-
-1. Referência 1
-2. Referência 2
-3. Referência 3
-
-## Sobre o Autor
-
-Breve biografia fictícia de um especialista em {theme}.
-"""
-        else:  # en-US
-            content = f"""# {title}
-
-## Table of Contents
-
-1. Introduction
-{', '.join([f'{i+2}. Chapter {i+1}' for i in range(chapter_count)])}
-{chapter_count+2}. Conclusion
-{chapter_count+3}. References
-{chapter_count+4}. About the Author
-
-## Introduction
-
-This is an eBook about {theme}. The content was automatically generated as a demonstration.
-
-{chr(10).join([f'''
-## Chapter {i+1}
-
-Content of chapter {i+1} about {theme}.
-
-### Subtopic 1
-
-Development of the first subtopic.
-
-### Subtopic 2
-
-Development of the second subtopic.
-
-### Subtopic 3
+def _store_content(doc_info, tenant, content):
+    """Guarda o Markdown final e indexa o documento; falhas aqui não afetam a geração"""
+    try:
+        sections = ContentValidator.iter_enhanced_sections(content, doc_info['doc_type'], doc_info['language'])
+        content_store.put_document(doc_info['id'], list(sections))
+    except Exception as e:
+        print(f"Erro ao guardar o Markdown do documento: {str(e)}")
+    try:
+        search_index.index_document(doc_info, tenant, content)
+    except Exception as e:
+        print(f"Erro ao indexar documento: {str(e)}")
 
-Development of the third subtopic with practical examples.
-''' for i in range(chapter_count)])}
+@app.route('/api/estimate', methods=['POST'])
+def estimate_document():
+    """Estima tokens, chamadas, custo e latência de um documento sem gerá-lo"""
+    try:
+        data = request.json
+        title = data.get('title')
+        theme = data.get('theme')
+        ai_model_provider = data.get('ai_model')
+        doc_type = data.get('doc_type')
+        page_count = int(data.get('page_count', 20))
+        language = data.get('language', 'pt-BR')
+        
+        if not all([title, theme, ai_model_provider, doc_type]):
+            return jsonify({'error': 'Dados incompletos'}), 400
+        
+        document_template = TemplateFactory.create_template(doc_type, language)
+        budget_plan = TokenBudget.plan(
+            document_template, title, theme, page_count, ai_model_provider, data.get('model')
+        )
+        return jsonify(budget_plan.to_dict()), 200
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
 
-## Conclusion
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    if render_queue is None:
+        return jsonify({'error': 'Fila de renderização desativada'}), 404
+    
+    # Apenas jobs de documentos do próprio tenant
+    doc = document_store.find_by_job(job_id)
+    job = render_queue.get_job(job_id) if doc and doc.get('tenant') == g.tenant else None
+    if not job:
+        return jsonify({'error': 'Job não encontrado'}), 404
+    
+    # O worker atualiza o documento; aqui cobre apenas workers sem acesso ao banco de documentos
+    if doc['status'] != job['status']:
+        doc = document_store.update_document(doc['id'], status=job['status']) or doc
+    job['document'] = doc
+    
+    return jsonify(job), 200
 
-Summary of main points and final reflections on {theme}.
+@app.route('/api/documents', methods=['GET'])
+def get_documents():
+    return jsonify(document_store.list_documents(g.tenant)), 200
 
-## References
+@app.route('/api/documents/<doc_id>', methods=['DELETE'])
+def delete_document(doc_id):
+    tenant = g.tenant
+    
+    # Encontrar o documento (apenas do próprio tenant)
+    doc = document_store.get_document(doc_id)
+    
+    if not doc or doc.get('tenant') != tenant:
+        return jsonify({'error': 'Documento não encontrado'}), 404
+    
+    # Remover do banco primeiro: entre exclusões simultâneas do mesmo documento, só uma continua
+    if document_store.delete_document(doc_id) is None:
+        return jsonify({'error': 'Documento não encontrado'}), 404
+    
+    # Excluir arquivo PDF e suas miniaturas, se nenhum documento idêntico ainda os usa
+    pdf_path = storage.path_for(doc['file_path'])
+    size = os.path.getsize(pdf_path) if os.path.exists(pdf_path) else 0
+    if not document_store.is_file_referenced(doc['file_path']):
+        PreviewGenerator.delete(pdf_path)
+        storage.delete(doc['file_path'])
+    
+    # Remover do índice de busca e do armazenamento de Markdown
+    document_store.record_usage(tenant, bytes_stored=-size)
+    search_index.remove_document(doc_id)
+    content_store.delete_document(doc_id)
+    
+    return jsonify({'message': 'Documento excluído com sucesso'}), 200
 
-1. Reference 1
-2. Reference 2
-3. Reference 3
+@app.route('/api/documents/<doc_id>/markdown', methods=['GET'])
+def get_document_markdown(doc_id):
+    doc = document_store.get_document(doc_id)
+    if not doc or doc.get('tenant') != g.tenant:
+        return jsonify({'error': 'Documento não encontrado'}), 404
+    
+    markdown = content_store.get_document(doc_id)
+    if markdown is None:
+        return jsonify({'error': 'Markdown não disponível para este documento'}), 404
+    return Response(markdown, mimetype='text/markdown; charset=utf-8'), 200
+
+@app.route('/api/search', methods=['GET'])
+def search_documents():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Informe o texto da busca (q)'}), 400
+    
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    
+    started = time.perf_counter()
+    results = search_index.search(
+        query, g.tenant, request.args.get('language'), limit=limit, offset=offset
+    )
+    return jsonify({
+        'query': query,
+        'results': results,
+        'took_ms': round((time.perf_counter() - started) * 1000, 1)
+    }), 200
+
+def _is_admin() -> bool:
+    """Verifica o token de administração (ADMIN_TOKEN) no cabeçalho X-Admin-Token"""
+    admin_token = os.getenv('ADMIN_TOKEN', '')
+    return bool(admin_token) and hmac.compare_digest(request.headers.get('X-Admin-Token', ''), admin_token)
+
+@app.route('/api/admin/usage', methods=['GET'])
+def get_usage():
+    if not _is_admin():
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    return jsonify(document_store.get_usage(request.args.get('tenant'))), 200
 
-## About the Author
+@app.route('/api/admin/scheduler', methods=['GET'])
+def get_scheduler_state():
+    if not _is_admin():
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    state = {'llm': llm_scheduler.snapshot(), 'render': render_scheduler.snapshot(), 'admission': admission.snapshot()}
+    if render_queue is not None:
+        state['render_queue_depth'] = render_queue.depth()
+    return jsonify(state), 200
+
+@app.route('/api/admin/profiles', methods=['GET'])
+def list_profiles():
+    if not _is_admin():
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+    return jsonify(profiles.list(limit)), 200
 
-Brief fictional biography of an expert on {theme}.
-"""
+@app.route('/api/admin/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    if not _is_admin():
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    profile = profiles.get(profile_id)
+    if profile is None:
+        return jsonify({'error': 'Perfil não encontrado'}), 404
+    return jsonify(profile), 200
+
+@app.route('/api/admin/profiles/<profile_id>/<fmt>', methods=['GET'])
+def download_profile(profile_id, fmt):
+    """Baixa o perfil no formato do speedscope ('speedscope') ou em pilhas dobradas ('folded')"""
+    if not _is_admin():
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    if fmt == 'speedscope':
+        data = profiles.speedscope(profile_id)
+        body = json.dumps(data) if data is not None else None
+        mimetype, filename = 'application/json', f"{profile_id}.speedscope.json"
+    elif fmt == 'folded':
+        body = profiles.folded(profile_id)
+        mimetype, filename = 'text/plain; charset=utf-8', f"{profile_id}.folded.txt"
     else:
-        # Para outros tipos, usar um template genérico
-        if language == "pt-BR":
-            content = f"""# {title}
-
-## Introdução
-
-Este é um documento sobre {theme}. O conteúdo foi gerado automaticamente como demonstração.
-
-## Seção 1
-
-Conteúdo da primeira seção.
-
-## Seção 2
-
-Conteúdo da segunda seção.
-
-## Seção 3
-
-Conteúdo da terceira seção.
-
-## Conclusão
-
-Resumo e considerações finais sobre {theme}.
-"""
-        else:  # en-US
-            content = f"""# {title}
-
-## Introduction
-
-This is a document about {theme}. The content was automatically generated as a demonstration.
-
-## Section 1
-
-Content of the first section.
-
-## Section 2
+        return jsonify({'error': 'Formato de perfil não suportado'}), 400
+    
+    if body is None:
+        return jsonify({'error': 'Perfil não encontrado'}), 404
+    return Response(body, mimetype=mimetype, headers={'Content-Disposition': f'attachment; filename="{filename}"'}), 200
 
-Content of the second section.
+@app.route('/download/<path:filename>')
+def download_file(filename):
+    return pdf_server.send(filename, as_attachment=True)
 
-## Section 3
+@app.route('/exports/<filename>')
+def download_export(filename):
+    # Exportações são nomeadas pelo hash do conteúdo: o nome já é o ETag
+    return export_server.send(filename, as_attachment=True, cache_control=CACHE_PRIVATE_IMMUTABLE,
+                              etag=os.path.splitext(filename)[0])
 
-Content of the third section.
+@app.route('/preview/<path:filename>')
+def preview_file(filename):
+    return pdf_server.send(filename)
 
-## Conclusion
+@app.route('/thumbnail/<path:filename>')
+def thumbnail_file(filename):
+    pdf_path = storage.path_for(filename)
+    if not os.path.exists(pdf_path):
+        return jsonify({'error': 'Documento não encontrado'}), 404
+    
+    # WebP para navegadores que o aceitam, PNG para os demais
+    fmt = 'webp' if 'image/webp' in request.headers.get('Accept', '') else 'png'
+    thumbnail_path = PreviewGenerator.thumbnail_path(pdf_path, fmt)
+    
+    # Documentos anteriores às miniaturas: gerar uma vez sob demanda
+    if not os.path.exists(thumbnail_path):
+        try:
+            PreviewGenerator.generate(pdf_path)
+        except Exception as e:
+            print(f"Erro ao gerar miniatura: {str(e)}")
+        if not os.path.exists(thumbnail_path):
+            return jsonify({'error': 'Miniatura indisponível'}), 404
+    
+    response = pdf_server.send(storage.key_for(thumbnail_path), cache_control=CACHE_IMMUTABLE)
+    response.vary.add('Accept')
+    return response
 
-Summary and final considerations about {theme}.
-"""
+@app.route('/api/settings', methods=['POST'])
+def save_settings():
+    # As chaves valem para todos os tenants: apenas o administrador pode trocá-las
+    if not _is_admin():
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    try:
+        # Obter dados do formulário
+        data = request.json
+        
+        # Atualizar chaves de API (valores vazios mantêm a chave atual)
+        api_keys.update(**{provider: data.get(f"{provider}_api_key") for provider in API_KEY_PROVIDERS})
+        
+        return jsonify({'message': 'Configurações salvas com sucesso'}), 200
     
-    return content
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
+    # Servidor de desenvolvimento; em produção use: gunicorn -c gunicorn.conf.py wsgi:application
+    # (com o recarregador do modo debug, apenas o processo filho inicia as threads)
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_tasks()
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,301 @@
+"""
+Geração offline de catálogos pelas APIs de lote dos provedores
+
+Para lotes grandes e sem urgência (ex.: catálogos gerados durante a noite),
+as chamadas de todos os documentos são enviadas às APIs de lote (OpenAI
+Batch e Anthropic Message Batches), que custam menos e não disputam o
+limite de requisições das chamadas síncronas. A geração avança em rodadas:
+
+    1. Todas as chamadas dos planos de tokens (token_budget.py) vão em um lote
+    2. Respostas truncadas são aparadas e continuadas na rodada seguinte,
+       como na geração síncrona; pedidos com erro são reenviados
+    3. Os documentos concluídos seguem o pipeline normal: validação e PDF
+       (ou a fila de renderização no modo 'queue'), banco de documentos,
+       armazenamento do Markdown e índice de busca
+
+O progresso fica nos mesmos checkpoints da geração síncrona (mesma chave),
+e os lotes em andamento em um arquivo da execução: uma execução
+interrompida é retomada com --resume, sem reenviar os lotes.
+
+Uso:
+    python batch_generation.py catalogo.jsonl [--provider openai] [--model nome] [--tenant nome]
+                                              [--base-url url] [--poll segundos]
+    python batch_generation.py --resume <execução>
+
+Cada linha do catálogo é um documento:
+    {"title": "...", "theme": "...", "doc_type": "ebook", "page_count": 20, "language": "pt-BR", "quality": "high"}
+
+Para testar sem custo, use o servidor local batch_standin.py como --base-url.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from ai_models import AIModelFactory, BatchClientInterface, BatchRequest, BATCH_MAX_REQUESTS, DEFAULT_MODELS
+from api_keys import ApiKeyStore
+from content_generation import ContentGenerator, CheckpointStore, MAX_CONTINUATIONS
+from document_templates import TemplateFactory
+from metrics import metrics
+from settings import CHECKPOINT_FOLDER, API_KEYS_PATH
+from token_budget import TokenBudget
+
+BATCH_POLL_INTERVAL = float(os.getenv('BATCH_POLL_INTERVAL', '60'))
+
+# Rodadas: a inicial, uma por continuação e uma para reenviar os pedidos com erro
+BATCH_MAX_ROUNDS = int(os.getenv('BATCH_MAX_ROUNDS', str(MAX_CONTINUATIONS + 2)))
+
+class BatchJob:
+    """Documento do catálogo e o estado da sua geração"""
+    
+    def __init__(self, spec: Dict[str, Any], provider: str, model: Optional[str], tenant: str, checkpoints: CheckpointStore):
+        self.spec = dict(spec, page_count=int(spec.get('page_count', 20)), language=spec.get('language', 'pt-BR'),
+                         quality=spec.get('quality', 'high'))
+        self.template = TemplateFactory.create_template(self.spec['doc_type'], self.spec['language'])
+        self.plan = TokenBudget.plan(self.template, self.spec['title'], self.spec['theme'], self.spec['page_count'], provider, model)
+        self.temperature = ContentGenerator.temperature_for(self.spec['quality'])
+        
+        # Mesma chave da geração síncrona: os checkpoints servem para as duas
+        self.job_key = ContentGenerator.job_key(
+            provider=provider, doc_type=self.spec['doc_type'], language=self.spec['language'],
+            title=self.spec['title'], theme=self.spec['theme'], page_count=self.spec['page_count'],
+            quality=self.spec['quality'], tenant=tenant
+        )
+        
+        # O gerador só monta os prompts e incorpora as respostas; as chamadas vão nos lotes
+        self.generator = ContentGenerator(None, self.template, checkpoints, tenant=tenant)
+        self.state = self.generator.load_state(self.plan, self.job_key)
+    
+    @property
+    def complete(self) -> bool:
+        return all(entry['complete'] for entry in self.state['calls'])
+    
+    def content(self) -> str:
+        """Conteúdo Markdown com as saídas de todas as chamadas"""
+        return '\n\n'.join(entry['text'].strip() for entry in self.state['calls'])
+
+class BatchRunner:
+    """Envia as rodadas de lotes, acompanha o processamento e entrega os documentos concluídos"""
+    
+    def __init__(self, client: BatchClientInterface, provider: str, checkpoints: CheckpointStore, run_id: str,
+                 poll_interval: float = BATCH_POLL_INTERVAL, max_rounds: int = BATCH_MAX_ROUNDS):
+        self.client = client
+        self.provider = provider
+        self.checkpoints = checkpoints
+        self.run_id = run_id
+        self.run_path = os.path.join(checkpoints.root, f"batch-{run_id}.json")
+        self.poll_interval = poll_interval
+        self.max_rounds = max_rounds
+    
+    def run(self, jobs: List[BatchJob], run_state: Dict[str, Any]) -> Tuple[List[BatchJob], List[BatchJob]]:
+        """
+        Executa as rodadas até todos os documentos concluírem ou as rodadas acabarem
+        
+        Args:
+            jobs: Documentos do catálogo
+            run_state: Estado da execução (com os lotes em andamento, se retomada)
+        
+        Returns:
+            Tupla (documentos concluídos, documentos incompletos)
+        """
+        while run_state['round'] < self.max_rounds:
+            pending = self._pending(jobs)
+            if not pending:
+                break
+            
+            # Lotes já enviados (execução retomada) são apenas acompanhados
+            if not run_state['batches']:
+                requests = [
+                    BatchRequest(custom_id, prompt, call['max_tokens'], job.temperature)
+                    for custom_id, (job, call, entry, prompt) in pending.items()
+                ]
+                for start in range(0, len(requests), BATCH_MAX_REQUESTS):
+                    run_state['batches'].append(self.client.submit(requests[start:start + BATCH_MAX_REQUESTS]))
+                self._save_run(run_state)
+                metrics.increment('batch_requests', len(requests), provider=self.provider)
+                print(f"Rodada {run_state['round'] + 1}: {len(requests)} pedidos em {len(run_state['batches'])} lote(s)")
+            
+            results = {}
+            for batch_id in run_state['batches']:
+                results.update(self.client.wait(batch_id, self.poll_interval))
+            
+            touched = set()
+            for custom_id, completion in results.items():
+                if custom_id not in pending:
+                    continue
+                job, call, entry, prompt = pending[custom_id]
+                job.generator.account(prompt, completion, self.provider)
+                job.generator.apply_completion(entry, completion, self.provider)
+                touched.add(job)
+            for job in touched:
+                self.checkpoints.save(job.job_key, job.state)
+            
+            metrics.increment('batch_failed_requests', len(pending) - len(results), provider=self.provider)
+            run_state.update(round=run_state['round'] + 1, batches=[])
+            self._save_run(run_state)
+        
+        done = [job for job in jobs if job.complete]
+        return done, [job for job in jobs if not job.complete]
+    
+    def _pending(self, jobs: List[BatchJob]) -> Dict[str, Tuple[BatchJob, Dict[str, Any], Dict[str, Any], str]]:
+        """Chamadas ainda não concluídas, por custom_id, com o prompt da próxima chamada"""
+        pending = {}
+        for job in jobs:
+            for index, (call, entry) in enumerate(zip(job.plan.calls, job.state['calls'])):
+                if not entry['complete']:
+                    pending[f"{job.job_key}-{index}"] = (job, call, entry, job.generator.next_prompt(call, entry))
+        return pending
+    
+    def _save_run(self, run_state: Dict[str, Any]) -> None:
+        """Grava o estado da execução de forma atômica"""
+        tmp_path = f"{self.run_path}.tmp{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as run_file:
+            json.dump(run_state, run_file, ensure_ascii=False)
+        os.replace(tmp_path, self.run_path)
+    
+    def finish(self, jobs: List[BatchJob], tenant: str) -> List[Dict[str, Any]]:
+        """
+        Entrega os documentos concluídos ao pipeline normal
+        
+        Args:
+            jobs: Documentos concluídos
+            tenant: Tenant dos documentos
+        
+        Returns:
+            Informações dos documentos salvos
+        """
+        # Dependências da entrega carregadas só ao final (a espera dos lotes pode levar horas)
+        from content_store import ContentStore
+        from content_validator import ContentValidator
+        from document_generator import DocumentGenerator
+        from document_store import DocumentStore
+        from render_queue import create_render_queue
+        from search_index import SearchIndex
+        from settings import PDF_FOLDER, RENDER_MODE, DOCUMENT_STORE_PATH, SEARCH_INDEX_PATH, CONTENT_STORE_FOLDER
+        from storage import FileStorage
+        
+        storage = FileStorage(PDF_FOLDER)
+        document_store = DocumentStore(DOCUMENT_STORE_PATH)
+        content_store = ContentStore(CONTENT_STORE_FOLDER)
+        search_index = SearchIndex(SEARCH_INDEX_PATH)
+        render_queue = create_render_queue() if RENDER_MODE == 'queue' else None
+        
+        saved = []
+        for job in jobs:
+            spec = job.spec
+            content = job.content()
+            document_store.record_usage(tenant, **job.generator.usage)
+            
+            doc_info = {
+                'id': str(uuid.uuid4()),
+                'title': spec['title'],
+                'theme': spec['theme'],
+                'ai_model': self.provider,
+                'doc_type': spec['doc_type'],
+                'page_count': spec['page_count'],
+                'language': spec['language'],
+                'file_path': storage.new_key(spec['title'], content, doc_type=spec['doc_type'],
+                                             language=spec['language'], quality=spec['quality']),
+                'status': 'done',
+                'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'token_estimate': job.plan.to_dict(),
+                'batch_run': self.run_id
+            }
+            
+            if render_queue is not None:
+                doc_info['job_id'] = render_queue.enqueue({
+                    'content': content,
+                    'doc_type': spec['doc_type'],
+                    'language': spec['language'],
+                    'title': spec['title'],
+                    'storage_key': doc_info['file_path'],
+                    'quality': spec['quality'],
+                    'tenant': tenant,
+                    'page_count': spec['page_count']
+                })
+                doc_info['status'] = 'queued'
+                document_store.record_usage(tenant, documents=1)
+            else:
+                render_started = time.monotonic()
+                success, message, pdf_path = DocumentGenerator.generate_document(
+                    content, spec['doc_type'], spec['language'], spec['title'],
+                    storage.path_for(doc_info['file_path']), spec['quality']
+                )
+                render_seconds = time.monotonic() - render_started
+                if not success:
+                    document_store.record_usage(tenant, render_seconds=render_seconds)
+                    print(f"Documento '{spec['title']}' não gerado: {message}")
+                    continue
+                document_store.record_usage(
+                    tenant, documents=1, render_seconds=render_seconds, bytes_stored=os.path.getsize(pdf_path)
+                )
+            
+            document_store.add_document(doc_info, tenant)
+            
+            # O worker pode ter concluído o job antes do registro do documento
+            if 'job_id' in doc_info:
+                queued_job = render_queue.get_job(doc_info['job_id'])
+                if queued_job and queued_job['status'] != doc_info['status']:
+                    document_store.update_document(doc_info['id'], status=queued_job['status'])
+            
+            sections = ContentValidator.iter_enhanced_sections(content, spec['doc_type'], spec['language'])
+            content_store.put_document(doc_info['id'], list(sections))
+            search_index.index_document(doc_info, tenant, content)
+            self.checkpoints.delete(job.job_key)
+            saved.append(doc_info)
+        return saved
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Geração offline de catálogos pelas APIs de lote")
+    parser.add_argument('catalog', nargs='?', help="Arquivo JSONL com um documento por linha")
+    parser.add_argument('--resume', help="Retoma uma execução interrompida")
+    parser.add_argument('--provider', default='openai', choices=['openai', 'anthropic'])
+    parser.add_argument('--model')
+    parser.add_argument('--tenant', default='default')
+    parser.add_argument('--base-url', help="Endereço da API (ex.: servidor local de batch_standin.py)")
+    parser.add_argument('--poll', type=float, default=BATCH_POLL_INTERVAL, help="Intervalo entre consultas, em segundos")
+    args = parser.parse_args()
+    
+    checkpoints = CheckpointStore(CHECKPOINT_FOLDER)
+    if args.resume:
+        with open(os.path.join(checkpoints.root, f"batch-{args.resume}.json"), 'r', encoding='utf-8') as run_file:
+            run_state = json.load(run_file)
+    elif args.catalog:
+        with open(args.catalog, 'r', encoding='utf-8') as catalog_file:
+            catalog = [json.loads(line) for line in catalog_file if line.strip()]
+        run_state = {
+            'id': uuid.uuid4().hex[:12], 'catalog': catalog, 'provider': args.provider,
+            'model': args.model or DEFAULT_MODELS.get(args.provider),  # O lote inteiro usa o mesmo modelo
+            'tenant': args.tenant, 'base_url': args.base_url, 'round': 0, 'batches': []
+        }
+    else:
+        parser.error("Informe o catálogo ou --resume")
+    
+    provider = run_state['provider']
+    api_key = ApiKeyStore(API_KEYS_PATH).get(provider)
+    client = AIModelFactory.create_batch_client(provider, api_key, run_state['model'], run_state['base_url'])
+    # Entradas repetidas do catálogo (mesma chave de geração) produzem um único documento
+    jobs = {}
+    for spec in run_state['catalog']:
+        job = BatchJob(spec, provider, run_state['model'], run_state['tenant'], checkpoints)
+        jobs.setdefault(job.job_key, job)
+    jobs = list(jobs.values())
+    
+    runner = BatchRunner(client, provider, checkpoints, run_state['id'], poll_interval=args.poll)
+    print(f"Execução {run_state['id']}: {len(jobs)} documentos ({provider})")
+    done, incomplete = runner.run(jobs, run_state)
+    saved = runner.finish(done, run_state['tenant'])
+    
+    print(f"{len(saved)} documentos salvos, {len(done) - len(saved)} reprovados na validação, "
+          f"{len(incomplete)} incompletos (retomáveis pelo checkpoint)")
+    if not incomplete and os.path.exists(runner.run_path):
+        os.remove(runner.run_path)
+    sys.exit(0 if len(saved) == len(jobs) else 1)
+
+if __name__ == '__main__':
+    main()
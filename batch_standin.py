@@ -0,0 +1,166 @@
+"""
+Servidor local que imita as APIs de lote da OpenAI e da Anthropic, para testes
+
+Implementa apenas o necessário para batch_generation.py: envio de arquivos
+e lotes da OpenAI (/v1/files, /v1/batches) e os Message Batches da Anthropic
+(/v1/messages/batches). As respostas são geradas pelo provedor simulado
+(SimulatedModel), sem rede, e cada lote termina BATCH_STANDIN_DELAY segundos
+depois de enviado. BATCH_STANDIN_ERROR_RATE faz uma fração dos pedidos
+falhar, para exercitar o reenvio.
+
+Uso:
+    python batch_standin.py [porta]
+    python batch_generation.py catalogo.jsonl --provider openai --base-url http://127.0.0.1:8089/v1
+"""
+
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+
+from flask import Flask, Response, abort, jsonify, request, url_for
+
+from ai_models import SimulatedModel
+
+BATCH_STANDIN_DELAY = float(os.getenv('BATCH_STANDIN_DELAY', '2'))
+BATCH_STANDIN_ERROR_RATE = float(os.getenv('BATCH_STANDIN_ERROR_RATE', '0'))
+
+app = Flask(__name__)
+
+_files = {}
+_batches = {}
+_lock = threading.Lock()
+
+def _simulate(prompt: str, max_tokens: int):
+    """Gera a resposta de um pedido; None se o pedido deve falhar (sorteado a cada tentativa)"""
+    if random.random() < BATCH_STANDIN_ERROR_RATE:
+        return None
+    digest = hashlib.sha256(prompt.encode('utf-8')).digest()
+    return SimulatedModel(seed=int.from_bytes(digest[:4], 'big')).complete(prompt, max_tokens)
+
+def _openai_output(line: str) -> str:
+    """Processa uma linha do arquivo de entrada da OpenAI"""
+    item = json.loads(line)
+    body = item['body']
+    completion = _simulate(body['messages'][-1]['content'], body.get('max_tokens', 4000))
+    if completion is None:
+        response = {'status_code': 500, 'body': {'error': {'message': 'Falha simulada'}}}
+    else:
+        response = {'status_code': 200, 'body': {
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': completion.text},
+                         'finish_reason': completion.finish_reason}],
+            'usage': {'prompt_tokens': completion.usage['prompt_tokens'],
+                      'completion_tokens': completion.usage['output_tokens']}
+        }}
+    return json.dumps({'id': f"batch_req_{uuid.uuid4().hex}", 'custom_id': item['custom_id'], 'response': response,
+                       'error': None}, ensure_ascii=False)
+
+def _anthropic_output(item: dict) -> str:
+    """Processa um pedido de um Message Batch"""
+    params = item['params']
+    prompt = ''.join(block['text'] for block in params['messages'][-1]['content'])
+    completion = _simulate(prompt, params.get('max_tokens', 4000))
+    if completion is None:
+        result = {'type': 'errored', 'error': {'type': 'api_error', 'message': 'Falha simulada'}}
+    else:
+        result = {'type': 'succeeded', 'message': {
+            'type': 'message', 'role': 'assistant',
+            'content': [{'type': 'text', 'text': completion.text}],
+            'stop_reason': 'max_tokens' if completion.truncated else 'end_turn',
+            'usage': {'input_tokens': completion.usage['prompt_tokens'],
+                      'output_tokens': completion.usage['output_tokens']}
+        }}
+    return json.dumps({'custom_id': item['custom_id'], 'result': result}, ensure_ascii=False)
+
+def _advance(batch: dict) -> None:
+    """Processa o lote quando o prazo simulado termina"""
+    if batch['_done'] or time.time() < batch['_ready_at']:
+        return
+    if batch['_kind'] == 'openai':
+        lines = [_openai_output(line) for line in _files[batch['input_file_id']].splitlines() if line.strip()]
+        output_id = f"file-{uuid.uuid4().hex}"
+        _files[output_id] = '\n'.join(lines) + '\n'
+        batch.update(status='completed', output_file_id=output_id, completed_at=int(time.time()))
+    else:
+        batch['_results'] = '\n'.join(_anthropic_output(item) for item in batch['_requests']) + '\n'
+        batch.update(processing_status='ended', ended_at=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()))
+    batch['_done'] = True
+
+def _public(batch: dict) -> dict:
+    """Campos do lote visíveis na API"""
+    return {key: value for key, value in batch.items() if not key.startswith('_')}
+
+@app.route('/v1/files', methods=['POST'])
+def upload_file():
+    file_id = f"file-{uuid.uuid4().hex}"
+    with _lock:
+        _files[file_id] = request.files['file'].read().decode('utf-8')
+    return jsonify({'id': file_id, 'object': 'file', 'purpose': request.form.get('purpose')}), 200
+
+@app.route('/v1/files/<file_id>/content', methods=['GET'])
+def file_content(file_id):
+    if file_id not in _files:
+        abort(404)
+    return Response(_files[file_id], mimetype='application/jsonl')
+
+@app.route('/v1/batches', methods=['POST'])
+def create_openai_batch():
+    data = request.json
+    if data.get('input_file_id') not in _files:
+        return jsonify({'error': {'message': 'Arquivo não encontrado'}}), 404
+    batch = {
+        'id': f"batch_{uuid.uuid4().hex}", 'object': 'batch', 'endpoint': data.get('endpoint'),
+        'input_file_id': data['input_file_id'], 'status': 'in_progress', 'output_file_id': None,
+        'error_file_id': None, 'created_at': int(time.time()),
+        '_kind': 'openai', '_ready_at': time.time() + BATCH_STANDIN_DELAY, '_done': False
+    }
+    with _lock:
+        _batches[batch['id']] = batch
+    return jsonify(_public(batch)), 200
+
+@app.route('/v1/batches/<batch_id>', methods=['GET'])
+def get_openai_batch(batch_id):
+    with _lock:
+        batch = _batches.get(batch_id)
+        if batch is None or batch['_kind'] != 'openai':
+            abort(404)
+        _advance(batch)
+        return jsonify(_public(batch)), 200
+
+@app.route('/v1/messages/batches', methods=['POST'])
+def create_anthropic_batch():
+    batch = {
+        'id': f"msgbatch_{uuid.uuid4().hex}", 'type': 'message_batch', 'processing_status': 'in_progress',
+        'results_url': None, 'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        '_kind': 'anthropic', '_requests': request.json['requests'],
+        '_ready_at': time.time() + BATCH_STANDIN_DELAY, '_done': False
+    }
+    with _lock:
+        _batches[batch['id']] = batch
+    return jsonify(_public(batch)), 200
+
+@app.route('/v1/messages/batches/<batch_id>', methods=['GET'])
+def get_anthropic_batch(batch_id):
+    with _lock:
+        batch = _batches.get(batch_id)
+        if batch is None or batch['_kind'] != 'anthropic':
+            abort(404)
+        _advance(batch)
+        if batch['_done']:
+            batch['results_url'] = url_for('anthropic_batch_results', batch_id=batch_id, _external=True)
+        return jsonify(_public(batch)), 200
+
+@app.route('/v1/messages/batches/<batch_id>/results', methods=['GET'])
+def anthropic_batch_results(batch_id):
+    batch = _batches.get(batch_id)
+    if batch is None or not batch['_done']:
+        abort(404)
+    return Response(batch['_results'], mimetype='application/binary')
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8089
+    app.run(host='127.0.0.1', port=port, threaded=True)
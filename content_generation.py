@@ -0,0 +1,405 @@
+"""
+Geração de conteúdo com continuação de respostas truncadas e checkpoints
+
+Cada chamada do plano de tokens (token_budget.py) é registrada em um
+checkpoint em disco assim que termina. Quando o provedor corta a resposta
+pelo limite de tokens, o texto é aparado na última seção completa e uma
+chamada de continuação retoma a partir dela. Se o processo cair ou o
+provedor falhar, repetir a mesma geração retoma do último checkpoint.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from ai_models import AIModelInterface
+from content_validator import ContentValidator, StreamingValidator
+from document_templates import DocumentTemplate
+from metrics import metrics
+from prompt_cache import record_cache_usage
+from quality_tiers import get_tier
+from storage import temp_path
+from tenant_scheduler import FairScheduler, DEFAULT_TENANT
+from token_budget import BudgetPlan, TokenEstimator
+
+# Número máximo de chamadas de continuação por chamada do plano
+MAX_CONTINUATIONS = int(os.getenv('GENERATION_MAX_CONTINUATIONS', '3'))
+
+# Caracteres finais do texto já escrito enviados como contexto na continuação
+CONTINUATION_TAIL_CHARS = 1500
+
+# Idade a partir da qual um checkpoint abandonado é removido pelo janitor (padrão 7 dias)
+CHECKPOINT_TTL = float(os.getenv('CHECKPOINT_TTL', str(7 * 86400)))
+
+# Checkpoints de geração (chave de 32 dígitos hexadecimais) e as suas gravações temporárias
+CHECKPOINT_PATTERN = re.compile(r'^[0-9a-f]{32}\.json(\.tmp[\d-]+)?$')
+
+class GenerationCancelled(Exception):
+    """Geração interrompida antes da próxima chamada ao modelo"""
+    pass
+
+class CheckpointStore:
+    """Guarda o progresso de cada geração em um arquivo JSON"""
+    
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+    
+    def path_for(self, job_key: str) -> str:
+        """Retorna o caminho do checkpoint de uma geração"""
+        return os.path.join(self.root, f"{job_key}.json")
+    
+    def load(self, job_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Lê o checkpoint de uma geração
+        
+        Args:
+            job_key: Chave da geração
+        
+        Returns:
+            Estado salvo ou None se não houver checkpoint válido
+        """
+        try:
+            with open(self.path_for(job_key), 'r', encoding='utf-8') as checkpoint_file:
+                return json.load(checkpoint_file)
+        except (OSError, ValueError):
+            return None
+    
+    def save(self, job_key: str, state: Dict[str, Any]) -> None:
+        """Grava o checkpoint de forma atômica"""
+        state['updated_at'] = time.time()
+        path = self.path_for(job_key)
+        tmp_path = temp_path(path)
+        with open(tmp_path, 'w', encoding='utf-8') as checkpoint_file:
+            json.dump(state, checkpoint_file, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    
+    def delete(self, job_key: str) -> None:
+        """Remove o checkpoint de uma geração concluída"""
+        path = self.path_for(job_key)
+        if os.path.exists(path):
+            os.remove(path)
+    
+    def iter_stale(self, max_age: float = CHECKPOINT_TTL) -> Iterator[str]:
+        """
+        Percorre os checkpoints não atualizados há mais de `max_age` segundos
+        
+        Gerações abandonadas (o cliente desistiu, ou a falha se repetiu) nunca
+        chegam ao delete; os arquivos de execução dos lotes não são incluídos.
+        
+        Args:
+            max_age: Idade mínima em segundos
+        
+        Returns:
+            Caminhos dos checkpoints (e gravações temporárias) abandonados
+        """
+        cutoff = time.time() - max_age
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                try:
+                    if CHECKPOINT_PATTERN.match(entry.name) and entry.stat().st_mtime < cutoff:
+                        yield entry.path
+                except FileNotFoundError:
+                    continue
+
+class ContentGenerator:
+    """Executa o plano de chamadas com continuação e checkpoints"""
+    
+    def __init__(self, ai_model: AIModelInterface, template: DocumentTemplate, checkpoints: CheckpointStore, max_continuations: int = MAX_CONTINUATIONS,
+                 scheduler: Optional[FairScheduler] = None, tenant: str = DEFAULT_TENANT, cancel: Optional[threading.Event] = None):
+        self.ai_model = ai_model
+        self.template = template
+        self.checkpoints = checkpoints
+        self.max_continuations = max_continuations
+        self.scheduler = scheduler  # Se informado, cada chamada ocupa uma vaga do tenant
+        self.tenant = tenant
+        self.cancel = cancel  # Se sinalizado, a geração para antes da próxima chamada
+        self.usage = {'prompt_tokens': 0, 'output_tokens': 0, 'cached_tokens': 0, 'llm_calls': 0}
+        self.refinement = None  # Resultado da última revisão (ver refine)
+    
+    @staticmethod
+    def job_key(**params) -> str:
+        """
+        Calcula a chave de uma geração a partir dos seus parâmetros
+        
+        Repetir a mesma requisição produz a mesma chave e, portanto, retoma
+        o checkpoint existente.
+        
+        Args:
+            params: Parâmetros da geração (título, tema, modelo, etc.)
+        
+        Returns:
+            Chave hexadecimal da geração
+        """
+        payload = json.dumps(params, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+    
+    @staticmethod
+    def temperature_for(quality: str) -> float:
+        """Temperatura de geração de um nível de qualidade (ver quality_tiers.py)"""
+        return get_tier(quality)['temperature']
+    
+    def load_state(self, plan: BudgetPlan, job_key: str) -> Dict[str, Any]:
+        """Estado salvo da geração ou um estado novo, se não houver checkpoint compatível com o plano"""
+        state = self.checkpoints.load(job_key)
+        if state is None or len(state.get('calls', [])) != len(plan.calls):
+            state = {'calls': [{'text': '', 'complete': False, 'continuations': 0} for _ in plan.calls]}
+        return state
+    
+    def generate(self, plan: BudgetPlan, job_key: str, temperature: float = 0.7, max_calls: Optional[int] = None) -> str:
+        """
+        Gera o conteúdo completo do plano, retomando o checkpoint se existir
+        
+        Erros do provedor são propagados; o progresso até o erro fica salvo.
+        
+        Args:
+            plan: Plano de chamadas do documento
+            job_key: Chave da geração (ver job_key)
+            temperature: Temperatura para geração
+            max_calls: Executa apenas as primeiras chamadas do plano (o restante
+                fica para quando a geração for retomada)
+        
+        Returns:
+            Conteúdo Markdown com as saídas das chamadas executadas
+        
+        Raises:
+            GenerationCancelled: Se o evento cancel for sinalizado
+        """
+        state = self.load_state(plan, job_key)
+        if any(entry['text'] for entry in state['calls']):
+            print(f"Retomando geração {job_key} a partir do checkpoint")
+            metrics.increment('generation_resumed', provider=plan.provider)
+        
+        outputs = []
+        for index, call in enumerate(plan.calls[:max_calls]):
+            outputs.append(self._run_call(call, state['calls'][index], state, job_key, plan.provider, temperature))
+        
+        return '\n\n'.join(output.strip() for output in outputs)
+    
+    def refine(self, plan: BudgetPlan, job_key: str, temperature: float, content: str, doc_type: str, language: str,
+               threshold: float, max_rounds: int) -> str:
+        """
+        Revisa o conteúdo guiado pela validação, parando assim que a pontuação atinge o limite
+        
+        A cada rodada, a chamada do plano mais fraca (partes citadas nos
+        problemas, seções curtas, menos texto que o esperado) é refeita com os problemas
+        apontados pelo validador. A nova versão só é mantida se a pontuação
+        do documento não piorar. Se a primeira pontuação já atinge o limite,
+        nenhuma chamada extra é feita.
+        
+        Args:
+            plan: Plano de chamadas do documento
+            job_key: Chave da geração (o checkpoint guarda as versões mantidas)
+            temperature: Temperatura para geração
+            content: Conteúdo gerado por generate
+            doc_type: Tipo de documento
+            language: Idioma do conteúdo
+            threshold: Pontuação (ContentValidator.get_quality_score) que encerra a revisão
+            max_rounds: Número máximo de chamadas refeitas
+        
+        Returns:
+            Conteúdo revisado
+        """
+        score, issues = ContentGenerator.score(content, doc_type, language)
+        state = self.load_state(plan, job_key)
+        revised = set()
+        rounds = 0
+        
+        while score < threshold and rounds < max_rounds and len(revised) < len(plan.calls):
+            index = self._weakest_call(plan, state, revised, issues, doc_type, language)
+            revised.add(index)
+            rounds += 1
+            
+            previous = state['calls'][index]
+            call = dict(plan.calls[index], prompt=self.template.get_revision_prompt(plan.calls[index]['prompt'], issues))
+            state['calls'][index] = self.run_prompt(call, plan.provider, temperature)
+            candidate = '\n\n'.join(item['text'].strip() for item in state['calls'])
+            candidate_score, candidate_issues = ContentGenerator.score(candidate, doc_type, language)
+            
+            if candidate_score >= score and len(candidate_issues) <= len(issues):
+                content, score, issues = candidate, candidate_score, candidate_issues
+                self.checkpoints.save(job_key, state)
+            else:
+                state['calls'][index] = previous
+        
+        metrics.increment('refinement_rounds', rounds, provider=plan.provider)
+        if score >= threshold:
+            metrics.increment('refinement_early_stop' if rounds < max_rounds else 'refinement_converged', provider=plan.provider)
+        self.refinement = {'score': round(score, 3), 'rounds': rounds, 'threshold': threshold}
+        return content
+    
+    def _weakest_call(self, plan: BudgetPlan, state: Dict[str, Any], revised: set, issues: List[str], doc_type: str, language: str) -> int:
+        """Índice da chamada ainda não revisada com mais problemas: partes citadas, seções curtas e texto abaixo do esperado"""
+        def weakness(index: int) -> Tuple[int, int, float]:
+            # Ex.: "Falta seção de Conclusão" aponta a chamada que escreve a parte "Conclusão"
+            cited = sum(1 for issue in issues if any(part in issue for part in plan.calls[index]['parts']))
+            validator = StreamingValidator(doc_type, language)
+            text = state['calls'][index]['text']
+            for section in ContentValidator.iter_sections(text):
+                validator.feed(section)
+            written = TokenEstimator.count_tokens(text, plan.provider, language)
+            return -cited, -len(validator.short_sections), written / max(1, plan.calls[index]['output_tokens'])
+        
+        return min((index for index in range(len(plan.calls)) if index not in revised), key=weakness)
+    
+    @staticmethod
+    def score(content: str, doc_type: str, language: str) -> Tuple[float, List[str]]:
+        """
+        Pontuação e problemas do conteúdo, como o validador os vê na renderização
+        
+        Args:
+            content: Conteúdo Markdown
+            doc_type: Tipo de documento
+            language: Idioma do conteúdo
+        
+        Returns:
+            Tupla (pontuação de 0.0 a 1.0, lista de problemas)
+        """
+        validator = StreamingValidator(doc_type, language)
+        for section in ContentValidator.iter_enhanced_sections(content, doc_type, language):
+            validator.feed(section)
+        return validator.get_quality_score(), validator.result()[1]
+    
+    def run_prompt(self, call: Dict[str, Any], provider: str, temperature: float) -> Dict[str, Any]:
+        """
+        Executa um prompt avulso (fora do plano), continuando respostas truncadas, sem checkpoint
+        
+        Args:
+            call: Dicionário com 'prompt' e 'max_tokens'
+            provider: Nome do provedor
+            temperature: Temperatura para geração
+        
+        Returns:
+            Estado da chamada, com o texto em 'text'
+        """
+        entry = {'text': '', 'complete': False, 'continuations': 0}
+        while not entry['complete']:
+            completion = self._complete(self.next_prompt(call, entry), call['max_tokens'], provider, temperature)
+            self.apply_completion(entry, completion, provider)
+        return entry
+    
+    def _run_call(self, call: Dict[str, Any], entry: Dict[str, Any], state: Dict[str, Any], job_key: str, provider: str, temperature: float) -> str:
+        """Executa uma chamada do plano, continuando enquanto a resposta vier truncada"""
+        while not entry['complete']:
+            completion = self._complete(self.next_prompt(call, entry), call['max_tokens'], provider, temperature)
+            self.apply_completion(entry, completion, provider)
+            self.checkpoints.save(job_key, state)
+        return entry['text']
+    
+    def next_prompt(self, call: Dict[str, Any], entry: Dict[str, Any]) -> str:
+        """Prompt da próxima chamada: o original ou a continuação do texto já salvo"""
+        return call['prompt'] if not entry['text'] else self._continuation_prompt(call['prompt'], entry)
+    
+    def apply_completion(self, entry: Dict[str, Any], completion, provider: str) -> bool:
+        """
+        Incorpora uma resposta ao estado de uma chamada do plano
+        
+        Respostas truncadas são aparadas na última seção completa, para que a
+        próxima chamada (ver next_prompt) continue a partir dela.
+        
+        Args:
+            entry: Estado da chamada no checkpoint
+            completion: Resposta do modelo
+            provider: Nome do provedor (para as métricas)
+        
+        Returns:
+            True se a chamada está concluída
+        """
+        text = self._join(entry['text'], completion.text)
+        
+        if not completion.truncated:
+            entry.update(text=text, complete=True)
+            return True
+        
+        metrics.increment('generation_truncated', provider=provider)
+        if entry['continuations'] >= self.max_continuations:
+            # Mantém o texto parcial; o validador decide se o documento é aceitável
+            print(f"Resposta ainda truncada após {entry['continuations']} continuações")
+            entry.update(text=text, complete=True)
+            return True
+        
+        kept, resume_heading = ContentGenerator.split_complete(text)
+        entry.update(text=kept, resume_heading=resume_heading, continuations=entry['continuations'] + 1)
+        metrics.increment('generation_continuations', provider=provider)
+        return False
+    
+    def _complete(self, prompt: str, max_tokens: int, provider: str, temperature: float):
+        """Faz uma chamada ao modelo (na vaga do tenant, se houver escalonador) e contabiliza o uso"""
+        if self.cancel is not None and self.cancel.is_set():
+            raise GenerationCancelled("Geração cancelada")
+        
+        if self.scheduler is None:
+            completion = self.ai_model.complete(prompt, max_tokens=max_tokens, temperature=temperature)
+        else:
+            # O custo da chamada é a saída máxima, para que documentos grandes cedam a vez aos pequenos
+            with self.scheduler.slot(self.tenant, cost=max_tokens):
+                if self.cancel is not None and self.cancel.is_set():
+                    raise GenerationCancelled("Geração cancelada")
+                completion = self.ai_model.complete(prompt, max_tokens=max_tokens, temperature=temperature)
+        
+        self.account(prompt, completion, provider)
+        return completion
+    
+    def account(self, prompt: str, completion, provider: str) -> None:
+        """Soma o uso de uma resposta (informado pelo provedor ou estimado)"""
+        usage = completion.usage or {
+            'prompt_tokens': TokenEstimator.count_tokens(prompt, provider),
+            'output_tokens': TokenEstimator.count_tokens(completion.text, provider),
+        }
+        self.usage['prompt_tokens'] += usage['prompt_tokens']
+        self.usage['output_tokens'] += usage['output_tokens']
+        self.usage['cached_tokens'] += usage.get('cached_tokens', 0)
+        self.usage['llm_calls'] += 1
+        record_cache_usage(provider, usage)
+    
+    def _continuation_prompt(self, prompt: str, entry: Dict[str, Any]) -> str:
+        """Monta o prompt de continuação a partir do texto já salvo"""
+        return self.template.get_continuation_prompt(
+            prompt,
+            ContentGenerator.headings(entry['text']),
+            entry['text'].rstrip()[-CONTINUATION_TAIL_CHARS:],
+            entry.get('resume_heading')
+        )
+    
+    @staticmethod
+    def _join(previous: str, continuation: str) -> str:
+        """Junta o texto salvo com a continuação, separados por um parágrafo"""
+        if not previous:
+            return continuation
+        return previous.rstrip('\n') + '\n\n' + continuation.lstrip('\n')
+    
+    @staticmethod
+    def split_complete(text: str) -> Tuple[str, Optional[str]]:
+        """
+        Apara um texto truncado na última seção completa
+        
+        Args:
+            text: Texto Markdown cortado pelo limite de tokens
+        
+        Returns:
+            Tupla (texto mantido, título da seção a reescrever). Se não houver
+            seção completa, o texto é aparado no último parágrafo completo e o
+            título é None.
+        """
+        sections = list(ContentValidator.iter_sections(text))
+        if len(sections) > 1 and sections[-1].startswith('#'):
+            resume_heading = sections[-1].split('\n', 1)[0].lstrip('#').strip()
+            return ''.join(sections[:-1]), resume_heading
+        
+        paragraph_end = text.rfind('\n\n')
+        if paragraph_end > 0:
+            return text[:paragraph_end], None
+        return text, None
+    
+    @staticmethod
+    def headings(text: str) -> List[str]:
+        """Retorna os títulos das seções de um texto Markdown"""
+        return [
+            section.split('\n', 1)[0].lstrip('#').strip()
+            for section in ContentValidator.iter_sections(text)
+            if section.startswith('#')
+        ]
@@ -0,0 +1,228 @@
+"""
+Reparo direcionado do conteúdo antes da renderização
+
+Em vez de reprovar o documento inteiro (e obrigar o usuário a gerar tudo de
+novo), cada problema do validador vira a menor correção possível:
+
+    - "Falta seção de Introdução/Conclusão": uma chamada gera só a seção que
+      falta, inserida antes da parte seguinte da estrutura do template
+      (ex.: a Introdução antes do Capítulo 1, a Conclusão antes das Referências)
+    - "Seção 'X' tem conteúdo insuficiente": uma chamada reescreve só a seção,
+      que substitui a original no mesmo lugar
+    - "Múltiplos parágrafos vazios consecutivos": corrigido localmente, sem
+      chamar o modelo
+
+Problemas sem correção barata (conteúdo curto demais, faltam cabeçalhos)
+continuam a ser tratados pelo validador na renderização.
+
+Configuração (variáveis de ambiente):
+    REPAIR_MAX_CALLS     Chamadas de reparo por documento (padrão 4, 0 desativa)
+    REPAIR_EXPAND_WORDS  Palavras pedidas ao reescrever uma seção curta (padrão 300)
+"""
+
+import math
+import os
+import re
+from typing import Dict, Any, List, Optional
+
+from content_generation import ContentGenerator
+from content_validator import ContentValidator, StreamingValidator
+from enhancement_rules import RuleSet
+from metrics import metrics
+from token_budget import BudgetPlan, TokenBudget, TokenEstimator, OUTPUT_SAFETY_MARGIN
+
+REPAIR_MAX_CALLS = int(os.getenv('REPAIR_MAX_CALLS', '4'))
+REPAIR_EXPAND_WORDS = int(os.getenv('REPAIR_EXPAND_WORDS', '300'))
+
+# Títulos das seções obrigatórias, como o validador as procura
+REQUIRED_SECTIONS = {
+    'pt-BR': {'intro': 'Introdução', 'conclusion': 'Conclusão'},
+    'en-US': {'intro': 'Introduction', 'conclusion': 'Conclusion'},
+}
+
+# Apenas colapsa as linhas em branco repetidas, preservando os blocos de código cercados
+BLANK_LINES = RuleSet([], heading_space=False, blank_around_headings=False, collapse_blank_lines=True)
+
+class ContentRepair:
+    """Corrige os problemas do validador com chamadas pequenas e emenda o resultado no documento"""
+    
+    def __init__(self, generator: ContentGenerator, max_calls: int = REPAIR_MAX_CALLS, expand_words: int = REPAIR_EXPAND_WORDS):
+        self.generator = generator  # Faz as chamadas na vaga do tenant e soma o uso
+        self.max_calls = max_calls
+        self.expand_words = expand_words
+        self.report: List[Dict[str, Any]] = []  # Reparos feitos na última chamada de repair
+    
+    def repair(self, content: str, plan: BudgetPlan, doc_type: str, language: str, title: str, theme: str,
+               page_count: int, temperature: float) -> str:
+        """
+        Corrige as seções que faltam ou estão curtas demais
+        
+        Args:
+            content: Conteúdo Markdown gerado
+            plan: Plano de chamadas do documento (provedor e modelo)
+            doc_type: Tipo de documento
+            language: Idioma do conteúdo
+            title: Título do documento
+            theme: Tema do documento
+            page_count: Número de páginas
+            temperature: Temperatura para geração
+        
+        Returns:
+            Conteúdo com os reparos emendados (o original, se não houver o que reparar)
+        """
+        self.report = []
+        validator = StreamingValidator(doc_type, language)
+        for section in ContentValidator.iter_enhanced_sections(content, doc_type, language):
+            validator.feed(section)
+        
+        if validator.has_empty_paragraphs:
+            content = BLANK_LINES.apply(content)
+            self._record('empty_paragraphs', None, 0)
+        
+        sections = list(ContentValidator.iter_sections(content))
+        calls = 0
+        
+        # Seções obrigatórias que faltam: primeiro, porque reprovam o documento
+        if doc_type == 'ebook':
+            names = REQUIRED_SECTIONS.get(language, REQUIRED_SECTIONS['en-US'])
+            missing = [(kind, names[kind]) for kind, found in
+                       (('intro', validator.has_intro), ('conclusion', validator.has_conclusion)) if not found]
+            for kind, section_title in missing:
+                if calls >= self.max_calls:
+                    break
+                calls += 1
+                if self._add_section(sections, section_title, plan, title, theme, page_count, temperature):
+                    self._record(f"missing_{kind}", section_title, 1)
+        
+        # Seções curtas sem subseções: reescritas no mesmo lugar
+        for section_title in validator.short_sections:
+            if calls >= self.max_calls:
+                break
+            index = self._find_leaf(sections, section_title)
+            if index is None:
+                continue
+            calls += 1
+            if self._expand_section(sections, index, plan, title, theme, page_count, temperature):
+                self._record('thin_section', section_title, 1)
+        
+        if calls:
+            metrics.increment('repair_calls', calls, provider=plan.provider)
+        return ''.join(sections) if calls else content
+    
+    def _add_section(self, sections: List[str], section_title: str, plan: BudgetPlan, title: str, theme: str,
+                     page_count: int, temperature: float) -> bool:
+        """Gera uma seção que falta e a insere antes da parte seguinte da estrutura"""
+        template = self.generator.template
+        structure = template.get_structure(page_count)
+        position = next((i for i, part in enumerate(structure) if part['title'] == section_title), None)
+        words = structure[position]['words'] if position is not None else self.expand_words
+        
+        # Inserir antes da primeira parte seguinte que exista no documento; sem nenhuma, no fim
+        index, level = len(sections), 2
+        following = [part['title'] for part in structure[position + 1:]] if position is not None else []
+        for part_title in following:
+            found = self._find_heading(sections, part_title)
+            if found is not None:
+                index, level = found, ContentRepair._level(sections[found])
+                break
+        
+        prompt = template.get_section_prompt(title, theme, page_count, section_title, words)
+        text = self._generate(prompt, words, plan, temperature)
+        if text is None:
+            return False
+        
+        if index == len(sections) and sections and not sections[-1].endswith('\n\n'):
+            sections[-1] = sections[-1].rstrip('\n') + '\n\n'
+        sections.insert(index, ContentRepair._with_heading(ContentRepair._extract(text, section_title), '#' * level + ' ' + section_title))
+        return True
+    
+    def _expand_section(self, sections: List[str], index: int, plan: BudgetPlan, title: str, theme: str,
+                        page_count: int, temperature: float) -> bool:
+        """Reescreve uma seção curta e a substitui no mesmo lugar"""
+        heading = sections[index].split('\n', 1)[0].rstrip()
+        prompt = self.generator.template.get_expand_prompt(title, theme, page_count, sections[index], self.expand_words)
+        text = self._generate(prompt, self.expand_words, plan, temperature)
+        if text is None:
+            return False
+        
+        sections[index] = ContentRepair._with_heading(ContentRepair._extract(text, heading.lstrip('#').strip()), heading)
+        return True
+    
+    def _generate(self, prompt: str, words: int, plan: BudgetPlan, temperature: float) -> Optional[str]:
+        """Faz a chamada de reparo; None se falhar (o documento segue sem o reparo)"""
+        language = self.generator.template.language
+        max_tokens = min(
+            math.ceil(TokenEstimator.words_to_tokens(words, plan.provider, language) * OUTPUT_SAFETY_MARGIN),
+            TokenBudget.get_limits(plan.model)['max_output']
+        )
+        try:
+            entry = self.generator.run_prompt({'prompt': prompt, 'max_tokens': max_tokens}, plan.provider, temperature)
+        except Exception as e:
+            print(f"Erro no reparo do conteúdo: {str(e)}")
+            metrics.increment('repair_failed', provider=plan.provider)
+            return None
+        return entry['text'] if entry['text'].strip() else None
+    
+    def _record(self, kind: str, section_title: Optional[str], calls: int) -> None:
+        """Registra um reparo no relatório e nas métricas"""
+        self.report.append({'kind': kind, 'section': section_title, 'calls': calls})
+        metrics.increment('repair_applied', kind=kind)
+    
+    @staticmethod
+    def _find_heading(sections: List[str], section_title: str) -> Optional[int]:
+        """Índice da seção cujo título contém o texto informado"""
+        for index, section in enumerate(sections):
+            # "Capítulo 1" não deve encontrar "Capítulo 10"
+            if section.startswith('#') and re.search(re.escape(section_title) + r'(?!\d)', section.split('\n', 1)[0]):
+                return index
+        return None
+    
+    @staticmethod
+    def _find_leaf(sections: List[str], section_title: str) -> Optional[int]:
+        """
+        Índice da seção com o título exato, se ela não tiver subseções
+        
+        Um capítulo seguido das suas subseções é curto por construção e não
+        precisa de reparo.
+        """
+        for index, section in enumerate(sections):
+            if not section.startswith('#') or section.split('\n', 1)[0].lstrip('#').strip() != section_title:
+                continue
+            following = sections[index + 1] if index + 1 < len(sections) else ''
+            if following.startswith('#') and ContentRepair._level(following) > ContentRepair._level(section):
+                return None
+            return index
+        return None
+    
+    @staticmethod
+    def _extract(text: str, section_title: str) -> str:
+        """
+        Mantém da resposta só a seção pedida e as suas subseções
+        
+        Se o modelo escrever mais do que o pedido (outras seções, o título do
+        documento), o excedente é descartado. Sem um cabeçalho com o título,
+        vale a primeira seção da resposta.
+        """
+        sections = [section for section in ContentValidator.iter_sections(text) if section.strip()]
+        start = ContentRepair._find_heading(sections, section_title)
+        if start is None:
+            return sections[0] if sections else text
+        
+        level = ContentRepair._level(sections[start])
+        end = start + 1
+        while end < len(sections) and ContentRepair._level(sections[end]) > level:
+            end += 1
+        return ''.join(sections[start:end])
+    
+    @staticmethod
+    def _level(section: str) -> int:
+        """Nível do cabeçalho de uma seção (número de '#')"""
+        return len(section) - len(section.lstrip('#'))
+    
+    @staticmethod
+    def _with_heading(text: str, heading: str) -> str:
+        """Troca o primeiro cabeçalho da resposta pelo informado (ou o acrescenta) e termina a seção com uma linha em branco"""
+        body = text.strip()
+        if body.startswith('#'):
+            body = body.split('\n', 1)[1].strip() if '\n' in body else ''
+        return f"{heading}\n\n{body}\n\n"
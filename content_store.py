@@ -0,0 +1,524 @@
+"""
+Armazenamento compacto do Markdown final dos documentos
+
+Cada documento é guardado como a lista ordenada dos hashes das suas seções.
+Cada seção é um blob endereçado pelo conteúdo (seções idênticas são
+guardadas uma única vez), comprimido e anexado a um arquivo de pacote.
+Um índice SQLite registra a posição de cada blob no pacote.
+
+Compressão:
+    - zstd com dicionário treinado a partir das próprias seções, se o pacote
+      zstandard estiver instalado (os documentos compartilham muita estrutura
+      vinda dos templates)
+    - zlib com dicionário pré-definido (linhas mais frequentes), caso contrário
+
+O dicionário é treinado automaticamente quando o armazenamento atinge
+DICT_TRAIN_MIN_BLOBS seções, ou sob demanda. Cada blob registra o codec e o
+dicionário usados, então blobs antigos continuam legíveis após um novo
+treino. A leitura usa mmap: os bytes comprimidos são lidos direto das
+páginas do arquivo, sem cópia intermediária.
+
+A compactação grava um pacote novo e aposenta os anteriores, que só são
+removidos do disco depois de CONTENT_PACK_GRACE segundos: outros processos
+podem ter lido uma linha do índice antiga e ainda mapear o pacote. Cada
+processo descarta o mapeamento de um pacote aposentado assim que lê um blob
+de outro pacote.
+
+Uso:
+    python content_store.py --stats
+    python content_store.py --train             # Treina um novo dicionário
+    python content_store.py --compact           # Reescreve o pacote sem os blobs não referenciados
+    python content_store.py --purge             # Remove os pacotes aposentados após a carência
+    python content_store.py --benchmark [docs]  # Compara o tamanho em disco com o texto original
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from contextlib import closing, contextmanager
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from content_validator import ContentValidator
+from metrics import metrics
+from settings import CONTENT_STORE_FOLDER
+from storage import connect_sqlite, file_lock
+
+# Treino do dicionário
+DICT_SIZE = int(os.getenv('CONTENT_DICT_SIZE', str(112 * 1024)))
+DICT_TRAIN_MIN_BLOBS = int(os.getenv('CONTENT_DICT_MIN_BLOBS', '200'))
+DICT_TRAIN_SAMPLES = 2000
+
+# Níveis de compressão
+ZSTD_LEVEL = int(os.getenv('CONTENT_ZSTD_LEVEL', '19'))
+ZLIB_LEVEL = 9
+
+# O zlib só usa os últimos 32 KB do dicionário
+ZLIB_DICT_SIZE = 32 * 1024
+
+# Carência antes de remover os pacotes aposentados pela compactação
+PACK_GRACE_SECONDS = float(os.getenv('CONTENT_PACK_GRACE', '3600'))
+
+def _zstd():
+    """Módulo zstandard, se instalado"""
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+class ContentStore:
+    """Markdown dos documentos em blobs de seção deduplicados e comprimidos"""
+    
+    def __init__(self, root: str = CONTENT_STORE_FOLDER):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+        self.db_path = os.path.join(self.root, 'content.db')
+        self.lock_path = os.path.join(self.root, '.write.lock')
+        self.codec = 'zstd' if _zstd() is not None else 'zlib'
+        
+        self._maps = {}
+        self._maps_lock = threading.Lock()
+        self._dictionaries = {}
+        self._local_lock = threading.Lock()
+        
+        with closing(connect_sqlite(self.db_path)) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS blobs (
+                    hash TEXT PRIMARY KEY,
+                    pack TEXT NOT NULL,
+                    offset INTEGER NOT NULL,
+                    length INTEGER NOT NULL,
+                    raw_length INTEGER NOT NULL,
+                    codec TEXT NOT NULL,
+                    dict_id INTEGER
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS documents (
+                    doc_id TEXT PRIMARY KEY,
+                    sections TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS dictionaries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    codec TEXT NOT NULL,
+                    data BLOB NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS settings (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                )
+            ''')
+            conn.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('pack', 'pack-0001.dat')")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS retired_packs (
+                    pack TEXT PRIMARY KEY,
+                    retired_at REAL NOT NULL
+                )
+            ''')
+    
+    @contextmanager
+    def _write_lock(self) -> Iterator[None]:
+        """Trava exclusiva de escrita entre threads e processos (flock, apenas POSIX)"""
+        with self._local_lock, file_lock(self.lock_path):
+            yield
+    
+    def put_document(self, doc_id: str, sections: List[str]) -> Dict[str, int]:
+        """
+        Guarda o Markdown final de um documento
+        
+        Args:
+            doc_id: Identificador do documento
+            sections: Seções do Markdown final, na ordem (ver ContentValidator.iter_enhanced_sections)
+        
+        Returns:
+            Dicionário com 'raw_bytes', 'stored_bytes' (apenas dos blobs novos) e 'new_blobs'
+        """
+        hashes = []
+        report = {'raw_bytes': 0, 'stored_bytes': 0, 'new_blobs': 0}
+        
+        with self._write_lock():
+            with closing(connect_sqlite(self.db_path)) as conn:
+                # Os registros dos blobs só são confirmados depois do fsync do pacote: uma
+                # queda no meio nunca deixa um registro apontando para bytes que não chegaram
+                # ao disco (uma conexão fechada sem COMMIT descarta a transação)
+                conn.execute('BEGIN IMMEDIATE')
+                pack = conn.execute("SELECT value FROM settings WHERE key = 'pack'").fetchone()['value']
+                dict_id, dictionary = self._current_dictionary(conn)
+                
+                with open(os.path.join(self.root, pack), 'ab') as pack_file:
+                    for section in sections:
+                        raw = section.encode('utf-8')
+                        digest = hashlib.sha256(raw).hexdigest()
+                        hashes.append(digest)
+                        report['raw_bytes'] += len(raw)
+                        
+                        if conn.execute('SELECT 1 FROM blobs WHERE hash = ?', (digest,)).fetchone():
+                            continue
+                        
+                        codec, data = self._compress(raw, dictionary)
+                        offset = pack_file.tell()
+                        pack_file.write(data)
+                        conn.execute(
+                            'INSERT INTO blobs (hash, pack, offset, length, raw_length, codec, dict_id) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                            (digest, pack, offset, len(data), len(raw), codec, dict_id if codec != 'raw' else None)
+                        )
+                        report['stored_bytes'] += len(data)
+                        report['new_blobs'] += 1
+                    
+                    pack_file.flush()
+                    os.fsync(pack_file.fileno())
+                
+                conn.execute(
+                    'INSERT OR REPLACE INTO documents (doc_id, sections, created_at) VALUES (?, ?, ?)',
+                    (doc_id, json.dumps(hashes), time.time())
+                )
+                
+                blob_count = conn.execute('SELECT COUNT(*) FROM blobs').fetchone()[0]
+                conn.execute('COMMIT')
+            
+            # Primeiro dicionário assim que houver amostras suficientes
+            if dictionary is None and blob_count >= DICT_TRAIN_MIN_BLOBS:
+                self._train_locked()
+        
+        metrics.increment('content_raw_bytes', report['raw_bytes'])
+        metrics.increment('content_stored_bytes', report['stored_bytes'])
+        return report
+    
+    def get_document(self, doc_id: str) -> Optional[str]:
+        """
+        Lê o Markdown final de um documento
+        
+        Args:
+            doc_id: Identificador do documento
+        
+        Returns:
+            Markdown ou None se o documento não estiver guardado
+        """
+        with closing(connect_sqlite(self.db_path)) as conn:
+            row = conn.execute('SELECT sections FROM documents WHERE doc_id = ?', (doc_id,)).fetchone()
+            if row is None:
+                return None
+            hashes = json.loads(row['sections'])
+            blobs = {
+                blob['hash']: blob
+                for blob in conn.execute(
+                    f"SELECT * FROM blobs WHERE hash IN ({', '.join('?' for _ in set(hashes))})", list(set(hashes))
+                )
+            }
+            return ''.join(self._read_blob(conn, blobs[digest]) for digest in hashes)
+    
+    def iter_sections(self, doc_id: str) -> Iterator[str]:
+        """Percorre as seções de um documento sem montar o texto inteiro"""
+        with closing(connect_sqlite(self.db_path)) as conn:
+            row = conn.execute('SELECT sections FROM documents WHERE doc_id = ?', (doc_id,)).fetchone()
+            if row is None:
+                return
+            for digest in json.loads(row['sections']):
+                blob = conn.execute('SELECT * FROM blobs WHERE hash = ?', (digest,)).fetchone()
+                yield self._read_blob(conn, blob)
+    
+    def delete_document(self, doc_id: str) -> bool:
+        """
+        Remove um documento (os blobs sem referência são liberados em compact)
+        
+        Args:
+            doc_id: Identificador do documento
+        
+        Returns:
+            True se o documento existia
+        """
+        with closing(connect_sqlite(self.db_path)) as conn:
+            return conn.execute('DELETE FROM documents WHERE doc_id = ?', (doc_id,)).rowcount > 0
+    
+    def _read_blob(self, conn: sqlite3.Connection, blob: sqlite3.Row) -> str:
+        """Descomprime um blob lido diretamente do mapeamento do pacote"""
+        view = self._map(blob['pack'], blob['offset'] + blob['length'])
+        data = view[blob['offset']:blob['offset'] + blob['length']]
+        try:
+            if blob['codec'] == 'raw':
+                return str(data, 'utf-8')
+            dictionary = self._load_dictionary(conn, blob['dict_id'])
+            return self._decompress(blob['codec'], data, dictionary, blob['raw_length']).decode('utf-8')
+        finally:
+            data.release()
+    
+    def _map(self, pack: str, needed: int) -> memoryview:
+        """Mapeamento do pacote em memória, refeito quando o arquivo cresce"""
+        with self._maps_lock:
+            # Uma linha aponta para outro pacote: os demais foram aposentados por uma compactação
+            # (em qualquer processo) e seus mapeamentos não devem segurar os arquivos no disco
+            for stale in [other for other in self._maps if other != pack]:
+                del self._maps[stale]
+            
+            current = self._maps.get(pack)
+            if current is None or len(current[1]) < needed:
+                with open(os.path.join(self.root, pack), 'rb') as pack_file:
+                    mapping = mmap.mmap(pack_file.fileno(), 0, access=mmap.ACCESS_READ)
+                # O mapeamento anterior é liberado pelo coletor quando não houver leituras em andamento
+                current = (mapping, memoryview(mapping))
+                self._maps[pack] = current
+            return current[1]
+    
+    def _current_dictionary(self, conn: sqlite3.Connection) -> Tuple[Optional[int], Optional[bytes]]:
+        """Dicionário mais recente do codec em uso"""
+        row = conn.execute(
+            'SELECT id, data FROM dictionaries WHERE codec = ? ORDER BY id DESC LIMIT 1', (self.codec,)
+        ).fetchone()
+        if row is None:
+            return None, None
+        self._dictionaries[row['id']] = row['data']
+        return row['id'], row['data']
+    
+    def _load_dictionary(self, conn: sqlite3.Connection, dict_id: Optional[int]) -> Optional[bytes]:
+        """Dicionário pelo identificador (em cache no processo)"""
+        if dict_id is None:
+            return None
+        if dict_id not in self._dictionaries:
+            row = conn.execute('SELECT data FROM dictionaries WHERE id = ?', (dict_id,)).fetchone()
+            self._dictionaries[dict_id] = row['data']
+        return self._dictionaries[dict_id]
+    
+    def _compress(self, raw: bytes, dictionary: Optional[bytes]) -> Tuple[str, bytes]:
+        """Comprime um blob; guarda sem compressão quando não compensa"""
+        if self.codec == 'zstd':
+            zstandard = _zstd()
+            dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+            data = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dict_data).compress(raw)
+        else:
+            compressor = zlib.compressobj(ZLIB_LEVEL, zdict=dictionary) if dictionary else zlib.compressobj(ZLIB_LEVEL)
+            data = compressor.compress(raw) + compressor.flush()
+        
+        if len(data) >= len(raw):
+            return 'raw', raw
+        return self.codec, data
+    
+    @staticmethod
+    def _decompress(codec: str, data: memoryview, dictionary: Optional[bytes], raw_length: int) -> bytes:
+        """Descomprime um blob com o codec e o dicionário registrados"""
+        if codec == 'zstd':
+            zstandard = _zstd()
+            if zstandard is None:
+                raise RuntimeError("O pacote zstandard é necessário para ler este conteúdo")
+            dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+            return zstandard.ZstdDecompressor(dict_data=dict_data).decompress(data, max_output_size=raw_length)
+        
+        decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+        return decompressor.decompress(data) + decompressor.flush()
+    
+    def train_dictionary(self) -> Optional[int]:
+        """
+        Treina um novo dicionário com uma amostra das seções guardadas
+        
+        Apenas os blobs gravados depois usam o novo dicionário.
+        
+        Returns:
+            Identificador do dicionário ou None se não houver amostras
+        """
+        with self._write_lock():
+            return self._train_locked()
+    
+    def _train_locked(self) -> Optional[int]:
+        """Treina o dicionário (com a trava de escrita já obtida)"""
+        with closing(connect_sqlite(self.db_path)) as conn:
+            rows = conn.execute('SELECT * FROM blobs WHERE codec != ?', ('raw',)).fetchall()
+            raw_rows = conn.execute("SELECT * FROM blobs WHERE codec = 'raw'").fetchall()
+            candidates = list(rows) + list(raw_rows)
+            if not candidates:
+                return None
+            sample_rows = random.Random(0).sample(candidates, min(len(candidates), DICT_TRAIN_SAMPLES))
+            samples = [self._read_blob(conn, row).encode('utf-8') for row in sample_rows]
+            
+            started = time.perf_counter()
+            if self.codec == 'zstd':
+                zstandard = _zstd()
+                try:
+                    data = zstandard.train_dictionary(DICT_SIZE, samples).as_bytes()
+                except zstandard.ZstdError as e:
+                    print(f"Amostras insuficientes para o dicionário zstd: {str(e)}")
+                    return None
+            else:
+                data = ContentStore._build_zlib_dictionary(samples)
+            
+            cursor = conn.execute(
+                'INSERT INTO dictionaries (codec, data, created_at) VALUES (?, ?, ?)', (self.codec, data, time.time())
+            )
+            print(f"Dicionário {self.codec} de {len(data)} bytes treinado com {len(samples)} seções "
+                  f"em {time.perf_counter() - started:.2f} s")
+            return cursor.lastrowid
+    
+    @staticmethod
+    def _build_zlib_dictionary(samples: List[bytes]) -> bytes:
+        """Dicionário pré-definido do zlib: as linhas repetidas mais frequentes, a mais frequente no fim"""
+        counts = Counter()
+        for sample in samples:
+            counts.update(set(line for line in sample.split(b'\n') if len(line) >= 8))
+        
+        lines = []
+        size = 0
+        for line, count in counts.most_common():
+            if count < 2 or size + len(line) + 1 > ZLIB_DICT_SIZE:
+                break
+            lines.append(line)
+            size += len(line) + 1
+        return b'\n'.join(reversed(lines)) + b'\n'
+    
+    def compact(self) -> Dict[str, int]:
+        """
+        Reescreve os blobs referenciados em um novo pacote e aposenta os anteriores
+        
+        O índice passa a apontar para o novo pacote na mesma transação. Os
+        pacotes anteriores continuam no disco durante a carência, para os
+        leitores que ainda usam uma linha antiga, e são removidos por
+        purge_packs (chamado também aqui).
+        
+        Returns:
+            Dicionário com 'blobs_removed' e 'bytes_freed' (pacotes aposentados removidos)
+        """
+        with self._write_lock():
+            with closing(connect_sqlite(self.db_path)) as conn:
+                referenced = set()
+                for row in conn.execute('SELECT sections FROM documents'):
+                    referenced.update(json.loads(row['sections']))
+                
+                old_pack = conn.execute("SELECT value FROM settings WHERE key = 'pack'").fetchone()['value']
+                new_pack = f"pack-{int(old_pack[5:9]) + 1:04d}.dat"
+                old_packs = {row['pack'] for row in conn.execute('SELECT DISTINCT pack FROM blobs')} | {old_pack}
+                
+                conn.execute('BEGIN IMMEDIATE')
+                removed = 0
+                with open(os.path.join(self.root, new_pack), 'wb') as pack_file:
+                    for blob in conn.execute('SELECT * FROM blobs').fetchall():
+                        if blob['hash'] not in referenced:
+                            conn.execute('DELETE FROM blobs WHERE hash = ?', (blob['hash'],))
+                            removed += 1
+                            continue
+                        view = self._map(blob['pack'], blob['offset'] + blob['length'])
+                        offset = pack_file.tell()
+                        pack_file.write(view[blob['offset']:blob['offset'] + blob['length']])
+                        conn.execute('UPDATE blobs SET pack = ?, offset = ? WHERE hash = ?', (new_pack, offset, blob['hash']))
+                    pack_file.flush()
+                    os.fsync(pack_file.fileno())
+                conn.execute("UPDATE settings SET value = ? WHERE key = 'pack'", (new_pack,))
+                conn.executemany(
+                    'INSERT OR REPLACE INTO retired_packs (pack, retired_at) VALUES (?, ?)',
+                    [(pack, time.time()) for pack in old_packs]
+                )
+                conn.execute('COMMIT')
+            
+            with self._maps_lock:
+                for pack in old_packs:
+                    self._maps.pop(pack, None)
+            
+            freed = self._purge_locked()
+        
+        return {'blobs_removed': removed, 'bytes_freed': freed}
+    
+    def purge_packs(self) -> int:
+        """
+        Remove os pacotes aposentados há mais de PACK_GRACE_SECONDS
+        
+        Returns:
+            Bytes liberados
+        """
+        with self._write_lock():
+            return self._purge_locked()
+    
+    def _purge_locked(self) -> int:
+        """Remove os pacotes aposentados após a carência (com a trava de escrita já obtida)"""
+        freed = 0
+        with closing(connect_sqlite(self.db_path)) as conn:
+            rows = conn.execute(
+                'SELECT pack FROM retired_packs WHERE retired_at <= ?', (time.time() - PACK_GRACE_SECONDS,)
+            ).fetchall()
+            for row in rows:
+                path = os.path.join(self.root, row['pack'])
+                with self._maps_lock:
+                    self._maps.pop(row['pack'], None)
+                if os.path.exists(path):
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+                conn.execute('DELETE FROM retired_packs WHERE pack = ?', (row['pack'],))
+        return freed
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna o tamanho do conteúdo guardado
+        
+        Returns:
+            Dicionário com documentos, blobs, bytes originais (com e sem deduplicação),
+            bytes em disco e a razão de compressão
+        """
+        with closing(connect_sqlite(self.db_path)) as conn:
+            documents = conn.execute('SELECT sections FROM documents').fetchall()
+            sizes = {row['hash']: row['raw_length'] for row in conn.execute('SELECT hash, raw_length FROM blobs')}
+            unique_raw, stored, blob_count = conn.execute(
+                'SELECT COALESCE(SUM(raw_length), 0), COALESCE(SUM(length), 0), COUNT(*) FROM blobs'
+            ).fetchone()
+            dictionaries = conn.execute('SELECT COALESCE(SUM(LENGTH(data)), 0) FROM dictionaries').fetchone()[0]
+        
+        logical = sum(sizes.get(digest, 0) for row in documents for digest in json.loads(row['sections']))
+        return {
+            'codec': self.codec,
+            'documents': len(documents),
+            'blobs': blob_count,
+            'raw_bytes': logical,
+            'unique_raw_bytes': unique_raw,
+            'stored_bytes': stored + dictionaries,
+            'ratio': round((stored + dictionaries) / logical, 4) if logical else None,
+        }
+
+def _benchmark(documents: int) -> None:
+    """Guarda documentos simulados e compara o tamanho em disco com o texto original"""
+    import tempfile
+    from ai_models import SimulatedModel
+    from document_templates import TemplateFactory
+    from token_budget import TokenBudget
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = ContentStore(tmp_dir)
+        template = TemplateFactory.create_template('ebook', 'pt-BR')
+        started = time.perf_counter()
+        for number in range(documents):
+            plan = TokenBudget.plan(template, f"Documento {number}", 'desempenho', 20, 'simulated')
+            model = SimulatedModel(seed=number)
+            content = '\n\n'.join(model.generate_content(call['prompt'], call['max_tokens']) for call in plan.calls)
+            store.put_document(str(number), list(ContentValidator.iter_enhanced_sections(content, 'ebook', 'pt-BR')))
+        elapsed = time.perf_counter() - started
+        
+        stats = store.stats()
+        print(f"{stats['documents']} documentos ({stats['codec']}) em {elapsed:.1f} s: "
+              f"{stats['raw_bytes'] / 1024:.0f} KB de Markdown, {stats['stored_bytes'] / 1024:.0f} KB em disco "
+              f"({stats['ratio'] * 100:.1f}%)")
+        
+        started = time.perf_counter()
+        for number in range(documents):
+            store.get_document(str(number))
+        print(f"Leitura: {(time.perf_counter() - started) / documents * 1000:.2f} ms por documento")
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else '--stats'
+    if command == '--benchmark':
+        _benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 200)
+    elif command == '--train':
+        print(ContentStore().train_dictionary())
+    elif command == '--compact':
+        print(ContentStore().compact())
+    elif command == '--purge':
+        print(ContentStore().purge_packs())
+    else:
+        print(ContentStore().stats())
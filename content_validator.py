@@ -3,11 +3,95 @@ Serviço para validação e melhoria de conteúdo gerado
 """
 
 import re
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple, Iterable, Iterator, Union
+
+from enhancement_rules import FENCE_PATTERN, RuleSet, get_rule_set
 
 class ContentValidator:
     """Classe para validação e melhoria de conteúdo gerado"""
     
+    @staticmethod
+    def iter_sections(source: Union[str, Iterable[str]]) -> Iterator[str]:
+        """
+        Divide o conteúdo em seções, cada uma iniciando em uma linha de cabeçalho
+        
+        Apenas uma seção é mantida em memória por vez. Linhas dentro de blocos
+        de código cercados nunca iniciam uma nova seção.
+        
+        Args:
+            source: Conteúdo Markdown completo ou iterável de fragmentos de texto
+            
+        Returns:
+            Gerador de seções em formato Markdown
+        """
+        section_lines = []
+        in_fence = False
+        
+        for line in ContentValidator._iter_lines(source):
+            if FENCE_PATTERN.match(line):
+                in_fence = not in_fence
+            elif not in_fence and line.startswith('#') and section_lines:
+                yield ''.join(section_lines)
+                section_lines = []
+            section_lines.append(line)
+        
+        if section_lines:
+            yield ''.join(section_lines)
+    
+    @staticmethod
+    def _iter_lines(source: Union[str, Iterable[str]]) -> Iterator[str]:
+        """Percorre as linhas do conteúdo (com a quebra de linha) sem criar uma lista com todas elas"""
+        if isinstance(source, str):
+            for match in re.finditer(r'[^\n]*\n|[^\n]+$', source):
+                yield match.group(0)
+            return
+        
+        pending = ''
+        for chunk in source:
+            pending += chunk
+            start = 0
+            newline = pending.find('\n')
+            while newline != -1:
+                yield pending[start:newline + 1]
+                start = newline + 1
+                newline = pending.find('\n', start)
+            pending = pending[start:]
+        
+        if pending:
+            yield pending
+    
+    @staticmethod
+    def enhance_section(section: str, rule_set: Optional[RuleSet] = None) -> str:
+        """
+        Melhora uma única seção do conteúdo
+        
+        Args:
+            section: Seção em formato Markdown (iniciando no cabeçalho)
+            rule_set: Regras de melhoria (padrão: regras base, ver enhancement_rules)
+            
+        Returns:
+            Seção melhorada, terminando com exatamente uma linha em branco
+        """
+        return (rule_set or get_rule_set()).apply(section)
+    
+    @staticmethod
+    def iter_enhanced_sections(source: Union[str, Iterable[str]], doc_type: str, language: str) -> Iterator[str]:
+        """
+        Divide e melhora o conteúdo seção a seção
+        
+        Args:
+            source: Conteúdo Markdown completo ou iterável de fragmentos de texto
+            doc_type: Tipo de documento ('ebook', 'guia_pratico', 'dicas', 'documento_oficial')
+            language: Idioma do conteúdo ('pt-BR' ou 'en-US')
+            
+        Returns:
+            Gerador de seções melhoradas
+        """
+        rule_set = get_rule_set(doc_type, language)
+        for section in ContentValidator.iter_sections(source):
+            if section.strip():
+                yield rule_set.apply(section)
+    
     @staticmethod
     def validate_content(content: str, doc_type: str, language: str) -> Tuple[bool, List[str]]:
         """
@@ -18,136 +102,200 @@ class ContentValidator:
             doc_type: Tipo de documento ('ebook', 'guia_pratico', 'dicas', 'documento_oficial')
             language: Idioma do conteúdo ('pt-BR' ou 'en-US')
             
+        Returns:
+            Tupla com (is_valid, list_of_issues)
+        """
+        validator = StreamingValidator(doc_type, language)
+        for section in ContentValidator.iter_sections(content or ''):
+            validator.feed(section)
+        return validator.result()
+    
+    @staticmethod
+    def enhance_content(content: str, doc_type: str, language: str) -> str:
+        """
+        Melhora o conteúdo gerado para garantir qualidade
+        
+        Args:
+            content: Conteúdo gerado em formato Markdown
+            doc_type: Tipo de documento ('ebook', 'guia_pratico', 'dicas', 'documento_oficial')
+            language: Idioma do conteúdo ('pt-BR' ou 'en-US')
+            
+        Returns:
+            Conteúdo melhorado
+        """
+        return ''.join(ContentValidator.iter_enhanced_sections(content, doc_type, language))
+    
+    @staticmethod
+    def get_quality_score(content: str, doc_type: str, language: str) -> float:
+        """
+        Calcula uma pontuação de qualidade para o conteúdo gerado
+        
+        Args:
+            content: Conteúdo gerado em formato Markdown
+            doc_type: Tipo de documento ('ebook', 'guia_pratico', 'dicas', 'documento_oficial')
+            language: Idioma do conteúdo ('pt-BR' ou 'en-US')
+            
+        Returns:
+            Pontuação de qualidade (0.0 a 1.0)
+        """
+        validator = StreamingValidator(doc_type, language)
+        for section in ContentValidator.iter_sections(content or ''):
+            validator.feed(section)
+        return validator.get_quality_score()
+
+class StreamingValidator:
+    """Acumula o estado da validação seção a seção, sem manter o documento inteiro"""
+    
+    def __init__(self, doc_type: str, language: str):
+        self.doc_type = doc_type
+        self.language = language
+        self.total_length = 0
+        self.headers_count = 0
+        self.has_intro = False
+        self.has_conclusion = False
+        self.has_link_marker = False
+        self.has_valid_link = False
+        self.has_empty_paragraphs = False
+        self.short_sections = []
+        # Espaços no final da seção anterior, para detectar parágrafos vazios entre seções
+        self._previous_tail = ''
+        
+        if language == 'pt-BR':
+            self._intro_pattern = re.compile(r'#\s+Introdução', re.IGNORECASE)
+            self._conclusion_pattern = re.compile(r'#\s+Conclusão', re.IGNORECASE)
+        else:  # en-US
+            self._intro_pattern = re.compile(r'#\s+Introduction', re.IGNORECASE)
+            self._conclusion_pattern = re.compile(r'#\s+Conclusion', re.IGNORECASE)
+    
+    def feed(self, section: str) -> None:
+        """
+        Registra uma seção no estado da validação
+        
+        Args:
+            section: Seção em formato Markdown
+        """
+        self.total_length += len(section)
+        self.headers_count += len(re.findall(r'#\s+\w+', section))
+        
+        if self.doc_type == 'ebook':
+            self.has_intro = self.has_intro or bool(self._intro_pattern.search(section))
+            self.has_conclusion = self.has_conclusion or bool(self._conclusion_pattern.search(section))
+        
+        if '](http' in section:
+            self.has_link_marker = True
+        if not self.has_valid_link and re.search(r'\[.+?\]\(http', section):
+            self.has_valid_link = True
+        
+        if re.search(r'\n\s*\n\s*\n\s*\n', self._previous_tail + section):
+            self.has_empty_paragraphs = True
+        self._previous_tail = section[len(section.rstrip()):]
+        
+        # Verificar se há conteúdo suficiente na seção
+        if section.startswith('#'):
+            lines = section.split('\n', 1)
+            section_title = lines[0].lstrip('#').strip()
+            section_content = lines[1].strip() if len(lines) > 1 else ''
+            
+            if len(section_content) < 200:  # Seção muito curta
+                self.short_sections.append(section_title)
+    
+    def observe(self, sections: Iterable[str]) -> Iterator[str]:
+        """
+        Repassa as seções adiante, registrando cada uma na validação
+        
+        Args:
+            sections: Iterável de seções em formato Markdown
+            
+        Returns:
+            Gerador com as mesmas seções
+        """
+        for section in sections:
+            self.feed(section)
+            yield section
+    
+    def result(self) -> Tuple[bool, List[str]]:
+        """
+        Retorna o resultado da validação das seções registradas
+        
         Returns:
             Tupla com (is_valid, list_of_issues)
         """
         issues = []
         
         # Verificar se o conteúdo está vazio
-        if not content or len(content) < 100:
+        if self.total_length < 100:
             issues.append("Conteúdo muito curto ou vazio")
             return False, issues
         
         # Verificar estrutura básica (cabeçalhos)
-        if not re.search(r'#\s+\w+', content):
+        if self.headers_count == 0:
             issues.append("Faltam cabeçalhos no documento")
         
         # Verificar seções específicas por tipo de documento
-        if doc_type == 'ebook':
-            if language == 'pt-BR':
-                if not re.search(r'#\s+Introdução', content, re.IGNORECASE) and not re.search(r'#\s+Introdução', content):
+        if self.doc_type == 'ebook':
+            if self.language == 'pt-BR':
+                if not self.has_intro:
                     issues.append("Falta seção de Introdução")
-                if not re.search(r'#\s+Conclusão', content, re.IGNORECASE) and not re.search(r'#\s+Conclusão', content):
+                if not self.has_conclusion:
                     issues.append("Falta seção de Conclusão")
             else:  # en-US
-                if not re.search(r'#\s+Introduction', content, re.IGNORECASE):
+                if not self.has_intro:
                     issues.append("Missing Introduction section")
-                if not re.search(r'#\s+Conclusion', content, re.IGNORECASE):
+                if not self.has_conclusion:
                     issues.append("Missing Conclusion section")
         
         # Verificar comprimento mínimo
         min_length = 3000  # Aproximadamente 1 página
-        if len(content) < min_length:
-            issues.append(f"Conteúdo muito curto ({len(content)} caracteres, mínimo {min_length})")
+        if self.total_length < min_length:
+            issues.append(f"Conteúdo muito curto ({self.total_length} caracteres, mínimo {min_length})")
         
         # Verificar erros comuns de formatação Markdown
-        if '](http' in content and not re.search(r'\[.+?\]\(http', content):
+        if self.has_link_marker and not self.has_valid_link:
             issues.append("Links Markdown mal formatados")
         
         # Verificar parágrafos vazios consecutivos
-        if re.search(r'\n\s*\n\s*\n\s*\n', content):
+        if self.has_empty_paragraphs:
             issues.append("Múltiplos parágrafos vazios consecutivos")
         
-        # Verificar se há conteúdo suficiente em cada seção
-        sections = re.split(r'#\s+', content)
-        for section in sections[1:]:  # Ignorar o que vem antes do primeiro #
-            section_title = section.split('\n')[0].strip()
-            section_content = '\n'.join(section.split('\n')[1:]).strip()
-            
-            if len(section_content) < 200:  # Seção muito curta
-                issues.append(f"Seção '{section_title}' tem conteúdo insuficiente")
+        for section_title in self.short_sections:
+            issues.append(f"Seção '{section_title}' tem conteúdo insuficiente")
         
         return len(issues) == 0, issues
     
-    @staticmethod
-    def enhance_content(content: str, doc_type: str, language: str) -> str:
-        """
-        Melhora o conteúdo gerado para garantir qualidade
-        
-        Args:
-            content: Conteúdo gerado em formato Markdown
-            doc_type: Tipo de documento ('ebook', 'guia_pratico', 'dicas', 'documento_oficial')
-            language: Idioma do conteúdo ('pt-BR' ou 'en-US')
-            
-        Returns:
-            Conteúdo melhorado
-        """
-        enhanced_content = content
-        
-        # Corrigir formatação de cabeçalhos
-        enhanced_content = re.sub(r'#(\w+)', r'# \1', enhanced_content)
-        
-        # Garantir espaçamento adequado após cabeçalhos
-        enhanced_content = re.sub(r'(#+ .+)\n([^#\n])', r'\1\n\n\2', enhanced_content)
-        
-        # Corrigir links Markdown mal formatados
-        enhanced_content = re.sub(r'\[([^\]]+)\] \(([^)]+)\)', r'[\1](\2)', enhanced_content)
-        
-        # Remover múltiplos parágrafos vazios consecutivos
-        enhanced_content = re.sub(r'\n\s*\n\s*\n', r'\n\n', enhanced_content)
-        
-        # Garantir que haja uma linha em branco antes de cada cabeçalho (exceto o primeiro)
-        enhanced_content = re.sub(r'([^\n])\n(#+\s+)', r'\1\n\n\2', enhanced_content)
-        
-        return enhanced_content
-    
-    @staticmethod
-    def get_quality_score(content: str, doc_type: str, language: str) -> float:
+    def get_quality_score(self) -> float:
         """
-        Calcula uma pontuação de qualidade para o conteúdo gerado
+        Calcula a pontuação de qualidade das seções registradas
         
-        Args:
-            content: Conteúdo gerado em formato Markdown
-            doc_type: Tipo de documento ('ebook', 'guia_pratico', 'dicas', 'documento_oficial')
-            language: Idioma do conteúdo ('pt-BR' ou 'en-US')
-            
         Returns:
             Pontuação de qualidade (0.0 a 1.0)
         """
         score = 1.0
         
         # Verificar se o conteúdo está vazio
-        if not content or len(content) < 100:
+        if self.total_length < 100:
             return 0.0
         
         # Penalizar por falta de cabeçalhos
-        headers_count = len(re.findall(r'#\s+\w+', content))
-        if headers_count < 3:
+        if self.headers_count < 3:
             score -= 0.2
         
         # Penalizar por conteúdo curto
-        if len(content) < 3000:
+        if self.total_length < 3000:
             score -= 0.1
         
         # Penalizar por falta de seções específicas
-        if doc_type == 'ebook':
-            if language == 'pt-BR':
-                if not re.search(r'#\s+Introdução', content, re.IGNORECASE) and not re.search(r'#\s+Introdução', content):
-                    score -= 0.1
-                if not re.search(r'#\s+Conclusão', content, re.IGNORECASE) and not re.search(r'#\s+Conclusão', content):
-                    score -= 0.1
-            else:  # en-US
-                if not re.search(r'#\s+Introduction', content, re.IGNORECASE):
-                    score -= 0.1
-                if not re.search(r'#\s+Conclusion', content, re.IGNORECASE):
-                    score -= 0.1
+        if self.doc_type == 'ebook':
+            if not self.has_intro:
+                score -= 0.1
+            if not self.has_conclusion:
+                score -= 0.1
         
         # Penalizar por erros de formatação Markdown
-        if '](http' in content and not re.search(r'\[.+?\]\(http', content):
+        if self.has_link_marker and not self.has_valid_link:
             score -= 0.05
         
         # Penalizar por parágrafos vazios consecutivos
-        if re.search(r'\n\s*\n\s*\n\s*\n', content):
+        if self.has_empty_paragraphs:
             score -= 0.05
         
         # Garantir que a pontuação esteja entre 0.0 e 1.0
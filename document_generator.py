@@ -3,58 +3,76 @@ Integração da validação de conteúdo com a geração de PDF
 """
 
 import os
-from content_validator import ContentValidator
+from content_validator import ContentValidator, StreamingValidator
 from pdf_generator import PdfGenerator
+from preview_generator import PreviewGenerator
+from storage import temp_path
 from typing import Dict, Any, Tuple, Optional
 
+# Prefixo das mensagens de falha na renderização (erros transitórios, ao contrário das falhas de validação)
+RENDER_ERROR_PREFIX = "Erro ao gerar PDF"
+
 class DocumentGenerator:
     """Classe para geração e validação de documentos"""
     
     @staticmethod
-    def generate_document(content: str, doc_type: str, language: str, title: str, output_path: str) -> Tuple[bool, str, Optional[str]]:
+    def generate_document(content, doc_type: str, language: str, title: str, output_path: str, quality: str = 'high') -> Tuple[bool, str, Optional[str]]:
         """
-        Valida o conteúdo, melhora se necessário e gera o PDF
+        Melhora e valida o conteúdo seção a seção e gera o PDF
+        
+        O documento nunca é copiado por inteiro: cada seção é melhorada,
+        validada e convertida para HTML em disco antes da próxima ser lida.
         
         Args:
-            content: Conteúdo gerado em formato Markdown
+            content: Conteúdo gerado em formato Markdown ou iterável de fragmentos de texto
             doc_type: Tipo de documento ('ebook', 'guia_pratico', 'dicas', 'documento_oficial')
             language: Idioma do conteúdo ('pt-BR' ou 'en-US')
             title: Título do documento
             output_path: Caminho para salvar o arquivo PDF
+            quality: Nível de qualidade ('draft', 'standard', 'high', 'premium'), define o estilo e a otimização do PDF
             
         Returns:
             Tupla com (success, message, pdf_path)
         """
-        # Validar conteúdo
-        is_valid, issues = ContentValidator.validate_content(content, doc_type, language)
+        html_path = temp_path(output_path + '.html')
         
-        # Se houver problemas, melhorar o conteúdo
-        if not is_valid:
-            content = ContentValidator.enhance_content(content, doc_type, language)
-            
-            # Verificar novamente após melhorias
-            is_valid, issues = ContentValidator.validate_content(content, doc_type, language)
+        try:
+            # Melhorar, validar e converter para HTML em uma única passada, seção a seção
+            # (sem CSS embutido: o renderizador aplica as folhas de estilos já analisadas)
+            validator = StreamingValidator(doc_type, language)
+            sections = ContentValidator.iter_enhanced_sections(content, doc_type, language)
+            PdfGenerator.write_html(validator.observe(sections), html_path, quality, embed_styles=False)
             
             # Se ainda houver problemas graves, retornar erro
+            is_valid, issues = validator.result()
             if not is_valid and any(issue.startswith("Falta seção") for issue in issues):
                 return False, f"Falha na geração do documento: {', '.join(issues)}", None
-        
-        # Calcular pontuação de qualidade
-        quality_score = ContentValidator.get_quality_score(content, doc_type, language)
-        
-        # Se a qualidade for muito baixa, retornar erro
-        if quality_score < 0.5:
-            return False, f"Qualidade do conteúdo muito baixa (pontuação: {quality_score:.2f})", None
-        
-        try:
+            
+            # Calcular pontuação de qualidade
+            quality_score = validator.get_quality_score()
+            
+            # Se a qualidade for muito baixa, retornar erro
+            if quality_score < 0.5:
+                return False, f"Qualidade do conteúdo muito baixa (pontuação: {quality_score:.2f})", None
+            
             # Gerar PDF
-            pdf_path = PdfGenerator.generate_pdf(content, output_path)
+            pdf_path = PdfGenerator.render_html_file(html_path, output_path, quality, external_styles=True)
             
             # Verificar se o arquivo foi criado
             if not os.path.exists(pdf_path):
                 return False, "Falha ao criar arquivo PDF", None
             
+            # Gerar a miniatura da primeira página (uma falha aqui não impede a entrega do PDF)
+            try:
+                PreviewGenerator.generate(pdf_path)
+            except Exception as e:
+                print(f"Erro ao gerar miniatura: {str(e)}")
+            
             return True, "Documento gerado com sucesso", pdf_path
         
         except Exception as e:
-            return False, f"Erro ao gerar PDF: {str(e)}", None
+            return False, f"{RENDER_ERROR_PREFIX}: {str(e)}", None
+        
+        finally:
+            if os.path.exists(html_path):
+                os.remove(html_path)
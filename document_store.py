@@ -0,0 +1,222 @@
+"""
+Armazenamento persistente dos documentos e do uso por tenant (SQLite)
+
+Substitui a lista em memória da API: os documentos sobrevivem a reinícios e
+são compartilhados entre os processos da API e os workers de renderização,
+desde que todos apontem para o mesmo arquivo (DOCUMENT_STORE_PATH).
+"""
+
+import json
+import os
+import time
+from contextlib import closing
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from storage import connect_sqlite
+
+# Contadores de uso acumulados por tenant
+USAGE_COUNTERS = ('documents', 'prompt_tokens', 'output_tokens', 'cached_tokens', 'llm_calls', 'render_seconds', 'bytes_stored')
+
+class DocumentStore:
+    """Documentos gerados e contadores de uso por tenant"""
+    
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        
+        with closing(connect_sqlite(self.db_path)) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS documents (
+                    id TEXT PRIMARY KEY,
+                    tenant TEXT NOT NULL,
+                    job_id TEXT,
+                    data TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_documents_tenant ON documents (tenant, created_at)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_documents_job ON documents (job_id)')
+            # Documentos idênticos compartilham o PDF (chave endereçada pelo conteúdo)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_file ON documents (json_extract(data, '$.file_path'))")
+            conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS tenant_usage (
+                    tenant TEXT PRIMARY KEY,
+                    {', '.join(f'{name} REAL NOT NULL DEFAULT 0' for name in USAGE_COUNTERS)},
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            
+            # Bancos criados antes de algum dos contadores
+            columns = [row['name'] for row in conn.execute('PRAGMA table_info(tenant_usage)')]
+            for name in USAGE_COUNTERS:
+                if name not in columns:
+                    conn.execute(f'ALTER TABLE tenant_usage ADD COLUMN {name} REAL NOT NULL DEFAULT 0')
+    
+    def add_document(self, doc_info: Dict[str, Any], tenant: str) -> None:
+        """
+        Registra um documento
+        
+        Args:
+            doc_info: Informações do documento (com 'id' e, no modo fila, 'job_id')
+            tenant: Tenant dono do documento
+        """
+        doc_info = dict(doc_info, tenant=tenant)
+        with closing(connect_sqlite(self.db_path)) as conn:
+            conn.execute(
+                'INSERT INTO documents (id, tenant, job_id, data, created_at) VALUES (?, ?, ?, ?, ?)',
+                (doc_info['id'], tenant, doc_info.get('job_id'), json.dumps(doc_info), time.time())
+            )
+    
+    def update_document(self, doc_id: str, **fields) -> Optional[Dict[str, Any]]:
+        """
+        Atualiza campos de um documento
+        
+        Args:
+            doc_id: Identificador do documento
+            fields: Campos a atualizar (ex.: status='done')
+        
+        Returns:
+            Documento atualizado ou None se não existir
+        """
+        with closing(connect_sqlite(self.db_path)) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT data FROM documents WHERE id = ?', (doc_id,)).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            
+            doc = dict(json.loads(row['data']), **fields)
+            conn.execute('UPDATE documents SET data = ? WHERE id = ?', (json.dumps(doc), doc_id))
+            conn.execute('COMMIT')
+            return doc
+    
+    def get_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Retorna um documento pelo identificador"""
+        with closing(connect_sqlite(self.db_path)) as conn:
+            row = conn.execute('SELECT data FROM documents WHERE id = ?', (doc_id,)).fetchone()
+        return json.loads(row['data']) if row else None
+    
+    def find_by_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Retorna o documento de um job de renderização"""
+        with closing(connect_sqlite(self.db_path)) as conn:
+            row = conn.execute('SELECT data FROM documents WHERE job_id = ?', (job_id,)).fetchone()
+        return json.loads(row['data']) if row else None
+    
+    def list_documents(self, tenant: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Lista os documentos em ordem de criação
+        
+        Args:
+            tenant: Se informado, apenas os documentos deste tenant
+        
+        Returns:
+            Lista de documentos
+        """
+        with closing(connect_sqlite(self.db_path)) as conn:
+            if tenant is None:
+                rows = conn.execute('SELECT data FROM documents ORDER BY created_at').fetchall()
+            else:
+                rows = conn.execute(
+                    'SELECT data FROM documents WHERE tenant = ? ORDER BY created_at', (tenant,)
+                ).fetchall()
+        return [json.loads(row['data']) for row in rows]
+    
+    def iter_documents(self, batch_size: int = 500) -> Iterator[Tuple[Dict[str, Any], float]]:
+        """
+        Percorre todos os documentos em lotes, sem carregar a tabela inteira
+        
+        Args:
+            batch_size: Documentos lidos por consulta
+        
+        Returns:
+            Gerador de tuplas (documento, created_at em segundos desde a época)
+        """
+        last_rowid = 0
+        while True:
+            with closing(connect_sqlite(self.db_path)) as conn:
+                rows = conn.execute(
+                    'SELECT rowid, data, created_at FROM documents WHERE rowid > ? ORDER BY rowid LIMIT ?',
+                    (last_rowid, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield json.loads(row['data']), row['created_at']
+            last_rowid = rows[-1]['rowid']
+    
+    def delete_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Remove um documento
+        
+        Args:
+            doc_id: Identificador do documento
+        
+        Returns:
+            Documento removido ou None se não existir
+        """
+        with closing(connect_sqlite(self.db_path)) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT data FROM documents WHERE id = ?', (doc_id,)).fetchone()
+            if row is not None:
+                conn.execute('DELETE FROM documents WHERE id = ?', (doc_id,))
+            conn.execute('COMMIT')
+        return json.loads(row['data']) if row else None
+    
+    def is_file_referenced(self, file_path: str) -> bool:
+        """
+        Indica se algum documento ainda usa um arquivo
+        
+        Args:
+            file_path: Chave de armazenamento do PDF
+        
+        Returns:
+            True se o arquivo não pode ser excluído
+        """
+        with closing(connect_sqlite(self.db_path)) as conn:
+            row = conn.execute(
+                "SELECT 1 FROM documents WHERE json_extract(data, '$.file_path') = ? LIMIT 1", (file_path,)
+            ).fetchone()
+        return row is not None
+    
+    def record_usage(self, tenant: str, **deltas) -> None:
+        """
+        Soma valores aos contadores de uso de um tenant
+        
+        Args:
+            tenant: Tenant
+            deltas: Incrementos por contador (ex.: prompt_tokens=1200, render_seconds=3.5)
+        """
+        unknown = set(deltas) - set(USAGE_COUNTERS)
+        if unknown:
+            raise ValueError(f"Contadores de uso desconhecidos: {', '.join(sorted(unknown))}")
+        if not deltas:
+            return
+        
+        names = list(deltas)
+        with closing(connect_sqlite(self.db_path)) as conn:
+            conn.execute(
+                f"INSERT INTO tenant_usage (tenant, {', '.join(names)}, updated_at) "
+                f"VALUES (?, {', '.join('?' for _ in names)}, ?) "
+                f"ON CONFLICT(tenant) DO UPDATE SET "
+                f"{', '.join(f'{name} = {name} + excluded.{name}' for name in names)}, "
+                f"updated_at = excluded.updated_at",
+                [tenant] + [deltas[name] for name in names] + [time.time()]
+            )
+    
+    def get_usage(self, tenant: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Retorna os contadores de uso
+        
+        Args:
+            tenant: Se informado, apenas o uso deste tenant
+        
+        Returns:
+            Lista com os contadores de cada tenant
+        """
+        with closing(connect_sqlite(self.db_path)) as conn:
+            if tenant is None:
+                rows = conn.execute('SELECT * FROM tenant_usage ORDER BY tenant').fetchall()
+            else:
+                rows = conn.execute('SELECT * FROM tenant_usage WHERE tenant = ?', (tenant,)).fetchall()
+        return [dict(row) for row in rows]
@@ -2,9 +2,11 @@
 Templates para diferentes tipos de documentos
 """
 
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 from abc import ABC, abstractmethod
 
+from prompt_cache import CacheablePrompt, extend_prompt
+
 class DocumentTemplate(ABC):
     """Classe base para templates de documentos"""
     
@@ -15,29 +17,262 @@ class DocumentTemplate(ABC):
         """
         Retorna o prompt completo para o tipo de documento
         
+        As instruções do tipo de documento vêm antes do título e do tema, para
+        que o prefixo do prompt seja o mesmo em todos os documentos do tipo e
+        possa ser reaproveitado pelo cache de prompts do provedor.
+        
         Args:
             title: Título do documento
             theme: Tema do documento
             page_count: Número de páginas (20 ou 50)
             
         Returns:
-            Prompt completo para enviar à IA
+            Prompt completo para enviar à IA (CacheablePrompt)
         """
         if self.language.lower() == "pt-br":
-            return self._get_prompt_pt(title, theme, page_count)
+            instructions = self._get_instructions_pt(page_count)
+            details = f"""
+Dados do documento:
+Título: "{title}"
+Tema: "{theme}"
+"""
         else:
-            return self._get_prompt_en(title, theme, page_count)
+            instructions = self._get_instructions_en(page_count)
+            details = f"""
+Document details:
+Title: "{title}"
+Theme: "{theme}"
+"""
+        return CacheablePrompt(instructions, details)
     
     @abstractmethod
-    def _get_prompt_pt(self, title: str, theme: str, page_count: int) -> str:
-        """Implementação do prompt em português"""
+    def _get_instructions_pt(self, page_count: int) -> str:
+        """Instruções do tipo de documento em português (sem título e tema)"""
         pass
     
     @abstractmethod
-    def _get_prompt_en(self, title: str, theme: str, page_count: int) -> str:
-        """Implementação do prompt em inglês"""
+    def _get_instructions_en(self, page_count: int) -> str:
+        """Instruções do tipo de documento em inglês (sem título e tema)"""
         pass
     
+    def get_expected_words(self, page_count: int) -> int:
+        """
+        Retorna o total de palavras pedido no prompt
+        
+        Args:
+            page_count: Número de páginas (20 ou 50)
+            
+        Returns:
+            Número aproximado de palavras do documento completo
+        """
+        return page_count * 500
+    
+    def get_structure(self, page_count: int) -> List[Dict[str, Any]]:
+        """
+        Retorna as partes do documento com o número de palavras esperado em cada uma
+        
+        Os pesos de cada parte vêm do prompt e são escalados para somar o total
+        pedido em get_expected_words.
+        
+        Args:
+            page_count: Número de páginas (20 ou 50)
+            
+        Returns:
+            Lista de dicionários com 'title' e 'words'
+        """
+        parts = self._get_parts(page_count)
+        total_weight = sum(words for _, _, words in parts) or 1
+        scale = self.get_expected_words(page_count) / total_weight
+        use_pt = self.language.lower() == "pt-br"
+        
+        return [
+            {'title': title_pt if use_pt else title_en, 'words': int(round(words * scale))}
+            for title_pt, title_en, words in parts
+        ]
+    
+    def get_part_prompt(self, title: str, theme: str, page_count: int, parts: List[str], call_index: int, call_count: int) -> str:
+        """
+        Retorna o prompt para gerar apenas algumas partes do documento
+        
+        Usado quando o documento completo não cabe no limite de saída do modelo
+        e precisa ser gerado em várias chamadas.
+        
+        Args:
+            title: Título do documento
+            theme: Tema do documento
+            page_count: Número de páginas (20 ou 50)
+            parts: Títulos das partes a gerar nesta chamada
+            call_index: Índice da chamada (começando em 0)
+            call_count: Número total de chamadas
+            
+        Returns:
+            Prompt completo para enviar à IA (CacheablePrompt)
+        """
+        prompt = self.get_prompt(title, theme, page_count)
+        part_list = '\n'.join(f"- {part}" for part in parts)
+        
+        if self.language.lower() == "pt-br":
+            instructions = f"""
+IMPORTANTE: o documento será gerado em {call_count} etapas. Esta é a etapa {call_index + 1} de {call_count}.
+Escreva SOMENTE as seguintes partes, completas e no tamanho indicado acima:
+{part_list}
+"""
+            if call_index > 0:
+                instructions += "Não repita o título, a capa, o sumário nem partes anteriores; comece diretamente pela primeira parte da lista.\n"
+        else:
+            instructions = f"""
+IMPORTANT: the document will be generated in {call_count} steps. This is step {call_index + 1} of {call_count}.
+Write ONLY the following parts, complete and with the length indicated above:
+{part_list}
+"""
+            if call_index > 0:
+                instructions += "Do not repeat the title, cover, table of contents or previous parts; start directly with the first part in the list.\n"
+        
+        return extend_prompt(prompt, instructions)
+    
+    def get_continuation_prompt(self, prompt: str, written_headings: List[str], tail: str, resume_heading: Optional[str] = None) -> str:
+        """
+        Retorna o prompt para continuar uma resposta cortada pelo limite de tokens
+        
+        Args:
+            prompt: Prompt original da chamada
+            written_headings: Títulos das seções já escritas por completo
+            tail: Final do texto já escrito, para dar contexto à continuação
+            resume_heading: Título da seção a reescrever do início (None para
+                continuar exatamente do ponto em que o texto parou)
+        
+        Returns:
+            Prompt completo para enviar à IA
+        """
+        heading_list = '\n'.join(f"- {heading}" for heading in written_headings) or '-'
+        
+        if self.language.lower() == "pt-br":
+            instructions = f"""
+A resposta anterior foi interrompida pelo limite de tamanho. As seguintes seções já foram escritas por completo e NÃO devem ser repetidas:
+{heading_list}
+
+Final do texto já escrito:
+\"\"\"
+{tail}
+\"\"\"
+"""
+            if resume_heading:
+                instructions += f"Continue o documento começando pela seção \"{resume_heading}\" (inclua o título da seção) e siga até o fim das partes pedidas.\n"
+            else:
+                instructions += "Continue o texto exatamente do ponto em que parou, sem repetir o trecho acima, e siga até o fim das partes pedidas.\n"
+        else:
+            instructions = f"""
+The previous answer was cut off by the length limit. The following sections have already been fully written and must NOT be repeated:
+{heading_list}
+
+End of the text written so far:
+\"\"\"
+{tail}
+\"\"\"
+"""
+            if resume_heading:
+                instructions += f"Continue the document starting with the section \"{resume_heading}\" (include the section heading) and go on until the end of the requested parts.\n"
+            else:
+                instructions += "Continue the text exactly where it stopped, without repeating the excerpt above, and go on until the end of the requested parts.\n"
+        
+        return extend_prompt(prompt, instructions)
+    
+    def get_revision_prompt(self, prompt: str, issues: List[str]) -> str:
+        """
+        Retorna o prompt para reescrever uma chamada com problemas apontados pela validação
+        
+        Args:
+            prompt: Prompt original da chamada
+            issues: Problemas encontrados pelo validador
+        
+        Returns:
+            Prompt completo para enviar à IA
+        """
+        issue_list = '\n'.join(f"- {issue}" for issue in issues) or '-'
+        
+        if self.language.lower() == "pt-br":
+            instructions = f"""
+Uma versão anterior deste texto foi reprovada na revisão pelos seguintes problemas:
+{issue_list}
+
+Reescreva as partes pedidas por completo, corrigindo esses problemas e desenvolvendo cada seção com profundidade.
+"""
+        else:
+            instructions = f"""
+A previous version of this text failed review because of the following issues:
+{issue_list}
+
+Rewrite the requested parts in full, fixing these issues and developing each section in depth.
+"""
+        
+        return extend_prompt(prompt, instructions)
+    
+    def get_section_prompt(self, title: str, theme: str, page_count: int, section_title: str, words: int) -> str:
+        """
+        Retorna o prompt para gerar apenas uma seção que faltou no documento
+        
+        Args:
+            title: Título do documento
+            theme: Tema do documento
+            page_count: Número de páginas (20 ou 50)
+            section_title: Título da seção a gerar (ex.: "Introdução")
+            words: Número aproximado de palavras da seção
+        
+        Returns:
+            Prompt completo para enviar à IA (CacheablePrompt)
+        """
+        prompt = self.get_prompt(title, theme, page_count)
+        
+        if self.language.lower() == "pt-br":
+            instructions = f"""
+IMPORTANTE: o restante do documento já foi escrito. Escreva SOMENTE a seção "{section_title}", com cerca de {words} palavras, começando pelo título da seção. Não repita o título do documento nem outras seções.
+"""
+        else:
+            instructions = f"""
+IMPORTANT: the rest of the document has already been written. Write ONLY the section "{section_title}", with about {words} words, starting with the section heading. Do not repeat the document title or other sections.
+"""
+        
+        return extend_prompt(prompt, instructions)
+    
+    def get_expand_prompt(self, title: str, theme: str, page_count: int, section: str, words: int) -> str:
+        """
+        Retorna o prompt para reescrever uma seção curta com mais conteúdo
+        
+        Args:
+            title: Título do documento
+            theme: Tema do documento
+            page_count: Número de páginas (20 ou 50)
+            section: Seção atual em formato Markdown (com o título)
+            words: Número aproximado de palavras da nova versão
+        
+        Returns:
+            Prompt completo para enviar à IA (CacheablePrompt)
+        """
+        prompt = self.get_prompt(title, theme, page_count)
+        
+        if self.language.lower() == "pt-br":
+            instructions = f"""
+IMPORTANTE: o restante do documento já foi escrito. A seção abaixo ficou curta demais:
+\"\"\"
+{section.strip()}
+\"\"\"
+Reescreva SOMENTE esta seção, com o mesmo título e cerca de {words} palavras, desenvolvendo o conteúdo com explicações e exemplos. Não acrescente outras seções.
+"""
+        else:
+            instructions = f"""
+IMPORTANT: the rest of the document has already been written. The section below is too short:
+\"\"\"
+{section.strip()}
+\"\"\"
+Rewrite ONLY this section, keeping the same heading and with about {words} words, developing the content with explanations and examples. Do not add other sections.
+"""
+        
+        return extend_prompt(prompt, instructions)
+    
+    def _get_parts(self, page_count: int) -> List[Tuple[str, str, int]]:
+        """Retorna as partes do documento como (título em português, título em inglês, palavras)"""
+        return [("Documento completo", "Complete document", self.get_expected_words(page_count))]
+    
     def _get_structure_pt(self) -> Dict[str, Any]:
         """Retorna a estrutura do documento em português"""
         return {}
@@ -49,10 +284,23 @@ class DocumentTemplate(ABC):
 class EbookTemplate(DocumentTemplate):
     """Template para eBooks"""
     
-    def _get_prompt_pt(self, title: str, theme: str, page_count: int) -> str:
+    def _get_parts(self, page_count: int) -> List[Tuple[str, str, int]]:
         chapter_count = 5 if page_count == 20 else 10
+        chapter_words = 1000 if page_count == 20 else 2500
         
-        return f"""Crie um eBook completo em formato Markdown com o título "{title}" sobre o tema "{theme}".
+        return (
+            [("Capa e Sumário", "Cover and Table of Contents", 150),
+             ("Introdução", "Introduction", 500)]
+            + [(f"Capítulo {i + 1}", f"Chapter {i + 1}", chapter_words) for i in range(chapter_count)]
+            + [("Conclusão", "Conclusion", 500),
+               ("Referências", "References", 200),
+               ("Sobre o Autor", "About the Author", 150)]
+        )
+    
+    def _get_instructions_pt(self, page_count: int) -> str:
+        chapter_count = 5 if page_count == 20 else 10
+        
+        return f"""Crie um eBook completo em formato Markdown com o título e sobre o tema indicados ao final.
 
 O eBook deve ter a seguinte estrutura:
 1. Capa com título e subtítulo atraente
@@ -79,10 +327,10 @@ Requisitos de qualidade:
 O eBook completo deve ter aproximadamente {page_count * 500} palavras no total.
 """
     
-    def _get_prompt_en(self, title: str, theme: str, page_count: int) -> str:
+    def _get_instructions_en(self, page_count: int) -> str:
         chapter_count = 5 if page_count == 20 else 10
         
-        return f"""Create a complete eBook in Markdown format with the title "{title}" about the theme "{theme}".
+        return f"""Create a complete eBook in Markdown format with the title and about the theme given at the end.
 
 The eBook should have the following structure:
 1. Cover with title and attractive subtitle
@@ -112,10 +360,23 @@ The complete eBook should have approximately {page_count * 500} words in total.
 class PracticalGuideTemplate(DocumentTemplate):
     """Template para Guias Práticos"""
     
-    def _get_prompt_pt(self, title: str, theme: str, page_count: int) -> str:
+    def _get_parts(self, page_count: int) -> List[Tuple[str, str, int]]:
+        section_count = 5 if page_count == 20 else 10
+        section_words = 800 if page_count == 20 else 2000
+        
+        return (
+            [("Capa e Índice", "Cover and Table of Contents", 150),
+             ("Introdução", "Introduction", 400)]
+            + [(f"Seção {i + 1}", f"Section {i + 1}", section_words) for i in range(section_count)]
+            + [("Recursos Adicionais", "Additional Resources", 300),
+               ("Glossário", "Glossary", 300),
+               ("Conclusão", "Conclusion", 300)]
+        )
+    
+    def _get_instructions_pt(self, page_count: int) -> str:
         section_count = 5 if page_count == 20 else 10
         
-        return f"""Crie um guia prático completo em formato Markdown com o título "{title}" sobre o tema "{theme}".
+        return f"""Crie um guia prático completo em formato Markdown com o título e sobre o tema indicados ao final.
 
 O guia deve ter a seguinte estrutura:
 1. Capa com título e subtítulo explicativo
@@ -143,10 +404,10 @@ Requisitos de qualidade:
 O guia completo deve ter aproximadamente {page_count * 500} palavras no total.
 """
     
-    def _get_prompt_en(self, title: str, theme: str, page_count: int) -> str:
+    def _get_instructions_en(self, page_count: int) -> str:
         section_count = 5 if page_count == 20 else 10
         
-        return f"""Create a complete practical guide in Markdown format with the title "{title}" about the theme "{theme}".
+        return f"""Create a complete practical guide in Markdown format with the title and about the theme given at the end.
 
 The guide should have the following structure:
 1. Cover with title and explanatory subtitle
@@ -177,10 +438,23 @@ The complete guide should have approximately {page_count * 500} words in total.
 class TipsGuideTemplate(DocumentTemplate):
     """Template para Guias de Dicas"""
     
-    def _get_prompt_pt(self, title: str, theme: str, page_count: int) -> str:
+    def _get_parts(self, page_count: int) -> List[Tuple[str, str, int]]:
+        tips_count = 20 if page_count == 20 else 50
+        
+        # Cada dica: explicação (100-150 palavras), listas e exemplo
+        return (
+            [("Capa", "Cover", 50),
+             ("Introdução", "Introduction", 300)]
+            + [(f"Dica {i + 1}", f"Tip {i + 1}", 250) for i in range(tips_count)]
+            + [("Resumo das Principais Dicas", "Summary of the Main Tips", 300),
+               ("Recursos Adicionais", "Additional Resources", 200),
+               ("Conclusão", "Conclusion", 200)]
+        )
+    
+    def _get_instructions_pt(self, page_count: int) -> str:
         tips_count = 20 if page_count == 20 else 50
         
-        return f"""Crie um guia de dicas completo em formato Markdown com o título "{title}" sobre o tema "{theme}".
+        return f"""Crie um guia de dicas completo em formato Markdown com o título e sobre o tema indicados ao final.
 
 O guia deve ter a seguinte estrutura:
 1. Capa com título e subtítulo atraente
@@ -206,10 +480,10 @@ Requisitos de qualidade:
 O guia completo deve ter aproximadamente {page_count * 500} palavras no total.
 """
     
-    def _get_prompt_en(self, title: str, theme: str, page_count: int) -> str:
+    def _get_instructions_en(self, page_count: int) -> str:
         tips_count = 20 if page_count == 20 else 50
         
-        return f"""Create a complete tips guide in Markdown format with the title "{title}" about the theme "{theme}".
+        return f"""Create a complete tips guide in Markdown format with the title and about the theme given at the end.
 
 The guide should have the following structure:
 1. Cover with title and attractive subtitle
@@ -238,10 +512,23 @@ The complete guide should have approximately {page_count * 500} words in total.
 class OfficialDocumentTemplate(DocumentTemplate):
     """Template para Documentos Oficiais"""
     
-    def _get_prompt_pt(self, title: str, theme: str, page_count: int) -> str:
+    def _get_parts(self, page_count: int) -> List[Tuple[str, str, int]]:
+        section_count = 5 if page_count == 20 else 10
+        section_words = 800 if page_count == 20 else 2000
+        
+        return (
+            [("Cabeçalho, Sumário Executivo e Índice", "Header, Executive Summary and Table of Contents", 400),
+             ("Introdução", "Introduction", 400)]
+            + [(f"Seção {i + 1}", f"Section {i + 1}", section_words) for i in range(section_count)]
+            + [("Conclusões e Recomendações", "Conclusions and Recommendations", 400),
+               ("Anexos", "Appendices", 300),
+               ("Referências Bibliográficas", "Bibliographical References", 200)]
+        )
+    
+    def _get_instructions_pt(self, page_count: int) -> str:
         section_count = 5 if page_count == 20 else 10
         
-        return f"""Crie um documento oficial completo em formato Markdown com o título "{title}" sobre o tema "{theme}".
+        return f"""Crie um documento oficial completo em formato Markdown com o título e sobre o tema indicados ao final.
 
 O documento deve ter a seguinte estrutura:
 1. Cabeçalho com título, organização fictícia e data atual
@@ -269,10 +556,10 @@ Requisitos de qualidade:
 O documento completo deve ter aproximadamente {page_count * 500} palavras no total.
 """
     
-    def _get_prompt_en(self, title: str, theme: str, page_count: int) -> str:
+    def _get_instructions_en(self, page_count: int) -> str:
         section_count = 5 if page_count == 20 else 10
         
-        return f"""Create a complete official document in Markdown format with the title "{title}" about the theme "{theme}".
+        return f"""Create a complete official document in Markdown format with the title and about the theme given at the end.
 
 The document should have the following structure:
 1. Header with title, fictional organization, and current date
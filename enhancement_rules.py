@@ -0,0 +1,277 @@
+"""
+Regras de melhoria do Markdown gerado, compiladas uma vez e aplicadas em uma única passada
+
+As correções são declaradas como regras ordenadas. As regras de texto de
+todas as camadas aplicáveis (base, idioma, tipo de documento e tipo no
+idioma) são fundidas em uma única expressão regular; um varredor linha a
+linha aplica essa expressão e, na mesma passada, ajusta as linhas em branco
+em volta dos cabeçalhos e colapsa as sequências de linhas em branco. Linhas
+dentro de blocos de código cercados não são alteradas.
+
+Para adicionar regras a um tipo de documento ou idioma:
+
+    register_rules([Rule('travessao', r' -- ', ' — ')], doc_type='ebook', language='pt-BR')
+
+Uso (benchmark contra as cinco substituições sequenciais anteriores):
+    python enhancement_rules.py [palavras]
+"""
+
+import re
+import sys
+import time
+from typing import Dict, List, Optional, Tuple, Union, Callable
+
+# Linhas que abrem ou fecham blocos de código cercados (``` ou ~~~)
+FENCE_PATTERN = re.compile(r'^\s*(```|~~~)')
+
+# Linha de cabeçalho Markdown, com ou sem o espaço depois de '#'
+HEADING_PATTERN = re.compile(r'#+(?:[ \t]+\S|\w)')
+
+# Referências a grupos por número ou nome e grupos condicionais, que mudam
+# de sentido quando o padrão é combinado com os das demais regras
+GROUP_REFERENCE_PATTERN = re.compile(r'(?<!\\)(?:\\\\)*\\[1-9]|\(\?P=|\(\?\(')
+
+# Alternativas estruturais do varredor, tentadas antes das regras de texto:
+# blocos de código (copiados sem alteração), linhas de cabeçalho e
+# sequências de duas ou mais linhas em branco. Todas começam pela quebra de
+# linha (e não por '^'), o que permite ao re saltar direto para os
+# candidatos em vez de testar cada posição do texto. Só o bloco de código
+# atravessa linhas, com o DOTALL local (?s:...): uma flag global valeria
+# também para as regras de texto.
+SCANNER_PATTERNS = (
+    ('fence', r'\n[ \t]*(?:```|~~~)(?s:.*?)(?:\n[ \t]*(?:```|~~~)[^\n]*|\Z)'),
+    ('heading', r'\n#+(?:[ \t]+\S|\w)[^\n]*'),
+    ('blank', r'\n(?:[ \t]*\n){2,}'),
+)
+
+class Rule:
+    """
+    Substituição aplicada às linhas de texto (fora dos blocos de código)
+    
+    O padrão é combinado com os das demais regras em uma única expressão e
+    não deve atravessar quebras de linha nem usar grupos nomeados; para
+    ignorar maiúsculas, use flags locais, ex.: (?i:conclusão).
+    
+    Raises:
+        ValueError: Se o padrão usar flags globais ou referências a grupos
+    """
+    
+    def __init__(self, name: str, pattern: str, replacement: Union[str, Callable]):
+        self.name = name
+        self.pattern = pattern
+        self.replacement = replacement
+        self.compiled = re.compile(pattern)
+        
+        # Uma flag global valeria para o varredor inteiro, e as referências
+        # apontariam para os grupos de outras regras
+        if self.compiled.flags & ~re.UNICODE:
+            raise ValueError(f"Regra '{name}': use flags locais, ex.: (?i:...), em vez de flags globais")
+        if GROUP_REFERENCE_PATTERN.search(pattern):
+            raise ValueError(f"Regra '{name}': o padrão não pode referenciar grupos")
+
+class RuleSet:
+    """
+    Conjunto ordenado de regras compilado em um único varredor
+    
+    O conteúdo é percorrido uma vez por uma expressão que reúne as
+    alternativas estruturais e as regras de texto; o Python só é chamado
+    nos trechos que casam, e o restante do texto é copiado pelo próprio re.
+    Regras cujo padrão começa por um caractere literal mantêm a varredura
+    rápida.
+    """
+    
+    def __init__(self, rules: List[Rule], heading_space: bool = True,
+                 blank_around_headings: bool = True, collapse_blank_lines: bool = True):
+        self.rules = list(rules)
+        self.heading_space = heading_space
+        self.blank_around_headings = blank_around_headings
+        self.collapse_blank_lines = collapse_blank_lines
+        
+        # Todas as alternativas vão em uma única expressão, sem grupos em volta:
+        # quando cada uma começa por um caractere literal, o re salta direto
+        # para as posições candidatas. O trecho encontrado é atribuído à
+        # primeira alternativa que casa na mesma posição, como faz o próprio re.
+        structural = [(name, re.compile(pattern)) for name, pattern in SCANNER_PATTERNS]
+        self._alternatives = structural + [(rule, rule.compiled) for rule in self.rules]
+        self._scanner = re.compile('|'.join(pattern.pattern for _, pattern in self._alternatives))
+        self._inline = re.compile('|'.join(rule.pattern for rule in self.rules)) if self.rules else None
+    
+    def apply(self, section: str) -> str:
+        """
+        Melhora uma seção em uma única passada
+        
+        Args:
+            section: Seção em formato Markdown (iniciando no cabeçalho)
+        
+        Returns:
+            Seção melhorada, terminando com exatamente uma linha em branco
+        """
+        # A quebra de linha inicial permite casar a primeira linha como as demais
+        enhanced_section = self._scanner.sub(self._replace, '\n' + section)[1:]
+        
+        # A linha em branco final separa esta seção do cabeçalho da próxima
+        return enhanced_section.rstrip('\n') + '\n\n'
+    
+    def _replace(self, match: re.Match) -> str:
+        """Trata um trecho encontrado pelo varredor"""
+        for kind, pattern in self._alternatives:
+            alternative_match = pattern.match(match.string, match.start())
+            if alternative_match is not None:
+                break
+        
+        # A regra precisa casar sozinha exatamente o trecho que casou no varredor
+        if alternative_match is None or alternative_match.end() != match.end():
+            raise ValueError(f"Regra '{getattr(kind, 'name', kind)}' casa de forma diferente dentro do varredor combinado")
+        
+        if kind == 'fence':
+            return match.group(0)
+        if kind == 'blank':
+            return '\n\n' if self.collapse_blank_lines else match.group(0)
+        if kind == 'heading':
+            return self._replace_heading(match)
+        return self._expand(kind, alternative_match)
+    
+    def _replace_inline(self, match: re.Match) -> str:
+        """Aplica a primeira regra de texto que casa na posição encontrada"""
+        for rule in self.rules:
+            rule_match = rule.compiled.match(match.string, match.start())
+            if rule_match is not None:
+                return self._expand(rule, rule_match)
+        return match.group(0)
+    
+    @staticmethod
+    def _expand(rule: Rule, match: re.Match) -> str:
+        """Monta a substituição de uma regra de texto"""
+        if callable(rule.replacement):
+            return rule.replacement(match)
+        return match.expand(rule.replacement)
+    
+    def _replace_heading(self, match: re.Match) -> str:
+        """Corrige o cabeçalho e garante uma linha em branco antes e depois dele"""
+        heading = match.group(0)[1:]
+        if self.heading_space:
+            level = len(heading) - len(heading.lstrip('#'))
+            if heading[level] not in ' \t':
+                heading = heading[:level] + ' ' + heading[level:]
+        if self._inline is not None:
+            heading = self._inline.sub(self._replace_inline, heading)
+        
+        if not self.blank_around_headings:
+            return '\n' + heading
+        
+        content = match.string
+        start, end = match.span()
+        if start > 0:
+            previous_line = content[content.rfind('\n', 0, start) + 1:start]
+            if previous_line.strip():
+                heading = '\n' + heading
+        
+        # Um cabeçalho logo em seguida recebe a linha em branco antes dele
+        if end < len(content):
+            next_end = content.find('\n', end + 1)
+            next_line = content[end + 1:next_end if next_end != -1 else len(content)]
+            if next_line.strip() and not HEADING_PATTERN.match(next_line):
+                heading += '\n'
+        return '\n' + heading
+
+# Regras de texto aplicadas a todos os documentos (o espaço depois de '#',
+# as linhas em branco em volta dos cabeçalhos e o colapso de linhas em
+# branco são opções do RuleSet)
+BASE_RULES = [
+    # Corrigir links Markdown mal formatados ('[texto] (url)' -> '[texto](url)')
+    Rule('link_spacing', r'\[([^\]\n]+)\] \(([^)\n]+)\)', r'[\1](\2)'),
+]
+
+# Regras adicionais por (tipo de documento, idioma); None vale para todos
+_EXTRA_RULES: Dict[Tuple[Optional[str], Optional[str]], List[Rule]] = {}
+
+# Conjuntos compilados por (tipo de documento, idioma)
+_compiled: Dict[Tuple[Optional[str], Optional[str]], RuleSet] = {}
+
+def register_rules(rules: List[Rule], doc_type: Optional[str] = None, language: Optional[str] = None) -> None:
+    """
+    Acrescenta regras para um tipo de documento e/ou idioma
+    
+    As regras são aplicadas depois das regras base, na ordem:
+    idioma, tipo de documento e tipo de documento no idioma.
+    
+    Args:
+        rules: Regras a acrescentar
+        doc_type: Tipo de documento (None para todos)
+        language: Idioma (None para todos)
+    """
+    _EXTRA_RULES.setdefault((doc_type, language), []).extend(rules)
+    _compiled.clear()
+
+def get_rule_set(doc_type: Optional[str] = None, language: Optional[str] = None) -> RuleSet:
+    """
+    Retorna o conjunto de regras compilado de um tipo de documento e idioma
+    
+    Args:
+        doc_type: Tipo de documento
+        language: Idioma do conteúdo
+    
+    Returns:
+        Conjunto de regras (compilado uma única vez por combinação)
+    """
+    key = (doc_type, language)
+    rule_set = _compiled.get(key)
+    if rule_set is None:
+        rules = list(BASE_RULES)
+        for layer in ((None, None), (None, language), (doc_type, None), (doc_type, language)):
+            if layer in _EXTRA_RULES:
+                rules.extend(_EXTRA_RULES[layer])
+        rule_set = _compiled[key] = RuleSet(rules)
+    return rule_set
+
+def _legacy_enhance_section(section: str) -> str:
+    """Implementação anterior (cinco substituições sequenciais), usada apenas no benchmark"""
+    enhanced_section = re.sub(r'#(\w+)', r'# \1', section)
+    enhanced_section = re.sub(r'(#+ .+)\n([^#\n])', r'\1\n\n\2', enhanced_section)
+    enhanced_section = re.sub(r'\[([^\]]+)\] \(([^)]+)\)', r'[\1](\2)', enhanced_section)
+    enhanced_section = re.sub(r'\n\s*\n\s*\n', r'\n\n', enhanced_section)
+    enhanced_section = re.sub(r'([^\n])\n(#+\s+)', r'\1\n\n\2', enhanced_section)
+    return enhanced_section.rstrip('\n') + '\n\n'
+
+def _benchmark_content(words: int) -> str:
+    """Gera Markdown com o provedor simulado e injeta os defeitos que as regras corrigem"""
+    from ai_models import SimulatedModel
+    
+    model = SimulatedModel(pages=max(1, words // 500), sections=max(5, words // 4000), tables=1, code_blocks=1)
+    content = model.generate_content('Título: Benchmark das regras\nIdioma: pt-BR', max_tokens=words * 4)
+    
+    # Fora dos blocos de código, onde as duas implementações diferem de propósito
+    lines = content.split('\n')
+    in_fence = False
+    for index, line in enumerate(lines):
+        if FENCE_PATTERN.match(line):
+            in_fence = not in_fence
+        elif in_fence or index % 7:
+            continue
+        elif line.startswith('## '):
+            lines[index] = '##' + line[3:]
+        elif line and not line.startswith(('#', '|', ' ')):
+            lines[index] = line + ' Veja [a referência] (https://example.com).\n\n'
+    return '\n'.join(lines)
+
+if __name__ == '__main__':
+    from content_validator import ContentValidator
+    
+    words = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    content = _benchmark_content(words)
+    sections = list(ContentValidator.iter_sections(content))
+    rule_set = get_rule_set('ebook', 'pt-BR')
+    print(f"{len(content.split())} palavras, {len(sections)} seções")
+    
+    results = {}
+    for name, enhance in (('anterior', _legacy_enhance_section), ('regras', rule_set.apply)):
+        best = None
+        for _ in range(5):
+            start = time.perf_counter()
+            output = ''.join(enhance(section) for section in sections)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = output
+        print(f"{name:10} {best * 1000:8.1f} ms")
+    
+    print(f"Saídas idênticas: {results['anterior'] == results['regras']}")
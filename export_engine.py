@@ -0,0 +1,447 @@
+"""
+Exportação de documentos em vários formatos a partir de uma única análise do Markdown
+
+O Markdown melhorado é analisado uma vez em uma árvore de elementos (AST);
+os formatos baratos (HTML autônomo, EPUB3 e, opcionalmente, DOCX) são
+emitidos diretamente dessa árvore, sem paginação. Cada formato é guardado
+em cache pelo hash do conteúdo.
+"""
+
+import hashlib
+import html
+import html.entities
+import os
+import re
+import zipfile
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from xml.etree import ElementTree as etree
+
+from pdf_generator import PdfGenerator, MARKDOWN_EXTENSIONS, HTML_HEAD, HTML_TAIL
+from settings import UPLOAD_FOLDER
+from storage import temp_path
+
+# Pasta do cache de exportações
+EXPORT_FOLDER = os.getenv('EXPORT_FOLDER', os.path.join(UPLOAD_FOLDER, 'exports'))
+
+# Incrementar ao mudar a saída de algum formato, invalidando o cache
+EXPORT_VERSION = '1'
+
+# Extensão de arquivo de cada formato suportado
+FORMAT_EXTENSIONS = {
+    'html': 'html',
+    'epub': 'epub',
+    'docx': 'docx',
+    'pdf': 'pdf',
+}
+
+# Folha de estilo simples para leitores de eBook (sem regras de paginação)
+EPUB_STYLESHEET = """body { font-family: serif; line-height: 1.5; }
+h1, h2, h3, h4, h5, h6 { color: #2c3e50; }
+table { border-collapse: collapse; width: 100%; }
+th, td { border: 1px solid #ddd; padding: 4px; }
+pre { background-color: #f5f5f5; padding: 0.5em; white-space: pre-wrap; }
+blockquote { border-left: 4px solid #ddd; padding-left: 1em; color: #666; }
+"""
+
+# Elementos vazios do HTML, que no XHTML precisam ser fechados (<br> -> <br/>)
+VOID_TAG_PATTERN = re.compile(r'<(area|base|br|col|embed|hr|img|input|link|meta|source|track|wbr)\b([^<>]*?)\s*/?>', re.IGNORECASE)
+
+# Entidades nomeadas do HTML (&nbsp;, &eacute;...), que o XML não conhece
+ENTITY_PATTERN = re.compile(r'&([A-Za-z][A-Za-z0-9]*);')
+
+def is_well_formed(fragment: str) -> bool:
+    """
+    Verifica se um fragmento é XML bem formado (requisito dos capítulos de um EPUB)
+    
+    Args:
+        fragment: Fragmento de marcação
+    
+    Returns:
+        True se o fragmento, envolvido em um elemento, puder ser analisado como XML
+    """
+    try:
+        etree.fromstring(f"<div>{fragment}</div>")
+        return True
+    except etree.ParseError:
+        return False
+
+def _xhtml_entity(match: re.Match) -> str:
+    """Substitui uma entidade nomeada do HTML pelo caractere (as cinco do XML são mantidas)"""
+    name = match.group(1)
+    if name in ('amp', 'lt', 'gt', 'quot', 'apos'):
+        return match.group(0)
+    return html.entities.html5.get(f"{name};", match.group(0))
+
+class ParsedDocument:
+    """Árvore de elementos de um documento Markdown, pronta para ser emitida em vários formatos"""
+    
+    def __init__(self, md, root: etree.Element):
+        self.md = md
+        self.root = root
+        self._xhtml_blocks = None
+    
+    def serialize(self, elements: Iterable[etree.Element], xhtml: bool = False) -> str:
+        """
+        Converte uma sequência de elementos da árvore para XHTML
+        
+        O HTML bruto do Markdown (blocos e marcas inline guardados pelo Markdown)
+        é restaurado como veio. Com `xhtml`, o resultado é sempre XML bem formado:
+        os elementos vazios são fechados e as entidades do HTML convertidas; se
+        ainda assim o fragmento não for bem formado (marcas sem fechamento, por
+        exemplo), o HTML bruto que não for bem formado sozinho é escapado e
+        aparece como texto.
+        
+        Args:
+            elements: Elementos de nível superior a serializar
+            xhtml: Se o fragmento precisa ser XML bem formado (capítulos de EPUB)
+        
+        Returns:
+            Fragmento XHTML com os blocos guardados pelo Markdown já restaurados
+        """
+        wrapper = etree.Element(self.md.doc_tag)
+        wrapper.extend(elements)
+        
+        output = self.md.serializer(wrapper)
+        start = output.find('>') + 1
+        end = output.rfind('</')
+        output = output[start:end] if end > start else ''
+        
+        if not xhtml:
+            return self._postprocess(output)
+        
+        stash = self.md.htmlStash
+        raw_blocks = stash.rawHtmlBlocks
+        if self._xhtml_blocks is None:
+            self._xhtml_blocks = [self._xhtml_block(block) for block in raw_blocks]
+        
+        try:
+            stash.rawHtmlBlocks = [fixed for fixed, _ in self._xhtml_blocks]
+            result = self._postprocess(output)
+            if not is_well_formed(result):
+                stash.rawHtmlBlocks = [fixed if valid else html.escape(str(raw), quote=False)
+                                       for raw, (fixed, valid) in zip(raw_blocks, self._xhtml_blocks)]
+                result = self._postprocess(output)
+        finally:
+            stash.rawHtmlBlocks = raw_blocks
+        
+        return result
+    
+    def _postprocess(self, output: str) -> str:
+        """Executa os pós-processadores do Markdown (restauração do HTML guardado e dos escapes)"""
+        for postprocessor in self.md.postprocessors:
+            output = postprocessor.run(output)
+        
+        return output.strip()
+    
+    def _xhtml_block(self, block) -> Tuple[str, bool]:
+        """
+        Ajusta um bloco de HTML guardado pelo Markdown para XHTML
+        
+        Args:
+            block: HTML guardado (texto ou elemento)
+        
+        Returns:
+            (HTML ajustado, se o bloco sozinho é bem formado)
+        """
+        if not isinstance(block, str):
+            block = self.md.serializer(block)
+        fixed = VOID_TAG_PATTERN.sub(r'<\1\2/>', ENTITY_PATTERN.sub(_xhtml_entity, block))
+        # Marcadores de outros blocos aninhados são restaurados depois
+        return fixed, is_well_formed(re.sub(r'\x02[^\x03]*\x03', '', fixed))
+    
+    def chapters(self) -> List[Tuple[str, List[etree.Element]]]:
+        """
+        Divide o documento em capítulos nos cabeçalhos h1 e h2
+        
+        Returns:
+            Lista de (título do capítulo, elementos do capítulo)
+        """
+        chapters = []
+        title, elements = None, []
+        
+        for element in self.root:
+            if element.tag in ('h1', 'h2') and elements:
+                chapters.append((title or '', elements))
+                title, elements = None, []
+            if title is None and element.tag in ('h1', 'h2', 'h3'):
+                title = self.plain_text(element)
+            elements.append(element)
+        
+        if elements:
+            chapters.append((title or '', elements))
+        
+        return chapters
+    
+    def resolve_placeholder(self, text: str) -> Optional[str]:
+        """
+        Retorna o HTML guardado pelo Markdown para um marcador (blocos de código, HTML bruto)
+        
+        Args:
+            text: Texto de um elemento da árvore
+        
+        Returns:
+            HTML guardado ou None se o texto não for um marcador
+        """
+        match = re.fullmatch(r'\s*\x02wzxhzdk:(\d+)\x03\s*', text or '')
+        if not match:
+            return None
+        return str(self.md.htmlStash.rawHtmlBlocks[int(match.group(1))])
+    
+    def plain_text(self, element: etree.Element) -> str:
+        """
+        Extrai o texto de um elemento, restaurando os marcadores guardados pelo Markdown
+        
+        Args:
+            element: Elemento da árvore
+            
+        Returns:
+            Texto sem marcação
+        """
+        text = ''.join(element.itertext())
+        text = re.sub(
+            r'\x02wzxhzdk:(\d+)\x03',
+            lambda match: re.sub(r'<[^>]+>', '', str(self.md.htmlStash.rawHtmlBlocks[int(match.group(1))])),
+            text
+        )
+        # Marcadores restantes (como o de '&') são removidos
+        text = text.replace('\x02amp\x03', '&')
+        return html.unescape(re.sub(r'\x02[^\x03]*\x03', '', text)).strip()
+
+class ExportEngine:
+    """Classe para exportação de documentos em vários formatos"""
+    
+    @staticmethod
+    def parse(markdown_content: str) -> ParsedDocument:
+        """
+        Analisa o Markdown uma única vez, sem serializar
+        
+        Args:
+            markdown_content: Conteúdo em formato Markdown
+        
+        Returns:
+            Documento analisado
+        """
+        import markdown
+        
+        md = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS, output_format='xhtml')
+        
+        # Mesmas etapas de Markdown.convert, parando antes da serialização
+        lines = markdown_content.split('\n')
+        for preprocessor in md.preprocessors:
+            lines = preprocessor.run(lines)
+        
+        root = md.parser.parseDocument(lines).getroot()
+        for treeprocessor in md.treeprocessors:
+            new_root = treeprocessor.run(root)
+            if new_root is not None:
+                root = new_root
+        
+        return ParsedDocument(md, root)
+    
+    @staticmethod
+    def content_hash(markdown_content: str, title: str, language: str) -> str:
+        """
+        Calcula o hash que identifica as exportações de um conteúdo
+        
+        Args:
+            markdown_content: Conteúdo em formato Markdown
+            title: Título do documento
+            language: Idioma do conteúdo
+        
+        Returns:
+            Hash SHA-256 em hexadecimal
+        """
+        digest = hashlib.sha256()
+        for part in (EXPORT_VERSION, title, language, markdown_content):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+    
+    @staticmethod
+    def export(markdown_content: str, title: str, language: str, formats: Iterable[str] = ('html', 'epub'), output_folder: str = EXPORT_FOLDER) -> Dict[str, str]:
+        """
+        Exporta o documento em todos os formatos pedidos em uma única passada
+        
+        Formatos já presentes no cache não são gerados novamente; o Markdown só
+        é analisado se algum formato estiver faltando.
+        
+        Args:
+            markdown_content: Conteúdo melhorado em formato Markdown
+            title: Título do documento
+            language: Idioma do conteúdo ('pt-BR' ou 'en-US')
+            formats: Formatos desejados ('html', 'epub', 'docx', 'pdf')
+            output_folder: Pasta do cache de exportações
+        
+        Returns:
+            Dicionário formato -> nome do arquivo dentro da pasta de exportações
+        """
+        os.makedirs(output_folder, exist_ok=True)
+        
+        doc_hash = ExportEngine.content_hash(markdown_content, title, language)
+        filenames = {}
+        missing = []
+        
+        for fmt in formats:
+            if fmt not in FORMAT_EXTENSIONS:
+                raise ValueError(f"Formato de exportação não suportado: {fmt}")
+            filenames[fmt] = f"{doc_hash}.{FORMAT_EXTENSIONS[fmt]}"
+            if not os.path.exists(os.path.join(output_folder, filenames[fmt])):
+                missing.append(fmt)
+        
+        if not missing:
+            return filenames
+        
+        document = ExportEngine.parse(markdown_content)
+        body = None
+        
+        for fmt in missing:
+            path = os.path.join(output_folder, filenames[fmt])
+            tmp_path = temp_path(path)
+            
+            if fmt in ('html', 'pdf'):
+                body = body if body is not None else document.serialize(list(document.root))
+                ExportEngine._write_html(body, title, language, tmp_path)
+                if fmt == 'pdf':
+                    html_path = tmp_path
+                    tmp_path = temp_path(f"{path}.pdf")
+                    try:
+                        PdfGenerator.render_html_file(html_path, tmp_path)
+                    finally:
+                        os.remove(html_path)
+            elif fmt == 'epub':
+                ExportEngine._write_epub(document, title, language, doc_hash, tmp_path)
+            elif fmt == 'docx':
+                ExportEngine._write_docx(document, title, language, tmp_path)
+            
+            # Escrita atômica: o cache nunca expõe um arquivo incompleto
+            os.replace(tmp_path, path)
+        
+        return filenames
+    
+    @staticmethod
+    def _write_html(body: str, title: str, language: str, path: str) -> None:
+        """Grava um documento HTML autônomo"""
+        head = HTML_HEAD.replace('<html>', f'<html lang="{html.escape(language)}">', 1)
+        head = head.replace('<title>Documento Gerado</title>', f'<title>{html.escape(title)}</title>', 1)
+        
+        with open(path, 'w', encoding='utf-8') as html_file:
+            html_file.write(head)
+            html_file.write(body)
+            html_file.write('\n')
+            html_file.write(HTML_TAIL)
+    
+    @staticmethod
+    def _write_epub(document: ParsedDocument, title: str, language: str, doc_hash: str, path: str) -> None:
+        """Grava um arquivo EPUB3 com um arquivo XHTML por capítulo"""
+        chapters = document.chapters()
+        modified = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        escaped_title = html.escape(title)
+        
+        manifest = ['<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>',
+                    '<item id="css" href="style.css" media-type="text/css"/>']
+        spine = []
+        nav_items = []
+        
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as epub:
+            # O arquivo mimetype deve ser o primeiro e sem compressão
+            epub.writestr(zipfile.ZipInfo('mimetype'), 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+            epub.writestr('META-INF/container.xml', (
+                '<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">\n'
+                '  <rootfiles>\n'
+                '    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>\n'
+                '  </rootfiles>\n'
+                '</container>\n'
+            ))
+            epub.writestr('OEBPS/style.css', EPUB_STYLESHEET)
+            
+            for index, (chapter_title, elements) in enumerate(chapters, start=1):
+                name = f"chapter_{index:03d}.xhtml"
+                chapter_title = html.escape(chapter_title or f"{index}")
+                epub.writestr(f"OEBPS/{name}", ExportEngine._xhtml_page(chapter_title, language, document.serialize(elements, xhtml=True)))
+                manifest.append(f'<item id="c{index}" href="{name}" media-type="application/xhtml+xml"/>')
+                spine.append(f'<itemref idref="c{index}"/>')
+                nav_items.append(f'<li><a href="{name}">{chapter_title}</a></li>')
+            
+            nav_body = f'<nav epub:type="toc" id="toc"><h1>{escaped_title}</h1><ol>{"".join(nav_items)}</ol></nav>'
+            epub.writestr('OEBPS/nav.xhtml', ExportEngine._xhtml_page(escaped_title, language, nav_body))
+            
+            epub.writestr('OEBPS/content.opf', (
+                '<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="uid">\n'
+                '  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">\n'
+                f'    <dc:identifier id="uid">urn:sha256:{doc_hash}</dc:identifier>\n'
+                f'    <dc:title>{escaped_title}</dc:title>\n'
+                f'    <dc:language>{html.escape(language)}</dc:language>\n'
+                f'    <meta property="dcterms:modified">{modified}</meta>\n'
+                '  </metadata>\n'
+                f'  <manifest>{"".join(manifest)}</manifest>\n'
+                f'  <spine>{"".join(spine)}</spine>\n'
+                '</package>\n'
+            ))
+    
+    @staticmethod
+    def _xhtml_page(title: str, language: str, body: str) -> str:
+        """Monta uma página XHTML de um EPUB"""
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<!DOCTYPE html>\n'
+            f'<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" lang="{html.escape(language)}" xml:lang="{html.escape(language)}">\n'
+            f'<head><meta charset="UTF-8"/><title>{title}</title><link rel="stylesheet" href="style.css" type="text/css"/></head>\n'
+            f'<body>\n{body}\n</body>\n</html>\n'
+        )
+    
+    @staticmethod
+    def _write_docx(document: ParsedDocument, title: str, language: str, path: str) -> None:
+        """Grava um arquivo DOCX (requer o pacote opcional python-docx)"""
+        try:
+            import docx
+        except ImportError:
+            raise RuntimeError("Exportação DOCX requer o pacote python-docx")
+        
+        output = docx.Document()
+        output.core_properties.title = title
+        output.core_properties.language = language
+        
+        for element in document.root:
+            ExportEngine._append_docx_block(output, document, element)
+        
+        output.save(path)
+    
+    @staticmethod
+    def _append_docx_block(output, document: ParsedDocument, element: etree.Element) -> None:
+        """Converte um bloco da árvore em parágrafos do DOCX"""
+        text = ''.join(element.itertext()).strip()
+        
+        # Blocos de código são guardados pelo Markdown como marcadores
+        stashed = document.resolve_placeholder(text)
+        if stashed is not None:
+            code = html.unescape(re.sub(r'<[^>]+>', '', stashed)).strip('\n')
+            paragraph = output.add_paragraph()
+            paragraph.add_run(code).font.name = 'Courier New'
+            return
+        
+        text = document.plain_text(element)
+        
+        if re.fullmatch(r'h[1-6]', element.tag):
+            output.add_heading(text, level=int(element.tag[1]))
+        elif element.tag in ('ul', 'ol'):
+            style = 'List Bullet' if element.tag == 'ul' else 'List Number'
+            for item in element.findall('li'):
+                output.add_paragraph(document.plain_text(item), style=style)
+        elif element.tag == 'table':
+            rows = element.findall('.//tr')
+            if rows:
+                columns = max(len(list(row)) for row in rows)
+                table = output.add_table(rows=len(rows), cols=columns)
+                table.style = 'Table Grid'
+                for row_index, row in enumerate(rows):
+                    for col_index, cell in enumerate(row):
+                        table.cell(row_index, col_index).text = document.plain_text(cell)
+        elif element.tag == 'blockquote':
+            output.add_paragraph(text, style='Quote')
+        elif element.tag == 'hr':
+            output.add_page_break()
+        elif text:
+            output.add_paragraph(text)
@@ -0,0 +1,273 @@
+"""
+Entrega dos arquivos gerados (PDFs, prévias e exportações) e dos arquivos estáticos
+
+Cada resposta leva um ETag forte derivado do conteúdo, Last-Modified e um
+Cache-Control adequado ao arquivo: os endereçados por conteúdo (exportações,
+miniaturas e estáticos versionados) são imutáveis; os demais são revalidados
+pelo ETag, o que custa apenas uma resposta 304.
+
+Modos de entrega (SENDFILE_MODE):
+    (vazio)      O worker entrega o arquivo pelo wsgi.file_wrapper (sendfile
+                 do sistema, quando o servidor suporta), com Range/206
+    x-accel      Nginx: a resposta vai vazia com X-Accel-Redirect e o proxy
+                 envia o arquivo, sem ocupar o worker da aplicação
+    x-sendfile   Apache (mod_xsendfile) e lighttpd: cabeçalho X-Sendfile
+
+No modo x-accel, SENDFILE_PREFIX (padrão /protected) deve ser uma location
+`internal` do Nginx apontando para SENDFILE_ROOT (padrão: UPLOAD_FOLDER):
+
+    location /protected/ {
+        internal;
+        alias /caminho/para/uploads/;
+    }
+
+Os estáticos podem ser pré-comprimidos uma vez (gzip e, se o pacote brotli
+estiver instalado, Brotli); a variante aceita pelo navegador é entregue sem
+compressão em tempo de requisição:
+
+    python file_serving.py --precompress [pasta]
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+from urllib.parse import quote
+
+from flask import Response, abort, request, send_file
+from werkzeug.security import safe_join
+
+from metrics import metrics
+from settings import UPLOAD_FOLDER
+from storage import temp_path
+
+SENDFILE_MODE = os.getenv('SENDFILE_MODE', '').lower()
+SENDFILE_PREFIX = os.getenv('SENDFILE_PREFIX', '/protected').rstrip('/')
+SENDFILE_ROOT = os.path.abspath(os.getenv('SENDFILE_ROOT', UPLOAD_FOLDER))
+
+# Políticas de cache
+CACHE_IMMUTABLE = 'public, max-age=31536000, immutable'
+CACHE_PRIVATE_IMMUTABLE = 'private, max-age=31536000, immutable'
+CACHE_REVALIDATE = 'private, no-cache'
+CACHE_STATIC = 'public, max-age=3600'
+
+# ETags calculados, por caminho (invalidados pela data de modificação e pelo tamanho)
+ETAG_CACHE_SIZE = int(os.getenv('ETAG_CACHE_SIZE', '4096'))
+
+# Variantes pré-comprimidas, em ordem de preferência
+PRECOMPRESSED_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+PRECOMPRESS_EXTENSIONS = ('.js', '.css', '.html', '.svg', '.json')
+
+_etag_cache = OrderedDict()
+_etag_lock = threading.Lock()
+
+def content_etag(path: str, stat: Optional[os.stat_result] = None) -> str:
+    """
+    Retorna o ETag forte de um arquivo (hash do conteúdo)
+    
+    O hash é calculado uma vez por processo e reaproveitado enquanto a data
+    de modificação e o tamanho do arquivo não mudarem.
+    
+    Args:
+        path: Caminho do arquivo
+        stat: Resultado de os.stat, se já disponível
+    
+    Returns:
+        ETag (sem aspas)
+    """
+    stat = stat or os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    
+    with _etag_lock:
+        cached = _etag_cache.get(path)
+        if cached and cached[0] == signature:
+            _etag_cache.move_to_end(path)
+            return cached[1]
+    
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    etag = digest.hexdigest()[:32]
+    
+    with _etag_lock:
+        _etag_cache[path] = (signature, etag)
+        while len(_etag_cache) > ETAG_CACHE_SIZE:
+            _etag_cache.popitem(last=False)
+    return etag
+
+class FileServer:
+    """Entrega os arquivos de uma pasta, diretamente ou delegando ao proxy"""
+    
+    def __init__(self, root: str, mode: str = SENDFILE_MODE):
+        self.root = os.path.abspath(root)
+        self.mode = mode
+    
+    def send(self, filename: str, as_attachment: bool = False, cache_control: str = CACHE_REVALIDATE,
+             etag: Optional[str] = None, encoding: Optional[str] = None, mimetype: Optional[str] = None) -> Response:
+        """
+        Entrega um arquivo da pasta
+        
+        Args:
+            filename: Caminho relativo à pasta
+            as_attachment: Se True, força o download
+            cache_control: Valor do cabeçalho Cache-Control
+            etag: ETag conhecido (ex.: arquivos nomeados pelo hash); calculado se omitido
+            encoding: Content-Encoding do arquivo (variantes pré-comprimidas)
+            mimetype: Tipo do conteúdo; deduzido do nome se omitido
+        
+        Returns:
+            Resposta Flask (200, 206 ou 304)
+        """
+        path = safe_join(self.root, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        
+        stat = os.stat(path)
+        etag = etag or content_etag(path, stat)
+        mimetype = mimetype or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        download_name = os.path.basename(filename)
+        
+        target = self._proxy_target(path)
+        if target:
+            response = Response(mimetype=mimetype)
+            response.headers['X-Accel-Redirect' if self.mode == 'x-accel' else 'X-Sendfile'] = target
+            if as_attachment:
+                response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+            response.set_etag(etag)
+            response.last_modified = stat.st_mtime
+            response.make_conditional(request)
+        else:
+            response = send_file(path, mimetype=mimetype, as_attachment=as_attachment, download_name=download_name,
+                                 conditional=True, etag=etag, last_modified=stat.st_mtime)
+        
+        response.headers['Cache-Control'] = cache_control
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+            response.vary.add('Accept-Encoding')
+        
+        metrics.increment('files_served', mode=self.mode or 'direct', status=response.status_code)
+        return response
+    
+    def _proxy_target(self, path: str) -> Optional[str]:
+        """Destino do arquivo para o proxy (None para entregar diretamente)"""
+        if self.mode == 'x-sendfile':
+            return path
+        if self.mode != 'x-accel' or not path.startswith(SENDFILE_ROOT + os.sep):
+            return None
+        relative = os.path.relpath(path, SENDFILE_ROOT).replace(os.sep, '/')
+        return f"{SENDFILE_PREFIX}/{quote(relative)}"
+    
+    def version(self, filename: str) -> Optional[str]:
+        """
+        Retorna a versão de um arquivo, para URLs que mudam com o conteúdo
+        
+        Args:
+            filename: Caminho relativo à pasta
+        
+        Returns:
+            Prefixo do hash do conteúdo ou None se o arquivo não existir
+        """
+        path = safe_join(self.root, filename)
+        if path is None or not os.path.isfile(path):
+            return None
+        return content_etag(path)[:12]
+    
+    def send_static(self, filename: str) -> Response:
+        """
+        Entrega um arquivo estático, preferindo a variante pré-comprimida aceita pelo navegador
+        
+        URLs com o parâmetro v igual à versão atual do arquivo (ver version)
+        são servidas como imutáveis.
+        
+        Args:
+            filename: Caminho relativo à pasta de estáticos
+        
+        Returns:
+            Resposta Flask
+        """
+        version = self.version(filename)
+        if version is None:
+            abort(404)
+        cache_control = CACHE_IMMUTABLE if request.args.get('v') == version else CACHE_STATIC
+        mimetype = mimetypes.guess_type(filename)[0]
+        
+        encoding, suffix = self._accepted_variant(filename)
+        if encoding:
+            return self.send(filename + suffix, cache_control=cache_control, encoding=encoding, mimetype=mimetype,
+                             etag=f"{version}-{encoding}")
+        
+        response = self.send(filename, cache_control=cache_control, mimetype=mimetype)
+        if filename.endswith(PRECOMPRESS_EXTENSIONS):
+            response.vary.add('Accept-Encoding')
+        return response
+    
+    def _accepted_variant(self, filename: str) -> Tuple[Optional[str], str]:
+        """Escolhe a variante pré-comprimida atualizada que o navegador aceita"""
+        original = os.path.join(self.root, filename)
+        for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+            if encoding not in request.accept_encodings:
+                continue
+            variant = original + suffix
+            try:
+                if os.stat(variant).st_mtime_ns >= os.stat(original).st_mtime_ns:
+                    return encoding, suffix
+            except OSError:
+                continue
+        return None, ''
+    
+    @staticmethod
+    def precompress(folder: str, extensions: Iterable[str] = PRECOMPRESS_EXTENSIONS) -> int:
+        """
+        Gera as variantes .gz e .br dos arquivos estáticos desatualizadas
+        
+        Args:
+            folder: Pasta dos arquivos estáticos
+            extensions: Extensões a comprimir
+        
+        Returns:
+            Número de variantes geradas
+        """
+        try:
+            import brotli
+        except ImportError:
+            brotli = None
+        
+        extensions = tuple(extensions)
+        generated = 0
+        for directory, _, filenames in os.walk(folder):
+            for name in filenames:
+                if not name.endswith(extensions):
+                    continue
+                path = os.path.join(directory, name)
+                with open(path, 'rb') as f:
+                    data = f.read()
+                
+                variants = {'.gz': lambda: gzip.compress(data, compresslevel=9, mtime=0)}
+                if brotli is not None:
+                    variants['.br'] = lambda: brotli.compress(data, quality=11)
+                
+                for suffix, compress in variants.items():
+                    target = path + suffix
+                    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+                        continue
+                    compressed = compress()
+                    if len(compressed) >= len(data):
+                        continue  # Não compensa: o original é servido
+                    tmp_path = temp_path(target)
+                    with open(tmp_path, 'wb') as f:
+                        f.write(compressed)
+                    os.replace(tmp_path, target)
+                    generated += 1
+        return generated
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--precompress':
+        folder = sys.argv[2] if len(sys.argv) > 2 else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+        print(f"{FileServer.precompress(folder)} variantes geradas em {folder}")
+    else:
+        print(__doc__)
@@ -0,0 +1,101 @@
+"""
+Configuração do Gunicorn para o modo de produção
+
+Uso:
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+Todas as opções podem ser sobrescritas por variáveis de ambiente.
+"""
+
+import gc
+import multiprocessing
+import os
+import signal
+
+def _default_workers() -> int:
+    """Calcula o número de workers com base nos núcleos disponíveis"""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = multiprocessing.cpu_count()
+    
+    workers = cores * 2 + 1
+    max_workers = int(os.getenv('MAX_WORKERS', '0'))
+    if max_workers > 0:
+        workers = min(workers, max_workers)
+    return workers
+
+# Endereço e processos
+bind = os.getenv('BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+workers = int(os.getenv('WEB_CONCURRENCY', '0')) or _default_workers()
+
+# As chamadas às APIs de IA passam a maior parte do tempo esperando a rede,
+# então cada worker atende várias requisições em threads
+worker_class = 'gthread'
+threads = int(os.getenv('WORKER_THREADS', '4'))
+
+# Carregar a aplicação antes do fork
+preload_app = True
+
+# Reciclar workers periodicamente para conter vazamentos de memória
+max_requests = int(os.getenv('MAX_REQUESTS', '500'))
+max_requests_jitter = int(os.getenv('MAX_REQUESTS_JITTER', '50'))
+
+# A geração de um documento pode levar minutos
+timeout = int(os.getenv('WORKER_TIMEOUT', '600'))
+graceful_timeout = int(os.getenv('GRACEFUL_TIMEOUT', '300'))
+keepalive = int(os.getenv('KEEPALIVE', '5'))
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.getenv('LOG_LEVEL', 'info')
+
+def on_starting(server):
+    """
+    Importa no processo mestre as dependências pesadas do papel do processo,
+    para que as páginas de memória sejam compartilhadas (copy-on-write) entre os workers
+    """
+    from lazy_imports import prewarm
+    
+    prewarm(background=False)
+
+def when_ready(server):
+    """Congela os objetos já carregados para evitar cópias após o fork"""
+    gc.collect()
+    gc.freeze()
+
+def pre_fork(server, worker):
+    """
+    Designa um único worker vivo para rodar o janitor (JANITOR_INTERVAL)
+    
+    Executado no mestre antes de cada fork: o substituto de um worker
+    reciclado (max_requests) herda o papel se o designado saiu.
+    """
+    worker.run_janitor = not any(getattr(other, 'run_janitor', False) for other in server.WORKERS.values())
+
+def post_fork(server, worker):
+    """Inicia as threads de segundo plano no worker, nunca no mestre (ver app.start_background_tasks)"""
+    from app import start_background_tasks
+    
+    start_background_tasks(janitor=worker.run_janitor)
+
+def post_worker_init(worker):
+    """Marca o worker como em drenagem ao receber SIGTERM antes de encerrar"""
+    from server_lifecycle import lifecycle
+    
+    original_handler = signal.getsignal(signal.SIGTERM)
+    
+    def handle_term(signum, frame):
+        lifecycle.start_draining()
+        if callable(original_handler):
+            original_handler(signum, frame)
+    
+    signal.signal(signal.SIGTERM, handle_term)
+
+def worker_exit(server, worker):
+    """Aguarda os jobs em andamento terminarem antes de o worker sair"""
+    from server_lifecycle import lifecycle
+    
+    lifecycle.start_draining()
+    if not lifecycle.wait_idle(graceful_timeout):
+        server.log.warning(f"Worker {worker.pid} encerrado com {lifecycle.in_flight} job(s) em andamento")
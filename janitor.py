@@ -0,0 +1,272 @@
+"""
+Limpeza periódica dos PDFs: retenção, reconciliação e arquivos órfãos
+
+Uma passada do janitor:
+    1. Exclui os documentos cujo prazo de retenção venceu (PDF, prévias,
+       Markdown guardado e registro)
+    2. Reconcilia o banco de documentos com o disco: exclui PDFs sem registro,
+       prévias sem PDF e arquivos temporários abandonados (após um prazo de
+       carência, para não disputar com renderizações em andamento) e marca
+       como 'missing' os documentos cujo PDF sumiu
+    3. Compacta o armazenamento de Markdown quando houve exclusões
+    4. Remove os checkpoints de geração abandonados há mais de CHECKPOINT_TTL
+       segundos (padrão 7 dias)
+
+As exclusões são limitadas por segundo, para que a limpeza não concorra com
+as renderizações pelo disco. Um arquivo de trava garante uma única passada
+por vez entre processos.
+
+Uso:
+    python janitor.py          # Executa continuamente (intervalo JANITOR_INTERVAL ou 3600 s)
+    python janitor.py --once   # Executa uma única passada
+
+Configuração (variáveis de ambiente):
+    RETENTION_DAYS         Retenção padrão em dias (padrão 0, manter para sempre)
+    RETENTION_POLICY       JSON com retenção em dias por tipo e por tenant, ex.:
+                           {"doc_type": {"dicas": 30}, "tenant": {"acme": 365}}
+    ORPHAN_GRACE_SECONDS   Idade mínima de um arquivo órfão para ser excluído (padrão 3600)
+    JANITOR_DELETE_RATE    Exclusões por segundo (padrão 10)
+    JANITOR_INTERVAL       Intervalo entre passadas; na API, 0 desativa (padrão 0)
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+from typing import Dict, Any, Optional
+
+from content_generation import CheckpointStore, CHECKPOINT_TTL
+from content_store import ContentStore
+from document_store import DocumentStore
+from metrics import metrics
+from preview_generator import PreviewGenerator
+from search_index import SearchIndex
+from settings import PDF_FOLDER, DOCUMENT_STORE_PATH, SEARCH_INDEX_PATH, CONTENT_STORE_FOLDER, CHECKPOINT_FOLDER
+from storage import FileStorage, file_lock
+
+RETENTION_DAYS = float(os.getenv('RETENTION_DAYS', '0'))
+RETENTION_POLICY = json.loads(os.getenv('RETENTION_POLICY', '{}'))
+ORPHAN_GRACE_SECONDS = float(os.getenv('ORPHAN_GRACE_SECONDS', '3600'))
+JANITOR_DELETE_RATE = float(os.getenv('JANITOR_DELETE_RATE', '10'))
+
+# Prévias geradas ao lado do PDF (ver PreviewGenerator)
+PREVIEW_PATTERN = re.compile(r'^(?P<pdf>.+\.pdf)\.(thumb|sprite)\.\w+$')
+
+# Arquivos temporários da geração (HTML intermediário, gravações atômicas e otimização)
+TEMP_PATTERN = re.compile(r'\.pdf\.html$|\.(tmp|opt)[\d-]+$')
+
+class RateLimiter:
+    """Balde de fichas simples: no máximo `rate` operações por segundo"""
+    
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = time.monotonic()
+    
+    def wait(self) -> None:
+        """Espera até a próxima operação ser permitida"""
+        if self.interval <= 0:
+            return
+        now = time.monotonic()
+        if self._next > now:
+            time.sleep(self._next - now)
+        self._next = max(now, self._next) + self.interval
+
+class Janitor:
+    """Aplica a retenção e reconcilia o banco de documentos com o disco"""
+    
+    def __init__(self, store: DocumentStore, storage: FileStorage, delete_rate: float = JANITOR_DELETE_RATE,
+                 orphan_grace: float = ORPHAN_GRACE_SECONDS, lock_path: Optional[str] = None,
+                 search_index: Optional[SearchIndex] = None, content_store: Optional[ContentStore] = None,
+                 checkpoints: Optional[CheckpointStore] = None, checkpoint_ttl: float = CHECKPOINT_TTL):
+        self.store = store
+        self.storage = storage
+        self.search_index = search_index
+        self.content_store = content_store
+        self.checkpoints = checkpoints
+        self.checkpoint_ttl = checkpoint_ttl
+        self.orphan_grace = orphan_grace
+        self.lock_path = lock_path or os.path.join(storage.root, '.janitor.lock')
+        self._limiter = RateLimiter(delete_rate)
+        self._stop = threading.Event()
+    
+    @staticmethod
+    def retention_seconds(doc: Dict[str, Any]) -> Optional[float]:
+        """
+        Retorna o prazo de retenção de um documento
+        
+        A política do tenant prevalece sobre a do tipo de documento, que
+        prevalece sobre RETENTION_DAYS.
+        
+        Args:
+            doc: Informações do documento
+        
+        Returns:
+            Prazo em segundos ou None para manter para sempre
+        """
+        days = RETENTION_POLICY.get('tenant', {}).get(doc.get('tenant'))
+        if days is None:
+            days = RETENTION_POLICY.get('doc_type', {}).get(doc.get('doc_type'))
+        if days is None:
+            days = RETENTION_DAYS
+        return days * 86400 if days and days > 0 else None
+    
+    def run_once(self) -> Dict[str, Any]:
+        """
+        Executa uma passada completa, se nenhum outro processo estiver executando
+        
+        Returns:
+            Relatório da passada (ou {'skipped': True})
+        """
+        with file_lock(self.lock_path, blocking=False) as acquired:
+            if not acquired:
+                return {'skipped': True}
+            
+            started = time.monotonic()
+            report = {'expired': 0, 'orphans': 0, 'previews': 0, 'temp_files': 0, 'missing': 0, 'checkpoints': 0, 'bytes_freed': 0}
+            self._expire_documents(report)
+            self._reconcile(report)
+            self._expire_checkpoints(report)
+            if self.content_store is not None:
+                # Compactar após expirar documentos; os pacotes aposentados saem do disco após a carência
+                if report['expired']:
+                    report['content_bytes_freed'] = self.content_store.compact()['bytes_freed']
+                else:
+                    report['content_bytes_freed'] = self.content_store.purge_packs()
+            report['seconds'] = round(time.monotonic() - started, 2)
+            
+            metrics.increment('janitor_bytes_freed', report['bytes_freed'])
+            metrics.observe('janitor_pass_seconds', report['seconds'])
+            return report
+    
+    def _expire_documents(self, report: Dict[str, Any]) -> None:
+        """Exclui os documentos com retenção vencida"""
+        now = time.time()
+        expired = []
+        for doc, created_at in self.store.iter_documents():
+            retention = Janitor.retention_seconds(doc)
+            if retention is not None and now - created_at > retention:
+                expired.append(doc)
+        
+        for doc in expired:
+            if self._stop.is_set():
+                return
+            if self.store.delete_document(doc['id']) is None:
+                continue  # Já excluído pela API
+            
+            # Documentos idênticos compartilham o PDF: só o último a expirar o exclui
+            pdf_path = self.storage.path_for(doc['file_path'])
+            size = os.path.getsize(pdf_path) if os.path.exists(pdf_path) else 0
+            freed = 0
+            if not self.store.is_file_referenced(doc['file_path']):
+                freed = self._delete_file(pdf_path)
+                PreviewGenerator.delete(pdf_path)
+            if self.search_index is not None:
+                self.search_index.remove_document(doc['id'])
+            if self.content_store is not None:
+                self.content_store.delete_document(doc['id'])
+            if size:
+                self.store.record_usage(doc.get('tenant', 'default'), bytes_stored=-size)
+            report['expired'] += 1
+            report['bytes_freed'] += freed
+    
+    def _reconcile(self, report: Dict[str, Any]) -> None:
+        """Remove arquivos sem registro e marca registros sem arquivo"""
+        referenced = set()
+        for doc, _ in self.store.iter_documents():
+            referenced.add(doc['file_path'])
+            if doc.get('status') == 'done' and not self.storage.exists(doc['file_path']):
+                self.store.update_document(doc['id'], status='missing')
+                report['missing'] += 1
+        
+        cutoff = time.time() - self.orphan_grace
+        for entry in self.storage.iter_files():
+            if self._stop.is_set():
+                return
+            if entry.stat(follow_symlinks=False).st_mtime > cutoff:
+                continue
+            
+            preview = PREVIEW_PATTERN.match(entry.name)
+            if entry.name.endswith('.pdf'):
+                if self.storage.key_for(entry.path) in referenced:
+                    continue
+                kind = 'orphans'
+                PreviewGenerator.delete(entry.path)
+            elif preview:
+                # Já excluída junto com o PDF órfão, ou o PDF ainda existe
+                if not os.path.exists(entry.path) or os.path.exists(os.path.join(os.path.dirname(entry.path), preview.group('pdf'))):
+                    continue
+                kind = 'previews'
+            elif TEMP_PATTERN.search(entry.name):
+                kind = 'temp_files'
+            else:
+                continue
+            
+            report[kind] += 1
+            report['bytes_freed'] += self._delete_file(entry.path)
+    
+    def _expire_checkpoints(self, report: Dict[str, Any]) -> None:
+        """Exclui os checkpoints de gerações abandonadas"""
+        if self.checkpoints is None or self.checkpoint_ttl <= 0:
+            return
+        for path in list(self.checkpoints.iter_stale(self.checkpoint_ttl)):
+            report['checkpoints'] += 1
+            report['bytes_freed'] += self._delete_file(path)
+    
+    def _delete_file(self, path: str) -> int:
+        """Exclui um arquivo respeitando o limite de exclusões por segundo"""
+        self._limiter.wait()
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return 0
+        metrics.increment('janitor_deleted_files')
+        return size
+    
+    def run(self, interval: float) -> None:
+        """Executa passadas a cada `interval` segundos até stop()"""
+        while not self._stop.is_set():
+            try:
+                report = self.run_once()
+                if not report.get('skipped'):
+                    print(f"Janitor: {report}")
+            except Exception as e:
+                print(f"Erro na limpeza: {str(e)}")
+            self._stop.wait(interval)
+    
+    def start_background(self, interval: float) -> threading.Thread:
+        """
+        Executa o janitor em uma thread de segundo plano
+        
+        Args:
+            interval: Intervalo entre passadas em segundos
+        
+        Returns:
+            Thread iniciada
+        """
+        thread = threading.Thread(target=self.run, args=(interval,), name='janitor', daemon=True)
+        thread.start()
+        return thread
+    
+    def stop(self, *args) -> None:
+        """Interrompe o janitor ao fim da operação atual"""
+        self._stop.set()
+
+if __name__ == '__main__':
+    # Prioridade baixa de CPU (e, na maioria dos escalonadores de disco, de E/S)
+    if hasattr(os, 'nice'):
+        os.nice(int(os.getenv('JANITOR_NICE', '10')))
+    
+    janitor = Janitor(DocumentStore(DOCUMENT_STORE_PATH), FileStorage(PDF_FOLDER),
+                      search_index=SearchIndex(SEARCH_INDEX_PATH), content_store=ContentStore(CONTENT_STORE_FOLDER),
+                      checkpoints=CheckpointStore(CHECKPOINT_FOLDER))
+    
+    if '--once' in sys.argv:
+        print(janitor.run_once())
+    else:
+        import signal
+        signal.signal(signal.SIGTERM, janitor.stop)
+        signal.signal(signal.SIGINT, janitor.stop)
+        janitor.run(float(os.getenv('JANITOR_INTERVAL', '0')) or 3600)
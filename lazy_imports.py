@@ -0,0 +1,151 @@
+"""
+Carregamento sob demanda e pré-aquecimento das dependências pesadas
+
+As dependências pesadas (WeasyPrint, Markdown, Pygments, Requests) são
+importadas apenas no primeiro uso. Processos que sabem o seu papel podem
+pré-aquecê-las em segundo plano para que a primeira requisição não pague o
+custo da importação.
+
+Relatório de tempo de importação:
+    python lazy_imports.py [papel]
+"""
+
+import importlib
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# Dependências pesadas usadas na conversão e renderização do PDF
+RENDER_MODULES = [
+    'markdown',
+    'markdown.extensions.tables',
+    'markdown.extensions.fenced_code',
+    'markdown.extensions.codehilite',
+    'markdown.extensions.toc',
+    'markdown.extensions.nl2br',
+    'pygments',
+    'pygments.formatters.html',
+    'pygments.lexers',
+    'weasyprint',
+]
+
+# Dependências usadas nas chamadas às APIs de IA
+API_MODULES = [
+    'requests',
+]
+
+# Módulos a pré-aquecer para cada papel do processo
+ROLE_MODULES = {
+    'api': API_MODULES,
+    'render': RENDER_MODULES,
+    'all': API_MODULES + RENDER_MODULES,
+}
+
+def get_process_role() -> str:
+    """
+    Retorna o papel do processo definido em PROCESS_ROLE
+    
+    Returns:
+        'api', 'render' ou 'all' (padrão)
+    """
+    role = os.getenv('PROCESS_ROLE', 'all').lower()
+    return role if role in ROLE_MODULES else 'all'
+
+def prewarm(role: Optional[str] = None, background: bool = True) -> Optional[threading.Thread]:
+    """
+    Importa antecipadamente as dependências pesadas de um papel
+    
+    Args:
+        role: Papel do processo ('api', 'render', 'all'); padrão: PROCESS_ROLE
+        background: Se True, importa em uma thread daemon e retorna imediatamente
+    
+    Returns:
+        Thread de pré-aquecimento (ou None se executado de forma síncrona)
+    """
+    modules = ROLE_MODULES[role or get_process_role()]
+    
+    if not background:
+        _import_all(modules)
+        return None
+    
+    thread = threading.Thread(target=_import_all, args=(modules,), name='prewarm-imports', daemon=True)
+    thread.start()
+    return thread
+
+def _import_all(modules: List[str]) -> Dict[str, float]:
+    """Importa os módulos, ignorando os ausentes, e retorna o tempo gasto em cada um"""
+    timings = {}
+    for module_name in modules:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(module_name)
+        except Exception as e:
+            print(f"Não foi possível pré-carregar {module_name}: {str(e)}")
+            continue
+        timings[module_name] = time.perf_counter() - start
+    return timings
+
+def import_profile(modules: Optional[List[str]] = None, top: int = 5) -> List[Dict[str, Any]]:
+    """
+    Mede o tempo de importação a frio de cada módulo em um interpretador novo
+    
+    Usa `python -X importtime`, de modo que módulos já carregados neste
+    processo não distorcem a medição.
+    
+    Args:
+        modules: Módulos a medir (padrão: todas as dependências pesadas e a aplicação)
+        top: Quantidade de submódulos mais lentos a listar por módulo
+    
+    Returns:
+        Lista de dicionários (module, seconds, slowest) ordenada do mais lento para o mais rápido
+    """
+    if modules is None:
+        modules = ROLE_MODULES['all'] + ['app']
+    
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    report = []
+    
+    for module_name in modules:
+        script = (
+            'import time; start = time.perf_counter(); '
+            f'import {module_name}; '
+            'print(time.perf_counter() - start)'
+        )
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', script],
+            cwd=project_dir,
+            capture_output=True,
+            text=True
+        )
+        
+        if result.returncode != 0:
+            print(f"Falha ao medir a importação de {module_name}")
+            continue
+        
+        # Cada linha: "import time: self [us] | cumulative | imported package"
+        self_times = []
+        for line in result.stderr.splitlines():
+            match = re.match(r'import time:\s+(\d+)\s+\|\s+\d+\s+\|\s+(\S+)', line)
+            if match:
+                self_times.append((match.group(2), int(match.group(1)) / 1_000_000))
+        
+        report.append({
+            'module': module_name,
+            'seconds': float(result.stdout.strip().splitlines()[-1]),
+            'slowest': sorted(self_times, key=lambda item: item[1], reverse=True)[:top]
+        })
+    
+    return sorted(report, key=lambda item: item['seconds'], reverse=True)
+
+if __name__ == '__main__':
+    role = sys.argv[1] if len(sys.argv) > 1 else None
+    modules = ROLE_MODULES[role] if role in ROLE_MODULES else None
+    
+    for entry in import_profile(modules):
+        print(f"{entry['seconds'] * 1000:10.1f} ms  {entry['module']}")
+        for name, seconds in entry['slowest']:
+            print(f"{'':14}{seconds * 1000:8.1f} ms  {name}")
@@ -0,0 +1,91 @@
+"""
+Teste de carga offline das etapas de geração, validação, HTML e PDF
+
+Usa o provedor simulado (sem rede e determinístico) para produzir documentos
+de tamanho realista e mede o tempo de cada etapa do pipeline.
+
+Uso:
+    python load_test.py [documentos] [páginas] [tipo] [idioma]
+
+A configuração do provedor simulado vem das variáveis SIMULATED_* (ver
+ai_models.SimulatedModel); LOAD_TEST_RENDER=1 inclui a renderização do PDF.
+"""
+
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from ai_models import AIModelFactory
+from content_validator import ContentValidator, StreamingValidator
+from document_templates import TemplateFactory
+from token_budget import TokenBudget
+
+def run(documents: int, page_count: int, doc_type: str, language: str, render: bool = False) -> Dict[str, List[float]]:
+    """
+    Gera os documentos e mede cada etapa
+    
+    Args:
+        documents: Número de documentos
+        page_count: Número de páginas de cada documento
+        doc_type: Tipo de documento
+        language: Idioma do documento
+        render: Se True, também renderiza o PDF (requer WeasyPrint)
+    
+    Returns:
+        Dicionário com os tempos de cada etapa, em segundos
+    """
+    from pdf_generator import PdfGenerator
+    
+    timings = {'generate': [], 'validate': [], 'html': [], 'render': []}
+    template = TemplateFactory.create_template(doc_type, language)
+    plan = TokenBudget.plan(template, 'Teste de Carga', 'desempenho', page_count, 'simulated')
+    issues_seen = set()
+    
+    for index in range(documents):
+        # Cada documento usa uma semente diferente
+        os.environ['SIMULATED_SEED'] = str(index)
+        model = AIModelFactory.create_model('simulated', '')
+        
+        start = time.perf_counter()
+        content = '\n\n'.join(model.generate_content(call['prompt'], call['max_tokens']) for call in plan.calls)
+        timings['generate'].append(time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        validator = StreamingValidator(doc_type, language)
+        sections = list(validator.observe(ContentValidator.iter_enhanced_sections(content, doc_type, language)))
+        _, issues = validator.result()
+        issues_seen.update(issues)
+        timings['validate'].append(time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            html_path = os.path.join(tmp_dir, 'documento.html')
+            PdfGenerator.write_html(sections, html_path)
+            timings['html'].append(time.perf_counter() - start)
+            
+            if render:
+                start = time.perf_counter()
+                PdfGenerator.render_html_file(html_path, os.path.join(tmp_dir, 'documento.pdf'))
+                timings['render'].append(time.perf_counter() - start)
+    
+    for issue in sorted(issues_seen):
+        print(f"Aviso do validador: {issue}")
+    return timings
+
+if __name__ == '__main__':
+    documents = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    page_count = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    doc_type = sys.argv[3] if len(sys.argv) > 3 else 'ebook'
+    language = sys.argv[4] if len(sys.argv) > 4 else 'pt-BR'
+    
+    timings = run(documents, page_count, doc_type, language, os.getenv('LOAD_TEST_RENDER', '0') == '1')
+    
+    print(f"{documents} documentos de {page_count} páginas ({doc_type}, {language})")
+    for stage, values in timings.items():
+        if not values:
+            continue
+        values = sorted(values)
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+        print(f"{stage:10} média {sum(values) / len(values) * 1000:8.1f} ms   p95 {p95 * 1000:8.1f} ms")
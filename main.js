@@ -47,9 +47,57 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
     
+    // Pré-geração especulativa: quando título, tema e tipo estão preenchidos,
+    // o servidor começa a gerar o início do documento antes do envio
+    // (a sessão identifica este formulário: uma nova pré-geração substitui apenas a anterior dele)
+    let prewarmTimer = null;
+    let lastPrewarm = null;
+    const prewarmSession = (window.crypto && crypto.randomUUID) ? crypto.randomUUID() : Math.random().toString(36).slice(2);
+    
+    function getFormData() {
+        return {
+            title: document.getElementById('title').value,
+            theme: document.getElementById('theme').value,
+            ai_model: document.getElementById('ai_model').value,
+            doc_type: document.getElementById('doc_type').value,
+            page_count: parseInt(document.getElementById('page_count').value),
+            language: document.getElementById('language').value,
+            quality: document.getElementById('quality').value,
+            formats: Array.from(document.querySelectorAll('input[name="formats"]:checked')).map(input => input.value)
+        };
+    }
+    
+    function schedulePrewarm() {
+        clearTimeout(prewarmTimer);
+        prewarmTimer = setTimeout(function() {
+            const formData = getFormData();
+            if (!formData.title.trim() || !formData.theme.trim() || !formData.ai_model || !formData.doc_type) {
+                return;
+            }
+            
+            const payload = JSON.stringify(Object.assign({session: prewarmSession}, formData));
+            if (payload === lastPrewarm) {
+                return;
+            }
+            lastPrewarm = payload;
+            
+            fetch('/api/prewarm', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: payload
+            }).catch(() => {});  // Apenas otimização: erros são ignorados
+        }, 800);
+    }
+    
+    generatorForm.addEventListener('input', schedulePrewarm);
+    generatorForm.addEventListener('change', schedulePrewarm);
+    
     // Envio do formulário de geração
     generatorForm.addEventListener('submit', function(e) {
         e.preventDefault();
+        clearTimeout(prewarmTimer);
         
         // Mostrar status de geração
         generatorForm.style.display = 'none';
@@ -60,15 +108,7 @@ document.addEventListener('DOMContentLoaded', function() {
         simulateProgress();
         
         // Obter dados do formulário
-        const formData = {
-            title: document.getElementById('title').value,
-            theme: document.getElementById('theme').value,
-            ai_model: document.getElementById('ai_model').value,
-            doc_type: document.getElementById('doc_type').value,
-            page_count: parseInt(document.getElementById('page_count').value),
-            language: document.getElementById('language').value,
-            quality: document.getElementById('quality').value
-        };
+        const formData = getFormData();
         
         // Enviar requisição para o backend
         fetch('/api/generate', {
@@ -85,25 +125,14 @@ document.addEventListener('DOMContentLoaded', function() {
             return response.json();
         })
         .then(data => {
-            // Armazenar informações do documento
-            currentDocId = data.id;
-            currentFilePath = data.file_path;
-            
-            // Preencher resultado
-            document.getElementById('result-title').textContent = data.title;
-            document.getElementById('result-theme').textContent = data.theme;
-            document.getElementById('result-type').textContent = getDocTypeName(data.doc_type);
-            document.getElementById('result-size').textContent = data.page_count;
-            document.getElementById('result-ai').textContent = getAIModelName(data.ai_model);
-            document.getElementById('result-language').textContent = getLanguageName(data.language);
-            document.getElementById('result-date').textContent = data.created_at;
-            
-            // Configurar botão de download
-            downloadBtn.href = `/download/${data.file_path}`;
-            
-            // Mostrar resultado
-            generationStatus.style.display = 'none';
-            generationResult.style.display = 'block';
+            // Renderização enfileirada: aguardar o worker concluir
+            if (data.job_id && data.status !== 'done') {
+                return waitForJob(data.job_id).then(() => data);
+            }
+            return data;
+        })
+        .then(data => {
+            showResult(data);
         })
         .catch(error => {
             console.error('Erro:', error);
@@ -171,6 +200,9 @@ document.addEventListener('DOMContentLoaded', function() {
                         const row = document.createElement('tr');
                         
                         row.innerHTML = `
+                            <td>
+                                <img src="/thumbnail/${doc.file_path}" alt="" class="history-thumbnail" loading="lazy" width="60">
+                            </td>
                             <td>${doc.title}</td>
                             <td>${getDocTypeName(doc.doc_type)}</td>
                             <td>${getAIModelName(doc.ai_model)}</td>
@@ -260,6 +292,60 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
+    function showResult(data) {
+        // Armazenar informações do documento
+        currentDocId = data.id;
+        currentFilePath = data.file_path;
+        
+        // Preencher resultado
+        document.getElementById('result-title').textContent = data.title;
+        document.getElementById('result-theme').textContent = data.theme;
+        document.getElementById('result-type').textContent = getDocTypeName(data.doc_type);
+        document.getElementById('result-size').textContent = data.page_count;
+        document.getElementById('result-ai').textContent = getAIModelName(data.ai_model);
+        document.getElementById('result-language').textContent = getLanguageName(data.language);
+        document.getElementById('result-date').textContent = data.created_at;
+        
+        // Configurar botão de download
+        downloadBtn.href = `/download/${data.file_path}`;
+        
+        // Links para os formatos adicionais
+        const resultExports = document.getElementById('result-exports');
+        resultExports.innerHTML = '';
+        Object.entries(data.exports || {}).forEach(([format, filename]) => {
+            const link = document.createElement('a');
+            link.href = `/exports/${filename}`;
+            link.className = 'btn btn-secondary ml-2';
+            link.innerHTML = `<i class="fas fa-download"></i> ${format.toUpperCase()}`;
+            resultExports.appendChild(link);
+        });
+        
+        // Mostrar resultado
+        generationStatus.style.display = 'none';
+        generationResult.style.display = 'block';
+    }
+    
+    function waitForJob(jobId) {
+        // Consultar o status do job até a renderização terminar
+        return new Promise((resolve, reject) => {
+            const poll = function() {
+                fetch(`/api/jobs/${jobId}`)
+                    .then(response => response.json())
+                    .then(job => {
+                        if (job.status === 'done') {
+                            resolve(job);
+                        } else if (job.status === 'dead' || !job.status) {
+                            reject(new Error(job.error || 'Falha na renderização do documento'));
+                        } else {
+                            setTimeout(poll, 2000);
+                        }
+                    })
+                    .catch(reject);
+            };
+            poll();
+        });
+    }
+    
     function simulateProgress() {
         const progressBar = document.querySelector('.progress-bar');
         let width = 0;
@@ -0,0 +1,218 @@
+"""
+Registro simples de métricas do processo (contadores e resumos)
+
+Cada processo tem o seu registro. Para que /api/metrics mostre também as
+métricas dos workers de renderização e dos demais workers da API, cada
+processo grava periodicamente uma cópia das suas métricas em METRICS_FOLDER
+(MetricsExporter), e a API soma as cópias recentes (collect_snapshots).
+
+Configuração (variáveis de ambiente):
+    METRICS_EXPORT_INTERVAL  Intervalo entre gravações, em segundos; 0 desativa (padrão 15)
+    METRICS_EXPORT_TTL       Idade máxima de uma cópia para entrar na soma; cópias
+                             mais antigas (processos encerrados) são excluídas (padrão 300)
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from settings import METRICS_FOLDER
+from storage import temp_path
+
+METRICS_EXPORT_INTERVAL = float(os.getenv('METRICS_EXPORT_INTERVAL', '15'))
+METRICS_EXPORT_TTL = float(os.getenv('METRICS_EXPORT_TTL', '300'))
+
+def _metric_key(name: str, labels: Dict[str, Any]) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+    """Chave única de uma métrica com seus rótulos"""
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+class MetricsRegistry:
+    """Contadores e resumos (count/sum/min/max) seguros entre threads"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._summaries = {}
+    
+    def increment(self, name: str, value: float = 1, **labels) -> None:
+        """
+        Soma um valor a um contador
+        
+        Args:
+            name: Nome da métrica
+            value: Valor a somar
+            labels: Rótulos da métrica (ex.: quality='high')
+        """
+        key = _metric_key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+    
+    def observe(self, name: str, value: float, **labels) -> None:
+        """
+        Registra uma observação em um resumo
+        
+        Args:
+            name: Nome da métrica
+            value: Valor observado
+            labels: Rótulos da métrica
+        """
+        key = _metric_key(name, labels)
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                self._summaries[key] = {'count': 1, 'sum': value, 'min': value, 'max': value}
+            else:
+                summary['count'] += 1
+                summary['sum'] += value
+                summary['min'] = min(summary['min'], value)
+                summary['max'] = max(summary['max'], value)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Retorna uma cópia de todas as métricas
+        
+        Returns:
+            Dicionário com listas de 'counters' e 'summaries'
+        """
+        with self._lock:
+            counters = [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            summaries = [
+                dict(summary, name=name, labels=dict(labels), avg=summary['sum'] / summary['count'])
+                for (name, labels), summary in sorted(self._summaries.items())
+            ]
+        return {'counters': counters, 'summaries': summaries}
+
+def merge_snapshots(snapshots: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Soma as métricas de vários processos
+    
+    Args:
+        snapshots: Cópias retornadas por MetricsRegistry.snapshot()
+    
+    Returns:
+        Dicionário no mesmo formato, com os contadores somados e os resumos combinados
+    """
+    counters, summaries = {}, {}
+    for snapshot in snapshots:
+        for counter in snapshot.get('counters', []):
+            key = _metric_key(counter['name'], counter['labels'])
+            counters[key] = counters.get(key, 0) + counter['value']
+        for summary in snapshot.get('summaries', []):
+            key = _metric_key(summary['name'], summary['labels'])
+            merged = summaries.get(key)
+            if merged is None:
+                summaries[key] = {field: summary[field] for field in ('count', 'sum', 'min', 'max')}
+            else:
+                merged['count'] += summary['count']
+                merged['sum'] += summary['sum']
+                merged['min'] = min(merged['min'], summary['min'])
+                merged['max'] = max(merged['max'], summary['max'])
+    
+    return {
+        'counters': [
+            {'name': name, 'labels': dict(labels), 'value': value}
+            for (name, labels), value in sorted(counters.items())
+        ],
+        'summaries': [
+            dict(summary, name=name, labels=dict(labels), avg=summary['sum'] / summary['count'])
+            for (name, labels), summary in sorted(summaries.items())
+        ]
+    }
+
+def collect_snapshots(folder: str = METRICS_FOLDER, max_age: float = METRICS_EXPORT_TTL,
+                      exclude_pid: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Lê as cópias de métricas gravadas pelos processos
+    
+    Args:
+        folder: Pasta das cópias
+        max_age: Idade máxima em segundos; as cópias mais antigas são excluídas
+        exclude_pid: Processo a ignorar (o próprio, que usa o registro em memória)
+    
+    Returns:
+        Lista de cópias com 'role', 'pid', 'updated_at', 'counters' e 'summaries'
+    """
+    if not os.path.isdir(folder):
+        return []
+    
+    snapshots = []
+    cutoff = time.time() - max_age
+    for entry in os.scandir(folder):
+        if not entry.name.endswith('.json'):
+            continue
+        try:
+            with open(entry.path, 'r', encoding='utf-8') as snapshot_file:
+                snapshot = json.load(snapshot_file)
+        except (OSError, ValueError):
+            continue  # Excluída ou substituída durante a leitura
+        
+        if snapshot.get('updated_at', 0) < cutoff:
+            # Processo encerrado sem remover a cópia
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+        elif snapshot.get('pid') != exclude_pid:
+            snapshots.append(snapshot)
+    
+    return snapshots
+
+class MetricsExporter:
+    """Grava periodicamente as métricas do processo para a soma em /api/metrics"""
+    
+    def __init__(self, registry: MetricsRegistry, role: str, folder: str = METRICS_FOLDER):
+        self.registry = registry
+        self.role = role
+        self.folder = folder
+        self.path = os.path.join(folder, f"{role}-{os.getpid()}.json")
+        self._stop = threading.Event()
+    
+    def export(self) -> None:
+        """Grava a cópia atual (gravação atômica: os leitores nunca veem um arquivo pela metade)"""
+        os.makedirs(self.folder, exist_ok=True)
+        snapshot = dict(self.registry.snapshot(), role=self.role, pid=os.getpid(), updated_at=time.time())
+        tmp_path = temp_path(self.path)
+        with open(tmp_path, 'w', encoding='utf-8') as snapshot_file:
+            json.dump(snapshot, snapshot_file)
+        os.replace(tmp_path, self.path)
+    
+    def run(self, interval: float) -> None:
+        """Grava a cada `interval` segundos até stop(); ao parar, remove a cópia"""
+        while not self._stop.wait(interval):
+            try:
+                self.export()
+            except Exception as e:
+                print(f"Erro ao exportar métricas: {str(e)}")
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+    
+    def start_background(self, interval: float = METRICS_EXPORT_INTERVAL) -> Optional[threading.Thread]:
+        """
+        Executa a exportação em uma thread de segundo plano
+        
+        Args:
+            interval: Intervalo entre gravações em segundos (0 desativa)
+        
+        Returns:
+            Thread iniciada ou None se a exportação estiver desativada
+        """
+        if interval <= 0:
+            return None
+        self.export()
+        thread = threading.Thread(target=self.run, args=(interval,), name='metrics-exporter', daemon=True)
+        thread.start()
+        return thread
+    
+    def stop(self) -> None:
+        """Interrompe a exportação"""
+        self._stop.set()
+
+# Instância única por processo
+metrics = MetricsRegistry()
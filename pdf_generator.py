@@ -1,11 +1,279 @@
 """
 Serviço para geração de PDF a partir de conteúdo Markdown
+
+A renderização passa por um PdfRenderer por thread, que mantém aquecidos o
+WeasyPrint, a configuração de fontes e as folhas de estilos já analisadas
+(inclusive o CSS do realce de código do Pygments). Para medir o ganho por
+documento em relação a uma renderização a frio:
+
+    python pdf_generator.py [renderizações] [páginas]
 """
 
 import os
-import markdown
-from weasyprint import HTML, CSS
-from typing import Optional
+import re
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Iterable, Iterator, Tuple
+
+from pdf_optimizer import PdfOptimizer
+from quality_tiers import QUALITY_TIERS, get_tier
+from storage import temp_path
+
+# Estilo do Pygments usado nos blocos de código realçados pelo codehilite
+PYGMENTS_STYLE = os.getenv('PYGMENTS_STYLE', 'default')
+
+# Renderizações até o PdfRenderer ser recriado, limitando o crescimento dos caches de fontes
+RENDERER_RECYCLE_AFTER = int(os.getenv('RENDERER_RECYCLE_AFTER', '1000'))
+
+# Extensões para melhorar a conversão
+MARKDOWN_EXTENSIONS = [
+    'markdown.extensions.tables',
+    'markdown.extensions.fenced_code',
+    'markdown.extensions.codehilite',
+    'markdown.extensions.toc',
+    'markdown.extensions.nl2br'
+]
+
+# Sem realce de sintaxe (rascunho): os blocos de código saem como texto simples
+MARKDOWN_EXTENSIONS_PLAIN = [
+    extension for extension in MARKDOWN_EXTENSIONS if extension != 'markdown.extensions.codehilite'
+]
+
+# CSS básico para melhorar a aparência
+STYLESHEET_FULL = """
+        @page {
+            margin: 2.5cm 1.5cm;
+            @top-center {
+                content: '';
+            }
+            @bottom-center {
+                content: counter(page);
+            }
+        }
+        
+        body {
+            font-family: 'Arial', sans-serif;
+            line-height: 1.6;
+            margin: 0;
+            padding: 20px;
+            color: #333;
+        }
+        
+        h1, h2, h3, h4, h5, h6 {
+            color: #2c3e50;
+            margin-top: 1.5em;
+            margin-bottom: 0.5em;
+        }
+        
+        h1 {
+            font-size: 2.2em;
+            text-align: center;
+            page-break-before: always;
+            page-break-after: avoid;
+        }
+        
+        h1:first-of-type {
+            page-break-before: avoid;
+        }
+        
+        h2 {
+            font-size: 1.8em;
+            border-bottom: 1px solid #ddd;
+            padding-bottom: 0.3em;
+            page-break-after: avoid;
+        }
+        
+        h3 {
+            font-size: 1.5em;
+            page-break-after: avoid;
+        }
+        
+        p {
+            margin-bottom: 1em;
+            text-align: justify;
+        }
+        
+        ul, ol {
+            margin-bottom: 1em;
+        }
+        
+        li {
+            margin-bottom: 0.5em;
+        }
+        
+        table {
+            border-collapse: collapse;
+            width: 100%;
+            margin-bottom: 1em;
+        }
+        
+        th, td {
+            border: 1px solid #ddd;
+            padding: 8px;
+        }
+        
+        th {
+            background-color: #f2f2f2;
+            text-align: left;
+        }
+        
+        img {
+            max-width: 100%;
+            height: auto;
+        }
+        
+        blockquote {
+            border-left: 4px solid #ddd;
+            padding-left: 1em;
+            color: #666;
+            margin-left: 0;
+        }
+        
+        code {
+            background-color: #f5f5f5;
+            padding: 0.2em 0.4em;
+            border-radius: 3px;
+            font-family: monospace;
+        }
+        
+        pre {
+            background-color: #f5f5f5;
+            padding: 1em;
+            border-radius: 5px;
+            overflow-x: auto;
+        }
+        
+        a {
+            color: #3498db;
+            text-decoration: none;
+        }
+        
+        hr {
+            border: 0;
+            border-top: 1px solid #eee;
+            margin: 2em 0;
+        }
+        
+        .page-break {
+            page-break-after: always;
+        }
+"""
+
+# CSS mínimo do rascunho, sem quebras de página por capítulo
+STYLESHEET_SIMPLE = """
+        @page {
+            margin: 2cm 1.5cm;
+            @bottom-center {
+                content: counter(page);
+            }
+        }
+        
+        body {
+            font-family: sans-serif;
+            line-height: 1.5;
+            color: #333;
+        }
+        
+        table {
+            border-collapse: collapse;
+            width: 100%;
+        }
+        
+        th, td {
+            border: 1px solid #ddd;
+            padding: 4px;
+        }
+        
+        pre {
+            white-space: pre-wrap;
+        }
+"""
+
+# Folhas de estilos por nome (ver quality_tiers.QUALITY_TIERS)
+STYLESHEETS = {
+    'full': STYLESHEET_FULL,
+    'simple': STYLESHEET_SIMPLE,
+}
+
+# Início do documento HTML, com o CSS embutido
+HTML_HEAD = f"""<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Documento Gerado</title>
+    <style>{STYLESHEET_FULL}    </style>
+</head>
+<body>
+"""
+
+# Início do documento HTML do rascunho
+HTML_HEAD_SIMPLE = f"""<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <title>Documento Gerado</title>
+    <style>{STYLESHEET_SIMPLE}    </style>
+</head>
+<body>
+"""
+
+# Início do documento HTML sem CSS: as folhas de estilos já analisadas são
+# passadas pelo PdfRenderer, em vez de analisadas de novo a cada documento
+HTML_HEAD_BARE = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <title>Documento Gerado</title>
+</head>
+<body>
+"""
+
+# Inícios do documento por folha de estilos
+HTML_HEADS = {
+    'full': HTML_HEAD,
+    'simple': HTML_HEAD_SIMPLE,
+}
+
+# Fim do documento HTML
+HTML_TAIL = """</body>
+</html>
+"""
+
+# Linha com a definição de um link por referência ([rótulo]: url), filtro
+# rápido antes de analisar a seção com o Markdown
+REFERENCE_PATTERN = re.compile(r'^ {0,3}\[[^\[\]]+\]:', re.MULTILINE)
+
+class SharedIdsTreeprocessor:
+    """
+    Mantém únicos, entre as seções de um documento, os ids gerados pelo toc
+    
+    Cada seção é convertida separadamente, e o toc só garante ids únicos
+    dentro da seção. Este processador roda logo depois dele e renomeia os ids
+    já usados em seções anteriores (exemplo -> exemplo_1), corrigindo os
+    links da própria seção para o id renomeado.
+    """
+    
+    def __init__(self):
+        from markdown.extensions.toc import unique
+        self._unique = unique
+        self.used_ids = set()
+    
+    def run(self, root) -> None:
+        renamed = {}
+        for element in root.iter():
+            element_id = element.get('id')
+            if element_id:
+                unique_id = self._unique(element_id, self.used_ids)
+                if unique_id != element_id:
+                    element.set('id', unique_id)
+                    renamed[f"#{element_id}"] = f"#{unique_id}"
+        
+        if renamed:
+            for link in root.iter('a'):
+                if link.get('href') in renamed:
+                    link.set('href', renamed[link.get('href')])
 
 class PdfGenerator:
     """Classe para geração de PDF a partir de conteúdo Markdown"""
@@ -21,160 +289,109 @@ class PdfGenerator:
         Returns:
             Conteúdo em formato HTML
         """
-        # Extensões para melhorar a conversão
-        extensions = [
-            'markdown.extensions.tables',
-            'markdown.extensions.fenced_code',
-            'markdown.extensions.codehilite',
-            'markdown.extensions.toc',
-            'markdown.extensions.nl2br'
-        ]
-        
-        html = markdown.markdown(markdown_content, extensions=extensions)
-        
-        # Adicionar CSS básico para melhorar a aparência
-        html_template = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>Documento Gerado</title>
-            <style>
-                @page {{
-                    margin: 2.5cm 1.5cm;
-                    @top-center {{
-                        content: '';
-                    }}
-                    @bottom-center {{
-                        content: counter(page);
-                    }}
-                }}
-                
-                body {{
-                    font-family: 'Arial', sans-serif;
-                    line-height: 1.6;
-                    margin: 0;
-                    padding: 20px;
-                    color: #333;
-                }}
-                
-                h1, h2, h3, h4, h5, h6 {{
-                    color: #2c3e50;
-                    margin-top: 1.5em;
-                    margin-bottom: 0.5em;
-                }}
-                
-                h1 {{
-                    font-size: 2.2em;
-                    text-align: center;
-                    page-break-before: always;
-                    page-break-after: avoid;
-                }}
-                
-                h1:first-of-type {{
-                    page-break-before: avoid;
-                }}
-                
-                h2 {{
-                    font-size: 1.8em;
-                    border-bottom: 1px solid #ddd;
-                    padding-bottom: 0.3em;
-                    page-break-after: avoid;
-                }}
-                
-                h3 {{
-                    font-size: 1.5em;
-                    page-break-after: avoid;
-                }}
-                
-                p {{
-                    margin-bottom: 1em;
-                    text-align: justify;
-                }}
-                
-                ul, ol {{
-                    margin-bottom: 1em;
-                }}
-                
-                li {{
-                    margin-bottom: 0.5em;
-                }}
-                
-                table {{
-                    border-collapse: collapse;
-                    width: 100%;
-                    margin-bottom: 1em;
-                }}
-                
-                th, td {{
-                    border: 1px solid #ddd;
-                    padding: 8px;
-                }}
-                
-                th {{
-                    background-color: #f2f2f2;
-                    text-align: left;
-                }}
-                
-                img {{
-                    max-width: 100%;
-                    height: auto;
-                }}
-                
-                blockquote {{
-                    border-left: 4px solid #ddd;
-                    padding-left: 1em;
-                    color: #666;
-                    margin-left: 0;
-                }}
-                
-                code {{
-                    background-color: #f5f5f5;
-                    padding: 0.2em 0.4em;
-                    border-radius: 3px;
-                    font-family: monospace;
-                }}
-                
-                pre {{
-                    background-color: #f5f5f5;
-                    padding: 1em;
-                    border-radius: 5px;
-                    overflow-x: auto;
-                }}
-                
-                a {{
-                    color: #3498db;
-                    text-decoration: none;
-                }}
-                
-                hr {{
-                    border: 0;
-                    border-top: 1px solid #eee;
-                    margin: 2em 0;
-                }}
-                
-                .page-break {{
-                    page-break-after: always;
-                }}
-            </style>
-        </head>
-        <body>
-            {html}
-        </body>
-        </html>
-        """
-        
-        return html_template
+        return ''.join(PdfGenerator.iter_html([markdown_content]))
     
     @staticmethod
-    def generate_pdf(markdown_content: str, output_path: str) -> str:
+    def iter_html(sections: Iterable[str], quality: str = 'high', embed_styles: bool = True) -> Iterator[str]:
         """
-        Gera um arquivo PDF a partir de conteúdo Markdown
+        Converte seções Markdown para HTML, uma de cada vez
+        
+        As seções formam um único documento: os ids dos cabeçalhos são únicos
+        no documento inteiro, e um link por referência vale em qualquer seção
+        depois da sua definição. Com uma lista de seções, as definições são
+        coletadas antes e valem também nas seções anteriores; com um gerador
+        (conteúdo ainda em geração), não, para não atrasar a conversão até o
+        fim do conteúdo.
         
         Args:
-            markdown_content: Conteúdo em formato Markdown
+            sections: Iterável de seções em formato Markdown
+            quality: Nível de qualidade, define o realce de sintaxe e a folha de estilos
+            embed_styles: Se False, o HTML sai sem CSS (as folhas de estilos são passadas pelo PdfRenderer)
+            
+        Returns:
+            Gerador de fragmentos do documento HTML completo
+        """
+        # Importação sob demanda: o Markdown só é carregado por quem converte documentos
+        import markdown
+        
+        tier = get_tier(quality)
+        md = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS if tier['syntax_highlight'] else MARKDOWN_EXTENSIONS_PLAIN)
+        md.treeprocessors.register(SharedIdsTreeprocessor(), 'shared_ids', 4)  # Logo depois do toc (5)
+        
+        references = {}
+        collected = isinstance(sections, (list, tuple))
+        if collected:
+            for section in sections:
+                references.update(PdfGenerator._collect_references(md, section))
+        
+        yield HTML_HEADS[tier['stylesheet']] if embed_styles else HTML_HEAD_BARE
+        for section in sections:
+            if not collected:
+                references.update(PdfGenerator._collect_references(md, section))
+            md.reset()
+            md.references.update(references)
+            yield md.convert(section)
+            yield '\n'
+        yield HTML_TAIL
+    
+    @staticmethod
+    def _collect_references(md, section: str) -> Dict[str, Tuple[str, str]]:
+        """
+        Coleta as definições de links por referência de uma seção
+        
+        Só as etapas de bloco do Markdown rodam (sem a conversão inline), e
+        apenas nas seções com alguma linha que pareça uma definição; as
+        definições dentro de blocos de código são ignoradas pelo próprio Markdown.
+        
+        Args:
+            md: Instância do Markdown usada na conversão (é reiniciada)
+            section: Seção em formato Markdown
+        
+        Returns:
+            Dicionário rótulo -> (url, título)
+        """
+        if not REFERENCE_PATTERN.search(section):
+            return {}
+        
+        md.reset()
+        lines = section.split('\n')
+        for preprocessor in md.preprocessors:
+            lines = preprocessor.run(lines)
+        md.parser.parseDocument(lines)
+        return dict(md.references)
+    
+    @staticmethod
+    def write_html(sections: Iterable[str], html_path: str, quality: str = 'high', embed_styles: bool = True) -> str:
+        """
+        Grava o HTML do documento em disco seção a seção
+        
+        Args:
+            sections: Iterável de seções em formato Markdown
+            html_path: Caminho para salvar o arquivo HTML
+            quality: Nível de qualidade, define o realce de sintaxe e a folha de estilos
+            embed_styles: Se False, o HTML sai sem CSS (as folhas de estilos são passadas pelo PdfRenderer)
+            
+        Returns:
+            Caminho do arquivo HTML gerado
+        """
+        os.makedirs(os.path.dirname(html_path), exist_ok=True)
+        
+        with open(html_path, 'w', encoding='utf-8') as html_file:
+            for fragment in PdfGenerator.iter_html(sections, quality, embed_styles):
+                html_file.write(fragment)
+        
+        return html_path
+    
+    @staticmethod
+    def render_html_file(html_path: str, output_path: str, quality: str = 'high', external_styles: bool = False) -> str:
+        """
+        Gera um arquivo PDF otimizado a partir de um arquivo HTML
+        
+        Args:
+            html_path: Caminho do arquivo HTML
             output_path: Caminho para salvar o arquivo PDF
+            quality: Nível de qualidade ('draft', 'standard', 'high', 'premium'), define a otimização
+            external_styles: Se True, aplica as folhas de estilos do nível (HTML gravado com embed_styles=False)
             
         Returns:
             Caminho do arquivo PDF gerado
@@ -182,10 +399,251 @@ class PdfGenerator:
         # Criar diretório se não existir
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         
-        # Converter Markdown para HTML
-        html_content = PdfGenerator.markdown_to_html(markdown_content)
+        # Gerar e otimizar em um arquivo temporário; o PDF só aparece no destino completo
+        tmp_path = temp_path(output_path)
+        try:
+            get_renderer().render(html_path, tmp_path, quality, external_styles)
+            
+            # Reduzir o tamanho do arquivo (fontes, recursos repetidos, imagens, linearização)
+            PdfOptimizer.optimize(tmp_path, quality)
+            os.replace(tmp_path, output_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
         
-        # Gerar PDF com WeasyPrint
-        HTML(string=html_content).write_pdf(output_path)
+        return output_path
+    
+    @staticmethod
+    def generate_pdf(markdown_content, output_path: str, quality: str = 'high') -> str:
+        """
+        Gera um arquivo PDF a partir de conteúdo Markdown
+        
+        Args:
+            markdown_content: Conteúdo em formato Markdown ou iterável de seções
+            output_path: Caminho para salvar o arquivo PDF
+            quality: Nível de qualidade ('draft', 'standard', 'high', 'premium')
+            
+        Returns:
+            Caminho do arquivo PDF gerado
+        """
+        sections = [markdown_content] if isinstance(markdown_content, str) else markdown_content
+        html_path = temp_path(output_path + '.html')
+        
+        try:
+            # Converter Markdown para HTML em disco, seção a seção
+            PdfGenerator.write_html(sections, html_path, quality, embed_styles=False)
+            return PdfGenerator.render_html_file(html_path, output_path, quality, external_styles=True)
+        finally:
+            if os.path.exists(html_path):
+                os.remove(html_path)
+
+# HTML de aquecimento: títulos, texto, tabela e código, para carregar as fontes usadas pelos documentos
+WARMUP_HTML = """<!DOCTYPE html>
+<html>
+<head><meta charset="UTF-8"></head>
+<body>
+<h1>Aquecimento</h1>
+<h2>Seção</h2>
+<p>Texto com <strong>negrito</strong>, <em>itálico</em> e <code>código</code>: áéíóú çãõ.</p>
+<table><tr><th>Coluna</th><th>Valor</th></tr><tr><td>a</td><td>1</td></tr></table>
+<div class="codehilite"><pre><span class="k">def</span> <span class="nf">f</span>(<span class="n">x</span>): <span class="k">return</span> <span class="mi">1</span></pre></div>
+</body>
+</html>
+"""
+
+# CSS do Pygments para o codehilite, gerado uma vez por processo
+_pygments_css: Optional[str] = None
+
+def pygments_css() -> str:
+    """
+    Retorna o CSS do realce de sintaxe dos blocos de código (classe .codehilite)
+    
+    Returns:
+        Regras CSS do estilo PYGMENTS_STYLE
+    """
+    global _pygments_css
+    if _pygments_css is None:
+        from pygments.formatters import HtmlFormatter
+        _pygments_css = HtmlFormatter(style=PYGMENTS_STYLE).get_style_defs('.codehilite')
+    return _pygments_css
+
+def stylesheet_css(quality: str) -> str:
+    """
+    CSS aplicado a um nível de qualidade, com o do Pygments se houver realce de sintaxe
+    
+    Args:
+        quality: Nível de qualidade
+    
+    Returns:
+        Regras CSS da folha de estilos do nível
+    """
+    tier = get_tier(quality)
+    return STYLESHEETS[tier['stylesheet']] + (pygments_css() if tier['syntax_highlight'] else '')
+
+class PdfRenderer:
+    """
+    Renderizador do WeasyPrint reaproveitado entre documentos
+    
+    A configuração de fontes (FontConfiguration) e as folhas de estilos
+    analisadas são criadas uma vez e reutilizadas; warm() ainda renderiza um
+    documento pequeno com cada folha de estilos, para que a busca de fontes
+    do fontconfig/Pango não aconteça no primeiro documento real. Os objetos
+    do Pango não devem ser compartilhados entre threads: use get_renderer(),
+    que mantém um renderizador por thread.
+    """
+    
+    def __init__(self):
+        self.font_config = None
+        self.renders = 0
+        self.warm_seconds = 0.0
+        self._stylesheets: Dict[tuple, List] = {}
+    
+    def warm(self) -> 'PdfRenderer':
+        """
+        Carrega o WeasyPrint, as fontes e as folhas de estilos de todos os níveis (apenas na primeira chamada)
         
+        Returns:
+            O próprio renderizador
+        """
+        if self.font_config is not None:
+            return self
+        
+        started = time.perf_counter()
+        # Importação sob demanda: o WeasyPrint (cairo/pango, fontes) domina o tempo de inicialização
+        from weasyprint import HTML
+        try:
+            from weasyprint.text.fonts import FontConfiguration
+        except ImportError:
+            from weasyprint.fonts import FontConfiguration  # WeasyPrint anterior ao 53
+        
+        self.font_config = FontConfiguration()
+        try:
+            warmed = set()
+            for quality in QUALITY_TIERS:
+                stylesheets = self.stylesheets(quality)
+                if id(stylesheets) not in warmed:
+                    warmed.add(id(stylesheets))
+                    HTML(string=WARMUP_HTML).write_pdf(stylesheets=stylesheets, font_config=self.font_config)
+        except Exception:
+            # Aquecimento incompleto: a próxima chamada tenta de novo
+            self.font_config = None
+            self._stylesheets = {}
+            raise
+        
+        self.warm_seconds = time.perf_counter() - started
+        return self
+    
+    def stylesheets(self, quality: str) -> List:
+        """
+        Folhas de estilos analisadas de um nível de qualidade (com o CSS do Pygments, se houver realce)
+        
+        Args:
+            quality: Nível de qualidade
+        
+        Returns:
+            Lista de weasyprint.CSS, compartilhada entre os níveis com o mesmo estilo
+        """
+        tier = get_tier(quality)
+        key = (tier['stylesheet'], tier['syntax_highlight'])
+        stylesheets = self._stylesheets.get(key)
+        if stylesheets is None:
+            from weasyprint import CSS
+            stylesheets = self._stylesheets[key] = [CSS(string=stylesheet_css(quality), font_config=self.font_config)]
+        return stylesheets
+    
+    def render(self, html_path: str, output_path: str, quality: str = 'high', external_styles: bool = True) -> str:
+        """
+        Renderiza um arquivo HTML em PDF
+        
+        Args:
+            html_path: Caminho do arquivo HTML
+            output_path: Caminho para salvar o arquivo PDF
+            quality: Nível de qualidade, define as folhas de estilos e as opções do PDF
+            external_styles: Se True, aplica as folhas de estilos do nível (HTML sem CSS embutido)
+        
+        Returns:
+            Caminho do arquivo PDF gerado
+        """
+        self.warm()
+        from weasyprint import HTML
+        
+        options = PdfOptimizer.render_options(quality)
+        if external_styles:
+            options['stylesheets'] = self.stylesheets(quality)
+        HTML(filename=html_path, encoding='utf-8').write_pdf(output_path, font_config=self.font_config, **options)
+        self.renders += 1
         return output_path
+
+# Um renderizador aquecido por thread (o worker de renderização usa uma só)
+_renderers = threading.local()
+
+def get_renderer() -> PdfRenderer:
+    """
+    Retorna o renderizador da thread atual, criando-o na primeira chamada
+    
+    Após RENDERER_RECYCLE_AFTER renderizações, o renderizador é recriado.
+    
+    Returns:
+        PdfRenderer da thread
+    """
+    renderer = getattr(_renderers, 'renderer', None)
+    if renderer is None or renderer.renders >= RENDERER_RECYCLE_AFTER > 0:
+        renderer = _renderers.renderer = PdfRenderer()
+    return renderer
+
+def _benchmark(renders: int = 20, page_count: int = 2) -> None:
+    """
+    Compara a renderização a frio (CSS analisado e fontes descobertas a cada
+    documento) com o PdfRenderer aquecido, em documentos curtos, nos quais o
+    custo fixo por documento domina. Os dois usam o mesmo HTML e o mesmo CSS
+    (com o do Pygments nos níveis com realce de sintaxe)
+    """
+    import tempfile
+    
+    from ai_models import SimulatedModel
+    from content_validator import ContentValidator
+    from document_templates import TemplateFactory
+    
+    try:
+        from weasyprint import CSS, HTML
+    except (ImportError, OSError) as e:
+        print(f"WeasyPrint indisponível: {str(e)}")
+        return
+    
+    template = TemplateFactory.create_template('ebook', 'pt-BR')
+    content = SimulatedModel(pages=page_count, code_blocks=1).generate_content(
+        template.get_prompt('Produtividade', 'Hábitos e ferramentas', page_count), 4096, 0.5
+    )
+    sections = list(ContentValidator.iter_enhanced_sections(content, 'ebook', 'pt-BR'))
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print(f"{renders} renderizações de {page_count} páginas por nível")
+        print(f"{'nível':<10}{'a frio ms':>11}{'aquecido ms':>13}{'ganho':>8}")
+        renderer = PdfRenderer()
+        renderer.warm()
+        print(f"Aquecimento (uma vez por worker): {renderer.warm_seconds * 1000:.0f} ms")
+        
+        for quality in ('draft', 'high'):
+            bare_path = PdfGenerator.write_html(sections, os.path.join(tmp_dir, f"{quality}-bare.html"), quality, embed_styles=False)
+            output_path = os.path.join(tmp_dir, f"{quality}.pdf")
+            options = PdfOptimizer.render_options(quality)
+            
+            # A frio: como antes do PdfRenderer, cada documento analisa o CSS e cria a sua configuração de fontes
+            started = time.perf_counter()
+            for _ in range(renders):
+                stylesheets = [CSS(string=stylesheet_css(quality))]
+                HTML(filename=bare_path, encoding='utf-8').write_pdf(output_path, stylesheets=stylesheets, **options)
+            cold = (time.perf_counter() - started) / renders
+            
+            started = time.perf_counter()
+            for _ in range(renders):
+                renderer.render(bare_path, output_path, quality)
+            warm = (time.perf_counter() - started) / renders
+            
+            print(f"{quality:<10}{cold * 1000:>11.1f}{warm * 1000:>13.1f}{1 - warm / cold:>8.0%}")
+
+if __name__ == '__main__':
+    _benchmark(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 20,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    )
@@ -0,0 +1,257 @@
+"""
+Otimização do tamanho dos PDFs gerados
+
+A otimização acontece em duas etapas:
+    1. Opções do WeasyPrint por nível de qualidade (subconjunto das fontes,
+       otimização e resolução máxima das imagens)
+    2. Pós-processamento com pikepdf, se instalado (exceto no rascunho):
+       eliminação de recursos repetidos ou não referenciados, redução
+       opcional das imagens, compressão em object streams e linearização
+       ("fast web view")
+"""
+
+import hashlib
+import io
+import os
+from typing import Dict, Any
+
+from metrics import metrics
+from storage import temp_path
+
+# Perfis de otimização por nível de qualidade
+OPTIMIZATION_PROFILES = {
+    # Rascunho: menor custo de renderização, sem recompressão de imagens nem pós-processamento
+    'draft': {
+        'dpi': 96,
+        'jpeg_quality': 70,
+        'optimize_images': False,
+        'downsample_images': False,
+        'linearize': False,
+        'postprocess': False,
+    },
+    'standard': {
+        'dpi': 150,
+        'jpeg_quality': 80,
+        'optimize_images': True,
+        'downsample_images': True,
+        'linearize': True,
+        'postprocess': True,
+    },
+    'high': {
+        'dpi': 200,
+        'jpeg_quality': 85,
+        'optimize_images': True,
+        'downsample_images': True,
+        'linearize': True,
+        'postprocess': True,
+    },
+    'premium': {
+        'dpi': 300,
+        'jpeg_quality': 92,
+        'optimize_images': True,
+        'downsample_images': False,
+        'linearize': True,
+        'postprocess': True,
+    },
+}
+
+# Largura útil da página A4 com as margens do documento, em polegadas
+PAGE_CONTENT_WIDTH_IN = 7.1
+
+class PdfOptimizer:
+    """Classe para otimização do tamanho de arquivos PDF"""
+    
+    @staticmethod
+    def get_profile(quality: str) -> Dict[str, Any]:
+        """
+        Retorna o perfil de otimização de um nível de qualidade
+        
+        Args:
+            quality: Nível de qualidade ('draft', 'standard', 'high', 'premium')
+        
+        Returns:
+            Dicionário com as opções do perfil
+        """
+        return OPTIMIZATION_PROFILES.get(quality, OPTIMIZATION_PROFILES['high'])
+    
+    @staticmethod
+    def render_options(quality: str) -> Dict[str, Any]:
+        """
+        Retorna as opções de write_pdf do WeasyPrint para um nível de qualidade
+        
+        Args:
+            quality: Nível de qualidade ('draft', 'standard', 'high', 'premium')
+        
+        Returns:
+            Argumentos nomeados para HTML.write_pdf
+        """
+        import weasyprint
+        
+        profile = PdfOptimizer.get_profile(quality)
+        major_version = int(weasyprint.__version__.split('.')[0])
+        
+        if major_version >= 59:
+            return {
+                'full_fonts': False,  # Embutir apenas os glifos usados
+                'optimize_images': profile['optimize_images'],
+                'jpeg_quality': profile['jpeg_quality'],
+                'dpi': profile['dpi'],
+            }
+        
+        # Versões anteriores ao WeasyPrint 59
+        return {'optimize_size': ('fonts', 'images') if profile['optimize_images'] else ('fonts',)}
+    
+    @staticmethod
+    def optimize(pdf_path: str, quality: str = 'high') -> Dict[str, Any]:
+        """
+        Pós-processa um PDF no próprio lugar, reduzindo o seu tamanho
+        
+        Args:
+            pdf_path: Caminho do arquivo PDF
+            quality: Nível de qualidade ('draft', 'standard', 'high', 'premium')
+        
+        Returns:
+            Relatório com os tamanhos antes e depois e os bytes economizados
+        """
+        original_size = os.path.getsize(pdf_path)
+        report = {
+            'quality': quality,
+            'original_bytes': original_size,
+            'optimized_bytes': original_size,
+            'bytes_saved': 0,
+            'optimized': False,
+        }
+        
+        profile = PdfOptimizer.get_profile(quality)
+        if not profile['postprocess']:
+            metrics.increment('pdf_bytes_original', original_size, quality=quality)
+            return report
+        
+        try:
+            import pikepdf
+        except ImportError:
+            # Sem pikepdf, apenas as otimizações do WeasyPrint são aplicadas
+            metrics.increment('pdf_bytes_original', original_size, quality=quality)
+            return report
+        
+        tmp_path = temp_path(pdf_path, 'opt')
+        
+        try:
+            with pikepdf.open(pdf_path) as pdf:
+                report['duplicates_removed'] = PdfOptimizer._deduplicate_resources(pdf)
+                pdf.remove_unreferenced_resources()
+                
+                if profile['downsample_images']:
+                    report['images_downsampled'] = PdfOptimizer._downsample_images(pdf, profile)
+                
+                pdf.save(
+                    tmp_path,
+                    compress_streams=True,
+                    recompress_flate=True,
+                    object_stream_mode=pikepdf.ObjectStreamMode.generate,
+                    linearize=profile['linearize']
+                )
+            
+            optimized_size = os.path.getsize(tmp_path)
+            if optimized_size < original_size:
+                os.replace(tmp_path, pdf_path)
+                report.update({
+                    'optimized_bytes': optimized_size,
+                    'bytes_saved': original_size - optimized_size,
+                    'optimized': True,
+                })
+        except Exception as e:
+            print(f"Erro ao otimizar PDF: {str(e)}")
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        
+        metrics.increment('pdf_bytes_original', report['original_bytes'], quality=quality)
+        metrics.increment('pdf_bytes_saved', report['bytes_saved'], quality=quality)
+        return report
+    
+    @staticmethod
+    def _deduplicate_resources(pdf) -> int:
+        """Faz as páginas apontarem para uma única cópia de fontes e imagens idênticas"""
+        import pikepdf
+        
+        canonical = {}
+        replacements = {}
+        
+        for obj in pdf.objects:
+            if not isinstance(obj, pikepdf.Stream):
+                continue
+            try:
+                digest = hashlib.sha256(obj.read_raw_bytes())
+            except pikepdf.PdfError:
+                continue
+            for key in sorted(k for k in obj.keys() if k != '/Length'):
+                digest.update(key.encode('utf-8'))
+                digest.update(repr(obj[key]).encode('utf-8'))
+            digest = digest.hexdigest()
+            
+            if digest in canonical:
+                replacements[obj.objgen] = canonical[digest]
+            else:
+                canonical[digest] = obj
+        
+        if not replacements:
+            return 0
+        
+        replaced = 0
+        for page in pdf.pages:
+            resources = page.obj.get('/Resources')
+            if resources is None:
+                continue
+            for resource_type in ('/XObject', '/Font'):
+                entries = resources.get(resource_type)
+                if entries is None:
+                    continue
+                for name in list(entries.keys()):
+                    target = replacements.get(entries[name].objgen)
+                    if target is not None:
+                        entries[name] = target
+                        replaced += 1
+        
+        return replaced
+    
+    @staticmethod
+    def _downsample_images(pdf, profile: Dict[str, Any]) -> int:
+        """Reduz imagens maiores que a resolução do perfil (requer Pillow)"""
+        try:
+            import pikepdf
+            from pikepdf import PdfImage
+            from PIL import Image
+        except ImportError:
+            return 0
+        
+        max_width = int(profile['dpi'] * PAGE_CONTENT_WIDTH_IN)
+        downsampled = 0
+        
+        for page in pdf.pages:
+            for name, raw_image in page.images.items():
+                try:
+                    image = PdfImage(raw_image)
+                    # Imagens com transparência (SMask) não podem virar JPEG
+                    if image.width <= max_width or '/SMask' in raw_image:
+                        continue
+                    if image.colorspace not in ('/DeviceRGB', '/DeviceGray'):
+                        continue
+                    
+                    pil_image = image.as_pil_image()
+                    height = max(1, int(pil_image.height * max_width / pil_image.width))
+                    pil_image = pil_image.resize((max_width, height), Image.LANCZOS)
+                    
+                    buffer = io.BytesIO()
+                    pil_image.save(buffer, format='JPEG', quality=profile['jpeg_quality'], optimize=True)
+                    raw_image.write(buffer.getvalue(), filter=pikepdf.Name.DCTDecode)
+                    raw_image.Width = max_width
+                    raw_image.Height = height
+                    raw_image.BitsPerComponent = 8
+                    if '/DecodeParms' in raw_image:
+                        del raw_image['/DecodeParms']
+                    downsampled += 1
+                except Exception as e:
+                    print(f"Imagem {name} não pôde ser reduzida: {str(e)}")
+        
+        return downsampled
@@ -0,0 +1,169 @@
+"""
+Geração de miniaturas e prévias das páginas dos PDFs
+
+As imagens são geradas uma única vez, logo após o PDF, e guardadas ao lado
+dele. A renderização usa o pypdfium2, se instalado, ou o utilitário
+pdftoppm (poppler-utils); a conversão para WebP/PNG usa o Pillow.
+"""
+
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import Any, Dict, List
+
+from storage import temp_path
+
+# Largura da miniatura da primeira página, em pixels
+THUMBNAIL_WIDTH = int(os.getenv('THUMBNAIL_WIDTH', '300'))
+
+# Páginas incluídas na faixa de prévia em baixa resolução (0 desativa)
+SPRITE_PAGES = int(os.getenv('PREVIEW_SPRITE_PAGES', '0'))
+SPRITE_PAGE_WIDTH = 120
+
+# Formatos gerados para cada imagem de prévia
+PREVIEW_FORMATS = {
+    'webp': {'format': 'WEBP', 'options': {'quality': 80, 'method': 6}},
+    'png': {'format': 'PNG', 'options': {'optimize': True}},
+}
+
+class PreviewGenerator:
+    """Classe para geração de miniaturas de documentos PDF"""
+    
+    @staticmethod
+    def thumbnail_path(pdf_path: str, fmt: str = 'webp') -> str:
+        """
+        Retorna o caminho da miniatura de um PDF
+        
+        Args:
+            pdf_path: Caminho do arquivo PDF
+            fmt: Formato da imagem ('webp' ou 'png')
+        
+        Returns:
+            Caminho da miniatura
+        """
+        return f"{pdf_path}.thumb.{fmt}"
+    
+    @staticmethod
+    def sprite_path(pdf_path: str, fmt: str = 'webp') -> str:
+        """Retorna o caminho da faixa de prévia das páginas de um PDF"""
+        return f"{pdf_path}.sprite.{fmt}"
+    
+    @staticmethod
+    def generate(pdf_path: str, width: int = THUMBNAIL_WIDTH, sprite_pages: int = SPRITE_PAGES) -> Dict[str, str]:
+        """
+        Gera a miniatura da primeira página (e, opcionalmente, a faixa de prévia)
+        
+        Args:
+            pdf_path: Caminho do arquivo PDF
+            width: Largura da miniatura em pixels
+            sprite_pages: Número de páginas na faixa de prévia (0 para não gerar)
+        
+        Returns:
+            Dicionário com os caminhos das imagens geradas
+        """
+        page_count = max(1, sprite_pages)
+        page_width = width if sprite_pages == 0 else max(width, SPRITE_PAGE_WIDTH)
+        pages = PreviewGenerator._render_pages(pdf_path, page_count, page_width)
+        if not pages:
+            return {}
+        
+        generated = {}
+        thumbnail = pages[0]
+        if thumbnail.width != width:
+            thumbnail = thumbnail.resize((width, max(1, int(thumbnail.height * width / thumbnail.width))))
+        
+        for fmt in PREVIEW_FORMATS:
+            path = PreviewGenerator.thumbnail_path(pdf_path, fmt)
+            PreviewGenerator._save_image(thumbnail, path, fmt)
+            generated[f"thumbnail_{fmt}"] = path
+        
+        if sprite_pages > 0:
+            sprite = PreviewGenerator._build_sprite(pages)
+            path = PreviewGenerator.sprite_path(pdf_path)
+            PreviewGenerator._save_image(sprite, path, 'webp')
+            generated['sprite_webp'] = path
+        
+        return generated
+    
+    @staticmethod
+    def delete(pdf_path: str) -> None:
+        """
+        Exclui as imagens de prévia de um PDF
+        
+        Args:
+            pdf_path: Caminho do arquivo PDF
+        """
+        for fmt in PREVIEW_FORMATS:
+            for path in (PreviewGenerator.thumbnail_path(pdf_path, fmt), PreviewGenerator.sprite_path(pdf_path, fmt)):
+                if os.path.exists(path):
+                    os.remove(path)
+    
+    @staticmethod
+    def _save_image(image, path: str, fmt: str) -> None:
+        """Grava a imagem de forma atômica"""
+        settings = PREVIEW_FORMATS[fmt]
+        buffer = io.BytesIO()
+        image.save(buffer, format=settings['format'], **settings['options'])
+        
+        tmp_path = temp_path(path)
+        with open(tmp_path, 'wb') as image_file:
+            image_file.write(buffer.getvalue())
+        os.replace(tmp_path, path)
+    
+    @staticmethod
+    def _build_sprite(pages: List) -> Any:
+        """Empilha as páginas lado a lado em uma única imagem de baixa resolução"""
+        from PIL import Image
+        
+        scaled = [
+            page.resize((SPRITE_PAGE_WIDTH, max(1, int(page.height * SPRITE_PAGE_WIDTH / page.width))))
+            for page in pages
+        ]
+        sprite = Image.new('RGB', (SPRITE_PAGE_WIDTH * len(scaled), max(page.height for page in scaled)), 'white')
+        for index, page in enumerate(scaled):
+            sprite.paste(page, (index * SPRITE_PAGE_WIDTH, 0))
+        return sprite
+    
+    @staticmethod
+    def _render_pages(pdf_path: str, page_count: int, width: int) -> List:
+        """Renderiza as primeiras páginas do PDF como imagens Pillow"""
+        try:
+            import pypdfium2 as pdfium
+        except ImportError:
+            return PreviewGenerator._render_pages_pdftoppm(pdf_path, page_count, width)
+        
+        document = pdfium.PdfDocument(pdf_path)
+        try:
+            pages = []
+            for index in range(min(page_count, len(document))):
+                page = document[index]
+                scale = width / page.get_width()
+                pages.append(page.render(scale=scale).to_pil().convert('RGB'))
+            return pages
+        finally:
+            document.close()
+    
+    @staticmethod
+    def _render_pages_pdftoppm(pdf_path: str, page_count: int, width: int) -> List:
+        """Renderiza as páginas com o utilitário pdftoppm, se disponível"""
+        from PIL import Image
+        
+        if shutil.which('pdftoppm') is None:
+            print("Nenhum renderizador de prévia disponível (instale pypdfium2 ou poppler-utils)")
+            return []
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            prefix = os.path.join(tmp_dir, 'page')
+            subprocess.run(
+                ['pdftoppm', '-png', '-f', '1', '-l', str(page_count), '-scale-to-x', str(width), '-scale-to-y', '-1', pdf_path, prefix],
+                check=True,
+                capture_output=True
+            )
+            
+            pages = []
+            for name in sorted(os.listdir(tmp_dir)):
+                with Image.open(os.path.join(tmp_dir, name)) as image:
+                    pages.append(image.convert('RGB'))
+            return pages
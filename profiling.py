@@ -0,0 +1,460 @@
+"""
+Perfil por amostragem do pipeline de geração, sob demanda
+
+Quando um documento demora, o perfil mostra para onde foi o tempo: layout do
+WeasyPrint, realce de código do Pygments (codehilite), regexes do validador,
+espera pelo provedor etc. Uma thread amostra a pilha da thread da requisição
+a cada PROFILE_INTERVAL segundos (tempo de parede: esperas também aparecem),
+sem instrumentar as chamadas, de modo que o custo é baixo e independe do
+número de funções chamadas.
+
+O perfil é ativado por requisição com o cabeçalho X-Profile: 1 (apenas com o
+X-Admin-Token válido) ou por amostragem (PROFILE_SAMPLE_RATE). Cada parte do
+pipeline é gravada em PROFILE_FOLDER: 'api' (geração e, no modo inline,
+renderização) e 'render' (renderização no worker, no modo fila). Os perfis
+são baixados pelos endpoints de administração no formato do speedscope
+(https://www.speedscope.app) ou de pilhas dobradas (flamegraph.pl).
+
+Configuração (variáveis de ambiente):
+    PROFILE_SAMPLE_RATE  Fração das gerações perfiladas (padrão 0)
+    PROFILE_INTERVAL     Intervalo entre amostras em segundos (padrão 0.005)
+    PROFILE_MAX_SAMPLES  Amostras por parte, para limitar o tamanho (padrão 100000)
+    PROFILE_MAX_FILES    Partes guardadas; as mais antigas são excluídas (padrão 200)
+
+Para perfilar o pipeline localmente, com o provedor simulado:
+
+    python profiling.py [páginas] [saída.speedscope.json]
+"""
+
+import glob
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from metrics import metrics
+from storage import temp_path
+
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', '0.005'))
+PROFILE_MAX_SAMPLES = int(os.getenv('PROFILE_MAX_SAMPLES', '100000'))
+PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', '200'))
+
+# Cabeçalho que pede o perfil de uma requisição
+PROFILE_HEADER = 'X-Profile'
+
+# Componentes do pipeline, reconhecidos pelo arquivo de cada quadro da pilha.
+# A amostra conta para o quadro mais interno reconhecido: o Pygments chamado
+# pelo Markdown conta como 'pygments'
+COMPONENTS = (
+    ('weasyprint', ('/weasyprint/', '/tinycss2/', '/cssselect2/', '/pydyf/', '/fontTools/')),
+    ('pygments', ('/pygments/',)),
+    ('markdown', ('/markdown/',)),
+    ('validator', ('content_validator.py', 'enhancement_rules.py')),
+    ('pdf_optimizer', ('pdf_optimizer.py', '/pikepdf/')),
+    ('previews', ('preview_generator.py', '/pypdfium2/', '/PIL/')),
+    ('scheduler_wait', ('tenant_scheduler.py',)),
+    ('llm', ('ai_models.py', '/requests/', '/urllib3/', '/ssl.py', '/socket.py', '/http/client.py')),
+    ('storage', ('document_store.py', 'search_index.py', 'content_store.py', '/sqlite3/')),
+)
+
+_PROFILE_ID = re.compile(r'^[0-9a-f]{32}$')
+_PART = re.compile(r'^\w+$')
+
+def should_profile(requested: bool, sample_rate: float = PROFILE_SAMPLE_RATE) -> bool:
+    """
+    Decide se uma geração será perfilada
+    
+    Args:
+        requested: Se a requisição pediu o perfil (cabeçalho X-Profile autorizado)
+        sample_rate: Fração das gerações perfiladas por amostragem
+    
+    Returns:
+        True se a geração deve ser perfilada
+    """
+    return requested or (sample_rate > 0 and random.random() < sample_rate)
+
+class SamplingProfiler:
+    """Amostra periodicamente a pilha de uma thread"""
+    
+    def __init__(self, thread_id: Optional[int] = None, interval: float = PROFILE_INTERVAL,
+                 max_samples: int = PROFILE_MAX_SAMPLES):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.max_samples = max_samples
+        self.frames: List[Tuple[str, str, int]] = []  # (função, arquivo, linha)
+        self.samples: List[Tuple[int, ...]] = []  # Índices dos quadros, da raiz à folha
+        self.weights: List[float] = []  # Segundos de cada amostra
+        self.sample_count = 0
+        self.started_at = None
+        self.seconds = 0.0
+        self._started = 0.0
+        self._frame_index: Dict[Tuple[str, str, int], int] = {}
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self) -> None:
+        """Inicia a amostragem em uma thread separada"""
+        self.started_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        """Interrompe a amostragem e aguarda a thread terminar"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.seconds = time.perf_counter() - self._started
+    
+    def _run(self) -> None:
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval) and self.sample_count < self.max_samples:
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            weight, last = now - last, now
+            if frame is None:
+                continue
+            
+            # Amostras seguidas com a mesma pilha viram uma só, com os pesos somados
+            stack = self._stack(frame)
+            if self.samples and self.samples[-1] == stack:
+                self.weights[-1] += weight
+            else:
+                self.samples.append(stack)
+                self.weights.append(weight)
+            self.sample_count += 1
+    
+    def _stack(self, frame) -> Tuple[int, ...]:
+        """Índices dos quadros da pilha, da raiz à folha"""
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            key = (getattr(code, 'co_qualname', code.co_name), code.co_filename, code.co_firstlineno)
+            index = self._frame_index.get(key)
+            if index is None:
+                index = self._frame_index[key] = len(self.frames)
+                self.frames.append(key)
+            stack.append(index)
+            frame = frame.f_back
+        return tuple(reversed(stack))
+    
+    def summary(self, top: int = 15) -> Dict[str, Any]:
+        """
+        Resume o perfil: tempo por componente e funções com mais tempo próprio
+        
+        Args:
+            top: Número de funções listadas
+        
+        Returns:
+            Dicionário com a duração, o número de amostras, 'components' e 'top'
+        """
+        components: Dict[str, float] = {}
+        self_seconds: Dict[int, float] = {}
+        for stack, weight in zip(self.samples, self.weights):
+            component = self._component(stack)
+            components[component] = components.get(component, 0.0) + weight
+            if stack:
+                self_seconds[stack[-1]] = self_seconds.get(stack[-1], 0.0) + weight
+        
+        total = sum(self.weights) or 1.0
+        ranked = sorted(self_seconds.items(), key=lambda item: item[1], reverse=True)[:top]
+        return {
+            'started_at': self.started_at,
+            'seconds': round(self.seconds, 3),
+            'samples': self.sample_count,
+            'interval': self.interval,
+            'components': {
+                name: {'seconds': round(seconds, 3), 'share': round(seconds / total, 3)}
+                for name, seconds in sorted(components.items(), key=lambda item: item[1], reverse=True)
+            },
+            'top': [
+                {'function': self.frames[index][0], 'file': self.frames[index][1], 'line': self.frames[index][2],
+                 'seconds': round(seconds, 3), 'share': round(seconds / total, 3)}
+                for index, seconds in ranked
+            ],
+        }
+    
+    def _component(self, stack: Tuple[int, ...]) -> str:
+        """Componente do quadro mais interno reconhecido da pilha"""
+        for index in reversed(stack):
+            filename = self.frames[index][1].replace('\\', '/')
+            for name, patterns in COMPONENTS:
+                if any(pattern in filename for pattern in patterns):
+                    return name
+        return 'other'
+
+class ProfileStore:
+    """Perfis gravados em disco, uma parte do pipeline por arquivo"""
+    
+    def __init__(self, folder: str, max_files: int = PROFILE_MAX_FILES):
+        self.folder = folder
+        self.max_files = max_files
+        os.makedirs(folder, exist_ok=True)
+    
+    @staticmethod
+    def new_id() -> str:
+        """Identificador de um novo perfil"""
+        return uuid.uuid4().hex
+    
+    @contextmanager
+    def capture(self, profile_id: Optional[str], part: str) -> Iterator[Optional[SamplingProfiler]]:
+        """
+        Perfila o bloco na thread atual e grava o resultado ao sair
+        
+        Args:
+            profile_id: Identificador do perfil (None: o bloco roda sem perfil)
+            part: Parte do pipeline ('api', 'render')
+        """
+        if profile_id is None:
+            yield None
+            return
+        
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            yield profiler
+        finally:
+            profiler.stop()
+            try:
+                self.save(profile_id, part, profiler)
+            except Exception as e:
+                print(f"Erro ao gravar o perfil {profile_id}: {str(e)}")
+    
+    def save(self, profile_id: str, part: str, profiler: SamplingProfiler) -> Dict[str, Any]:
+        """
+        Grava uma parte do perfil: o resumo e as pilhas amostradas
+        
+        Args:
+            profile_id: Identificador do perfil
+            part: Parte do pipeline
+            profiler: Perfil já interrompido
+        
+        Returns:
+            Resumo da parte
+        """
+        summary = dict(profiler.summary(), id=profile_id, part=part)
+        stacks = {'frames': profiler.frames, 'samples': profiler.samples, 'weights': profiler.weights}
+        self._write(self._path(profile_id, part, 'stacks'), stacks)
+        self._write(self._path(profile_id, part, 'summary'), summary)
+        
+        metrics.increment('profiles_captured', part=part)
+        metrics.observe('profile_seconds', profiler.seconds, part=part)
+        self._prune()
+        return summary
+    
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retorna os resumos das partes de um perfil
+        
+        Args:
+            profile_id: Identificador do perfil
+        
+        Returns:
+            Dicionário com 'id' e 'parts' (resumo por parte), ou None se não existir
+        """
+        if not _PROFILE_ID.match(profile_id or ''):
+            return None
+        parts = {}
+        for path in sorted(glob.glob(os.path.join(self.folder, f"{profile_id}.*.summary.json"))):
+            summary = self._read(path)
+            if summary is not None:
+                parts[summary['part']] = summary
+        return {'id': profile_id, 'parts': parts} if parts else None
+    
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Lista os perfis mais recentes
+        
+        Args:
+            limit: Número máximo de perfis
+        
+        Returns:
+            Lista com id, início, partes e duração de cada perfil, do mais recente ao mais antigo
+        """
+        profiles: Dict[str, Dict[str, Any]] = {}
+        paths = sorted(glob.glob(os.path.join(self.folder, '*.summary.json')), key=ProfileStore._mtime, reverse=True)
+        for path in paths:
+            summary = self._read(path)
+            if summary is None:
+                continue
+            profile = profiles.setdefault(summary['id'], {'id': summary['id'], 'started_at': summary['started_at'], 'parts': {}})
+            profile['started_at'] = min(profile['started_at'], summary['started_at'])
+            profile['parts'][summary['part']] = summary['seconds']
+            if len(profiles) > limit:
+                del profiles[summary['id']]
+                break
+        return list(profiles.values())
+    
+    def speedscope(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Exporta um perfil no formato do speedscope, com uma linha do tempo por parte
+        
+        Args:
+            profile_id: Identificador do perfil
+        
+        Returns:
+            Documento JSON do speedscope, ou None se o perfil não existir
+        """
+        parts = self._load_stacks(profile_id)
+        if not parts:
+            return None
+        
+        # Os quadros são compartilhados entre as partes
+        frames: List[Dict[str, Any]] = []
+        frame_index: Dict[Tuple[str, str, int], int] = {}
+        profiles = []
+        for part, stacks in parts:
+            remap = []
+            for name, filename, line in stacks['frames']:
+                key = (name, filename, line)
+                if key not in frame_index:
+                    frame_index[key] = len(frames)
+                    frames.append({'name': name, 'file': filename, 'line': line})
+                remap.append(frame_index[key])
+            profiles.append({
+                'type': 'sampled',
+                'name': part,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': sum(stacks['weights']),
+                'samples': [[remap[index] for index in stack] for stack in stacks['samples']],
+                'weights': stacks['weights'],
+            })
+        
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': frames},
+            'profiles': profiles,
+            'name': f"perfil {profile_id}",
+            'activeProfileIndex': 0,
+            'exporter': 'Site-gerador-de-ebook',
+        }
+    
+    def folded(self, profile_id: str) -> Optional[str]:
+        """
+        Exporta um perfil como pilhas dobradas (uma linha "a;b;c microssegundos" por pilha)
+        
+        Args:
+            profile_id: Identificador do perfil
+        
+        Returns:
+            Texto para flamegraph.pl ou inferno, ou None se o perfil não existir
+        """
+        parts = self._load_stacks(profile_id)
+        if not parts:
+            return None
+        
+        folded: Dict[str, float] = {}
+        for part, stacks in parts:
+            names = [f"{name} ({os.path.basename(filename)}:{line})" for name, filename, line in stacks['frames']]
+            for stack, weight in zip(stacks['samples'], stacks['weights']):
+                key = ';'.join([part] + [names[index] for index in stack])
+                folded[key] = folded.get(key, 0.0) + weight
+        return ''.join(f"{stack} {round(seconds * 1e6)}\n" for stack, seconds in folded.items() if seconds >= 1e-6)
+    
+    def _load_stacks(self, profile_id: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """Pilhas de cada parte do perfil, na ordem do pipeline"""
+        profile = self.get(profile_id)
+        if profile is None:
+            return []
+        parts = sorted(profile['parts'].values(), key=lambda summary: summary['started_at'])
+        loaded = []
+        for summary in parts:
+            stacks = self._read(self._path(profile_id, summary['part'], 'stacks'))
+            if stacks is not None:
+                loaded.append((summary['part'], stacks))
+        return loaded
+    
+    def _path(self, profile_id: str, part: str, kind: str) -> str:
+        if not _PROFILE_ID.match(profile_id) or not _PART.match(part):
+            raise ValueError(f"Perfil inválido: {profile_id}.{part}")
+        return os.path.join(self.folder, f"{profile_id}.{part}.{kind}.json")
+    
+    def _prune(self) -> None:
+        """Exclui as partes mais antigas além de max_files"""
+        paths = sorted(glob.glob(os.path.join(self.folder, '*.summary.json')), key=ProfileStore._mtime, reverse=True)
+        for path in paths[self.max_files:]:
+            for old_path in (path, path[:-len('summary.json')] + 'stacks.json'):
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+    
+    @staticmethod
+    def _write(path: str, data: Dict[str, Any]) -> None:
+        """Grava o JSON em um temporário e o publica de forma atômica"""
+        tmp_path = temp_path(path)
+        with open(tmp_path, 'w', encoding='utf-8') as profile_file:
+            json.dump(data, profile_file, separators=(',', ':'))
+        os.replace(tmp_path, path)
+    
+    @staticmethod
+    def _read(path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, 'r', encoding='utf-8') as profile_file:
+                return json.load(profile_file)
+        except (OSError, ValueError):
+            return None
+    
+    @staticmethod
+    def _mtime(path: str) -> float:
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return 0.0
+
+def _profile_pipeline(page_count: int = 20, output_path: Optional[str] = None) -> None:
+    """
+    Perfila a geração simulada, a validação, o HTML e (com o WeasyPrint) o PDF
+    
+    Imprime o tempo por componente e as funções com mais tempo próprio; com
+    output_path, grava o perfil no formato do speedscope.
+    """
+    import tempfile
+    
+    from ai_models import SimulatedModel
+    from content_generation import ContentGenerator, CheckpointStore
+    from document_generator import DocumentGenerator
+    from document_templates import TemplateFactory
+    from token_budget import TokenBudget
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = ProfileStore(os.path.join(tmp_dir, 'profiles'))
+        profile_id = store.new_id()
+        template = TemplateFactory.create_template('ebook', 'pt-BR')
+        
+        with store.capture(profile_id, 'api'):
+            plan = TokenBudget.plan(template, 'Produtividade no Trabalho Remoto', 'Hábitos e ferramentas', page_count, 'openai')
+            generator = ContentGenerator(SimulatedModel(code_blocks=1), template, CheckpointStore(os.path.join(tmp_dir, 'checkpoints')))
+            content = generator.generate(plan, ContentGenerator.job_key(page_count=page_count), 0.5)
+            success, message, _ = DocumentGenerator.generate_document(
+                content, 'ebook', 'pt-BR', 'Produtividade no Trabalho Remoto', os.path.join(tmp_dir, 'perfil.pdf')
+            )
+        
+        summary = store.get(profile_id)['parts']['api']
+        print(f"{summary['seconds']:.2f}s, {summary['samples']} amostras ({message})")
+        print("Tempo por componente:")
+        for name, component in summary['components'].items():
+            print(f"  {name:<16}{component['seconds']:>8.3f}s {component['share']:>6.1%}")
+        print("Funções com mais tempo próprio:")
+        for entry in summary['top']:
+            print(f"  {entry['seconds']:>8.3f}s {entry['share']:>6.1%}  {entry['function']} ({os.path.basename(entry['file'])}:{entry['line']})")
+        
+        if output_path:
+            with open(output_path, 'w', encoding='utf-8') as output_file:
+                json.dump(store.speedscope(profile_id), output_file)
+            print(f"Perfil gravado em {output_path} (abra em https://www.speedscope.app)")
+
+if __name__ == '__main__':
+    _profile_pipeline(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 20,
+        sys.argv[2] if len(sys.argv) > 2 else None
+    )
@@ -0,0 +1,77 @@
+"""
+Prompts divididos em prefixo estável e sufixo variável, para o cache de prompts dos provedores
+
+Os provedores reaproveitam o processamento de um prefixo de prompt já visto
+(a OpenAI e o Gemini automaticamente; a Anthropic nos pontos marcados com
+cache_control), o que reduz o custo e a latência dos tokens de entrada.
+Para isso, as partes que se repetem entre chamadas precisam vir primeiro:
+
+    1. Instruções do tipo de documento (iguais para todos os documentos do
+       mesmo tipo, idioma e número de páginas)
+    2. Dados do documento (iguais em todas as chamadas do documento)
+    3. Instruções da etapa e da continuação (variáveis)
+
+Os provedores só guardam prefixos a partir de um tamanho mínimo (cerca de
+1024 tokens na OpenAI e na Anthropic); prefixos menores são enviados
+normalmente, sem cache.
+"""
+
+from typing import Dict, List, Optional
+
+from metrics import metrics
+
+# Menor prefixo guardado pelos provedores, em tokens (usado pelo provedor simulado)
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+class CacheablePrompt(str):
+    """
+    Texto do prompt que guarda os segmentos que o formam
+    
+    Funciona como uma string comum; os provedores que suportam pontos de
+    cache explícitos marcam o fim de cada segmento, exceto o último.
+    """
+    
+    def __new__(cls, *segments: str):
+        prompt = super().__new__(cls, ''.join(segments))
+        prompt.segments = tuple(segment for segment in segments if segment)
+        return prompt
+
+def prompt_segments(prompt: str) -> List[str]:
+    """
+    Retorna os segmentos de um prompt (um único segmento para strings comuns)
+    
+    Args:
+        prompt: Prompt a enviar
+    
+    Returns:
+        Lista de segmentos, do mais estável ao mais variável
+    """
+    return list(getattr(prompt, 'segments', None) or [prompt])
+
+def extend_prompt(prompt: str, suffix: str) -> str:
+    """
+    Acrescenta um segmento variável ao final do prompt, preservando os anteriores
+    
+    Args:
+        prompt: Prompt original (string comum ou CacheablePrompt)
+        suffix: Texto a acrescentar
+    
+    Returns:
+        Novo prompt com o sufixo como último segmento
+    """
+    return CacheablePrompt(*prompt_segments(prompt), suffix)
+
+def record_cache_usage(provider: str, usage: Optional[Dict[str, int]]) -> None:
+    """
+    Registra nas métricas os tokens de entrada e a parte lida do cache
+    
+    Args:
+        provider: Nome do provedor
+        usage: Uso informado pelo provedor ('prompt_tokens' e 'cached_tokens')
+    """
+    if not usage or not usage.get('prompt_tokens'):
+        return
+    cached = usage.get('cached_tokens', 0)
+    metrics.increment('llm_prompt_tokens', usage['prompt_tokens'], provider=provider)
+    metrics.increment('llm_cached_tokens', cached, provider=provider)
+    metrics.observe('llm_cache_hit_ratio', cached / usage['prompt_tokens'], provider=provider)
@@ -0,0 +1,202 @@
+"""
+Níveis de qualidade como ajuste de desempenho: modelo, renderização e revisão
+
+Cada nível define, além da temperatura:
+    - O modelo de cada provedor ('draft' usa o modelo rápido e barato,
+      'premium' o melhor; os demais usam o modelo padrão do provedor)
+    - O realce de sintaxe (codehilite) e a folha de estilos do PDF
+    - O perfil de otimização do PDF (ver pdf_optimizer.OPTIMIZATION_PROFILES)
+    - A revisão guiada pela validação ('premium'): as chamadas mais fracas do
+      plano são refeitas até ContentValidator.get_quality_score atingir o
+      limite, parando na primeira rodada em que isso acontecer
+    - Metas de latência e custo para um documento de TARGET_PAGES páginas
+
+As metas são comparadas com os valores medidos em cada geração (métricas
+generation_seconds, generation_cost_usd e quality_target_missed). Para
+medir os níveis sem chamar os provedores:
+
+    python quality_tiers.py [provedor] [páginas]
+"""
+
+import sys
+import time
+from typing import Dict, Any, Optional
+
+from ai_models import DEFAULT_MODELS
+from metrics import metrics
+
+# Nível usado quando a requisição não informa a qualidade
+DEFAULT_QUALITY = 'high'
+
+# Número de páginas a que as metas se referem (escaladas proporcionalmente)
+TARGET_PAGES = 20
+
+QUALITY_TIERS = {
+    'draft': {
+        'temperature': 0.7,
+        'models': {
+            'openai': 'gpt-4o-mini',
+            'anthropic': 'claude-3-haiku-20240307',
+            'gemini': 'gemini-1.5-flash',
+        },
+        'syntax_highlight': False,
+        'stylesheet': 'simple',
+        'refine': None,
+        'targets': {'seconds': 240, 'cost_usd': 0.02},
+    },
+    'standard': {
+        'temperature': 0.7,
+        'models': {},
+        'syntax_highlight': True,
+        'stylesheet': 'full',
+        'refine': None,
+        'targets': {'seconds': 360, 'cost_usd': 0.04},
+    },
+    'high': {
+        'temperature': 0.5,  # Mais determinístico para alta qualidade
+        'models': {},
+        'syntax_highlight': True,
+        'stylesheet': 'full',
+        'refine': None,
+        'targets': {'seconds': 360, 'cost_usd': 0.04},
+    },
+    'premium': {
+        'temperature': 0.3,  # Ainda mais determinístico para qualidade premium
+        'models': {
+            'openai': 'gpt-4o',
+            'anthropic': 'claude-3-5-sonnet-20241022',
+            'gemini': 'gemini-1.5-pro',
+        },
+        'syntax_highlight': True,
+        'stylesheet': 'full',
+        'refine': {'threshold': 0.95, 'max_rounds': 2},
+        'targets': {'seconds': 480, 'cost_usd': 0.40},
+    },
+}
+
+def get_tier(quality: str) -> Dict[str, Any]:
+    """
+    Retorna a configuração de um nível de qualidade
+    
+    Args:
+        quality: Nível de qualidade ('draft', 'standard', 'high', 'premium')
+    
+    Returns:
+        Dicionário com as opções do nível (nível padrão se desconhecido)
+    """
+    return QUALITY_TIERS.get(quality, QUALITY_TIERS[DEFAULT_QUALITY])
+
+def model_for(quality: str, provider: str) -> Optional[str]:
+    """Modelo do provedor para o nível (o modelo padrão do provedor, se o nível não definir um)"""
+    provider = provider.lower()
+    return get_tier(quality)['models'].get(provider) or DEFAULT_MODELS.get(provider)
+
+def targets_for(quality: str, page_count: int) -> Dict[str, float]:
+    """
+    Metas de latência e custo de um documento
+    
+    Args:
+        quality: Nível de qualidade
+        page_count: Número de páginas do documento
+    
+    Returns:
+        Dicionário com 'seconds' e 'cost_usd', proporcionais ao número de páginas
+    """
+    scale = page_count / TARGET_PAGES
+    targets = get_tier(quality)['targets']
+    return {'seconds': round(targets['seconds'] * scale, 1), 'cost_usd': round(targets['cost_usd'] * scale, 4)}
+
+def record_generation(quality: str, page_count: int, seconds: float, cost_usd: Optional[float]) -> Dict[str, Any]:
+    """
+    Registra a latência e o custo medidos de uma geração e compara com as metas
+    
+    Args:
+        quality: Nível de qualidade
+        page_count: Número de páginas do documento
+        seconds: Duração da geração do conteúdo
+        cost_usd: Custo da geração (None se o preço do modelo for desconhecido)
+    
+    Returns:
+        Relatório com os valores medidos, as metas e se foram cumpridas
+    """
+    targets = targets_for(quality, page_count)
+    within_targets = seconds <= targets['seconds'] and (cost_usd is None or cost_usd <= targets['cost_usd'])
+    
+    metrics.observe('generation_seconds', seconds, quality=quality)
+    if cost_usd is not None:
+        metrics.observe('generation_cost_usd', cost_usd, quality=quality)
+    if not within_targets:
+        metrics.increment('quality_target_missed', quality=quality)
+    
+    return {
+        'seconds': round(seconds, 2),
+        'cost_usd': cost_usd,
+        'targets': targets,
+        'within_targets': within_targets,
+    }
+
+def _benchmark(provider: str = 'openai', page_count: int = TARGET_PAGES) -> None:
+    """
+    Mede cada nível com o provedor simulado e compara com as metas
+    
+    A latência e o custo do provedor são as estimativas do plano para o
+    modelo do nível; a revisão e a conversão para HTML são medidas de fato.
+    Com o WeasyPrint instalado, a renderização do PDF também é medida.
+    """
+    import os
+    import tempfile
+    
+    from ai_models import SimulatedModel
+    from content_generation import ContentGenerator, CheckpointStore
+    from document_templates import TemplateFactory
+    from pdf_generator import PdfGenerator
+    from token_budget import TokenBudget
+    
+    try:
+        import weasyprint  # noqa: F401
+        render_pdf = True
+    except ImportError:
+        render_pdf = False
+    
+    template = TemplateFactory.create_template('ebook', 'pt-BR')
+    title, theme = 'Produtividade no Trabalho Remoto', 'Hábitos e ferramentas para equipes distribuídas'
+    
+    print(f"Provedor: {provider}, {page_count} páginas, PDF {'medido' if render_pdf else 'não medido (sem WeasyPrint)'}")
+    print(f"{'nível':<10}{'modelo':<28}{'chamadas':>9}{'revisões':>9}{'LLM s':>8}{'local s':>9}{'USD':>9}{'meta s':>8}{'meta USD':>10}  ok")
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        checkpoints = CheckpointStore(os.path.join(tmp_dir, 'checkpoints'))
+        
+        for quality, tier in QUALITY_TIERS.items():
+            plan = TokenBudget.plan(template, title, theme, page_count, provider, model_for(quality, provider))
+            generator = ContentGenerator(SimulatedModel(code_blocks=1), template, checkpoints)
+            job_key = ContentGenerator.job_key(quality=quality, provider=provider, page_count=page_count)
+            
+            started = time.monotonic()
+            content = generator.generate(plan, job_key, tier['temperature'])
+            if tier['refine']:
+                content = generator.refine(plan, job_key, tier['temperature'], content, 'ebook', 'pt-BR', **tier['refine'])
+            
+            html_path = os.path.join(tmp_dir, f"{quality}.html")
+            PdfGenerator.write_html([content], html_path, quality)
+            if render_pdf:
+                PdfGenerator.render_html_file(html_path, os.path.join(tmp_dir, f"{quality}.pdf"), quality)
+            local_seconds = time.monotonic() - started
+            
+            # Latência e custo do provedor estimados pelos tokens realmente consumidos
+            calls_ratio = generator.usage['output_tokens'] / max(1, plan.output_tokens)
+            llm_seconds = plan.estimated_seconds * calls_ratio
+            cost_usd = TokenBudget.cost_usd(plan.model, generator.usage['prompt_tokens'], generator.usage['output_tokens'])
+            targets = targets_for(quality, page_count)
+            ok = llm_seconds + local_seconds <= targets['seconds'] and (cost_usd is None or cost_usd <= targets['cost_usd'])
+            
+            rounds = generator.refinement['rounds'] if generator.refinement else 0
+            print(f"{quality:<10}{plan.model:<28}{generator.usage['llm_calls']:>9}{rounds:>9}{llm_seconds:>8.1f}{local_seconds:>9.2f}"
+                  f"{(cost_usd if cost_usd is not None else float('nan')):>9.4f}{targets['seconds']:>8.0f}"
+                  f"{targets['cost_usd']:>10.4f}  {'sim' if ok else 'NÃO'}")
+
+if __name__ == '__main__':
+    _benchmark(
+        sys.argv[1] if len(sys.argv) > 1 else 'openai',
+        int(sys.argv[2]) if len(sys.argv) > 2 else TARGET_PAGES
+    )
@@ -0,0 +1,601 @@
+"""
+Fila de jobs de renderização entre a API e os workers de renderização
+
+Backends disponíveis (variável RENDER_QUEUE_BACKEND):
+    sqlite  Arquivo SQLite local (padrão), compartilhado por processos na mesma máquina
+    redis   Servidor compatível com Redis (REDIS_URL)
+    local   Substituto do Redis em memória, para desenvolvimento e testes
+
+No backend sqlite, o próximo job é escolhido de forma justa entre os tenants
+(tenant_scheduler.py); os backends redis e local atendem por ordem de chegada.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import closing
+from typing import Dict, Any, List, Optional, Callable
+
+from settings import UPLOAD_FOLDER
+from storage import connect_sqlite
+from tenant_scheduler import DEFAULT_TENANT, get_tenant_limits, at_tenant_limit
+
+# Jobs prontos considerados na escolha do próximo job (escalonamento justo entre tenants)
+FAIR_SHARE_WINDOW = 200
+
+class RenderQueue(ABC):
+    """Interface base para filas de renderização"""
+    
+    def __init__(self, max_attempts: int = 3, retry_delay: float = 30.0):
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+    
+    @abstractmethod
+    def enqueue(self, payload: Dict[str, Any]) -> str:
+        """
+        Adiciona um job de renderização à fila
+        
+        Args:
+            payload: Dados do job (content, doc_type, language, title, storage_key)
+        
+        Returns:
+            Identificador do job
+        """
+        pass
+    
+    @abstractmethod
+    def reserve(self, lease_seconds: float = 600) -> Optional[Dict[str, Any]]:
+        """
+        Reserva o próximo job disponível para um worker
+        
+        Se o worker não confirmar o job dentro do prazo da reserva, o job volta
+        para a fila (ou vai para a fila de falhas, se as tentativas acabaram).
+        O token `lease` identifica a reserva: ack e fail só têm efeito enquanto
+        a reserva pertencer ao worker.
+        
+        Args:
+            lease_seconds: Prazo da reserva em segundos
+        
+        Returns:
+            Dicionário com (id, payload, attempts, lease) ou None se a fila estiver vazia
+        """
+        pass
+    
+    @abstractmethod
+    def ack(self, job_id: str, lease: str, result: Dict[str, Any]) -> bool:
+        """
+        Confirma a conclusão de um job
+        
+        Args:
+            job_id: Identificador do job
+            lease: Token da reserva retornado por reserve()
+            result: Resultado da renderização
+        
+        Returns:
+            False se a reserva expirou e o job já foi devolvido à fila ou concluído por outro worker
+        """
+        pass
+    
+    @abstractmethod
+    def fail(self, job_id: str, lease: str, error: str, retryable: bool = True) -> str:
+        """
+        Registra a falha de um job, agendando nova tentativa ou enviando para a fila de falhas
+        
+        Args:
+            job_id: Identificador do job
+            lease: Token da reserva retornado por reserve()
+            error: Mensagem de erro
+            retryable: Se False, o job vai direto para a fila de falhas
+        
+        Returns:
+            Novo status do job ('queued' ou 'dead'); se a reserva não pertence
+            mais ao worker, o status atual, sem alteração
+        """
+        pass
+    
+    @abstractmethod
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retorna o estado de um job (sem o conteúdo Markdown)
+        
+        Args:
+            job_id: Identificador do job
+        
+        Returns:
+            Dicionário com (id, status, attempts, error, result) ou None
+        """
+        pass
+    
+    @abstractmethod
+    def depth(self) -> int:
+        """
+        Retorna o número de jobs aguardando um worker
+        
+        Returns:
+            Profundidade da fila
+        """
+        pass
+    
+    def _backoff(self, attempts: int) -> float:
+        """Atraso exponencial até a próxima tentativa"""
+        return self.retry_delay * (2 ** max(0, attempts - 1))
+
+class SQLiteRenderQueue(RenderQueue):
+    """Fila de renderização em um arquivo SQLite"""
+    
+    def __init__(self, db_path: str, max_attempts: int = 3, retry_delay: float = 30.0):
+        super().__init__(max_attempts, retry_delay)
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        
+        with closing(connect_sqlite(self.db_path)) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS render_jobs (
+                    id TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    available_at REAL NOT NULL,
+                    lease_expires REAL,
+                    error TEXT,
+                    result TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_render_jobs_status ON render_jobs (status, available_at)')
+            
+            # Filas criadas antes do escalonamento por tenant
+            columns = [row['name'] for row in conn.execute('PRAGMA table_info(render_jobs)')]
+            if 'tenant' not in columns:
+                conn.execute(f"ALTER TABLE render_jobs ADD COLUMN tenant TEXT NOT NULL DEFAULT '{DEFAULT_TENANT}'")
+            
+            # Filas criadas antes dos tokens de reserva
+            if 'lease_token' not in columns:
+                conn.execute('ALTER TABLE render_jobs ADD COLUMN lease_token TEXT')
+    
+    def enqueue(self, payload: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        
+        with closing(connect_sqlite(self.db_path)) as conn:
+            conn.execute(
+                'INSERT INTO render_jobs (id, payload, status, tenant, available_at, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (job_id, json.dumps(payload), 'queued', payload.get('tenant', DEFAULT_TENANT), now, now, now)
+            )
+        
+        return job_id
+    
+    def reserve(self, lease_seconds: float = 600) -> Optional[Dict[str, Any]]:
+        conn = connect_sqlite(self.db_path)
+        try:
+            while True:
+                now = time.time()
+                conn.execute('BEGIN IMMEDIATE')
+                candidates = conn.execute(
+                    "SELECT id, payload, attempts, tenant FROM render_jobs "
+                    "WHERE (status = 'queued' AND available_at <= ?) "
+                    "OR (status = 'running' AND lease_expires <= ?) "
+                    "ORDER BY created_at LIMIT ?",
+                    (now, now, FAIR_SHARE_WINDOW)
+                ).fetchall()
+                running = dict(conn.execute(
+                    "SELECT tenant, COUNT(*) FROM render_jobs "
+                    "WHERE status = 'running' AND lease_expires > ? GROUP BY tenant",
+                    (now,)
+                ).fetchall())
+                row = self._fair_pick(candidates, running)
+                
+                if row is None:
+                    conn.execute('COMMIT')
+                    return None
+                
+                # Reserva expirada de um worker que caiu sem tentativas restantes
+                if row['attempts'] >= self.max_attempts:
+                    conn.execute(
+                        "UPDATE render_jobs SET status = 'dead', error = ?, lease_expires = NULL, "
+                        "lease_token = NULL, updated_at = ? WHERE id = ?",
+                        ('Prazo da reserva expirado', now, row['id'])
+                    )
+                    conn.execute('COMMIT')
+                    continue
+                
+                # Um novo token por reserva: o worker anterior, se a reserva expirou, perde o job
+                lease = uuid.uuid4().hex
+                conn.execute(
+                    "UPDATE render_jobs SET status = 'running', attempts = attempts + 1, "
+                    "lease_expires = ?, lease_token = ?, updated_at = ? WHERE id = ?",
+                    (now + lease_seconds, lease, now, row['id'])
+                )
+                conn.execute('COMMIT')
+                
+                return {
+                    'id': row['id'],
+                    'payload': json.loads(row['payload']),
+                    'attempts': row['attempts'] + 1,
+                    'lease': lease
+                }
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def _fair_pick(candidates: List[sqlite3.Row], running: Dict[str, int]) -> Optional[sqlite3.Row]:
+        """
+        Escolhe o job do tenant com menos renderizações em andamento (ponderadas pelo peso)
+        
+        Entre os jobs de um mesmo tenant vale a ordem de chegada; tenants no
+        limite de execuções simultâneas esperam.
+        """
+        best, best_share = None, None
+        seen = set()
+        
+        for row in candidates:
+            tenant = row['tenant']
+            if tenant in seen:
+                continue
+            seen.add(tenant)
+            
+            if at_tenant_limit(tenant, running.get(tenant, 0)):
+                continue
+            share = running.get(tenant, 0) / get_tenant_limits(tenant)['weight']
+            if best_share is None or share < best_share:
+                best, best_share = row, share
+        
+        return best
+    
+    def ack(self, job_id: str, lease: str, result: Dict[str, Any]) -> bool:
+        with closing(connect_sqlite(self.db_path)) as conn:
+            cursor = conn.execute(
+                "UPDATE render_jobs SET status = 'done', result = ?, error = NULL, "
+                "lease_expires = NULL, lease_token = NULL, updated_at = ? "
+                "WHERE id = ? AND status = 'running' AND lease_token = ?",
+                (json.dumps(result), time.time(), job_id, lease)
+            )
+            return cursor.rowcount > 0
+    
+    def fail(self, job_id: str, lease: str, error: str, retryable: bool = True) -> str:
+        now = time.time()
+        
+        with closing(connect_sqlite(self.db_path)) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT status, attempts, lease_token FROM render_jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return 'dead'
+            
+            # A reserva expirou: o job já voltou à fila, foi reservado por outro worker ou terminou
+            if row['status'] != 'running' or row['lease_token'] != lease:
+                conn.execute('COMMIT')
+                return row['status']
+            
+            if retryable and row['attempts'] < self.max_attempts:
+                status = 'queued'
+                available_at = now + self._backoff(row['attempts'])
+            else:
+                status = 'dead'
+                available_at = now
+            
+            conn.execute(
+                "UPDATE render_jobs SET status = ?, error = ?, available_at = ?, "
+                "lease_expires = NULL, lease_token = NULL, updated_at = ? WHERE id = ?",
+                (status, error, available_at, now, job_id)
+            )
+            conn.execute('COMMIT')
+        
+        return status
+    
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with closing(connect_sqlite(self.db_path)) as conn:
+            row = conn.execute(
+                'SELECT id, status, attempts, error, result FROM render_jobs WHERE id = ?',
+                (job_id,)
+            ).fetchone()
+        
+        if row is None:
+            return None
+        
+        return {
+            'id': row['id'],
+            'status': row['status'],
+            'attempts': row['attempts'],
+            'error': row['error'],
+            'result': json.loads(row['result']) if row['result'] else None
+        }
+    
+    def depth(self) -> int:
+        with closing(connect_sqlite(self.db_path)) as conn:
+            return conn.execute("SELECT COUNT(*) FROM render_jobs WHERE status = 'queued'").fetchone()[0]
+
+class RedisRenderQueue(RenderQueue):
+    """
+    Fila de renderização em um servidor compatível com Redis
+    
+    Cada mudança de estado de um job roda em uma transação (WATCH/MULTI):
+    a reserva move o job para 'processing' e registra o prazo e o token da
+    reserva de uma só vez, e ack, fail e a devolução das reservas expiradas
+    só alteram o job se ele continuar no estado que leram.
+    """
+    
+    def __init__(self, client, prefix: str = 'render', max_attempts: int = 3, retry_delay: float = 30.0):
+        super().__init__(max_attempts, retry_delay)
+        # O cliente deve ser criado com decode_responses=True
+        self.client = client
+        self.prefix = prefix
+    
+    def _key(self, name: str) -> str:
+        return f"{self.prefix}:{name}"
+    
+    def enqueue(self, payload: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        
+        self.client.hset(self._key(f"job:{job_id}"), mapping={
+            'payload': json.dumps(payload),
+            'status': 'queued',
+            'attempts': 0,
+            'created_at': time.time()
+        })
+        self.client.lpush(self._key('queued'), job_id)
+        
+        return job_id
+    
+    def _promote_due_jobs(self) -> None:
+        """Devolve à fila os jobs com nova tentativa vencida e os de reservas expiradas"""
+        now = time.time()
+        
+        for job_id in self.client.zrangebyscore(self._key('delayed'), 0, now):
+            # zrem retorna 0 se outro worker já promoveu o job
+            if self.client.zrem(self._key('delayed'), job_id):
+                self.client.lpush(self._key('queued'), job_id)
+        
+        for job_id in self.client.zrangebyscore(self._key('leases'), 0, now):
+            if self.client.zrem(self._key('leases'), job_id):
+                self._reclaim(job_id)
+    
+    def _reclaim(self, job_id: str) -> None:
+        """Devolve à fila (ou à fila de falhas) um job cuja reserva expirou"""
+        job_key = self._key(f"job:{job_id}")
+        
+        def reclaim(pipe) -> None:
+            status, attempts = pipe.hmget(job_key, 'status', 'attempts')
+            if status != 'running':
+                return  # Confirmado ou registrado como falha pelo worker depois que o prazo venceu
+            
+            pipe.multi()
+            pipe.lrem(self._key('processing'), 0, job_id)
+            if int(attempts or 0) >= self.max_attempts:
+                self._dead_letter(pipe, job_id, 'Prazo da reserva expirado')
+            else:
+                pipe.hset(job_key, mapping={'status': 'queued', 'lease': ''})
+                pipe.lpush(self._key('queued'), job_id)
+        
+        self.client.transaction(reclaim, job_key)
+    
+    def _dead_letter(self, pipe, job_id: str, error: str) -> None:
+        pipe.hset(self._key(f"job:{job_id}"), mapping={'status': 'dead', 'error': error, 'lease': ''})
+        pipe.lpush(self._key('dead'), job_id)
+    
+    def reserve(self, lease_seconds: float = 600) -> Optional[Dict[str, Any]]:
+        self._promote_due_jobs()
+        lease = uuid.uuid4().hex
+        
+        # O job sai de 'queued' com o prazo e o token da reserva na mesma
+        # transação: um worker que cai no meio não deixa em 'processing' um
+        # job sem prazo, que nunca voltaria à fila
+        def reserve_next(pipe) -> Optional[Dict[str, Any]]:
+            job_id = pipe.lindex(self._key('queued'), -1)
+            if job_id is None:
+                return None
+            job_key = self._key(f"job:{job_id}")
+            pipe.watch(job_key)
+            attempts = int(pipe.hget(job_key, 'attempts') or 0) + 1
+            
+            pipe.multi()
+            pipe.rpoplpush(self._key('queued'), self._key('processing'))
+            pipe.hset(job_key, mapping={'status': 'running', 'attempts': attempts, 'lease': lease})
+            pipe.zadd(self._key('leases'), {job_id: time.time() + lease_seconds})
+            return {'id': job_id, 'attempts': attempts, 'lease': lease}
+        
+        job = self.client.transaction(reserve_next, self._key('queued'), value_from_callable=True)
+        if job is None:
+            return None
+        
+        job['payload'] = json.loads(self.client.hget(self._key(f"job:{job['id']}"), 'payload'))
+        return job
+    
+    def _release(self, pipe, job_id: str) -> None:
+        pipe.zrem(self._key('leases'), job_id)
+        pipe.lrem(self._key('processing'), 0, job_id)
+    
+    def ack(self, job_id: str, lease: str, result: Dict[str, Any]) -> bool:
+        job_key = self._key(f"job:{job_id}")
+        
+        def confirm(pipe) -> bool:
+            status, owner = pipe.hmget(job_key, 'status', 'lease')
+            if status != 'running' or owner != lease:
+                return False
+            pipe.multi()
+            self._release(pipe, job_id)
+            pipe.hset(job_key, mapping={'status': 'done', 'result': json.dumps(result), 'error': '', 'lease': ''})
+            return True
+        
+        return self.client.transaction(confirm, job_key, value_from_callable=True)
+    
+    def fail(self, job_id: str, lease: str, error: str, retryable: bool = True) -> str:
+        job_key = self._key(f"job:{job_id}")
+        
+        def record_failure(pipe) -> str:
+            status, owner, attempts = pipe.hmget(job_key, 'status', 'lease', 'attempts')
+            if status is None:
+                return 'dead'
+            # A reserva expirou: o job já voltou à fila, foi reservado por outro worker ou terminou
+            if status != 'running' or owner != lease:
+                return status
+            
+            attempts = int(attempts or 0)
+            pipe.multi()
+            self._release(pipe, job_id)
+            if retryable and attempts < self.max_attempts:
+                pipe.hset(job_key, mapping={'status': 'queued', 'error': error, 'lease': ''})
+                pipe.zadd(self._key('delayed'), {job_id: time.time() + self._backoff(attempts)})
+                return 'queued'
+            
+            self._dead_letter(pipe, job_id, error)
+            return 'dead'
+        
+        return self.client.transaction(record_failure, job_key, value_from_callable=True)
+    
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.client.hgetall(self._key(f"job:{job_id}"))
+        if not job:
+            return None
+        
+        return {
+            'id': job_id,
+            'status': job.get('status'),
+            'attempts': int(job.get('attempts') or 0),
+            'error': job.get('error') or None,
+            'result': json.loads(job['result']) if job.get('result') else None
+        }
+    
+    def depth(self) -> int:
+        return self.client.llen(self._key('queued')) + self.client.zcard(self._key('delayed'))
+
+class LocalRedis:
+    """
+    Substituto em memória do subconjunto de comandos Redis usado pela fila
+    
+    Serve apenas para desenvolvimento e testes em um único processo. As
+    transações rodam sob a trava do cliente, e o próprio cliente faz o papel
+    do pipeline: os comandos são executados na hora, sem WATCH.
+    """
+    
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._hashes = {}
+        self._lists = {}
+        self._zsets = {}
+    
+    def hset(self, name: str, mapping: Dict[str, Any]) -> int:
+        with self._lock:
+            values = self._hashes.setdefault(name, {})
+            added = len([key for key in mapping if key not in values])
+            values.update({key: str(value) for key, value in mapping.items()})
+            return added
+    
+    def hget(self, name: str, key: str) -> Optional[str]:
+        with self._lock:
+            return self._hashes.get(name, {}).get(key)
+    
+    def hmget(self, name: str, *keys: str) -> List[Optional[str]]:
+        with self._lock:
+            values = self._hashes.get(name, {})
+            return [values.get(key) for key in keys]
+    
+    def hgetall(self, name: str) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._hashes.get(name, {}))
+    
+    def hincrby(self, name: str, key: str, amount: int = 1) -> int:
+        with self._lock:
+            values = self._hashes.setdefault(name, {})
+            values[key] = str(int(values.get(key, 0)) + amount)
+            return int(values[key])
+    
+    def lpush(self, name: str, *values: str) -> int:
+        with self._lock:
+            items = self._lists.setdefault(name, [])
+            for value in values:
+                items.insert(0, str(value))
+            return len(items)
+    
+    def lindex(self, name: str, index: int) -> Optional[str]:
+        with self._lock:
+            items = self._lists.get(name, [])
+            return items[index] if -len(items) <= index < len(items) else None
+    
+    def rpoplpush(self, source: str, destination: str) -> Optional[str]:
+        with self._lock:
+            items = self._lists.get(source)
+            if not items:
+                return None
+            value = items.pop()
+            self._lists.setdefault(destination, []).insert(0, value)
+            return value
+    
+    def lrem(self, name: str, count: int, value: str) -> int:
+        with self._lock:
+            items = self._lists.get(name, [])
+            removed = len([item for item in items if item == value])
+            self._lists[name] = [item for item in items if item != value]
+            return removed
+    
+    def llen(self, name: str) -> int:
+        with self._lock:
+            return len(self._lists.get(name, []))
+    
+    def lrange(self, name: str, start: int, end: int) -> List[str]:
+        with self._lock:
+            items = self._lists.get(name, [])
+            return items[start:] if end == -1 else items[start:end + 1]
+    
+    def zadd(self, name: str, mapping: Dict[str, float]) -> int:
+        with self._lock:
+            scores = self._zsets.setdefault(name, {})
+            added = len([key for key in mapping if key not in scores])
+            scores.update(mapping)
+            return added
+    
+    def zrem(self, name: str, *values: str) -> int:
+        with self._lock:
+            scores = self._zsets.get(name, {})
+            return len([scores.pop(value) for value in values if value in scores])
+    
+    def zrangebyscore(self, name: str, min_score: float, max_score: float) -> List[str]:
+        with self._lock:
+            scores = self._zsets.get(name, {})
+            return [key for key, score in sorted(scores.items(), key=lambda item: item[1])
+                    if min_score <= score <= max_score]
+    
+    def zcard(self, name: str) -> int:
+        with self._lock:
+            return len(self._zsets.get(name, {}))
+    
+    def transaction(self, func: Callable, *watches: str, value_from_callable: bool = False) -> Any:
+        with self._lock:
+            value = func(self)
+            return value if value_from_callable else []
+    
+    def watch(self, *names: str) -> None:
+        pass
+    
+    def multi(self) -> None:
+        pass
+
+def create_render_queue() -> RenderQueue:
+    """
+    Cria a fila de renderização configurada por variáveis de ambiente
+    
+    Returns:
+        Instância da fila de renderização
+    """
+    backend = os.getenv('RENDER_QUEUE_BACKEND', 'sqlite').lower()
+    max_attempts = int(os.getenv('RENDER_MAX_ATTEMPTS', '3'))
+    retry_delay = float(os.getenv('RENDER_RETRY_DELAY', '30'))
+    
+    if backend == 'redis':
+        import redis  # Dependência opcional, apenas para este backend
+        
+        client = redis.Redis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379/0'), decode_responses=True)
+        return RedisRenderQueue(client, max_attempts=max_attempts, retry_delay=retry_delay)
+    
+    if backend == 'local':
+        return RedisRenderQueue(LocalRedis(), max_attempts=max_attempts, retry_delay=retry_delay)
+    
+    db_path = os.getenv('RENDER_QUEUE_PATH', os.path.join(UPLOAD_FOLDER, 'render_queue.db'))
+    return SQLiteRenderQueue(db_path, max_attempts=max_attempts, retry_delay=retry_delay)
@@ -0,0 +1,160 @@
+"""
+Worker de renderização: consome a fila de renderização e gera os PDFs
+
+Uso:
+    RENDER_QUEUE_BACKEND=sqlite python render_worker.py
+
+Os workers escalam de forma independente dos processos da API; basta que
+todos apontem para a mesma fila e para o mesmo volume de PDFs (PDF_FOLDER).
+"""
+
+import os
+import signal
+import time
+from contextlib import nullcontext
+from typing import Dict, Any, Optional
+
+from document_generator import DocumentGenerator, RENDER_ERROR_PREFIX
+from document_store import DocumentStore
+from lazy_imports import prewarm
+from metrics import metrics, MetricsExporter
+from pdf_generator import get_renderer
+from profiling import ProfileStore
+from render_queue import RenderQueue, create_render_queue
+from settings import PDF_FOLDER, DOCUMENT_STORE_PATH, PROFILE_FOLDER
+from storage import FileStorage
+from tenant_scheduler import DEFAULT_TENANT
+
+class RenderWorker:
+    """Consome jobs da fila de renderização até ser interrompido"""
+    
+    def __init__(self, queue: RenderQueue, storage: FileStorage, poll_interval: float = 1.0, lease_seconds: float = 600,
+                 documents: Optional[DocumentStore] = None, profiles: Optional[ProfileStore] = None):
+        self.queue = queue
+        self.storage = storage
+        self.documents = documents  # Se informado, registra o uso por tenant e o status dos documentos
+        self.profiles = profiles  # Se informado, perfila os jobs cuja geração foi perfilada
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self._running = True
+    
+    def stop(self, *args) -> None:
+        """Interrompe o worker após o job atual"""
+        self._running = False
+    
+    def run_once(self) -> bool:
+        """
+        Processa no máximo um job da fila
+        
+        Returns:
+            True se um job foi processado
+        """
+        job = self.queue.reserve(self.lease_seconds)
+        if job is None:
+            return False
+        
+        payload = job['payload']
+        try:
+            self._render(job['id'], job['lease'], payload)
+        except Exception as e:
+            status = self.queue.fail(job['id'], job['lease'], f"{RENDER_ERROR_PREFIX}: {str(e)}")
+            print(f"Job {job['id']} falhou (tentativa {job['attempts']}), novo status: {status}")
+            if status == 'dead':
+                self._update_document(job['id'], status)
+        
+        return True
+    
+    def _render(self, job_id: str, lease: str, payload: Dict[str, Any]) -> None:
+        """Renderiza um job e confirma ou registra a falha na fila"""
+        output_path = self.storage.path_for(payload['storage_key'])
+        tenant = payload.get('tenant', DEFAULT_TENANT)
+        
+        # A renderização entra no mesmo perfil da geração, como a parte 'render'
+        profile_id = payload.get('profile_id') if self.profiles is not None else None
+        render_started = time.monotonic()
+        with self.profiles.capture(profile_id, 'render') if profile_id else nullcontext():
+            success, message, pdf_path = DocumentGenerator.generate_document(
+                payload['content'], payload['doc_type'], payload['language'], payload['title'], output_path,
+                payload.get('quality', 'high')
+            )
+        
+        if self.documents is not None:
+            usage = {'render_seconds': time.monotonic() - render_started}
+            if success:
+                usage['bytes_stored'] = os.path.getsize(pdf_path)
+            self.documents.record_usage(tenant, **usage)
+        
+        if success:
+            # O PDF é o mesmo para qualquer worker: se a reserva expirou, quem tem o job publica o status
+            if self.queue.ack(job_id, lease, {'storage_key': payload['storage_key']}):
+                self._update_document(job_id, 'done')
+            else:
+                print(f"Job {job_id}: reserva expirada antes da confirmação")
+            return
+        
+        # Falhas de validação são determinísticas: repetir não adianta
+        retryable = message.startswith(RENDER_ERROR_PREFIX)
+        status = self.queue.fail(job_id, lease, message, retryable=retryable)
+        print(f"Job {job_id} falhou: {message} (novo status: {status})")
+        if status == 'dead':
+            self._update_document(job_id, status)
+    
+    def _update_document(self, job_id: str, status: str) -> None:
+        """
+        Atualiza o status do documento do job (concluído ou descartado)
+        
+        Sem isso, o documento só sairia de 'queued' quando alguém consultasse
+        /api/jobs, o que nunca acontece com os documentos dos lotes.
+        """
+        if self.documents is None:
+            return
+        try:
+            doc = self.documents.find_by_job(job_id)
+            if doc is not None and doc.get('status') != status:
+                self.documents.update_document(doc['id'], status=status)
+        except Exception as e:
+            print(f"Erro ao atualizar o documento do job {job_id}: {str(e)}")
+    
+    def run(self) -> None:
+        """Processa jobs continuamente até receber SIGTERM/SIGINT"""
+        while self._running:
+            if not self.run_once():
+                time.sleep(self.poll_interval)
+
+def main() -> None:
+    # Carregar as dependências de renderização antes do primeiro job
+    prewarm('render', background=False)
+    
+    # Fontes e folhas de estilos do renderizador desta thread, reutilizadas em todos os jobs
+    try:
+        renderer = get_renderer().warm()
+        print(f"Renderizador aquecido em {renderer.warm_seconds:.2f}s")
+    except Exception as e:
+        print(f"Erro ao aquecer o renderizador: {str(e)}")
+    
+    worker = RenderWorker(
+        create_render_queue(),
+        FileStorage(PDF_FOLDER),
+        poll_interval=float(os.getenv('RENDER_POLL_INTERVAL', '1.0')),
+        lease_seconds=float(os.getenv('RENDER_LEASE_SECONDS', '600')),
+        documents=DocumentStore(DOCUMENT_STORE_PATH),
+        profiles=ProfileStore(PROFILE_FOLDER)
+    )
+    
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    
+    # As métricas da renderização (bytes economizados, tempos) só existem neste processo:
+    # a cópia periódica é somada por /api/metrics
+    exporter = MetricsExporter(metrics, 'render')
+    export_thread = exporter.start_background()
+    
+    print(f"Worker de renderização iniciado (pid {os.getpid()})")
+    worker.run()
+    exporter.stop()
+    if export_thread is not None:
+        export_thread.join(5)
+    print("Worker de renderização encerrado")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,317 @@
+"""
+Índice de busca textual dos documentos gerados (SQLite FTS5)
+
+Cada documento é indexado com título, tema, títulos das seções e o texto
+Markdown final. O índice é atualizado a cada geração e exclusão; as buscas
+são ordenadas por relevância (BM25, com peso maior para título e tema) e
+retornam um trecho do texto com os termos destacados.
+
+Termos presentes em mais da metade dos documentos têm IDF quase nulo no
+BM25 do FTS5, e aí os pesos das colunas deixam de pesar. Por isso os
+documentos em que todos os termos aparecem no título ou no tema vêm
+primeiro (title_match), e o BM25 desempata.
+
+Os termos da busca passam por um radicalizador leve (português ou inglês)
+e viram buscas por prefixo: "gerações" procura "gerac*", que encontra
+"geração" e "gerações"; "stories" procura "stor*". O índice ignora acentos.
+
+Uso:
+    python search_index.py --backfill            # Indexa título e tema dos documentos antigos
+    python search_index.py --benchmark [docs]    # Mede as buscas em um índice sintético
+"""
+
+import hashlib
+import html
+import os
+import re
+import sqlite3
+import sys
+import time
+import unicodedata
+from contextlib import closing
+from typing import Dict, Any, List, Optional
+
+from metrics import metrics
+from storage import connect_sqlite
+
+# Pesos do BM25 por coluna: título, tema, títulos das seções e texto
+COLUMN_WEIGHTS = (10.0, 5.0, 3.0, 1.0)
+
+# Pontuação BM25 abaixo da qual os termos são comuns demais para ordenar (IDF limitado pelo FTS5)
+MIN_SCORE = 1e-3
+
+# Termos considerados por busca e tamanho mínimo do radical
+MAX_QUERY_TERMS = 8
+MIN_STEM_LENGTH = 4
+
+# Sufixos removidos pelo radicalizador leve (sem acentos), do mais longo ao mais curto
+STEM_SUFFIXES = {
+    'pt': ('amentos', 'imentos', 'amento', 'imento', 'idades', 'idade', 'mente', 'acoes', 'icoes',
+           'aveis', 'iveis', 'istas', 'ista', 'ismos', 'ismo', 'acao', 'icao', 'avel', 'ivel',
+           'oes', 'aes', 'ais', 'eis', 'ois', 'ao', 'ns', 'es', 'as', 'os', 'a', 'o', 'e', 's'),
+    'en': ('ational', 'ization', 'fulness', 'ousness', 'iveness', 'ements', 'ement', 'ments', 'ment',
+           'ingly', 'ings', 'ing', 'edly', 'ies', 'ied', 'ed', 'ly', 'es', 'e', 's', 'y'),
+}
+
+# Palavras ignoradas na busca (sem acentos)
+STOPWORDS = frozenset('''
+    a o as os um uma uns umas de da do das dos em na no nas nos para por com sem e ou que se ao aos
+    the an of in on at to for with without and or is are be by from as it its this that
+'''.split())
+
+# Marcadores internos do trecho, trocados por <mark> depois do escape do HTML
+_MARK_START, _MARK_END = '\x02', '\x03'
+
+HEADING_PATTERN = re.compile(r'^#+\s+(.+?)\s*#*\s*$', re.MULTILINE)
+TERM_PATTERN = re.compile(r'\w+')
+
+def normalize(text: str) -> str:
+    """Converte para minúsculas e remove os acentos"""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+def stem(term: str, language: str) -> str:
+    """
+    Reduz um termo ao radical, removendo o sufixo flexional mais longo
+    
+    Args:
+        term: Termo normalizado (minúsculas, sem acentos)
+        language: 'pt' ou 'en'
+    
+    Returns:
+        Radical (o próprio termo se for curto demais)
+    """
+    for suffix in STEM_SUFFIXES[language]:
+        if term.endswith(suffix) and len(term) - len(suffix) >= MIN_STEM_LENGTH:
+            return term[:-len(suffix)]
+    return term
+
+def build_match_query(query: str, language: Optional[str] = None) -> Optional[str]:
+    """
+    Converte a busca do usuário em uma expressão MATCH do FTS5
+    
+    Cada termo vira uma busca por prefixo do radical (termos curtos, pela
+    palavra exata); todos os termos são obrigatórios e palavras comuns são
+    ignoradas. Sem idioma, vale o radical mais curto entre português e inglês.
+    
+    Args:
+        query: Texto digitado pelo usuário
+        language: Idioma da busca ('pt-BR', 'en-US' ou None)
+    
+    Returns:
+        Expressão MATCH ou None se a busca não tiver termos
+    """
+    languages = ['pt' if language.lower().startswith('pt') else 'en'] if language else ['pt', 'en']
+    terms = []
+    words = [word for word in TERM_PATTERN.findall(normalize(query)) if word not in STOPWORDS]
+    for word in words[:MAX_QUERY_TERMS]:
+        # Aspas protegem termos que coincidem com operadores do FTS5 (AND, OR, NOT, NEAR)
+        if len(word) < MIN_STEM_LENGTH:
+            terms.append(f'"{word}"')
+            continue
+        stems = sorted({stem(word, lang) for lang in languages}, key=len)
+        terms.append(f'"{stems[0]}"*')
+    return ' AND '.join(terms) or None
+
+def tenant_token(tenant: str) -> str:
+    """Token único do tenant, para restringir a busca dentro do próprio índice"""
+    return 't' + hashlib.sha1(tenant.encode('utf-8')).hexdigest()[:16]
+
+class SearchIndex:
+    """Índice FTS5 dos documentos, com atualização incremental"""
+    
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        
+        with closing(connect_sqlite(self.db_path)) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+                    title, theme, headings, body,
+                    tenant_key,
+                    doc_id UNINDEXED, tenant UNINDEXED, language UNINDEXED, created_at UNINDEXED,
+                    tokenize = 'unicode61 remove_diacritics 2'
+                )
+            ''')
+            # Linha do índice de cada documento, para atualizar e excluir sem varrer a tabela FTS
+            conn.execute('CREATE TABLE IF NOT EXISTS indexed_documents (doc_id TEXT PRIMARY KEY, fts_rowid INTEGER NOT NULL)')
+    
+    def index_document(self, doc_info: Dict[str, Any], tenant: str, content: str = '') -> None:
+        """
+        Indexa (ou reindexa) um documento
+        
+        Args:
+            doc_info: Informações do documento ('id', 'title', 'theme', 'language', 'created_at')
+            tenant: Tenant dono do documento
+            content: Markdown final do documento (vazio para indexar só os metadados)
+        """
+        started = time.perf_counter()
+        with closing(connect_sqlite(self.db_path)) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            SearchIndex._delete(conn, doc_info['id'])
+            SearchIndex._insert(conn, doc_info, tenant, content)
+            conn.execute('COMMIT')
+        metrics.observe('search_index_seconds', time.perf_counter() - started)
+    
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, doc_info: Dict[str, Any], tenant: str, content: str) -> None:
+        """Insere o documento na tabela FTS e registra a linha correspondente"""
+        headings = '\n'.join(HEADING_PATTERN.findall(content))
+        cursor = conn.execute(
+            'INSERT INTO documents_fts (title, theme, headings, body, tenant_key, doc_id, tenant, language, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (doc_info.get('title', ''), doc_info.get('theme', ''), headings, content, tenant_token(tenant),
+             doc_info['id'], tenant, doc_info.get('language', ''), doc_info.get('created_at', ''))
+        )
+        conn.execute('INSERT INTO indexed_documents (doc_id, fts_rowid) VALUES (?, ?)', (doc_info['id'], cursor.lastrowid))
+    
+    @staticmethod
+    def _delete(conn: sqlite3.Connection, doc_id: str) -> None:
+        """Remove o documento da tabela FTS, se indexado"""
+        row = conn.execute('SELECT fts_rowid FROM indexed_documents WHERE doc_id = ?', (doc_id,)).fetchone()
+        if row is not None:
+            conn.execute('DELETE FROM documents_fts WHERE rowid = ?', (row['fts_rowid'],))
+            conn.execute('DELETE FROM indexed_documents WHERE doc_id = ?', (doc_id,))
+    
+    def remove_document(self, doc_id: str) -> None:
+        """Remove um documento do índice"""
+        with closing(connect_sqlite(self.db_path)) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            SearchIndex._delete(conn, doc_id)
+            conn.execute('COMMIT')
+    
+    def contains(self, doc_id: str) -> bool:
+        """Indica se o documento já está no índice"""
+        with closing(connect_sqlite(self.db_path)) as conn:
+            return conn.execute('SELECT 1 FROM indexed_documents WHERE doc_id = ?', (doc_id,)).fetchone() is not None
+    
+    def search(self, query: str, tenant: str, language: Optional[str] = None, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Busca os documentos de um tenant por relevância
+        
+        Args:
+            query: Texto da busca
+            tenant: Tenant que faz a busca (só vê os próprios documentos)
+            language: Idioma dos termos, para a radicalização (None: ambos)
+            limit: Número máximo de resultados
+            offset: Resultados a pular (paginação)
+        
+        Returns:
+            Lista com 'id', 'title', 'theme', 'language', 'created_at', 'title_match'
+            (todos os termos no título ou no tema), 'score' (BM25, 4 algarismos
+            significativos; None se os termos forem comuns demais para pesar) e
+            'snippet' (HTML escapado, com os termos encontrados entre <mark> e </mark>)
+        """
+        match_query = build_match_query(query, language)
+        if match_query is None:
+            return []
+        
+        tenant_filter = f'{{tenant_key}} : {tenant_token(tenant)}'
+        started = time.perf_counter()
+        with closing(connect_sqlite(self.db_path)) as conn:
+            # Primeiro os documentos com todos os termos no título ou no tema; o BM25 desempata
+            rows = conn.execute(
+                '''
+                SELECT doc_id, title, theme, language, created_at, rank,
+                       rowid IN (SELECT rowid FROM documents_fts WHERE documents_fts MATCH ?) AS title_match,
+                       snippet(documents_fts, -1, ?, ?, '…', 16) AS snippet
+                FROM documents_fts
+                WHERE documents_fts MATCH ? AND rank MATCH ? AND tenant = ?
+                ORDER BY title_match DESC, rank
+                LIMIT ? OFFSET ?
+                ''',
+                (f'{tenant_filter} AND {{title theme}} : ({match_query})', _MARK_START, _MARK_END,
+                 f'{tenant_filter} AND ({match_query})', f"bm25({', '.join(map(str, COLUMN_WEIGHTS))}, 0)",
+                 tenant, limit, offset)
+            ).fetchall()
+        metrics.observe('search_query_seconds', time.perf_counter() - started)
+        
+        return [
+            {
+                'id': row['doc_id'],
+                'title': row['title'],
+                'theme': row['theme'],
+                'language': row['language'],
+                'created_at': row['created_at'],
+                'title_match': bool(row['title_match']),
+                'score': SearchIndex._score(row['rank']),
+                'snippet': html.escape(row['snippet']).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>'),
+            }
+            for row in rows
+        ]
+    
+    @staticmethod
+    def _score(rank: float) -> Optional[float]:
+        """
+        Pontuação BM25 com 4 algarismos significativos
+        
+        O FTS5 limita o IDF dos termos comuns a 1e-6: abaixo de MIN_SCORE a
+        pontuação não distingue os documentos e não é informada.
+        """
+        score = -rank
+        return float(f'{score:.4g}') if score >= MIN_SCORE else None
+    
+    def optimize(self) -> None:
+        """Junta os segmentos do índice (após cargas grandes)"""
+        with closing(connect_sqlite(self.db_path)) as conn:
+            conn.execute("INSERT INTO documents_fts (documents_fts) VALUES ('optimize')")
+
+def _benchmark(documents: int, words: int) -> None:
+    """Cria um índice sintético e mede o tempo das buscas"""
+    import itertools
+    import random
+    import tempfile
+    from ai_models import SIMULATED_VOCABULARY
+    
+    # Metade das palavras vem do vocabulário comum (presente em quase todos os
+    # documentos) e metade de um vocabulário longo com distribuição de Zipf
+    common = SIMULATED_VOCABULARY['pt-BR']
+    rng = random.Random(0)
+    syllables = ['ba', 'ce', 'di', 'fo', 'gu', 'la', 'me', 'ni', 'po', 'ru', 'sa', 'te', 'vi', 'xo', 'za']
+    rare = [''.join(rng.choice(syllables) for _ in range(4)) for _ in range(20000)]
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(rare))))
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index = SearchIndex(os.path.join(tmp_dir, 'search.db'))
+        
+        started = time.perf_counter()
+        with closing(connect_sqlite(index.db_path)) as conn:
+            conn.execute('BEGIN')
+            for number in range(documents):
+                doc_info = {'id': str(number), 'title': f"Guia {rng.choice(common)} {number}",
+                            'theme': rng.choice(rare), 'language': 'pt-BR'}
+                body = rng.choices(common, k=words // 2) + rng.choices(rare, cum_weights=cum_weights, k=words // 2)
+                rng.shuffle(body)
+                SearchIndex._insert(conn, doc_info, f"tenant{number % 20}", f"## {rng.choice(common)}\n\n" + ' '.join(body))
+            conn.execute('COMMIT')
+        index.optimize()
+        print(f"{documents} documentos de {words} palavras indexados em {time.perf_counter() - started:.1f} s")
+        
+        queries = ('estratégias', 'gestão de projetos', rare[10], rare[1000], f"{rare[50]} qualidade", 'inexistente')
+        for query in queries:
+            timings = []
+            for repeat in range(20):
+                start = time.perf_counter()
+                results = index.search(query, f"tenant{repeat % 20}", 'pt-BR', limit=10)
+                timings.append(time.perf_counter() - start)
+            timings.sort()
+            print(f"{query!r:28} {len(results):3} resultados   mediana {timings[len(timings) // 2] * 1000:7.1f} ms   "
+                  f"máx. {timings[-1] * 1000:7.1f} ms")
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--benchmark':
+        _benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 100000, int(sys.argv[3]) if len(sys.argv) > 3 else 200)
+    elif len(sys.argv) > 1 and sys.argv[1] == '--backfill':
+        from document_store import DocumentStore
+        from settings import DOCUMENT_STORE_PATH, SEARCH_INDEX_PATH
+        
+        index = SearchIndex(SEARCH_INDEX_PATH)
+        indexed = 0
+        for doc, _ in DocumentStore(DOCUMENT_STORE_PATH).iter_documents():
+            if not index.contains(doc['id']):
+                index.index_document(doc, doc.get('tenant', 'default'))
+                indexed += 1
+        print(f"{indexed} documentos indexados (somente título e tema)")
+    else:
+        print(__doc__)
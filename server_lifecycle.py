@@ -0,0 +1,71 @@
+"""
+Controle do ciclo de vida do processo servidor (prontidão e drenagem de jobs)
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+class ServerLifecycle:
+    """Acompanha os jobs em andamento e o estado de drenagem de um worker"""
+    
+    def __init__(self):
+        self._lock = threading.Condition()
+        self._in_flight = 0
+        self._draining = False
+        self.started_at = time.time()
+    
+    @contextmanager
+    def track_job(self) -> Iterator[None]:
+        """
+        Registra um job em andamento enquanto o bloco estiver ativo
+        
+        Returns:
+            Gerenciador de contexto do job
+        """
+        with self._lock:
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._lock.notify_all()
+    
+    @property
+    def in_flight(self) -> int:
+        """Número de jobs em andamento"""
+        with self._lock:
+            return self._in_flight
+    
+    @property
+    def draining(self) -> bool:
+        """Indica se o worker está encerrando e não deve receber novos jobs"""
+        return self._draining
+    
+    def start_draining(self) -> None:
+        """Marca o worker como em drenagem (a verificação de prontidão passa a falhar)"""
+        self._draining = True
+    
+    def wait_idle(self, timeout: float) -> bool:
+        """
+        Aguarda a conclusão dos jobs em andamento
+        
+        Args:
+            timeout: Tempo máximo de espera em segundos
+        
+        Returns:
+            True se não houver mais jobs em andamento
+        """
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while self._in_flight > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._lock.wait(remaining)
+            return True
+
+# Instância única por processo
+lifecycle = ServerLifecycle()
@@ -0,0 +1,34 @@
+"""
+Configurações compartilhadas entre a API e os workers de renderização
+"""
+
+import os
+
+# Configuração de pastas (a API e os workers devem apontar para o mesmo volume)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', os.path.join(BASE_DIR, 'uploads'))
+PDF_FOLDER = os.getenv('PDF_FOLDER', os.path.join(UPLOAD_FOLDER, 'pdfs'))
+
+# Modo de renderização: 'inline' (no processo da API) ou 'queue' (workers separados)
+RENDER_MODE = os.getenv('RENDER_MODE', 'inline')
+
+# Checkpoints das gerações de conteúdo em andamento (retomadas após falhas)
+CHECKPOINT_FOLDER = os.getenv('CHECKPOINT_FOLDER', os.path.join(UPLOAD_FOLDER, 'checkpoints'))
+
+# Banco de documentos e de uso por tenant (compartilhado pela API e pelos workers)
+DOCUMENT_STORE_PATH = os.getenv('DOCUMENT_STORE_PATH', os.path.join(UPLOAD_FOLDER, 'documents.db'))
+
+# Índice de busca textual dos documentos (SQLite FTS5)
+SEARCH_INDEX_PATH = os.getenv('SEARCH_INDEX_PATH', os.path.join(UPLOAD_FOLDER, 'search.db'))
+
+# Markdown final dos documentos, em blobs de seção deduplicados e comprimidos
+CONTENT_STORE_FOLDER = os.getenv('CONTENT_STORE_FOLDER', os.path.join(UPLOAD_FOLDER, 'content'))
+
+# Chaves de API salvas por /api/settings (lidas por todos os workers)
+API_KEYS_PATH = os.getenv('API_KEYS_PATH', os.path.join(UPLOAD_FOLDER, 'api_keys.json'))
+
+# Perfis de desempenho das gerações (ver profiling.py)
+PROFILE_FOLDER = os.getenv('PROFILE_FOLDER', os.path.join(UPLOAD_FOLDER, 'profiles'))
+
+# Cópias das métricas de cada processo, somadas por /api/metrics (ver metrics.py)
+METRICS_FOLDER = os.getenv('METRICS_FOLDER', os.path.join(UPLOAD_FOLDER, 'metrics'))
@@ -0,0 +1,204 @@
+"""
+Pré-geração especulativa enquanto o usuário preenche o formulário
+
+Quando título, tema e tipo de documento já estão preenchidos, o formulário
+chama /api/prewarm. Depois de uma curta espera (SPECULATION_DELAY), a
+primeira chamada do plano (estrutura e primeiras seções) é gerada em segundo
+plano e gravada no checkpoint da geração, com a mesma chave que
+/api/generate calcula. Se o envio chegar com os mesmos parâmetros dentro de
+SPECULATION_TTL segundos, a geração é adotada: o envio retoma do
+checkpoint em vez de começar do zero.
+
+Controle de custo:
+    - Apenas a primeira chamada do plano é especulada
+    - Uma nova especulação da mesma sessão do formulário (identificador
+      enviado pela página) cancela a anterior; durante a espera inicial o
+      cancelamento não gasta nenhum token. Sessões diferentes do mesmo tenant
+      (todos os usuários anônimos são o tenant 'default') não se cancelam
+    - Especulações não adotadas dentro do prazo, ou canceladas, são descartadas
+      na hora (checkpoint removido, exceto se uma geração de /api/generate
+      estiver usando a mesma chave) e os tokens gastos aparecem na métrica
+      speculation_wasted_tokens
+    - No máximo SPECULATION_MAX_ACTIVE especulações simultâneas por processo,
+      somando todos os tenants e sessões
+
+Configuração (variáveis de ambiente):
+    SPECULATION_ENABLED     1 ativa a pré-geração (padrão 1)
+    SPECULATION_DELAY       Espera antes de chamar o modelo, em segundos (padrão 1.5)
+    SPECULATION_TTL         Prazo para a adoção, em segundos (padrão 120)
+    SPECULATION_MAX_ACTIVE  Especulações simultâneas por processo (padrão 16)
+"""
+
+import os
+import threading
+from typing import Dict, Any, Callable, Optional, Tuple
+
+from content_generation import ContentGenerator, CheckpointStore, GenerationCancelled
+from metrics import metrics
+
+SPECULATION_ENABLED = os.getenv('SPECULATION_ENABLED', '1') == '1'
+SPECULATION_DELAY = float(os.getenv('SPECULATION_DELAY', '1.5'))
+SPECULATION_TTL = float(os.getenv('SPECULATION_TTL', '120'))
+SPECULATION_MAX_ACTIVE = int(os.getenv('SPECULATION_MAX_ACTIVE', '16'))
+
+class Speculation:
+    """Estado de uma pré-geração em andamento"""
+    
+    def __init__(self, job_key: str, tenant: str, session: Optional[str] = None):
+        self.job_key = job_key
+        self.tenant = tenant
+        self.session = session
+        self.cancel = threading.Event()
+        self.adopted = threading.Event()
+        self.thread = None
+
+class Speculator:
+    """Inicia, adota e descarta pré-gerações especulativas"""
+    
+    def __init__(self, checkpoints: CheckpointStore, record_usage: Optional[Callable[..., None]] = None,
+                 delay: float = SPECULATION_DELAY, ttl: float = SPECULATION_TTL,
+                 max_active: int = SPECULATION_MAX_ACTIVE):
+        self.checkpoints = checkpoints
+        self.record_usage = record_usage  # Recebe (tenant, **uso) com os tokens gastos
+        self.delay = delay
+        self.ttl = ttl
+        self.max_active = max_active
+        self._by_key: Dict[str, Speculation] = {}
+        self._by_session: Dict[Tuple[str, str], Speculation] = {}  # Última especulação de cada sessão
+        self._generating: Dict[str, int] = {}  # Gerações de /api/generate em andamento por chave
+        self._lock = threading.Lock()
+    
+    def start(self, generator: ContentGenerator, plan, job_key: str, temperature: float,
+              session: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Inicia a pré-geração da primeira chamada do plano
+        
+        Args:
+            generator: Gerador configurado para o tenant (como em /api/generate)
+            plan: Plano de chamadas do documento
+            job_key: Chave da geração (ver ContentGenerator.job_key)
+            temperature: Temperatura para geração
+            session: Sessão do formulário; a especulação anterior da mesma sessão é cancelada
+        
+        Returns:
+            Dicionário com 'status' ('started', 'running', 'ready' ou 'rejected') e 'ttl'
+        """
+        tenant = generator.tenant
+        with self._lock:
+            current = self._by_key.get(job_key)
+            if current is not None and current.tenant == tenant and not current.cancel.is_set():
+                return {'status': 'running', 'ttl': self.ttl}
+            
+            # Parâmetros mudaram: a especulação anterior da sessão não será adotada
+            previous = self._by_session.get((tenant, session)) if session else None
+            if previous is not None:
+                previous.cancel.set()
+                self._forget(previous)  # A vaga é liberada já, sem esperar a thread acordar
+            
+            if self.checkpoints.load(job_key) is not None:
+                return {'status': 'ready', 'ttl': self.ttl}
+            
+            if len(self._by_key) >= self.max_active:
+                metrics.increment('speculation_rejected')
+                return {'status': 'rejected', 'ttl': 0}
+            
+            speculation = Speculation(job_key, tenant, session)
+            generator.cancel = speculation.cancel
+            speculation.thread = threading.Thread(
+                target=self._run, args=(speculation, generator, plan, temperature),
+                name=f"speculation-{job_key[:8]}", daemon=True
+            )
+            self._by_key[job_key] = speculation
+            if session:
+                self._by_session[(tenant, session)] = speculation
+        
+        speculation.thread.start()
+        metrics.increment('speculation_started')
+        return {'status': 'started', 'ttl': self.ttl}
+    
+    def adopt(self, job_key: str, tenant: str) -> bool:
+        """
+        Adota a pré-geração de uma chave, esperando a chamada em andamento terminar
+        
+        A especulação para depois da chamada em andamento, e a geração
+        normal retoma a partir do checkpoint. Chamado no início de toda
+        geração: até release(), o checkpoint da chave não é descartado por
+        uma especulação não adotada.
+        
+        Args:
+            job_key: Chave da geração
+            tenant: Tenant do envio (só adota especulações do mesmo tenant)
+        
+        Returns:
+            True se havia uma especulação adotada
+        """
+        with self._lock:
+            self._generating[job_key] = self._generating.get(job_key, 0) + 1
+            speculation = self._by_key.get(job_key)
+            if speculation is None or speculation.tenant != tenant or speculation.cancel.is_set():
+                return False
+            speculation.adopted.set()
+            speculation.cancel.set()  # Interrompe a espera inicial e as continuações
+            self._forget(speculation)
+        
+        speculation.thread.join()
+        metrics.increment('speculation_adopted')
+        return True
+    
+    def release(self, job_key: str) -> None:
+        """
+        Indica que a geração iniciada por adopt terminou (com ou sem sucesso)
+        
+        Args:
+            job_key: Chave da geração
+        """
+        with self._lock:
+            remaining = self._generating.get(job_key, 0) - 1
+            if remaining > 0:
+                self._generating[job_key] = remaining
+            else:
+                self._generating.pop(job_key, None)
+    
+    def _run(self, speculation: Speculation, generator: ContentGenerator, plan, temperature: float) -> None:
+        """Espera, gera a primeira chamada e aguarda a adoção até o prazo"""
+        try:
+            # Cancelada durante a espera (o usuário continuou editando): nenhum token gasto
+            if not speculation.cancel.wait(self.delay):
+                generator.generate(plan, speculation.job_key, temperature, max_calls=1)
+        except GenerationCancelled:
+            pass
+        except Exception as e:
+            print(f"Erro na pré-geração {speculation.job_key}: {str(e)}")
+        finally:
+            if self.record_usage is not None and generator.usage['llm_calls']:
+                self.record_usage(speculation.tenant, **generator.usage)
+        
+        # Aguardar a adoção até o prazo; a adoção e o cancelamento acordam a espera
+        speculation.cancel.wait(self.ttl)
+        
+        with self._lock:
+            if speculation.adopted.is_set():
+                return
+            self._forget(speculation)
+            
+            # Não adotada: o checkpoint parcial é descartado, salvo se uma nova
+            # especulação com os mesmos parâmetros ou uma geração de /api/generate
+            # (que pode estar retomando dele) já o estiver usando
+            if speculation.job_key not in self._by_key and speculation.job_key not in self._generating:
+                self.checkpoints.delete(speculation.job_key)
+        
+        metrics.increment('speculation_discarded')
+        metrics.increment('speculation_wasted_tokens', generator.usage['output_tokens'])
+    
+    def _forget(self, speculation: Speculation) -> None:
+        """Remove a especulação dos índices (com a trava já obtida)"""
+        if self._by_key.get(speculation.job_key) is speculation:
+            del self._by_key[speculation.job_key]
+        owner = (speculation.tenant, speculation.session)
+        if self._by_session.get(owner) is speculation:
+            del self._by_session[owner]
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Número de especulações em andamento"""
+        with self._lock:
+            return {'active': len(self._by_key), 'max_active': self.max_active}
@@ -0,0 +1,164 @@
+"""
+Armazenamento dos arquivos gerados, endereçados por chave de armazenamento
+
+Os arquivos ficam em subdiretórios com prefixo de hash (ab/cd/arquivo.pdf),
+para que nenhum diretório acumule milhares de entradas. Chaves antigas, sem
+subdiretório, continuam válidas.
+
+A chave de um novo documento é endereçada pelo conteúdo: o hash do Markdown e
+dos parâmetros de renderização. Requisições simultâneas com o mesmo título
+nunca disputam o mesmo arquivo, e documentos idênticos compartilham um único
+PDF (ver DocumentStore.is_file_referenced). Os arquivos são sempre gravados em
+um caminho temporário (temp_path) e renomeados, para que nenhum leitor veja um
+PDF pela metade.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+def temp_path(path: str, tag: str = 'tmp') -> str:
+    """
+    Caminho temporário exclusivo do processo e da thread, no mesmo diretório do destino
+    
+    Args:
+        path: Caminho final do arquivo
+        tag: Identificação da etapa ('tmp' para gravações, 'opt' para a otimização)
+    
+    Returns:
+        Caminho para gravar antes do os.replace
+    """
+    return f"{path}.{tag}{os.getpid()}-{threading.get_ident()}"
+
+def connect_sqlite(db_path: str) -> sqlite3.Connection:
+    """
+    Abre uma conexão SQLite por operação (seguro entre threads e processos)
+    
+    Em modo autocommit: as transações são abertas explicitamente com BEGIN.
+    
+    Args:
+        db_path: Caminho do banco
+    
+    Returns:
+        Conexão com linhas acessíveis por nome (sqlite3.Row)
+    """
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+@contextmanager
+def file_lock(path: str, blocking: bool = True) -> Iterator[bool]:
+    """
+    Trava exclusiva entre processos sobre um arquivo de trava (flock, apenas POSIX)
+    
+    A trava é liberada ao sair do bloco. Sem fcntl (Windows), nada é travado.
+    
+    Args:
+        path: Caminho do arquivo de trava (criado se não existir)
+        blocking: Se False, não espera a trava ser liberada por outro processo
+    
+    Yields:
+        True se a trava foi obtida (sempre, com blocking=True)
+    """
+    with open(path, 'a') as lock_file:
+        acquired = True
+        try:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except ImportError:
+            pass
+        except OSError:
+            if blocking:
+                raise
+            acquired = False
+        yield acquired
+
+class FileStorage:
+    """Armazena os PDFs em disco; a chave de armazenamento é o caminho relativo à raiz"""
+    
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+    
+    def new_key(self, title: str, content: str, **params) -> str:
+        """
+        Cria a chave de armazenamento de um documento a partir do seu conteúdo
+        
+        Args:
+            title: Título do documento (usado apenas no nome legível do arquivo)
+            content: Conteúdo Markdown do documento
+            params: Parâmetros que mudam o PDF (ex.: tipo, idioma, qualidade)
+        
+        Returns:
+            Chave de armazenamento (caminho relativo do arquivo PDF)
+        """
+        digest = hashlib.sha256()
+        digest.update(json.dumps(dict(params, title=title), sort_keys=True, ensure_ascii=False).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(content.encode('utf-8'))
+        digest = digest.hexdigest()
+        
+        slug = re.sub(r'[^\w-]+', '_', title).strip('_')[:60] or 'documento'
+        shard = os.path.join(digest[:2], digest[2:4])
+        os.makedirs(os.path.join(self.root, shard), exist_ok=True)
+        return f"{digest[:2]}/{digest[2:4]}/{slug}_{digest[:20]}.pdf"
+    
+    def path_for(self, key: str) -> str:
+        """
+        Retorna o caminho absoluto de uma chave de armazenamento
+        
+        Args:
+            key: Chave de armazenamento
+        
+        Returns:
+            Caminho do arquivo em disco
+        """
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(os.path.abspath(self.root) + os.sep):
+            raise ValueError(f"Chave de armazenamento inválida: {key}")
+        return path
+    
+    def key_for(self, path: str) -> str:
+        """Retorna a chave de armazenamento de um caminho dentro da raiz"""
+        return os.path.relpath(path, self.root).replace(os.sep, '/')
+    
+    def iter_files(self) -> Iterator[os.DirEntry]:
+        """
+        Percorre todos os arquivos do armazenamento, incluindo os subdiretórios
+        
+        Returns:
+            Gerador de entradas de diretório (os.DirEntry)
+        """
+        pending = [self.root]
+        while pending:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry
+    
+    def exists(self, key: str) -> bool:
+        """Indica se o arquivo da chave existe"""
+        return os.path.exists(self.path_for(key))
+    
+    def delete(self, key: str) -> bool:
+        """
+        Exclui o arquivo de uma chave de armazenamento
+        
+        Args:
+            key: Chave de armazenamento
+        
+        Returns:
+            True se o arquivo existia e foi excluído
+        """
+        path = self.path_for(key)
+        if os.path.exists(path):
+            os.remove(path)
+            return True
+        return False
@@ -0,0 +1,215 @@
+"""
+Teste de estresse do estado compartilhado: gerações e exclusões simultâneas
+
+Várias threads geram e excluem documentos ao mesmo tempo, com títulos
+repetidos de propósito (mesmo título com temas diferentes e documentos
+idênticos), e excluem também documentos de outras threads. Ao final confere:
+
+    - Nenhum documento criado e não excluído sumiu da listagem
+    - Nenhum documento excluído continua listado
+    - Cada documento foi excluído com sucesso no máximo uma vez
+    - Nenhum PDF é compartilhado por documentos com conteúdo diferente
+    - Cada PDF pronto pode ser baixado e está completo (%PDF ... %%EOF)
+    - Em processo: as chaves salvas em /api/settings ao mesmo tempo terminam
+      com um dos valores enviados, sem perder provedores
+
+Uso:
+    python stress_test.py [threads] [operações por thread]
+    python stress_test.py [threads] [operações por thread] --url http://127.0.0.1:8000
+
+Sem --url, a API roda no próprio processo (cliente de testes do Flask) sobre
+uma pasta temporária. Com --url, o alvo é um servidor real, por exemplo o
+gunicorn com vários workers, para exercitar também a concorrência entre
+processos. O provedor simulado é usado nas gerações.
+"""
+
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+# Títulos repetidos entre as threads: colisões de nome são o alvo do teste
+TITLES = ['Guia de Produtividade', 'Finanças Pessoais', 'Guia de Produtividade']
+THEMES = ['equipes remotas', 'planejamento semanal']
+
+class ApiClient:
+    """Chamadas à API, no processo (cliente de testes do Flask) ou por HTTP"""
+    
+    def __init__(self, url: Optional[str] = None, flask_app=None):
+        self.url = url.rstrip('/') if url else None
+        self.flask_app = flask_app
+        self._local = threading.local()
+    
+    def request(self, method: str, path: str, json: Optional[Dict[str, Any]] = None,
+                headers: Optional[Dict[str, str]] = None) -> Tuple[int, Any]:
+        """Faz uma requisição e retorna (status, JSON ou bytes do corpo)"""
+        if self.url:
+            import requests
+            session = getattr(self._local, 'session', None) or requests.Session()
+            self._local.session = session
+            response = session.request(method, self.url + path, json=json, headers=headers, timeout=300)
+            body = response.json() if 'json' in response.headers.get('Content-Type', '') else response.content
+            return response.status_code, body
+        
+        client = getattr(self._local, 'client', None) or self.flask_app.test_client()
+        self._local.client = client
+        response = client.open(path, method=method, json=json, headers=headers)
+        body = response.get_json(silent=True) if response.is_json else response.get_data()
+        return response.status_code, body
+
+class StressTest:
+    """Executa as operações concorrentes e confere as invariantes"""
+    
+    def __init__(self, client: ApiClient, threads: int, operations: int, check_settings: bool):
+        self.client = client
+        self.threads = threads
+        self.operations = operations
+        self.check_settings = check_settings
+        self.created: Dict[str, Dict[str, Any]] = {}
+        self.deleted: Counter = Counter()
+        self.counts: Counter = Counter()
+        self.errors: List[str] = []
+        self.sent_keys: Dict[str, set] = {}
+        self._lock = threading.Lock()
+    
+    def run(self) -> bool:
+        """Executa o teste e retorna True se todas as invariantes valem"""
+        workers = [threading.Thread(target=self._worker, args=(index,)) for index in range(self.threads)]
+        started = time.monotonic()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.monotonic() - started
+        
+        print(f"{sum(self.counts.values())} operações em {elapsed:.1f}s: "
+              + ', '.join(f"{name}={count}" for name, count in sorted(self.counts.items())))
+        self._check()
+        for error in self.errors[:20]:
+            print(f"  FALHA: {error}")
+        print('OK' if not self.errors else f"{len(self.errors)} falhas")
+        return not self.errors
+    
+    def _worker(self, index: int) -> None:
+        """Mistura gerações, exclusões (próprias e de outras threads) e atualizações de chaves"""
+        rng = random.Random(index)
+        for step in range(self.operations):
+            roll = rng.random()
+            try:
+                if self.check_settings and roll < 0.1:
+                    self._save_settings(index, step)
+                elif roll < 0.45 and self.created:
+                    with self._lock:
+                        doc_id = rng.choice(list(self.created))
+                    self._delete(doc_id)
+                else:
+                    self._generate(rng)
+            except Exception as e:
+                with self._lock:
+                    self.errors.append(f"exceção na thread {index}: {e!r}")
+    
+    def _generate(self, rng: random.Random) -> None:
+        payload = {
+            'title': rng.choice(TITLES), 'theme': rng.choice(THEMES), 'ai_model': 'simulated',
+            'doc_type': 'ebook', 'page_count': 20, 'language': 'pt-BR', 'quality': 'draft'
+        }
+        status, body = self.client.request('POST', '/api/generate', payload)
+        with self._lock:
+            if status in (200, 202):
+                self.counts['generate'] += 1
+                self.created[body['id']] = dict(body, theme=payload['theme'])
+            elif status in (429, 503):
+                self.counts['rejected'] += 1
+            else:
+                self.errors.append(f"geração retornou {status}: {body}")
+    
+    def _delete(self, doc_id: str) -> None:
+        status, body = self.client.request('DELETE', f"/api/documents/{doc_id}")
+        with self._lock:
+            if status == 200:
+                self.counts['delete'] += 1
+                self.deleted[doc_id] += 1
+            elif status == 404:
+                self.counts['delete_lost_race'] += 1  # Outra thread excluiu antes
+            else:
+                self.errors.append(f"exclusão retornou {status}: {body}")
+    
+    def _save_settings(self, index: int, step: int) -> None:
+        provider = ('openai', 'anthropic', 'gemini')[index % 3]
+        key = f"stress-{index}-{step}"
+        with self._lock:
+            self.sent_keys.setdefault(provider, set()).add(key)
+        status, body = self.client.request('POST', '/api/settings', {f"{provider}_api_key": key},
+                                           headers={'X-Admin-Token': os.getenv('ADMIN_TOKEN', '')})
+        with self._lock:
+            self.counts['settings'] += 1
+            if status != 200:
+                self.errors.append(f"configurações retornaram {status}: {body}")
+    
+    def _check(self) -> None:
+        """Confere as invariantes contra a listagem final"""
+        status, listed = self.client.request('GET', '/api/documents')
+        if status != 200:
+            self.errors.append(f"listagem retornou {status}")
+            return
+        listed = {doc['id']: doc for doc in listed}
+        
+        for doc_id in self.created:
+            if self.deleted[doc_id] == 0 and doc_id not in listed:
+                self.errors.append(f"documento perdido: {doc_id}")
+            if self.deleted[doc_id] and doc_id in listed:
+                self.errors.append(f"documento excluído ainda listado: {doc_id}")
+            if self.deleted[doc_id] > 1:
+                self.errors.append(f"documento excluído {self.deleted[doc_id]} vezes: {doc_id}")
+        
+        # O mesmo arquivo só pode servir documentos com os mesmos parâmetros (conteúdo idêntico)
+        owners: Dict[str, set] = {}
+        for doc in self.created.values():
+            owners.setdefault(doc['file_path'], set()).add((doc['title'], doc['theme']))
+        for file_path, params in owners.items():
+            if len(params) > 1:
+                self.errors.append(f"PDF compartilhado por conteúdos diferentes: {file_path} {sorted(params)}")
+        
+        for doc in listed.values():
+            if doc.get('status') != 'done':
+                continue
+            status, data = self.client.request('GET', f"/download/{doc['file_path']}")
+            if status != 200 or not data.startswith(b'%PDF') or b'%%EOF' not in data[-1024:]:
+                self.errors.append(f"PDF ausente ou incompleto: {doc['file_path']} ({status})")
+        
+        if self.check_settings:
+            from app import api_keys
+            for provider, sent in self.sent_keys.items():
+                if api_keys.get(provider) not in sent:
+                    self.errors.append(f"chave de {provider} perdida: {api_keys.get(provider)!r}")
+
+def main() -> int:
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    threads = int(args[0]) if len(args) > 0 else 8
+    operations = int(args[1]) if len(args) > 1 else 20
+    url = sys.argv[sys.argv.index('--url') + 1] if '--url' in sys.argv else None
+    
+    if url:
+        return 0 if StressTest(ApiClient(url=url), threads, operations, check_settings=False).run() else 1
+    
+    # Em processo: pasta temporária, e renderização na fila se o WeasyPrint não estiver instalado
+    os.environ['UPLOAD_FOLDER'] = tempfile.mkdtemp(prefix='stress-')
+    os.environ.setdefault('SPECULATION_ENABLED', '0')
+    os.environ.setdefault('ADMIN_TOKEN', 'stress-admin')  # /api/settings exige o token de administração
+    if 'RENDER_MODE' not in os.environ:
+        try:
+            import weasyprint  # noqa: F401
+        except ImportError:
+            print("WeasyPrint não instalado: RENDER_MODE=queue (PDFs não são conferidos)")
+            os.environ['RENDER_MODE'] = 'queue'
+    
+    from app import app
+    print(f"{threads} threads x {operations} operações em {os.environ['UPLOAD_FOLDER']}")
+    return 0 if StressTest(ApiClient(flask_app=app), threads, operations, check_settings=True).run() else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,241 @@
+"""
+Cotas por tenant e escalonamento justo (weighted fair queueing)
+
+Cada recurso limitado (chamadas aos modelos de IA e renderizações) tem um
+FairScheduler com capacidade global. As requisições de cada tenant esperam
+em uma fila própria; quando uma vaga é liberada, é atendido o tenant cuja
+próxima requisição tem a menor etiqueta de término virtual
+(início + custo / peso). Assim, um tenant que envia lotes de documentos de
+50 páginas não bloqueia os documentos pequenos dos demais.
+
+O tenant de cada requisição vem da chave de API (X-API-Key), conferida contra
+as chaves emitidas em TENANT_API_KEYS; chaves desconhecidas são recusadas. O
+cabeçalho X-Tenant-Id só é aceito com TRUST_TENANT_HEADER=1, quando um proxy
+confiável o define (e remove o enviado pelo cliente).
+
+Configuração (variáveis de ambiente):
+    TENANT_API_KEYS        JSON com o tenant de cada chave de API emitida, ex.:
+                           {"chave-secreta-da-acme": "acme"}
+    TRUST_TENANT_HEADER    1: aceitar X-Tenant-Id (apenas atrás de um proxy confiável)
+    TENANT_LIMITS          JSON com limites por tenant, ex.:
+                           {"acme": {"weight": 2, "max_concurrent": 4, "max_queued": 20}}
+    TENANT_MAX_CONCURRENT  Execuções simultâneas por tenant e recurso (padrão 0, sem limite)
+    TENANT_MAX_QUEUED      Requisições em espera por tenant e recurso (padrão 10)
+    LLM_CONCURRENCY        Chamadas simultâneas aos modelos por processo (padrão 8)
+    RENDER_CONCURRENCY     Renderizações simultâneas por processo (padrão: núcleos)
+    SCHEDULER_WAIT_TIMEOUT Espera máxima por uma vaga, em segundos (padrão 300)
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Mapping
+
+from metrics import metrics
+
+DEFAULT_TENANT = 'default'
+
+DEFAULT_TENANT_LIMITS = {
+    'weight': 1.0,
+    'max_concurrent': int(os.getenv('TENANT_MAX_CONCURRENT', '0')),  # 0: limitado só pela capacidade
+    'max_queued': int(os.getenv('TENANT_MAX_QUEUED', '10')),
+}
+
+TENANT_LIMITS = json.loads(os.getenv('TENANT_LIMITS', '{}'))
+
+# Chaves de API emitidas, guardadas em memória apenas pelo hash
+TENANT_API_KEYS = {
+    hashlib.sha256(api_key.encode('utf-8')).hexdigest(): tenant
+    for api_key, tenant in json.loads(os.getenv('TENANT_API_KEYS', '{}')).items()
+}
+
+TRUST_TENANT_HEADER = os.getenv('TRUST_TENANT_HEADER', '0') == '1'
+
+class InvalidApiKey(Exception):
+    """Chave de API não emitida por este servidor"""
+
+class QuotaExceeded(Exception):
+    """Cota do tenant excedida ou espera por uma vaga esgotada"""
+    
+    def __init__(self, message: str, retry_after: int = 30):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def resolve_tenant(headers: Mapping[str, str], api_keys: Mapping[str, str] = None,
+                   trust_header: bool = None) -> str:
+    """
+    Identifica o tenant de uma requisição
+    
+    Usa o tenant da chave de API (X-API-Key) emitida em TENANT_API_KEYS;
+    X-Tenant-Id só vale com TRUST_TENANT_HEADER=1 (definido por um proxy
+    confiável); sem nenhum dos dois, o tenant padrão.
+    
+    Args:
+        headers: Cabeçalhos da requisição
+        api_keys: Tenant por hash SHA-256 da chave (padrão: TENANT_API_KEYS)
+        trust_header: Se X-Tenant-Id é aceito (padrão: TRUST_TENANT_HEADER)
+    
+    Returns:
+        Identificador do tenant
+    
+    Raises:
+        InvalidApiKey: Chave de API informada, mas não emitida
+    """
+    api_keys = TENANT_API_KEYS if api_keys is None else api_keys
+    trust_header = TRUST_TENANT_HEADER if trust_header is None else trust_header
+    
+    if trust_header:
+        tenant = (headers.get('X-Tenant-Id') or '').strip()
+        if tenant:
+            return tenant[:64]
+    
+    api_key = headers.get('X-API-Key')
+    if api_key:
+        digest = hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+        # Comparar todos os hashes em tempo constante, sem atalho na primeira diferença
+        tenant = None
+        for known_digest, known_tenant in api_keys.items():
+            if hmac.compare_digest(digest, known_digest):
+                tenant = known_tenant
+        if tenant is None:
+            metrics.increment('invalid_api_keys')
+            raise InvalidApiKey("Chave de API inválida")
+        return tenant
+    
+    return DEFAULT_TENANT
+
+def get_tenant_limits(tenant: str) -> Dict[str, Any]:
+    """
+    Retorna os limites de um tenant (configurados ou padrão)
+    
+    Args:
+        tenant: Identificador do tenant
+    
+    Returns:
+        Dicionário com 'weight', 'max_concurrent' e 'max_queued'
+    """
+    return dict(DEFAULT_TENANT_LIMITS, **TENANT_LIMITS.get(tenant, {}))
+
+def at_tenant_limit(tenant: str, running: int) -> bool:
+    """Indica se o tenant já atingiu o limite de execuções simultâneas"""
+    max_concurrent = get_tenant_limits(tenant)['max_concurrent']
+    return max_concurrent > 0 and running >= max_concurrent
+
+class FairScheduler:
+    """Vagas de um recurso distribuídas entre tenants por weighted fair queueing"""
+    
+    def __init__(self, name: str, capacity: int, wait_timeout: float = 300):
+        self.name = name
+        self.capacity = capacity
+        self.wait_timeout = wait_timeout
+        self._cond = threading.Condition()
+        self._running = {}
+        self._waiting = {}
+        self._finish_tags = {}
+        self._virtual_time = 0.0
+    
+    @contextmanager
+    def slot(self, tenant: str, cost: float = 1.0) -> Iterator[None]:
+        """
+        Ocupa uma vaga do recurso enquanto o bloco estiver ativo
+        
+        Args:
+            tenant: Identificador do tenant
+            cost: Custo relativo do trabalho (ex.: tokens ou páginas)
+        
+        Returns:
+            Gerenciador de contexto da vaga
+        
+        Raises:
+            QuotaExceeded: Fila do tenant cheia ou espera esgotada
+        """
+        self._acquire(tenant, cost)
+        try:
+            yield
+        finally:
+            self._release(tenant)
+    
+    def _acquire(self, tenant: str, cost: float) -> None:
+        """Entra na fila do tenant e espera a vez"""
+        limits = get_tenant_limits(tenant)
+        started = time.monotonic()
+        
+        with self._cond:
+            queue = self._waiting.setdefault(tenant, deque())
+            if len(queue) >= limits['max_queued']:
+                metrics.increment('scheduler_rejected', resource=self.name, tenant=tenant)
+                raise QuotaExceeded(f"Limite de requisições em espera do tenant atingido ({self.name})")
+            
+            start_tag = max(self._virtual_time, self._finish_tags.get(tenant, 0.0))
+            ticket = {'start': start_tag, 'finish': start_tag + max(cost, 0.0) / limits['weight']}
+            self._finish_tags[tenant] = ticket['finish']
+            queue.append(ticket)
+            
+            while self._next_tenant() != tenant or queue[0] is not ticket:
+                remaining = self.wait_timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    queue.remove(ticket)
+                    self._cond.notify_all()
+                    metrics.increment('scheduler_timeouts', resource=self.name, tenant=tenant)
+                    raise QuotaExceeded(f"Tempo de espera por {self.name} esgotado")
+                self._cond.wait(remaining)
+            
+            queue.popleft()
+            self._running[tenant] = self._running.get(tenant, 0) + 1
+            self._virtual_time = max(self._virtual_time, ticket['start'])
+        
+        metrics.observe('scheduler_wait_seconds', time.monotonic() - started, resource=self.name)
+    
+    def _release(self, tenant: str) -> None:
+        """Libera a vaga e acorda as requisições em espera"""
+        with self._cond:
+            self._running[tenant] -= 1
+            if self._running[tenant] == 0:
+                del self._running[tenant]
+            self._cond.notify_all()
+    
+    def _next_tenant(self):
+        """Tenant a ser atendido na próxima vaga (None se não houver vaga)"""
+        if sum(self._running.values()) >= self.capacity:
+            return None
+        
+        best_tenant, best_finish = None, None
+        for tenant, queue in self._waiting.items():
+            if not queue or at_tenant_limit(tenant, self._running.get(tenant, 0)):
+                continue
+            if best_finish is None or queue[0]['finish'] < best_finish:
+                best_tenant, best_finish = tenant, queue[0]['finish']
+        return best_tenant
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Retorna o estado atual do escalonador
+        
+        Returns:
+            Dicionário com capacidade, execuções e esperas por tenant
+        """
+        with self._cond:
+            return {
+                'resource': self.name,
+                'capacity': self.capacity,
+                'running': dict(self._running),
+                'waiting': {tenant: len(queue) for tenant, queue in self._waiting.items() if queue},
+                'virtual_time': self._virtual_time,
+            }
+
+# Instâncias únicas por processo
+llm_scheduler = FairScheduler(
+    'llm',
+    int(os.getenv('LLM_CONCURRENCY', '8')),
+    float(os.getenv('SCHEDULER_WAIT_TIMEOUT', '300'))
+)
+render_scheduler = FairScheduler(
+    'render',
+    int(os.getenv('RENDER_CONCURRENCY', str(os.cpu_count() or 1))),
+    float(os.getenv('SCHEDULER_WAIT_TIMEOUT', '300'))
+)
@@ -0,0 +1,17 @@
+"""
+Configuração comum dos testes
+
+Os módulos da aplicação ficam na raiz do repositório e leem as pastas de
+settings.py na importação: a raiz entra no sys.path e UPLOAD_FOLDER aponta
+para uma pasta temporária antes de qualquer importação.
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ['UPLOAD_FOLDER'] = tempfile.mkdtemp(prefix='tests-')
+os.environ.setdefault('SPECULATION_ENABLED', '0')
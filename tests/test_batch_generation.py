@@ -0,0 +1,29 @@
+"""Entrega dos documentos concluídos pelas APIs de lote"""
+
+import settings
+from batch_generation import BatchJob, BatchRunner
+from content_generation import CheckpointStore
+from document_store import DocumentStore
+from render_queue import create_render_queue
+
+SPEC = {'title': 'Catálogo de Testes', 'theme': 'lotes', 'doc_type': 'ebook', 'page_count': 5, 'quality': 'draft'}
+
+def _complete_job(checkpoints: CheckpointStore, tenant: str) -> BatchJob:
+    job = BatchJob(SPEC, 'openai', None, tenant, checkpoints)
+    for index, entry in enumerate(job.state['calls']):
+        entry.update(complete=True, text=f"# Parte {index + 1}\n\nTexto da parte {index + 1}.")
+    checkpoints.save(job.job_key, job.state)
+    return job
+
+def test_finish_in_queue_mode_enqueues_and_clears_checkpoint(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'RENDER_MODE', 'queue')
+    checkpoints = CheckpointStore(str(tmp_path / 'checkpoints'))
+    job = _complete_job(checkpoints, 'acme')
+    
+    saved = BatchRunner(None, 'openai', checkpoints, 'teste').finish([job], 'acme')
+    
+    assert len(saved) == 1
+    assert saved[0]['status'] == 'queued'
+    assert create_render_queue().get_job(saved[0]['job_id'])['status'] == 'queued'
+    assert DocumentStore(settings.DOCUMENT_STORE_PATH).find_by_job(saved[0]['job_id'])['tenant'] == 'acme'
+    assert checkpoints.load(job.job_key) is None
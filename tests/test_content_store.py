@@ -0,0 +1,39 @@
+"""Gravação dos blobs do Markdown final: registros confirmados só após o fsync do pacote"""
+
+import os
+import sqlite3
+
+import pytest
+
+from content_store import ContentStore
+
+SECTIONS = ["# Título\n\nIntrodução do documento.\n\n", "## Seção\n\nTexto da seção.\n\n"]
+
+def _blob_count(store: ContentStore) -> int:
+    with sqlite3.connect(store.db_path) as conn:
+        return conn.execute('SELECT COUNT(*) FROM blobs').fetchone()[0]
+
+def test_put_and_get_document(tmp_path):
+    store = ContentStore(str(tmp_path))
+    
+    assert store.put_document('doc-1', SECTIONS)['new_blobs'] == 2
+    assert store.put_document('doc-2', SECTIONS)['new_blobs'] == 0
+    assert store.get_document('doc-2') == ''.join(SECTIONS)
+
+def test_failed_fsync_leaves_no_blob_rows(tmp_path, monkeypatch):
+    store = ContentStore(str(tmp_path))
+    
+    def failing_fsync(fd):
+        raise OSError('disco cheio')
+    
+    monkeypatch.setattr(os, 'fsync', failing_fsync)
+    with pytest.raises(OSError):
+        store.put_document('doc-1', SECTIONS)
+    monkeypatch.undo()
+    
+    assert _blob_count(store) == 0
+    assert store.get_document('doc-1') is None
+    
+    # A nova tentativa grava os blobs de novo em vez de apontar para os bytes perdidos
+    assert store.put_document('doc-1', SECTIONS)['new_blobs'] == 2
+    assert store.get_document('doc-1') == ''.join(SECTIONS)
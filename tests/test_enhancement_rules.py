@@ -0,0 +1,37 @@
+"""Regras de texto combinadas no varredor de melhoria do Markdown"""
+
+import pytest
+
+from enhancement_rules import BASE_RULES, Rule, RuleSet
+
+SECTION = """## Seção
+
+NOTA: revisar o texto.
+
+Outro parágrafo [com link] (https://example.com).
+
+```
+NOTA: dentro do código.
+
+
+fim do código
+```
+"""
+
+def test_rule_with_dot_does_not_cross_lines():
+    rule_set = RuleSet(BASE_RULES + [Rule('nota', r'NOTA:.*', 'Nota.')])
+    
+    assert rule_set.apply(SECTION) == (
+        "## Seção\n\nNota.\n\nOutro parágrafo [com link](https://example.com).\n\n"
+        "```\nNOTA: dentro do código.\n\n\nfim do código\n```\n\n"
+    )
+
+@pytest.mark.parametrize('pattern', [r'(?i)nota:', r'(?s)NOTA:.*', r'(\w+) \1', r'(?P<palavra>\w+) (?P=palavra)'])
+def test_rules_that_change_meaning_when_combined_are_rejected(pattern):
+    with pytest.raises(ValueError):
+        Rule('invalida', pattern, '')
+
+def test_local_flags_are_accepted():
+    rule_set = RuleSet([Rule('nota', r'(?i:nota):', 'Nota:')])
+    
+    assert rule_set.apply("## Seção\n\nnota: texto\n") == "## Seção\n\nNota: texto\n\n"
@@ -0,0 +1,46 @@
+"""Capítulos do EPUB: XHTML bem formado mesmo com HTML bruto no Markdown"""
+
+import zipfile
+from xml.dom import minidom
+
+from export_engine import ExportEngine
+
+MARKDOWN = """# A & B <x>
+
+Linha<br>quebrada&nbsp;aqui e 5 < 6 & 7.
+
+## Marcação válida
+
+Texto <em>enfático</em> mantido.
+
+```python
+if a < b and c & d:
+    print("<tag>")
+```
+
+## Marcação quebrada
+
+Negrito <b>sem fechamento e <i>itálico.
+"""
+
+def _chapters(tmp_path) -> dict:
+    filenames = ExportEngine.export(MARKDOWN, 'A & B <x>', 'pt-BR', formats=('epub',), output_folder=str(tmp_path))
+    with zipfile.ZipFile(tmp_path / filenames['epub']) as epub:
+        return {name: epub.read(name).decode('utf-8') for name in epub.namelist() if name.endswith('.xhtml')}
+
+def test_epub_chapters_are_well_formed_xhtml(tmp_path):
+    chapters = _chapters(tmp_path)
+    
+    assert len(chapters) == 4  # três capítulos e o sumário
+    for name, content in chapters.items():
+        minidom.parseString(content.encode('utf-8'))  # ExpatError se mal formado
+
+def test_epub_keeps_valid_markup_and_escapes_broken_markup(tmp_path):
+    chapters = _chapters(tmp_path)
+    
+    assert '<br/>' in chapters['OEBPS/chapter_001.xhtml']
+    assert '\xa0' in chapters['OEBPS/chapter_001.xhtml']
+    assert '<em>enfático</em>' in chapters['OEBPS/chapter_002.xhtml']
+    assert 'codehilite' in chapters['OEBPS/chapter_002.xhtml']
+    assert '&lt;b&gt;sem fechamento' in chapters['OEBPS/chapter_003.xhtml']
+    assert '<h1>A &amp; B &lt;x&gt;</h1>' in chapters['OEBPS/nav.xhtml']
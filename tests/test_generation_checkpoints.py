@@ -0,0 +1,61 @@
+"""Checkpoints de geração: chave por tenant, descarte após reprovação e limpeza por idade"""
+
+import os
+import time
+
+import pytest
+
+import app as app_module
+from content_generation import CheckpointStore, ContentGenerator
+from document_generator import DocumentGenerator, RENDER_ERROR_PREFIX
+from document_store import DocumentStore
+from janitor import Janitor
+from storage import FileStorage
+
+PAYLOAD = {'title': 'Guia de Checkpoints', 'theme': 'retomada', 'ai_model': 'simulated', 'doc_type': 'ebook',
+           'page_count': 5, 'language': 'pt-BR', 'quality': 'draft'}
+
+def _job_key(tenant: str) -> str:
+    params = dict(provider='simulated', doc_type='ebook', language='pt-BR', title=PAYLOAD['title'],
+                  theme=PAYLOAD['theme'], page_count=5, quality='draft')
+    return ContentGenerator.job_key(tenant=tenant, **params)
+
+def test_job_key_is_scoped_to_the_tenant():
+    assert _job_key('acme') != _job_key('globex')
+    _, _, job_key, _ = app_module._prepare_generation('simulated', 'ebook', 'pt-BR', PAYLOAD['title'], PAYLOAD['theme'],
+                                                      5, 'draft', 'acme')
+    assert job_key == _job_key('acme')
+
+@pytest.mark.parametrize('message, kept', [
+    ("Qualidade do conteúdo muito baixa (pontuação: 0.10)", False),
+    (f"{RENDER_ERROR_PREFIX}: falha no renderizador", True),
+])
+def test_failed_render_keeps_checkpoint_only_for_renderer_errors(monkeypatch, message, kept):
+    monkeypatch.setattr(DocumentGenerator, 'generate_document', staticmethod(lambda *args, **kwargs: (False, message, None)))
+    
+    response = app_module.app.test_client().post('/api/generate', json=PAYLOAD)
+    
+    assert response.status_code == 500
+    assert (app_module.checkpoints.load(_job_key('default')) is not None) == kept
+    app_module.checkpoints.delete(_job_key('default'))
+
+def test_janitor_removes_stale_checkpoints_only(tmp_path):
+    checkpoints = CheckpointStore(str(tmp_path / 'checkpoints'))
+    stale, fresh = 'a' * 32, 'b' * 32
+    checkpoints.save(stale, {'calls': []})
+    checkpoints.save(fresh, {'calls': []})
+    run_file = os.path.join(checkpoints.root, 'batch-execucao.json')
+    with open(run_file, 'w') as batch_file:
+        batch_file.write('{}')
+    old = time.time() - 3600
+    for path in (checkpoints.path_for(stale), run_file):
+        os.utime(path, (old, old))
+    
+    janitor = Janitor(DocumentStore(str(tmp_path / 'documents.db')), FileStorage(str(tmp_path / 'pdfs')),
+                      delete_rate=0, checkpoints=checkpoints, checkpoint_ttl=600)
+    report = janitor.run_once()
+    
+    assert report['checkpoints'] == 1
+    assert checkpoints.load(stale) is None
+    assert checkpoints.load(fresh) is not None
+    assert os.path.exists(run_file)
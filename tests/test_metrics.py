@@ -0,0 +1,54 @@
+"""Métricas somadas entre processos e acesso a /api/metrics"""
+
+import os
+import time
+
+import app as app_module
+from metrics import MetricsExporter, MetricsRegistry, collect_snapshots, merge_snapshots
+
+def test_merge_sums_counters_and_combines_summaries():
+    api, render = MetricsRegistry(), MetricsRegistry()
+    api.increment('documents_generated', quality='high')
+    render.increment('documents_generated', 2, quality='high')
+    render.increment('pdf_bytes_saved', 500)
+    api.observe('render_seconds', 1.0)
+    render.observe('render_seconds', 3.0)
+    
+    merged = merge_snapshots([api.snapshot(), render.snapshot()])
+    
+    counters = {(counter['name'], tuple(counter['labels'].items())): counter['value'] for counter in merged['counters']}
+    assert counters[('documents_generated', (('quality', 'high'),))] == 3
+    assert counters[('pdf_bytes_saved', ())] == 500
+    assert merged['summaries'] == [{'count': 2, 'sum': 4.0, 'min': 1.0, 'max': 3.0, 'avg': 2.0,
+                                    'name': 'render_seconds', 'labels': {}}]
+
+def test_stale_exports_are_ignored_and_removed(tmp_path):
+    registry = MetricsRegistry()
+    registry.increment('pdf_bytes_saved', 10)
+    exporter = MetricsExporter(registry, 'render', folder=str(tmp_path))
+    exporter.export()
+    
+    assert [snapshot['role'] for snapshot in collect_snapshots(str(tmp_path))] == ['render']
+    assert collect_snapshots(str(tmp_path), exclude_pid=os.getpid()) == []
+    
+    # Cópia de um processo encerrado: fora da soma e excluída
+    time.sleep(0.01)
+    assert collect_snapshots(str(tmp_path), max_age=0) == []
+    assert not os.path.exists(exporter.path)
+
+def test_metrics_endpoint_requires_admin_and_includes_render_workers(monkeypatch, tmp_path):
+    monkeypatch.setenv('ADMIN_TOKEN', 'segredo')
+    registry = MetricsRegistry()
+    registry.increment('pdf_bytes_saved', 1234)
+    MetricsExporter(registry, 'render', folder=str(tmp_path)).export()
+    monkeypatch.setattr(app_module, 'collect_snapshots',
+                        lambda exclude_pid=None: collect_snapshots(str(tmp_path)))
+    client = app_module.app.test_client()
+    
+    assert client.get('/api/metrics').status_code == 403
+    
+    response = client.get('/api/metrics', headers={'X-Admin-Token': 'segredo'})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert {'name': 'pdf_bytes_saved', 'labels': {}, 'value': 1234} in body['counters']
+    assert [process['role'] for process in body['processes']] == ['api', 'render']
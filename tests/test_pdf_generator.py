@@ -0,0 +1,40 @@
+"""Conversão seção a seção para HTML: ids e links por referência entre seções"""
+
+import re
+
+from pdf_generator import PdfGenerator
+
+SECTIONS = [
+    "# Introdução\n\n## Exemplo\n\nVeja [o site][site] e [o exemplo](#exemplo).\n",
+    "# Prática\n\n## Exemplo\n\nVolte [ao exemplo](#exemplo) e ao [site][].\n\n"
+    "```\n[falso]: https://nao.example.com\n```\n\n[site]: https://example.com\n",
+    "# Conclusão\n\nUm [último link][site] e um [link inexistente][falso].\n",
+]
+
+def _html(sections) -> str:
+    return ''.join(PdfGenerator.iter_html(sections, quality='draft', embed_styles=False))
+
+def test_heading_ids_are_unique_across_sections():
+    html = _html(SECTIONS)
+    ids = re.findall(r' id="([^"]+)"', html)
+    
+    assert len(ids) == len(set(ids))
+    assert '<h2 id="exemplo">' in html and '<h2 id="exemplo_1">' in html
+    # Os links internos da seção seguem o id renomeado do seu cabeçalho
+    assert '<a href="#exemplo">o exemplo</a>' in html
+    assert '<a href="#exemplo_1">ao exemplo</a>' in html
+
+def test_reference_definitions_apply_to_every_section():
+    html = _html(SECTIONS)
+    
+    assert '<a href="https://example.com">o site</a>' in html
+    assert '<a href="https://example.com">site</a>' in html
+    assert '<a href="https://example.com">último link</a>' in html
+    # Definições dentro de blocos de código não contam
+    assert '[link inexistente][falso]' in html
+
+def test_streamed_sections_resolve_references_after_their_definition():
+    html = _html(iter(SECTIONS))
+    
+    assert '[o site][site]' in html  # Definida só na seção seguinte
+    assert '<a href="https://example.com">último link</a>' in html
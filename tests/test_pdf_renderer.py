@@ -0,0 +1,52 @@
+"""Renderização de um documento por nível de qualidade com o renderizador aquecido (requer WeasyPrint)"""
+
+import pytest
+
+from pdf_generator import PdfGenerator, get_renderer
+from quality_tiers import QUALITY_TIERS
+
+try:
+    import weasyprint  # noqa: F401
+    WEASYPRINT_ERROR = None
+except (ImportError, OSError) as e:  # Sem o pacote ou sem as bibliotecas do sistema (Pango)
+    WEASYPRINT_ERROR = str(e)
+
+pytestmark = pytest.mark.skipif(WEASYPRINT_ERROR is not None, reason=f"WeasyPrint indisponível: {WEASYPRINT_ERROR}")
+
+CONTENT = """# Guia de Testes
+
+## Introdução
+
+Texto com **negrito**, *itálico* e uma lista:
+
+- primeiro item
+- segundo item
+
+| Coluna | Valor |
+|--------|-------|
+| a      | 1     |
+
+```python
+def soma(a, b):
+    return a + b
+```
+"""
+
+@pytest.mark.parametrize('quality', sorted(QUALITY_TIERS))
+def test_renders_one_document_per_tier(tmp_path, quality):
+    pdf_path = PdfGenerator.generate_pdf(CONTENT, str(tmp_path / f"{quality}.pdf"), quality)
+    
+    with open(pdf_path, 'rb') as pdf_file:
+        data = pdf_file.read()
+    assert data.startswith(b'%PDF')
+    assert b'%%EOF' in data[-1024:]
+
+def test_renderer_is_reused_across_renders(tmp_path):
+    renderer = get_renderer().warm()
+    renders = renderer.renders
+    for quality in sorted(QUALITY_TIERS):
+        PdfGenerator.generate_pdf(CONTENT, str(tmp_path / f"{quality}.pdf"), quality)
+    
+    assert get_renderer() is renderer
+    assert renderer.renders == renders + len(QUALITY_TIERS)
+    assert renderer.warm_seconds > 0
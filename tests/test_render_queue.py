@@ -0,0 +1,92 @@
+"""Reservas, confirmações e falhas da fila de renderização nos backends sqlite e local (Redis)"""
+
+import pytest
+
+from render_queue import LocalRedis, RedisRenderQueue, SQLiteRenderQueue
+
+@pytest.fixture(params=['sqlite', 'local'])
+def queue(request, tmp_path):
+    if request.param == 'sqlite':
+        return SQLiteRenderQueue(str(tmp_path / 'render_queue.db'), max_attempts=2, retry_delay=0)
+    return RedisRenderQueue(LocalRedis(), max_attempts=2, retry_delay=0)
+
+def _expire_leases(queue) -> None:
+    """Antecipa o vencimento de todas as reservas em andamento"""
+    if isinstance(queue, SQLiteRenderQueue):
+        import sqlite3
+        with sqlite3.connect(queue.db_path) as conn:
+            conn.execute("UPDATE render_jobs SET lease_expires = 0 WHERE status = 'running'")
+    else:
+        leases = queue.client._zsets.get(queue._key('leases'), {})
+        for job_id in leases:
+            leases[job_id] = 0
+
+def test_reserve_and_ack(queue):
+    job_id = queue.enqueue({'title': 'Guia', 'tenant': 'acme'})
+    
+    job = queue.reserve()
+    assert (job['id'], job['attempts'], job['payload']['title']) == (job_id, 1, 'Guia')
+    assert job['lease']
+    assert queue.reserve() is None
+    
+    assert queue.ack(job_id, job['lease'], {'storage_key': 'guia.pdf'})
+    assert queue.get_job(job_id)['status'] == 'done'
+    assert queue.get_job(job_id)['result'] == {'storage_key': 'guia.pdf'}
+    assert queue.depth() == 0
+
+def test_fail_retries_then_dead_letters(queue):
+    job_id = queue.enqueue({'title': 'Guia'})
+    
+    job = queue.reserve()
+    assert queue.fail(job_id, job['lease'], 'Erro ao gerar PDF: falha') == 'queued'
+    
+    job = queue.reserve()
+    assert job['attempts'] == 2
+    assert queue.fail(job_id, job['lease'], 'Erro ao gerar PDF: falha') == 'dead'
+    assert queue.get_job(job_id)['error'] == 'Erro ao gerar PDF: falha'
+    assert queue.reserve() is None
+
+def test_non_retryable_failure_goes_straight_to_dead(queue):
+    job_id = queue.enqueue({'title': 'Guia'})
+    job = queue.reserve()
+    
+    assert queue.fail(job_id, job['lease'], 'Conteúdo reprovado', retryable=False) == 'dead'
+
+def test_expired_lease_is_reassigned_and_old_worker_loses_it(queue):
+    job_id = queue.enqueue({'title': 'Guia'})
+    first = queue.reserve(lease_seconds=60)
+    
+    _expire_leases(queue)
+    second = queue.reserve(lease_seconds=60)
+    assert second['id'] == job_id and second['attempts'] == 2
+    assert second['lease'] != first['lease']
+    
+    # O primeiro worker terminou tarde: nem a confirmação nem a falha valem mais
+    assert not queue.ack(job_id, first['lease'], {'storage_key': 'antigo.pdf'})
+    assert queue.fail(job_id, first['lease'], 'Erro ao gerar PDF: tarde') == 'running'
+    assert queue.get_job(job_id)['status'] == 'running'
+    
+    assert queue.ack(job_id, second['lease'], {'storage_key': 'guia.pdf'})
+    assert queue.get_job(job_id)['result'] == {'storage_key': 'guia.pdf'}
+
+def test_expired_lease_without_attempts_left_is_dead_lettered(queue):
+    job_id = queue.enqueue({'title': 'Guia'})
+    queue.fail(job_id, queue.reserve()['lease'], 'Erro ao gerar PDF: falha')
+    last = queue.reserve()
+    
+    _expire_leases(queue)
+    assert queue.reserve() is None
+    assert queue.get_job(job_id)['status'] == 'dead'
+    assert not queue.ack(job_id, last['lease'], {'storage_key': 'guia.pdf'})
+
+def test_ack_after_reclaim_keeps_the_job_queued_for_the_next_worker():
+    queue = RedisRenderQueue(LocalRedis(), max_attempts=3, retry_delay=0)
+    job_id = queue.enqueue({'title': 'Guia'})
+    job = queue.reserve(lease_seconds=60)
+    
+    _expire_leases(queue)
+    queue._promote_due_jobs()
+    assert not queue.ack(job_id, job['lease'], {'storage_key': 'guia.pdf'})
+    assert queue.get_job(job_id)['status'] == 'queued'
+    assert queue.client.lrange(queue._key('processing'), 0, -1) == []
+    assert queue.reserve()['id'] == job_id
@@ -0,0 +1,23 @@
+"""Alteração das chaves de API por /api/settings"""
+
+import app as app_module
+
+def test_settings_require_the_admin_token(monkeypatch):
+    monkeypatch.setenv('ADMIN_TOKEN', 'segredo')
+    monkeypatch.setattr(app_module.api_keys, 'update', lambda **keys: updates.append(keys))
+    updates = []
+    client = app_module.app.test_client()
+    
+    assert client.post('/api/settings', json={'openai_api_key': 'sk-intruso'}).status_code == 403
+    assert client.post('/api/settings', json={'openai_api_key': 'sk-intruso'},
+                       headers={'X-Admin-Token': 'errado'}).status_code == 403
+    assert updates == []
+    
+    response = client.post('/api/settings', json={'openai_api_key': 'sk-admin'}, headers={'X-Admin-Token': 'segredo'})
+    assert response.status_code == 200
+    assert updates[0]['openai'] == 'sk-admin'
+
+def test_settings_are_disabled_without_admin_token(monkeypatch):
+    monkeypatch.delenv('ADMIN_TOKEN', raising=False)
+    client = app_module.app.test_client()
+    assert client.post('/api/settings', json={'openai_api_key': 'sk-x'}, headers={'X-Admin-Token': ''}).status_code == 403
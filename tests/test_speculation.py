@@ -0,0 +1,55 @@
+"""Pré-gerações especulativas: sessões do formulário e limite global"""
+
+import pytest
+
+import app as app_module
+from content_generation import CheckpointStore
+from speculation import Speculator
+
+class IdleGenerator:
+    """Gerador que nunca chega a ser chamado (a espera inicial não termina)"""
+    
+    def __init__(self, tenant: str):
+        self.tenant = tenant
+        self.cancel = None
+        self.usage = {'llm_calls': 0, 'output_tokens': 0}
+    
+    def generate(self, *args, **kwargs):
+        raise AssertionError("a especulação não deveria chamar o modelo")
+
+@pytest.fixture
+def speculator(tmp_path):
+    speculator = Speculator(CheckpointStore(str(tmp_path)), delay=60, ttl=60, max_active=3)
+    yield speculator
+    for speculation in list(speculator._by_key.values()):
+        speculation.cancel.set()
+        speculation.thread.join()
+
+def test_sessions_of_the_same_tenant_do_not_cancel_each_other(speculator):
+    assert speculator.start(IdleGenerator('default'), None, 'a' * 32, 0.7, session='usuario-1')['status'] == 'started'
+    assert speculator.start(IdleGenerator('default'), None, 'b' * 32, 0.7, session='usuario-2')['status'] == 'started'
+    assert speculator.start(IdleGenerator('default'), None, 'c' * 32, 0.7)['status'] == 'started'
+    
+    assert sorted(speculator._by_key) == ['a' * 32, 'b' * 32, 'c' * 32]
+
+def test_new_parameters_replace_the_previous_speculation_of_the_session(speculator):
+    speculator.start(IdleGenerator('default'), None, 'a' * 32, 0.7, session='usuario-1')
+    first = speculator._by_key['a' * 32]
+    
+    assert speculator.start(IdleGenerator('default'), None, 'b' * 32, 0.7, session='usuario-1')['status'] == 'started'
+    assert first.cancel.is_set()
+    assert list(speculator._by_key) == ['b' * 32]
+
+def test_active_speculations_are_capped_across_sessions(speculator):
+    for index in range(3):
+        speculator.start(IdleGenerator('default'), None, f"{index}" * 32, 0.7, session=f"usuario-{index}")
+    
+    assert speculator.start(IdleGenerator('acme'), None, 'f' * 32, 0.7, session='outro')['status'] == 'rejected'
+
+def test_prewarm_rejects_unknown_quality(monkeypatch):
+    monkeypatch.setattr(app_module, 'SPECULATION_ENABLED', True)
+    response = app_module.app.test_client().post('/api/prewarm', json={
+        'title': 'Guia', 'theme': 'testes', 'ai_model': 'simulated', 'doc_type': 'ebook', 'quality': 'ultra'
+    })
+    
+    assert response.status_code == 400
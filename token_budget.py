@@ -0,0 +1,284 @@
+"""
+Estimativa de tokens e planejamento de chamadas aos modelos de IA
+
+Estima os tokens do prompt e da resposta a partir da estrutura do template,
+define o max_tokens de cada chamada e divide a geração em várias chamadas
+quando o documento não cabe no limite de saída do modelo.
+"""
+
+import math
+from typing import Dict, Any, List, Optional
+
+from ai_models import DEFAULT_MODELS
+from document_templates import DocumentTemplate
+
+# Limites de contexto e de saída por modelo, em tokens
+MODEL_LIMITS = {
+    'gpt-3.5-turbo': {'context': 16385, 'max_output': 4096},
+    'gpt-4': {'context': 8192, 'max_output': 4096},
+    'gpt-4-turbo': {'context': 128000, 'max_output': 4096},
+    'gpt-4o': {'context': 128000, 'max_output': 16384},
+    'gpt-4o-mini': {'context': 128000, 'max_output': 16384},
+    'claude-2': {'context': 100000, 'max_output': 4096},
+    'claude-3-haiku-20240307': {'context': 200000, 'max_output': 4096},
+    'claude-3-5-haiku-20241022': {'context': 200000, 'max_output': 8192},
+    'claude-3-5-sonnet-20241022': {'context': 200000, 'max_output': 8192},
+    'gemini-pro': {'context': 30720, 'max_output': 2048},
+    'gemini-1.5-flash': {'context': 1048576, 'max_output': 8192},
+    'gemini-1.5-pro': {'context': 2097152, 'max_output': 8192},
+    'simulated': {'context': 128000, 'max_output': 16384},
+}
+DEFAULT_LIMITS = {'context': 8192, 'max_output': 4096}
+
+# Caracteres por token aproximados de cada tokenizador, por idioma
+# (textos em português usam mais tokens por palavra que em inglês)
+CHARS_PER_TOKEN = {
+    'openai': {'pt-BR': 3.4, 'en-US': 4.0},
+    'anthropic': {'pt-BR': 3.1, 'en-US': 3.6},
+    'gemini': {'pt-BR': 3.6, 'en-US': 4.2},
+}
+
+# Caracteres médios por palavra no texto gerado, incluindo espaço e marcação Markdown
+CHARS_PER_WORD = {'pt-BR': 6.6, 'en-US': 6.2}
+
+# Preços aproximados em USD por milhão de tokens (entrada, saída), para planejamento de custo
+MODEL_PRICES = {
+    'gpt-3.5-turbo': (0.50, 1.50),
+    'gpt-4': (30.00, 60.00),
+    'gpt-4-turbo': (10.00, 30.00),
+    'gpt-4o': (2.50, 10.00),
+    'gpt-4o-mini': (0.15, 0.60),
+    'claude-2': (8.00, 24.00),
+    'claude-3-haiku-20240307': (0.25, 1.25),
+    'claude-3-5-haiku-20241022': (0.80, 4.00),
+    'claude-3-5-sonnet-20241022': (3.00, 15.00),
+    'gemini-pro': (0.50, 1.50),
+    'gemini-1.5-flash': (0.075, 0.30),
+    'gemini-1.5-pro': (1.25, 5.00),
+}
+
+# Velocidade de geração aproximada em tokens de saída por segundo, para planejamento de latência
+OUTPUT_TOKENS_PER_SECOND = {
+    'openai': 60,
+    'anthropic': 50,
+    'gemini': 70,
+    'simulated': 60,
+}
+
+# Velocidade dos modelos que se afastam da média do provedor
+MODEL_OUTPUT_TOKENS_PER_SECOND = {
+    'gpt-4o': 80,
+    'gpt-4o-mini': 100,
+    'claude-3-haiku-20240307': 120,
+    'claude-3-5-haiku-20241022': 90,
+    'claude-3-5-sonnet-20241022': 60,
+    'gemini-1.5-flash': 150,
+    'gemini-1.5-pro': 60,
+}
+
+# Folga sobre a saída estimada, para que o modelo não seja cortado no fim de uma parte
+OUTPUT_SAFETY_MARGIN = 1.2
+
+class TokenEstimator:
+    """Aproximação local dos tokenizadores de cada provedor"""
+    
+    @staticmethod
+    def count_tokens(text: str, provider: str, language: str = 'pt-BR') -> int:
+        """
+        Estima o número de tokens de um texto
+        
+        Args:
+            text: Texto a estimar
+            provider: Nome do provedor ('openai', 'anthropic', 'gemini')
+            language: Idioma do texto ('pt-BR' ou 'en-US')
+        
+        Returns:
+            Número aproximado de tokens
+        """
+        ratios = CHARS_PER_TOKEN.get(provider.lower(), CHARS_PER_TOKEN['openai'])
+        return math.ceil(len(text) / ratios.get(language, ratios['en-US']))
+    
+    @staticmethod
+    def words_to_tokens(words: int, provider: str, language: str = 'pt-BR') -> int:
+        """
+        Estima os tokens de um texto gerado com o número de palavras indicado
+        
+        Args:
+            words: Número de palavras
+            provider: Nome do provedor ('openai', 'anthropic', 'gemini')
+            language: Idioma do texto ('pt-BR' ou 'en-US')
+        
+        Returns:
+            Número aproximado de tokens
+        """
+        ratios = CHARS_PER_TOKEN.get(provider.lower(), CHARS_PER_TOKEN['openai'])
+        chars = words * CHARS_PER_WORD.get(language, CHARS_PER_WORD['en-US'])
+        return math.ceil(chars / ratios.get(language, ratios['en-US']))
+
+class BudgetPlan:
+    """Plano de chamadas para gerar um documento dentro dos limites do modelo"""
+    
+    def __init__(self, provider: str, model: str, calls: List[Dict[str, Any]]):
+        self.provider = provider
+        self.model = model
+        self.calls = calls
+    
+    @property
+    def prompt_tokens(self) -> int:
+        """Tokens de entrada somados de todas as chamadas"""
+        return sum(call['prompt_tokens'] for call in self.calls)
+    
+    @property
+    def output_tokens(self) -> int:
+        """Tokens de saída esperados somados de todas as chamadas"""
+        return sum(call['output_tokens'] for call in self.calls)
+    
+    @property
+    def estimated_cost_usd(self) -> Optional[float]:
+        """Custo aproximado do documento em USD (None se o preço do modelo for desconhecido)"""
+        return TokenBudget.cost_usd(self.model, self.prompt_tokens, self.output_tokens)
+    
+    @property
+    def estimated_seconds(self) -> float:
+        """Latência aproximada da geração, com as chamadas feitas em sequência"""
+        tokens_per_second = MODEL_OUTPUT_TOKENS_PER_SECOND.get(self.model) or OUTPUT_TOKENS_PER_SECOND.get(self.provider, 50)
+        return round(self.output_tokens / tokens_per_second, 1)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Retorna as estimativas do plano (sem os prompts)
+        
+        Returns:
+            Dicionário serializável em JSON
+        """
+        return {
+            'provider': self.provider,
+            'model': self.model,
+            'call_count': len(self.calls),
+            'prompt_tokens': self.prompt_tokens,
+            'output_tokens': self.output_tokens,
+            'estimated_cost_usd': self.estimated_cost_usd,
+            'estimated_seconds': self.estimated_seconds,
+            'calls': [
+                {key: value for key, value in call.items() if key != 'prompt'}
+                for call in self.calls
+            ],
+        }
+
+class TokenBudget:
+    """Classe para planejar as chamadas de geração de um documento"""
+    
+    @staticmethod
+    def get_limits(model: str) -> Dict[str, int]:
+        """
+        Retorna os limites de contexto e de saída de um modelo
+        
+        Args:
+            model: Nome do modelo
+        
+        Returns:
+            Dicionário com 'context' e 'max_output'
+        """
+        return MODEL_LIMITS.get(model, DEFAULT_LIMITS)
+    
+    @staticmethod
+    def cost_usd(model: str, prompt_tokens: int, output_tokens: int) -> Optional[float]:
+        """
+        Calcula o custo aproximado de um consumo de tokens
+        
+        Args:
+            model: Nome do modelo
+            prompt_tokens: Tokens de entrada
+            output_tokens: Tokens de saída
+        
+        Returns:
+            Custo em USD (None se o preço do modelo for desconhecido)
+        """
+        prices = MODEL_PRICES.get(model)
+        if prices is None:
+            return None
+        return round((prompt_tokens * prices[0] + output_tokens * prices[1]) / 1_000_000, 4)
+    
+    @staticmethod
+    def plan(template: DocumentTemplate, title: str, theme: str, page_count: int, provider: str, model: Optional[str] = None) -> BudgetPlan:
+        """
+        Planeja as chamadas necessárias para gerar o documento
+        
+        As partes do template são agrupadas, em ordem, de modo que a saída
+        esperada de cada chamada (com folga) caiba no limite do modelo.
+        
+        Args:
+            template: Template do documento
+            title: Título do documento
+            theme: Tema do documento
+            page_count: Número de páginas (20 ou 50)
+            provider: Nome do provedor ('openai', 'anthropic', 'gemini')
+            model: Nome do modelo (padrão: modelo padrão do provedor)
+        
+        Returns:
+            Plano com o prompt, max_tokens e estimativas de cada chamada
+        """
+        provider = provider.lower()
+        model = model or DEFAULT_MODELS.get(provider, DEFAULT_MODELS['openai'])
+        language = template.language
+        limits = TokenBudget.get_limits(model)
+        
+        # Tokens esperados de cada parte do documento
+        parts = [
+            dict(part, tokens=TokenEstimator.words_to_tokens(part['words'], provider, language))
+            for part in template.get_structure(page_count)
+        ]
+        total_tokens = sum(part['tokens'] for part in parts)
+        
+        if math.ceil(total_tokens * OUTPUT_SAFETY_MARGIN) <= limits['max_output']:
+            groups = [parts]
+        else:
+            groups = TokenBudget._group_parts(parts, limits['max_output'])
+        
+        calls = []
+        for index, group in enumerate(groups):
+            if len(groups) == 1:
+                prompt = template.get_prompt(title, theme, page_count)
+            else:
+                prompt = template.get_part_prompt(
+                    title, theme, page_count, [part['title'] for part in group], index, len(groups)
+                )
+            
+            prompt_tokens = TokenEstimator.count_tokens(prompt, provider, language)
+            output_tokens = sum(part['tokens'] for part in group)
+            
+            # A saída também precisa caber no contexto junto com o prompt
+            max_tokens = min(
+                math.ceil(output_tokens * OUTPUT_SAFETY_MARGIN),
+                limits['max_output'],
+                max(256, limits['context'] - prompt_tokens)
+            )
+            
+            calls.append({
+                'parts': [part['title'] for part in group],
+                'prompt': prompt,
+                'prompt_tokens': prompt_tokens,
+                'output_tokens': output_tokens,
+                'max_tokens': max_tokens,
+            })
+        
+        return BudgetPlan(provider, model, calls)
+    
+    @staticmethod
+    def _group_parts(parts: List[Dict[str, Any]], max_output: int) -> List[List[Dict[str, Any]]]:
+        """Agrupa as partes em ordem, sem ultrapassar o limite de saída por chamada"""
+        budget = max_output / OUTPUT_SAFETY_MARGIN
+        groups = []
+        current, current_tokens = [], 0
+        
+        for part in parts:
+            if current and current_tokens + part['tokens'] > budget:
+                groups.append(current)
+                current, current_tokens = [], 0
+            current.append(part)
+            current_tokens += part['tokens']
+        
+        if current:
+            groups.append(current)
+        
+        return groups
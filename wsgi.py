@@ -0,0 +1,7 @@
+"""
+Ponto de entrada WSGI para servidores de produção (Gunicorn)
+"""
+
+from app import app
+
+application = app